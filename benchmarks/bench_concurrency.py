@@ -0,0 +1,143 @@
+"""
+Concurrency benchmark for the REST API under mixed load.
+
+Drives the FastAPI app in-process (through httpx's ASGI transport) with a
+mix of `/query`, `/add`, `/remove` and `/healthCheck` requests while the
+InfluxDB APIs are replaced by stand-ins that block for a fixed latency,
+as a slow Flux query would. The run is repeated with the InfluxDB calls
+made inline on the event loop ("blocking", the previous behaviour) and
+through the bounded executor ("executor"), and the p50/p99 latency per
+route is printed for both.
+
+Usage:
+    python -m benchmarks.bench_concurrency [--requests 400] [--rate 100]
+        [--latency-ms 50]
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.common import percentile
+from src.api import app as app_module
+from src.config.rollups import RollupConfig
+from src.services.executor import BlockingExecutor
+
+ROUTES = {
+    "query": ("GET", "/batteryData/query",
+              {"params": {"battery_id": "1", "start_time": "-1h",
+                          "stop_time": "-1m", "field": "voltage"}}),
+    "add": ("POST", "/batteryData/add",
+            {"json": {"battery_id": "1", "voltage": 450, "current": 50,
+                      "temperature": 25, "state_of_charge": 80,
+                      "state_of_health": 90}}),
+    "remove": ("DELETE", "/batteryData/remove",
+               {"params": {"battery_id": "1", "start_time": "-1h",
+                           "stop_time": "-1m"}}),
+    "healthCheck": ("GET", "/batteryData/healthCheck", {}),
+}
+# Relative weight of each route in the mixed load
+MIX = {"query": 3, "add": 3, "remove": 1, "healthCheck": 3}
+
+
+class _SlowApi:
+    """
+    Stand-in for the InfluxDB connection and its write, query and delete
+    APIs; every call blocks the calling thread for a fixed latency.
+    """
+
+    def __init__(self, latency_s: float):
+        self.latency_s = latency_s
+
+    def _block(self, *_args, **_kwargs):
+        time.sleep(self.latency_s)
+        return []
+
+    query = write = delete = _block
+
+    def close(self):
+        """Nothing to release."""
+
+
+async def _run_inline(_self, func, *args, **kwargs):
+    """Replacement for BlockingExecutor.run that blocks the event loop."""
+    return func(*args, **kwargs)
+
+
+async def _drive(app, requests: int, rate: float) -> dict:
+    """
+    Issues the requests open-loop at a fixed arrival rate; latency is
+    measured from each request's scheduled arrival, so time spent waiting
+    behind a blocked event loop is included.
+    """
+    latencies = defaultdict(list)
+    names = random.Random(0).choices(list(MIX), weights=list(MIX.values()),
+                                     k=requests)
+
+    transport = httpx.ASGITransport(app=app)
+    # the ASGI transport does not run the lifespan, which creates the
+    # InfluxManager
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=transport,
+                              base_url="http://bench") as client:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+
+        async def send(index: int, name: str):
+            scheduled = start + index / rate
+            await asyncio.sleep(scheduled - loop.time())
+            method, url, kwargs = ROUTES[name]
+            response = await client.request(method, url, **kwargs)
+            latencies[name].append((loop.time() - scheduled) * 1000)
+            response.raise_for_status()
+
+        await asyncio.gather(*(send(i, name) for i, name in
+                               enumerate(names)))
+        elapsed = loop.time() - start
+
+    return {"elapsed_s": elapsed, "latencies": latencies}
+
+
+def _report(mode: str, result: dict) -> None:
+    print(f"\n[{mode}] {sum(map(len, result['latencies'].values()))} "
+          f"requests in {result['elapsed_s']:.2f}s")
+    print(f"{'route':<12} {'n':>5} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, samples in sorted(result["latencies"].items()):
+        print(f"{name:<12} {len(samples):>5} "
+              f"{statistics.median(samples):>9.1f} "
+              f"{percentile(samples, 99):>9.1f}")
+
+
+def main() -> None:
+    """Runs the benchmark in both modes and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--rate", type=float, default=100.0,
+                        help="request arrivals per second")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    slow_api = _SlowApi(args.latency_ms / 1000)
+    app_module.InfluxConnection = lambda: slow_api
+    # the stand-in has no tasks API: every query aggregates the raw points
+    RollupConfig.ENABLED = False
+
+    executor_run = BlockingExecutor.run
+    for mode in ("blocking", "executor"):
+        BlockingExecutor.run = (_run_inline if mode == "blocking"
+                                else executor_run)
+        result = asyncio.run(
+            _drive(app_module.create_app(), args.requests, args.rate))
+        _report(mode, result)
+    BlockingExecutor.run = executor_run
+
+
+if __name__ == "__main__":
+    main()
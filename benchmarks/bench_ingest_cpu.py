@@ -0,0 +1,110 @@
+"""
+CPU cost per record of validating a reading and serialising it to line
+protocol.
+
+Times, in CPU time per record, the path a reading used to take (decoded to
+a dictionary, validated into BatteryData, dumped back to a dictionary and
+built into an InfluxDB `Point`) against the current one (validated from the
+raw JSON bytes and formatted straight to line protocol), and checks that
+both produce the same line protocol.
+
+Usage:
+    python -m benchmarks.bench_ingest_cpu [--records 50000]
+"""
+
+import argparse
+import json
+import random
+import time
+from typing import Any, Callable, Dict, List
+
+from influxdb_client import Point
+
+from src.models.battery import BatteryData
+from src.utils.line_protocol import battery_line
+
+INSERTED_AT = 1731801600000
+
+
+def _legacy(document: bytes) -> str:
+    """
+    The previous path: JSON decoded to a dictionary, validated, dumped and
+    built into a Point.
+    """
+    data: Dict[str, Any] = BatteryData.model_validate(
+        json.loads(document)).model_dump()
+    timestamp = data.get("timestamp")
+    return (
+        Point("battery_data")
+        .tag("battery_id", str(data.get("battery_id")))
+        .field("voltage", data.get("voltage"))
+        .field("current", data.get("current"))
+        .field("temperature", data.get("temperature"))
+        .field("state_of_charge", data.get("state_of_charge"))
+        .field("state_of_health", data.get("state_of_health"))
+        .field("influx_timestamp", INSERTED_AT)
+        .field("latency_ms", 0)
+        .time(INSERTED_AT if timestamp is None else timestamp,
+              write_precision="ms")
+    ).to_line_protocol()
+
+
+def _current(document: bytes) -> str:
+    """
+    The current path: validated from the raw bytes and formatted directly.
+    """
+    return battery_line(BatteryData.model_validate_json(document),
+                        INSERTED_AT)
+
+
+def _documents(count: int) -> List[bytes]:
+    """
+    Generates the JSON documents of random valid readings.
+    """
+    rng = random.Random(0)
+    return [json.dumps({
+        "battery_id": str(rng.randrange(1000)),
+        "voltage": rng.randrange(300, 600),
+        "current": rng.randrange(0, 200),
+        "temperature": rng.randrange(0, 60),
+        "state_of_charge": rng.randrange(0, 100),
+        "state_of_health": rng.randrange(0, 100),
+        "timestamp": INSERTED_AT - index,
+    }).encode() for index in range(count)]
+
+
+def _cpu_per_record(serialise: Callable[[bytes], str],
+                    documents: List[bytes]) -> float:
+    """
+    Returns the CPU time spent per record, in microseconds, best of three.
+    """
+    timings = []
+    for _ in range(3):
+        start = time.process_time()
+        for document in documents:
+            serialise(document)
+        timings.append(time.process_time() - start)
+    return min(timings) / len(documents) * 1e6
+
+
+def main() -> None:
+    """Times both paths and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--records", type=int, default=50_000)
+    args = parser.parse_args()
+
+    documents = _documents(args.records)
+    mismatches = sum(_legacy(document) != _current(document)
+                     for document in documents[:1000])
+    if mismatches:
+        raise SystemExit(f"{mismatches} records serialised differently")
+
+    legacy = _cpu_per_record(_legacy, documents)
+    current = _cpu_per_record(_current, documents)
+    print(f" legacy: {legacy:.2f} µs CPU per record")
+    print(f"current: {current:.2f} µs CPU per record")
+    print(f"speedup: {legacy / current:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
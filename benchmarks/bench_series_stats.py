@@ -0,0 +1,100 @@
+"""
+Time taken to summarise long battery time series.
+
+Times, per range of data points, summarising the fields of a battery from
+the rows of a query kept as dictionaries with the `statistics` module
+against collecting them into SeriesColumns and summarising them with NumPy,
+and checks that both agree on the mean and standard deviation.
+
+Usage:
+    python -m benchmarks.bench_series_stats [--points 1000000 5000000]
+"""
+
+import argparse
+import math
+import random
+import statistics
+import time
+from typing import Any, Dict, List
+
+from src.utils.series_stats import SeriesColumns
+
+FIELDS = ["voltage", "current", "temperature", "state_of_charge",
+          "state_of_health"]
+START_NS = 1731801600 * 10 ** 9
+PERCENTILES = [5, 50, 95]
+
+
+def _rows(count: int) -> List[Dict[str, Any]]:
+    """
+    Generates the pivoted rows of a battery, one reading per second.
+    """
+    rng = random.Random(0)
+    return [{"_time": START_NS + index * 10 ** 9,
+             **{field: rng.uniform(0, 100) for field in FIELDS}}
+            for index in range(count)]
+
+
+def _legacy(rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """
+    The pure Python path: every field summarised from the rows.
+    """
+    stats = {}
+    for field in FIELDS:
+        values = sorted(row[field] for row in rows)
+        cuts = statistics.quantiles(values, n=100, method="inclusive")
+        stats[field] = {"min": values[0], "max": values[-1],
+                        "mean": statistics.fmean(values),
+                        "std": statistics.pstdev(values),
+                        **{f"p{pct}": cuts[pct - 1] for pct in PERCENTILES}}
+    return stats
+
+
+def _current(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    The current path: the rows collected into columns and summarised with
+    NumPy, rates of change, time out of range and energy included.
+    """
+    columns = SeriesColumns(FIELDS)
+    for row in rows:
+        columns.append(row["_time"], [row[field] for field in FIELDS])
+    return columns.stats(PERCENTILES)["fields"]
+
+
+def _seconds(summarise, rows: List[Dict[str, Any]]) -> float:
+    """
+    Returns the wall time taken to summarise the rows, best of three.
+    """
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        summarise(rows)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    """Times both paths and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--points", type=int, nargs="+",
+                        default=[1_000_000])
+    args = parser.parse_args()
+
+    for count in args.points:
+        rows = _rows(count)
+        legacy, current = _legacy(rows), _current(rows)
+        for field in FIELDS:
+            for key in ("mean", "std"):
+                if not math.isclose(legacy[field][key],
+                                    current[field][key], rel_tol=1e-9):
+                    raise SystemExit(f"{field} {key} differs")
+
+        legacy_s = _seconds(_legacy, rows)
+        current_s = _seconds(_current, rows)
+        print(f"{count:>9} points: legacy {legacy_s:.2f} s, "
+              f"current {current_s:.2f} s, "
+              f"speedup {legacy_s / current_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Startup time of the service.
+
+Measures, each in a new Python process, the time taken to import
+`src.main` (which creates the application), and the time from starting
+`python -m src.main` until `/healthCheck` answers, against an address where
+no InfluxDB listens, as the service must not wait for InfluxDB to start.
+Also lists the heavy optional dependencies imported at startup, which
+should only be imported by the first request needing them.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List
+
+from benchmarks.common import percentile
+
+# Startup budgets, checked by the test suite
+IMPORT_BUDGET_S = 3.0
+READY_BUDGET_S = 6.0
+# Modules that must not be imported until a request needs them
+LAZY_MODULES = ("influxdb_client", "numpy", "pyarrow", "msgpack")
+# Longest time waited for the service to answer
+READY_TIMEOUT_S = 30
+
+IMPORT_SCRIPT = f"""
+import json, sys, time
+start = time.perf_counter()
+import src.main
+print(json.dumps({{
+    "import_s": time.perf_counter() - start,
+    "lazy_imported": [name for name in {LAZY_MODULES!r}
+                      if name in sys.modules],
+}}))
+"""
+
+
+def _environment(port: int, spool_dir: str) -> Dict[str, str]:
+    """
+    Returns the environment of a service listening on `port`, configured
+    with an InfluxDB address where nothing listens (the discard port).
+    """
+    return {**os.environ,
+            "REST_HOST": "127.0.0.1",
+            "REST_PORT": str(port),
+            "REST_WORKERS": "1",
+            "INFLUX_URL": "http://127.0.0.1:9",
+            "INFLUX_RETRIES": "0",
+            "SPOOL_DIR": spool_dir,
+            "LOG_LEVEL": "ERROR"}
+
+
+def _free_port() -> int:
+    """
+    Returns a TCP port nothing listens on.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import() -> Dict[str, object]:
+    """
+    Imports `src.main` in a new Python process.
+
+    Returns:
+    - Dict[str, object]: The seconds the import took, as "import_s", and
+      the modules of LAZY_MODULES it imported, as "lazy_imported".
+    """
+    with tempfile.TemporaryDirectory() as spool_dir:
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT], check=True,
+            capture_output=True, text=True,
+            env=_environment(_free_port(), spool_dir)).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def measure_ready() -> float:
+    """
+    Starts the service in a new process and waits until `/healthCheck`
+    answers, then stops it.
+
+    Returns:
+    - float: The seconds from starting the process until the first answer.
+
+    Raises:
+    - TimeoutError: If the service did not answer within READY_TIMEOUT_S.
+    """
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/batteryData/healthCheck"
+    with tempfile.TemporaryDirectory() as spool_dir:
+        start = time.perf_counter()
+        with subprocess.Popen([sys.executable, "-m", "src.main"],
+                              env=_environment(port, spool_dir),
+                              stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL) as process:
+            try:
+                while time.perf_counter() - start < READY_TIMEOUT_S:
+                    try:
+                        with urllib.request.urlopen(url, timeout=1):
+                            return time.perf_counter() - start
+                    except (urllib.error.URLError, ConnectionError):
+                        time.sleep(0.01)
+                raise TimeoutError(
+                    f"The service did not start within {READY_TIMEOUT_S} s")
+            finally:
+                process.terminate()
+                process.wait(timeout=READY_TIMEOUT_S)
+
+
+def _summary(samples: List[float]) -> str:
+    """
+    Formats the median and maximum of samples in seconds.
+    """
+    return (f"p50 {percentile(samples, 50):.3f} s, "
+            f"max {max(samples):.3f} s")
+
+
+def main() -> None:
+    """Measures the startup time and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    ready = [measure_ready() for _ in range(args.runs)]
+    print(f"       import: {_summary([run['import_s'] for run in imports])}"
+          f" (budget {IMPORT_BUDGET_S} s)")
+    print(f"time to ready: {_summary(ready)} (budget {READY_BUDGET_S} s)")
+    print(f"lazy modules imported at startup: "
+          f"{', '.join(imports[0]['lazy_imported']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Micro-benchmark of the time bound parsing and formatting of queries.
+
+Times the resolution of a query's start and stop times to the RFC3339
+bounds sent to InfluxDB, as done on every `/query` and `/remove` request,
+with the previous implementation (a unit table rebuilt on every call,
+`datetime` arithmetic and `strftime`) and the current one (precompiled
+patterns, cached parsing and integer nanoseconds), and prints the time per
+call of each.
+
+Usage:
+    python -m benchmarks.bench_time_parsing [--number 100000]
+"""
+
+import argparse
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from src.utils.datetime_utils import parse_time_range, to_rfc3339
+
+RANGES = [("-2h", "-1m"), ("-1d", "now()"), ("-30m", "now()"),
+          ("-7d", "-1d")]
+
+
+def _legacy_parse_relative_time(time_str: str) -> timedelta:
+    """
+    The previous parser of relative times, which rebuilt its unit table and
+    sliced the string by hand.
+    """
+    units = {
+        "ns": "nanoseconds", "us": "microseconds", "ms": "milliseconds",
+        "s": "seconds", "m": "minutes", "h": "hours", "d": "days",
+        "w": "weeks", "mo": "months", "y": "years",
+    }
+    time_str = time_str.lstrip("-")
+    if time_str[-2:] in units:
+        value, unit = int(time_str[:-2]), time_str[-2:]
+    else:
+        value, unit = int(time_str[:-1]), time_str[-1]
+    if unit not in units:
+        raise ValueError(f"Unsupported time unit: {unit}")
+    if unit == "mo":
+        return timedelta(days=value * 30)
+    if unit == "y":
+        return timedelta(days=value * 365)
+    if unit == "ns":
+        return timedelta(microseconds=value / 1000)
+    return timedelta(**{units[unit]: value})
+
+
+def _legacy_bound(now: datetime, time_str: str) -> str:
+    """
+    Formats a bound the way the previous implementation did.
+    """
+    if time_str == "now()":
+        moment = now
+    else:
+        moment = now - _legacy_parse_relative_time(time_str)
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def legacy(start_time: str, stop_time: str) -> tuple[str, str]:
+    """
+    Resolves a time range with the previous implementation.
+    """
+    now = datetime.now(timezone.utc)
+    return _legacy_bound(now, start_time), _legacy_bound(now, stop_time)
+
+
+def current(start_time: str, stop_time: str) -> tuple[str, str]:
+    """
+    Resolves a time range with the current implementation.
+    """
+    time_range = parse_time_range(start_time, stop_time)
+    return to_rfc3339(time_range.start_ns), to_rfc3339(time_range.stop_ns)
+
+
+def main() -> None:
+    """Times both implementations and prints the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--number", type=int, default=100_000,
+                        help="time ranges resolved per implementation")
+    args = parser.parse_args()
+
+    timings = {}
+    for name, resolve in (("legacy", legacy), ("current", current)):
+        calls = args.number // len(RANGES)
+        seconds = min(timeit.repeat(
+            lambda resolve=resolve: [resolve(*bounds) for bounds in RANGES],
+            number=calls, repeat=3))
+        timings[name] = seconds / (calls * len(RANGES))
+        print(f"{name:>8}: {timings[name] * 1e6:.2f} µs per range")
+    print(f" speedup: {timings['legacy'] / timings['current']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
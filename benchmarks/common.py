@@ -0,0 +1,19 @@
+"""
+Helpers shared by the benchmarks.
+"""
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """
+    Returns a percentile of samples, using the nearest-rank method.
+
+    Parameters:
+    - samples (list[float]): The samples; must not be empty.
+    - pct (float): The percentile, between 0 and 100.
+
+    Returns:
+    - float: The sample at that percentile.
+    """
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
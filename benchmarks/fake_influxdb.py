@@ -0,0 +1,520 @@
+"""
+In-process stand-in for the InfluxDB 2 HTTP API, used by the load tests
+and benchmarks so that they run offline and reproducibly.
+
+FakeInfluxDB serves the endpoints the service uses from a background
+thread: `/ping`, `/api/v2/write` (line protocol), `/api/v2/query`
+(annotated CSV), `/api/v2/delete` and `/api/v2/tasks`. Written points are
+kept in memory per battery; queries select them by the battery IDs and
+fields passed as Flux parameters, as sent by the InfluxManager's query
+templates, and return them as one table per series, or pivoted into one
+table per battery when the script pivots. Alternatively, queries return
+`rows_per_series` synthetic rows per series, to size responses without
+writing data first. Every request is delayed by `latency_s`, as a remote
+InfluxDB would. Setting `available` to False makes the API fail with 503
+responses, to simulate an outage. Tasks are stored but never run; they
+report a completed run at the start of every `every` interval, as if they
+always kept up.
+
+This is not a Flux engine: time ranges, aggregations and other stages of
+the script are ignored.
+
+The server runs in-process, or standalone so that generating large
+responses does not compete with the service for the GIL; the latency,
+`rows_per_series` and `available` of a standalone server are changed by
+posting them as JSON to `/fake/config`.
+
+Usage:
+    with FakeInfluxDB(latency_s=0.005) as influxdb:
+        os.environ["INFLUX_URL"] = influxdb.url
+
+    python -m benchmarks.fake_influxdb [--port 8086] [--latency-ms 5]
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+# Fields of the battery_data measurement, returned for the "*" wildcard
+FIELDS = ("voltage", "current", "temperature", "state_of_charge",
+          "state_of_health", "influx_timestamp", "latency_ms")
+# Start of the synthetic series, one point per second
+SYNTHETIC_START = datetime(2024, 11, 17, tzinfo=timezone.utc)
+
+# A quoted string of a delete predicate
+STRING_PATTERN = re.compile(r'"((?:[^"\\]|\\.)*)"')
+# The measurement of a delete predicate, if it selects one
+MEASUREMENT_PATTERN = re.compile(r'_measurement="([^"]*)"')
+# The name and interval in the task options of a Flux task
+TASK_OPTIONS = re.compile(r'option task = \{name: "([^"]*)", '
+                          r'every: (\d+)([smhd])')
+TASK_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3_600, "d": 86_400}
+# Line protocol separators, unless escaped with a backslash
+UNESCAPED_SPACE = re.compile(r"(?<!\\) ")
+UNESCAPED_COMMA = re.compile(r"(?<!\\),")
+# Line protocol boolean literals
+BOOLEANS = {literal: value
+            for value, literals in ((True, ("t", "T", "true", "True")),
+                                    (False, ("f", "F", "false", "False")))
+            for literal in literals}
+
+
+def _format_time(value: datetime) -> str:
+    """
+    Formats a time as RFC3339 with milliseconds.
+    """
+    return value.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def _parse_field(value: str) -> Any:
+    """
+    Parses a line protocol field value.
+    """
+    if value.endswith("i"):
+        return int(value[:-1])
+    if value.startswith('"'):
+        return value[1:-1]
+    return BOOLEANS[value] if value in BOOLEANS else float(value)
+
+
+def parse_line(line: str) -> Tuple[str, int, Dict[str, Any]]:
+    """
+    Parses a line protocol record of the battery_data measurement.
+
+    Parameters:
+    - line (str): The record, timestamped in milliseconds.
+
+    Returns:
+    - Tuple[str, int, Dict[str, Any]]: The battery ID, the timestamp in
+      milliseconds and the fields.
+    """
+    series, fields, timestamp = UNESCAPED_SPACE.split(line.strip())
+    tags = dict(tag.split("=", 1)
+                for tag in UNESCAPED_COMMA.split(series)[1:])
+    values = {name: _parse_field(value) for name, value in
+              (field.split("=", 1)
+               for field in UNESCAPED_COMMA.split(fields))}
+    return tags["battery_id"].replace("\\", ""), int(timestamp), values
+
+
+def _literal(node: Dict[str, Any]) -> Any:
+    """
+    Returns the value of a Flux literal or array of literals of the
+    parameters of a query.
+    """
+    if node["type"] == "ArrayExpression":
+        return [_literal(element) for element in node["elements"]]
+    return node.get("value")
+
+
+def _params(extern: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Returns the parameters of a query, sent by the InfluxDB client as
+    option statements, keyed by name.
+    """
+    return {statement["assignment"]["id"]["name"]:
+            _literal(statement["assignment"]["init"])
+            for statement in (extern or {}).get("body", [])}
+
+
+def _selected(params: Dict[str, Any], param: str) -> Optional[List[str]]:
+    """
+    Returns the values of a column selected by the parameters of a query,
+    a single value or a list of values, or None if every value is
+    selected.
+    """
+    if param in params:
+        return [params[param]]
+    return params.get(f"{param}s")
+
+
+def _datatype(values: List[Any]) -> str:
+    """
+    Returns the annotated CSV datatype of a column of field values.
+    """
+    if all(isinstance(value, int) and not isinstance(value, bool)
+           for value in values if value is not None):
+        return "long"
+    return "double"
+
+
+def _csv_value(value: Any) -> str:
+    """
+    Formats a field value for annotated CSV; missing values are empty.
+    """
+    return "" if value is None else str(value)
+
+
+class FakeInfluxDB:  # pylint: disable=too-many-instance-attributes
+    """
+    In-process fake InfluxDB 2 HTTP server.
+
+    Attributes:
+    - latency_s (float): Delay added to every request.
+    - rows_per_series (Optional[int]): If set, queries return this many
+      synthetic rows per series instead of the written points.
+    - available (bool): If False, writes, queries and deletes fail with a
+      503, as during an outage.
+    - requests (Dict[str, int]): Number of requests served per endpoint.
+    - tasks (Dict[str, Dict[str, Any]]): The tasks created, by ID.
+    """
+
+    def __init__(self, latency_s: float = 0.0,
+                 rows_per_series: Optional[int] = None, port: int = 0):
+        """
+        Initializes the FakeInfluxDB instance; the server starts when the
+        context manager is entered.
+
+        Parameters:
+        - latency_s (float): Delay added to every request.
+        - rows_per_series (Optional[int]): If set, queries return this many
+          synthetic rows per series instead of the written points.
+        - port (int): The port to listen on; any free port if 0.
+        """
+        self.latency_s = latency_s
+        self.rows_per_series = rows_per_series
+        self.available = True
+        self.requests: Dict[str, int] = {}
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        # points per battery, as (timestamp in ms, fields)
+        self._points: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        # polled often, so that the server stops quickly in tests
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        args=(0.05,), name="fake-influxdb",
+                                        daemon=True)
+
+    @property
+    def url(self) -> str:
+        """
+        str: The base URL of the server, e.g. "http://127.0.0.1:12345".
+        """
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "FakeInfluxDB":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_exc_info: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def points(self, battery_id: str) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Returns the points written for a battery, sorted by time.
+
+        Parameters:
+        - battery_id (str): The battery.
+
+        Returns:
+        - List[Tuple[int, Dict[str, Any]]]: The points, as (timestamp in
+          ms, fields).
+        """
+        with self._lock:
+            return sorted(self._points.get(battery_id, []),
+                          key=lambda point: point[0])
+
+    def write(self, body: str) -> None:
+        """
+        Stores the points of a line protocol body.
+
+        Parameters:
+        - body (str): The line protocol records, one per line.
+        """
+        records = [parse_line(line) for line in body.splitlines()
+                   if line.strip()]
+        with self._lock:
+            for battery_id, timestamp, fields in records:
+                self._points.setdefault(battery_id, []).append(
+                    (timestamp, fields))
+
+    def delete(self, start: str, stop: str, predicate: str) -> None:
+        """
+        Deletes the points of a battery within a time range.
+
+        Parameters:
+        - start (str): Start of the range, as RFC3339.
+        - stop (str): Stop of the range, as RFC3339.
+        - predicate (str): The delete predicate, e.g. 'battery_id="1"'.
+        """
+        start_ms, stop_ms = (
+            int(datetime.fromisoformat(bound).timestamp() * 1000)
+            for bound in (start, stop))
+        battery_id = STRING_PATTERN.search(predicate).group(1)
+        measurement = MEASUREMENT_PATTERN.search(predicate)
+        if measurement is not None and measurement.group(1) != "battery_data":
+            # only the battery_data measurement is stored
+            return
+        with self._lock:
+            self._points[battery_id] = [
+                point for point in self._points.get(battery_id, [])
+                if not start_ms <= point[0] <= stop_ms]
+
+    def query(self, flux: str, params: Dict[str, Any]) -> str:
+        """
+        Runs a Flux script, selecting points by battery ID and field.
+
+        Parameters:
+        - flux (str): The Flux script.
+        - params (Dict[str, Any]): The parameters of the script.
+
+        Returns:
+        - str: The result as annotated CSV.
+        """
+        fields = _selected(params, "_field") or list(FIELDS)
+        batteries = _selected(params, "_battery_id")
+        if batteries is None:
+            with self._lock:
+                batteries = sorted(self._points) or ["1"]
+        pivot = "pivot(" in flux
+        tables = (self._pivoted_table(battery_id, fields)
+                  if pivot else self._series_table(battery_id, field)
+                  for battery_id in batteries
+                  for field in ([None] if pivot else fields))
+        return "\n".join(self._annotated_csv(index, columns, rows)
+                         for index, (columns, rows) in enumerate(tables))
+
+    def _series(self, battery_id: str) -> List[Tuple[datetime,
+                                                     Dict[str, Any]]]:
+        """
+        Returns the points of a battery, most recent first.
+        """
+        if self.rows_per_series is not None:
+            return [(SYNTHETIC_START + timedelta(seconds=second),
+                     {field: float(second % 100) for field in FIELDS})
+                    for second in reversed(range(self.rows_per_series))]
+        return [(datetime.fromtimestamp(timestamp / 1000, timezone.utc),
+                 fields)
+                for timestamp, fields in reversed(self.points(battery_id))]
+
+    def _series_table(self, battery_id: str, field: str
+                      ) -> Tuple[List[Tuple[str, str, str]], List[List[Any]]]:
+        """
+        Returns the table of a battery's field, as its columns (name,
+        datatype, group) and rows.
+        """
+        series = [(time_, fields[field]) for time_, fields
+                  in self._series(battery_id) if field in fields]
+        columns = [("_time", "dateTime:RFC3339", "false"),
+                   ("_value", _datatype([value for _, value in series]),
+                    "false"),
+                   ("_field", "string", "true"),
+                   ("_measurement", "string", "true"),
+                   ("battery_id", "string", "true")]
+        rows = [[_format_time(time_), value, field, "battery_data",
+                 battery_id] for time_, value in series]
+        return columns, rows
+
+    def _pivoted_table(self, battery_id: str, fields: List[str]
+                       ) -> Tuple[List[Tuple[str, str, str]],
+                                  List[List[Any]]]:
+        """
+        Returns the table of a battery with one column per field, as its
+        columns (name, datatype, group) and rows.
+        """
+        series = self._series(battery_id)
+        columns = [("_time", "dateTime:RFC3339", "false"),
+                   ("battery_id", "string", "true")]
+        columns += [(field, _datatype([point.get(field)
+                                       for _, point in series]), "false")
+                    for field in fields]
+        rows = [[_format_time(time_), battery_id,
+                 *(point.get(field) for field in fields)]
+                for time_, point in series]
+        return columns, rows
+
+    @staticmethod
+    def _annotated_csv(index: int, columns: List[Tuple[str, str, str]],
+                       rows: List[List[Any]]) -> str:
+        """
+        Formats a table as annotated CSV, with the datatype, group and
+        default annotations requested by the InfluxDB client.
+        """
+        names, datatypes, groups = zip(*columns)
+        lines = [f"#datatype,string,long,{','.join(datatypes)}",
+                 f"#group,false,false,{','.join(groups)}",
+                 "#default,_result,," + "," * (len(columns) - 1),
+                 f",result,table,{','.join(names)}"]
+        lines += [f",,{index},{','.join(map(_csv_value, row))}"
+                  for row in rows]
+        return "\r\n".join(lines) + "\r\n"
+
+    def create_task(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Stores a task.
+
+        Parameters:
+        - request (Dict[str, Any]): The task creation request, with its
+          "flux" script, "org", "status" and "description".
+
+        Returns:
+        - Dict[str, Any]: The task, with its name and interval read from
+          the task options of the script.
+        """
+        name, every, unit = TASK_OPTIONS.search(request["flux"]).groups()
+        with self._lock:
+            task_id = f"{len(self.tasks) + 1:016x}"
+            self.tasks[task_id] = {
+                "id": task_id, "orgID": "0" * 16, "org": request.get("org"),
+                "name": name, "description": request.get("description"),
+                "status": request.get("status", "active"),
+                "flux": request["flux"], "every": f"{every}{unit}",
+                "createdAt": _format_time(datetime.now(timezone.utc)),
+                "every_s": int(every) * TASK_UNIT_SECONDS[unit]}
+        return self._task(task_id)
+
+    def _task(self, task_id: str) -> Dict[str, Any]:
+        """
+        Returns a task as the API does, completed at the start of the
+        current interval.
+        """
+        task = dict(self.tasks[task_id])
+        every_s = task.pop("every_s")
+        completed = int(time.time()) // every_s * every_s
+        task["latestCompleted"] = _format_time(
+            datetime.fromtimestamp(completed, timezone.utc))
+        task["lastRunStatus"] = "success"
+        return task
+
+    def _tasks_response(self, method: str, path: str,
+                        body: bytes) -> Tuple[int, bytes, str]:
+        """
+        Serves a request to the tasks API: listing, creating or deleting
+        tasks.
+        """
+        if method == "POST":
+            result = self.create_task(json.loads(body))
+        elif method == "DELETE":
+            self.tasks.pop(path.rsplit("/", 1)[1], None)
+            return 204, b"", "text/plain"
+        else:
+            result = {"tasks": [self._task(task_id)
+                                for task_id in list(self.tasks)]}
+        return 200, json.dumps(result).encode(), "application/json"
+
+    def configure(self, config: Dict[str, Any]) -> None:
+        """
+        Changes the latency, the number of synthetic rows and the
+        availability.
+
+        Parameters:
+        - config (Dict[str, Any]): The new "latency_s", "rows_per_series"
+          and "available", each optional.
+        """
+        self.latency_s = config.get("latency_s", self.latency_s)
+        self.rows_per_series = config.get("rows_per_series",
+                                          self.rows_per_series)
+        self.available = config.get("available", self.available)
+
+    def handle(self, method: str, path: str,
+               body: bytes) -> Tuple[int, bytes, str]:
+        """
+        Serves a request.
+
+        Parameters:
+        - method (str): The HTTP method.
+        - path (str): The request path, without the query string.
+        - body (bytes): The request body.
+
+        Returns:
+        - Tuple[int, bytes, str]: The status, body and content type of the
+          response.
+        """
+        time.sleep(self.latency_s)
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+        empty = (204, b"", "text/plain")
+        if method == "GET" and path == "/ping":
+            return empty
+        if not self.available and path.startswith("/api/"):
+            return 503, b'{"message": "unavailable"}', "application/json"
+        # the tasks API is served for any method and task ID
+        route = "/api/v2/tasks" if path.startswith("/api/v2/tasks") else path
+        handlers = {
+            "/api/v2/query": lambda: self._query_response(json.loads(body)),
+            "/api/v2/write": lambda: self.write(body.decode()),
+            "/api/v2/delete": lambda: self.delete(**{
+                key: value for key, value in json.loads(body).items()
+                if key in {"start", "stop", "predicate"}}),
+            "/api/v2/tasks": lambda: self._tasks_response(method, path,
+                                                          body),
+            "/fake/config": lambda: self.configure(json.loads(body)),
+        }
+        if route not in handlers or (method != "POST"
+                                     and route != "/api/v2/tasks"):
+            return 404, b'{"message": "not found"}', "application/json"
+        return handlers[route]() or empty
+
+    def _query_response(self, request: Dict[str, Any]
+                        ) -> Tuple[int, bytes, str]:
+        """
+        Serves a query request, returning the annotated CSV response.
+        """
+        result = self.query(request["query"], _params(request.get("extern")))
+        return 200, result.encode(), "text/csv; charset=utf-8"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Hands the requests to the FakeInfluxDB of the server.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *_args: Any) -> None:
+        """Silences the access log."""
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Serves a GET request."""
+        self._serve()
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        """Serves a POST request."""
+        self._serve()
+
+    def do_DELETE(self) -> None:  # pylint: disable=invalid-name
+        """Serves a DELETE request."""
+        self._serve()
+
+    def _serve(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        status, payload, content_type = self.server.fake.handle(
+            self.command, urlparse(self.path).path, self.rfile.read(length))
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def main() -> None:
+    """Runs a standalone server and prints its URL."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--port", type=int, default=0,
+                        help="port to listen on (default: any free port)")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--rows-per-series", type=int, default=None)
+    args = parser.parse_args()
+
+    influxdb = FakeInfluxDB(args.latency_ms / 1000, args.rows_per_series,
+                            port=args.port)
+    with influxdb:
+        print(influxdb.url, flush=True)
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Load test of the REST API against a fake InfluxDB.
+
+Starts the fake InfluxDB of `benchmarks.fake_influxdb` in a separate
+process, points the service at it, and drives the app built by
+`src.api.app.create_app` in-process (through httpx's ASGI transport) with
+`/add`, `/query` and `/remove` requests. Every route is run at each
+concurrency level and payload size: the number of readings per write
+(`/add` for one reading, `/addBulk` for more) and the number of rows per
+query result. Each scenario issues a fixed number of requests from
+`concurrency` closed-loop clients, and its throughput and p50/p95/p99
+latency are printed and saved as JSON.
+
+Given a previous result file with --baseline, the run is compared to it
+and exits with status 1 if a scenario's p99 latency grew, or its
+throughput dropped, by more than --tolerance, so that regressions can be
+caught offline.
+
+Usage:
+    python -m benchmarks.load_test [--requests 200]
+        [--concurrency 1 8 32] [--sizes 1 100 1000] [--latency-ms 5]
+        [--output load_test.json] [--baseline previous.json]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+from benchmarks.common import percentile
+
+# Battery the load test writes, queries and deletes
+BATTERY_ID = "bench"
+READING = {"battery_id": BATTERY_ID, "voltage": 450, "current": 50,
+           "temperature": 25, "state_of_charge": 80, "state_of_health": 90}
+# Requests sent before each scenario is timed
+WARMUP_REQUESTS = 10
+
+
+def _request(route: str, size: int) -> Tuple[str, str, Dict[str, Any]]:
+    """
+    Returns the method, URL and httpx arguments of a scenario's requests.
+    """
+    if route == "add" and size == 1:
+        return "POST", "/batteryData/add", {"json": READING}
+    if route == "add":
+        now = int(time.time() * 1000)
+        body = "".join(json.dumps({**READING, "timestamp": now - i}) + "\n"
+                       for i in range(size))
+        return "POST", "/batteryData/addBulk", {
+            "content": body,
+            "headers": {"Content-Type": "application/x-ndjson"}}
+    if route == "query":
+        return "GET", "/batteryData/query", {
+            "params": {"battery_id": BATTERY_ID, "start_time": "-1h",
+                       "stop_time": "now()", "field": "voltage"}}
+    return "DELETE", "/batteryData/remove", {
+        "params": {"battery_id": BATTERY_ID, "start_time": "-1h",
+                   "stop_time": "-1m"}}
+
+
+async def _run_scenario(client: httpx.AsyncClient, scenario: Dict[str, Any],
+                        requests: int) -> Dict[str, Any]:
+    """
+    Sends a scenario's requests from `concurrency` closed-loop clients and
+    summarises their latency.
+    """
+    method, url, kwargs = _request(scenario["route"], scenario["size"])
+    for _ in range(WARMUP_REQUESTS):
+        await client.request(method, url, **kwargs)
+
+    latencies: List[float] = []
+    errors = 0
+    jobs = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for _ in jobs:
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += response.is_error
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in
+                           range(scenario["concurrency"])))
+    elapsed = time.perf_counter() - start
+    return {
+        **scenario,
+        "requests": requests,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        **{f"p{pct}_ms": round(percentile(latencies, pct), 2)
+           for pct in (50, 95, 99)},
+        "max_ms": round(max(latencies), 2),
+    }
+
+
+async def _run(args: argparse.Namespace, fake_url: str) -> List[Dict]:
+    """
+    Runs every scenario against the app and returns their results.
+    """
+    # imported once the environment points the service at the fake
+    from src.api.app import create_app  # pylint: disable=import-outside-toplevel
+
+    app = create_app()
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    # the ASGI transport does not run the lifespan, which creates the
+    # InfluxManager
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=transport, base_url="http://load",
+                              timeout=None) as client, \
+            httpx.AsyncClient(base_url=fake_url) as fake:
+        print(f"{'route':<7} {'size':>6} {'conc':>5} {'req/s':>9} "
+              f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+        for route in ("add", "query", "remove"):
+            for size in args.sizes if route != "remove" else [1]:
+                await fake.post("/fake/config",
+                                json={"rows_per_series": size})
+                for concurrency in args.concurrency:
+                    result = await _run_scenario(
+                        client, {"route": route, "size": size,
+                                 "concurrency": concurrency},
+                        args.requests)
+                    _report(result)
+                    results.append(result)
+    return results
+
+
+def _report(result: Dict[str, Any]) -> None:
+    """
+    Prints the result of a scenario as a table row.
+    """
+    print(f"{result['route']:<7} {result['size']:>6} "
+          f"{result['concurrency']:>5} {result['throughput_rps']:>9.1f} "
+          f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+          f"{result['p99_ms']:>8.2f} {result['errors']:>6}")
+
+
+def _compare(results: List[Dict], baseline: List[Dict],
+             tolerance: float) -> List[str]:
+    """
+    Compares results to a baseline and returns the regressions found.
+    """
+    previous = {(result["route"], result["size"], result["concurrency"]):
+                result for result in baseline}
+    regressions = []
+    for result in results:
+        key = (result["route"], result["size"], result["concurrency"])
+        if key not in previous:
+            continue
+        before = previous[key]
+        if result["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: p99 {before['p99_ms']} ms -> "
+                               f"{result['p99_ms']} ms")
+        if result["throughput_rps"] < before["throughput_rps"] * (
+                1 - tolerance):
+            regressions.append(f"{key}: throughput "
+                               f"{before['throughput_rps']} req/s -> "
+                               f"{result['throughput_rps']} req/s")
+    return regressions
+
+
+def _start_fake_influxdb(latency_ms: float) -> Tuple[subprocess.Popen, str]:
+    """
+    Starts the fake InfluxDB in a separate process and returns it with its
+    URL.
+    """
+    process = subprocess.Popen(  # pylint: disable=consider-using-with
+        [sys.executable, "-m", "benchmarks.fake_influxdb",
+         "--latency-ms", str(latency_ms)],
+        stdout=subprocess.PIPE, text=True)
+    return process, process.stdout.readline().strip()
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=200,
+                        help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, nargs="+",
+                        default=[1, 8, 32])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 1000],
+                        help="readings per write and rows per query")
+    parser.add_argument("--latency-ms", type=float, default=5.0,
+                        help="latency of the fake InfluxDB")
+    parser.add_argument("--ack-mode", choices=["buffer", "flush"],
+                        default="buffer",
+                        help="WRITE_BUFFER_ACK_MODE of the service")
+    parser.add_argument("--query-cache", action="store_true",
+                        help="enable the query cache")
+    parser.add_argument("--output", default="load_test.json")
+    parser.add_argument("--baseline", help="previous result file")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative regression (default 0.2)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Runs the load test, saves its results and compares them."""
+    args = _parse_args()
+    logging.disable(logging.INFO)
+
+    process, fake_url = _start_fake_influxdb(args.latency_ms)
+    os.environ.update({
+        "INFLUX_URL": fake_url, "INFLUX_TOKEN": "load-test",
+        "INFLUX_ORG": "load-test", "INFLUX_BUCKET": "load-test",
+        "WRITE_BUFFER_ACK_MODE": args.ack_mode,
+        "QUERY_CACHE_ENABLED": str(args.query_cache).lower(),
+    })
+    try:
+        results = asyncio.run(_run(args, fake_url))
+    finally:
+        process.terminate()
+        process.wait()
+
+    settings = {name: value for name, value in vars(args).items()
+                if name not in {"output", "baseline", "tolerance"}}
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump({
+            "created": datetime.now(timezone.utc).isoformat(),
+            "environment": {"python": platform.python_version(),
+                            "platform": platform.platform(),
+                            "cpus": os.cpu_count()},
+            "settings": settings,
+            "results": results,
+        }, output, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline:
+            regressions = _compare(results, json.load(baseline)["results"],
+                                   args.tolerance)
+        for regression in regressions:
+            print(f"Regression {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regression beyond {args.tolerance:.0%} of "
+              f"{args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
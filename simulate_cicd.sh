@@ -59,7 +59,10 @@ log "Docker image built successfully."
 
 # Start the container
 log "Starting container $CONTAINER_NAME..."
-if ! sudo docker run -d --name "$CONTAINER_NAME" --network="host" "${IMAGE_NAME}" ; then
+# give the service time to drain its requests and flush its write buffers
+# on "docker stop" (REST_SHUTDOWN_TIMEOUT_S, plus the flush)
+if ! sudo docker run -d --name "$CONTAINER_NAME" --network="host" \
+        --stop-timeout 30 "${IMAGE_NAME}" ; then
     log "Failed to start container $CONTAINER_NAME. Exiting..."
     exit 1
 fi
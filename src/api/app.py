@@ -7,10 +7,158 @@ InfluxDB, allowing users to perform operations such as
 querying and deleting data.
 """
 
+import asyncio
+import contextlib
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from src.api.compression import CompressionMiddleware
 from src.api.endpoints import router as rest_api_router
+from src.api.metrics import MetricsMiddleware, metrics_endpoint, \
+    monitor_event_loop_lag
+from src.api.request_context import RequestContextMiddleware
+from src.config.admission import AdmissionConfig
+from src.config.compression import CompressionConfig
+from src.config.delete_jobs import DeleteJobsConfig
+from src.config.latest_values import LatestValuesConfig
+from src.config.logging import LoggingConfig
+from src.config.metrics import MetricsConfig
+from src.config.rollups import RollupConfig
+from src.db.connection import InfluxConnection
+from src.services.admission import AdmissionControl, ConcurrencyLimit, \
+    CostBudget
+from src.services.delete_jobs import DeleteJobs
+from src.services.influx_manager import InfluxManager
+from src.services.metrics import SNAPSHOT_COLLECTOR
+from src.utils.datetime_utils import NANOSECONDS_PER_SECOND, to_rfc3339
+
+# Configure the logger
+logger = LoggingConfig.get_logger(__name__)
+
+# Delay before retrying to seed the latest values when they are not
+# refreshed periodically
+SEED_RETRY_S = 5
+
+
+async def refresh_latest_values(influx_manager: InfluxManager,
+                                interval_s: float) -> None:
+    """
+    Seeds the latest values table from InfluxDB, then merges the values
+    written by other writers every `interval_s`, until cancelled. A failed
+    refresh is retried at the next interval over the whole range missed, so
+    InfluxDB being unavailable only delays the table.
+
+    Parameters:
+    - influx_manager (InfluxManager): The manager owning the table.
+    - interval_s (float): The interval between two refreshes; 0 stops once
+      the table is seeded.
+    """
+    start = LatestValuesConfig.SEED_RANGE
+    while True:
+        refreshed_at = time.time_ns()
+        try:
+            await influx_manager.executor.run(influx_manager.refresh_latest,
+                                              start)
+            if interval_s <= 0:
+                return
+            # overlap the previous range, for points written late
+            start = to_rfc3339(
+                refreshed_at - int(interval_s * NANOSECONDS_PER_SECOND))
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            logger.warning("Failed to refresh the latest values: %s", err)
+        await asyncio.sleep(interval_s or SEED_RETRY_S)
+
+
+async def refresh_rollups(influx_manager: InfluxManager,
+                          interval_s: float) -> None:
+    """
+    Creates the rollup tasks if needed, refreshes the range the rollup
+    tiers cover and rolls up again the tier windows whose data changed
+    every `interval_s`, until cancelled. A failed refresh is retried at the
+    next interval; until a refresh succeeds, queries are served from the
+    raw data points.
+
+    Parameters:
+    - influx_manager (InfluxManager): The manager owning the rollup tiers.
+    - interval_s (float): The interval between two refreshes.
+    """
+    while True:
+        try:
+            await influx_manager.executor.run(influx_manager.refresh_rollups)
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            logger.warning("Failed to refresh the rollup tiers: %s", err)
+        await asyncio.sleep(interval_s)
+
+
+def create_admission_control() -> AdmissionControl:
+    """
+    Creates the admission control of the ingest and query routes from
+    AdmissionConfig.
+
+    Returns:
+    - AdmissionControl: The admission control.
+    """
+    queue_timeout_s = AdmissionConfig.QUEUE_TIMEOUT_MS / 1000
+    return AdmissionControl(
+        ingest=ConcurrencyLimit(AdmissionConfig.INGEST_CONCURRENCY,
+                                AdmissionConfig.MAX_QUEUED, queue_timeout_s),
+        query=ConcurrencyLimit(AdmissionConfig.QUERY_CONCURRENCY,
+                               AdmissionConfig.MAX_QUEUED, queue_timeout_s),
+        query_budget=CostBudget(AdmissionConfig.QUERY_COST_PER_S,
+                                AdmissionConfig.QUERY_COST_BURST))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Manages the application lifecycle. On startup, creates the
+    InfluxManager used by the endpoints; the InfluxDB client connects on
+    first use, so startup does not wait for InfluxDB. It also exports the
+    manager's metrics, starts sampling the event loop lag, seeds the latest
+    values and refreshes the rollup tiers in the background, and creates
+    the background delete jobs and the admission control. On shutdown,
+    interrupts the delete jobs, flushes the write buffer, syncs the spool,
+    waits for the in-flight InfluxDB calls to complete and closes the
+    InfluxDB client.
+
+    Parameters:
+    - app (FastAPI): The FastAPI application instance.
+    """
+    influx_manager = app.state.influx_manager = InfluxManager(
+        InfluxConnection())
+    delete_jobs = app.state.delete_jobs = DeleteJobs(
+        influx_manager,
+        chunk_ms=DeleteJobsConfig.CHUNK_MS,
+        concurrency=DeleteJobsConfig.CONCURRENCY,
+        max_active=DeleteJobsConfig.MAX_ACTIVE,
+        max_finished=DeleteJobsConfig.MAX_FINISHED,
+        state_dir=DeleteJobsConfig.STATE_DIR)
+    admission = app.state.admission = create_admission_control()
+    SNAPSHOT_COLLECTOR.snapshots = {**influx_manager.snapshots(),
+                                    "delete_jobs": delete_jobs.snapshot,
+                                    "admission": admission.snapshot}
+    tasks = [
+        asyncio.create_task(monitor_event_loop_lag(
+            MetricsConfig.LOOP_LAG_INTERVAL_MS / 1000)),
+        asyncio.create_task(refresh_latest_values(
+            influx_manager, LatestValuesConfig.REFRESH_INTERVAL_MS / 1000))]
+    if influx_manager.rollups is not None:
+        tasks.append(asyncio.create_task(refresh_rollups(
+            influx_manager, RollupConfig.REFRESH_INTERVAL_MS / 1000)))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        SNAPSHOT_COLLECTOR.snapshots = {}
+        await delete_jobs.close()
+        influx_manager.close()
 
 
 def create_app() -> FastAPI:
@@ -26,9 +174,11 @@ def create_app() -> FastAPI:
     app = FastAPI(
         title="Battery Data API",
         description="API for managing battery data in InfluxDB",
-        version="1.0.0"
+        version="1.0.0",
+        lifespan=lifespan
     )
     app.include_router(rest_api_router, prefix="/batteryData")
+    app.add_api_route("/metrics", metrics_endpoint, include_in_schema=False)
 
     # Configure CORS -- This code is simply for the demo
     app.add_middleware(
@@ -39,4 +189,14 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    if CompressionConfig.ENABLED:
+        app.add_middleware(
+            CompressionMiddleware,
+            min_bytes=CompressionConfig.MIN_BYTES,
+            gzip_level=CompressionConfig.GZIP_LEVEL,
+            brotli_quality=CompressionConfig.BROTLI_QUALITY)
+    # added last so that they wrap the other middleware, and record the
+    # responses as sent
+    app.add_middleware(MetricsMiddleware)
+    app.add_middleware(RequestContextMiddleware)
     return app
@@ -0,0 +1,178 @@
+"""
+This module defines the CompressionMiddleware class, which compresses the
+large HTTP responses with Brotli or gzip, as negotiated with the client
+through the Accept-Encoding header.
+
+Brotli requires the optional `brotli` package; without it, responses are
+compressed with gzip only.
+"""
+
+import zlib
+from importlib.util import find_spec
+from typing import Callable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Encodings supported, in the order of preference of the server
+ENCODINGS = (("br",) if find_spec("brotli") is not None else ()) + ("gzip",)
+# Statuses whose responses have no body
+BODYLESS_STATUSES = frozenset({204, 304})
+
+
+def preferred_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Returns the supported encoding with the highest quality in an
+    Accept-Encoding header; the server's preference breaks ties.
+
+    Parameters:
+    - accept_encoding (str): The Accept-Encoding header.
+
+    Returns:
+    - Optional[str]: "br" or "gzip", or None if the client accepts
+      neither.
+    """
+    qualities = {}
+    for coding in accept_encoding.split(","):
+        name, *params = coding.split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+    wildcard = qualities.get("*", 0.0)
+    ranked = [(qualities.get(encoding, wildcard), encoding)
+              for encoding in ENCODINGS]
+    # max keeps the first of equal qualities, the server's preference
+    quality, encoding = max(ranked, key=lambda item: item[0])
+    return encoding if quality > 0 else None
+
+
+class Compressor:
+    """
+    Incremental compressor of a response body.
+    """
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        """
+        Initializes the Compressor instance.
+
+        Parameters:
+        - encoding (str): "br" or "gzip".
+        - gzip_level (int): The gzip compression level.
+        - brotli_quality (int): The Brotli quality.
+        """
+        if encoding == "br":
+            import brotli  # pylint: disable=import-outside-toplevel,import-error
+            compressor = brotli.Compressor(quality=brotli_quality)
+            self._process: Callable[[bytes], bytes] = compressor.process
+            self._flush: Callable[[], bytes] = compressor.flush
+            self._finish: Callable[[], bytes] = compressor.finish
+        else:
+            # wbits 31: a deflate stream with a gzip header and trailer
+            compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._process = compressor.compress
+            self._flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = compressor.flush
+
+    def compress(self, chunk: bytes, more_body: bool) -> bytes:
+        """
+        Compresses a chunk of the body. Every chunk but the last is flushed,
+        so that a streamed response reaches the client as it is produced.
+
+        Parameters:
+        - chunk (bytes): The chunk.
+        - more_body (bool): Whether more chunks follow.
+
+        Returns:
+        - bytes: The compressed data.
+        """
+        return self._process(chunk) + (
+            self._flush() if more_body else self._finish())
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing the response bodies of at least `min_bytes`
+    with the encoding the client prefers. Streamed responses are
+    compressed chunk by chunk, whatever the size of their first chunk.
+    Responses already encoded are left as they are.
+    """
+
+    def __init__(self, app: ASGIApp, min_bytes: int, gzip_level: int,
+                 brotli_quality: int):
+        """
+        Initializes the CompressionMiddleware instance.
+
+        Parameters:
+        - app (ASGIApp): The application wrapped by the middleware.
+        - min_bytes (int): The size under which a response is sent
+          uncompressed.
+        - gzip_level (int): The gzip compression level.
+        - brotli_quality (int): The Brotli quality.
+        """
+        self.app = app
+        self.min_bytes = min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
+        """
+        Serves a request, compressing its response if large enough.
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = preferred_encoding(
+            Headers(scope=scope).get("accept-encoding", ""))
+        start: Optional[Message] = None
+        compressor: Optional[Compressor] = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                # held until the first body chunk tells the size of the body
+                start = message
+                return
+            if start is not None:
+                if message["type"] == "http.response.body":
+                    compressor = self._compressor(start, message, encoding)
+                await send(start)
+                start = None
+            if compressor is not None:
+                message = {**message, "body": compressor.compress(
+                    message.get("body", b""),
+                    message.get("more_body", False))}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _compressor(self, start: Message, first: Message,
+                    encoding: Optional[str]) -> Optional[Compressor]:
+        """
+        Decides whether to compress a response from its start message and
+        first body chunk, updating its headers if so.
+
+        Returns:
+        - Optional[Compressor]: The compressor of the body, or None if it
+          is sent uncompressed.
+        """
+        headers = MutableHeaders(scope=start)
+        if (start["status"] in BODYLESS_STATUSES
+                or "content-encoding" in headers
+                or not first.get("more_body", False)
+                and len(first.get("body", b"")) < self.min_bytes):
+            return None
+        headers.add_vary_header("Accept-Encoding")
+        if encoding is None:
+            return None
+        headers["Content-Encoding"] = encoding
+        # the length of the compressed body is not known in advance
+        del headers["Content-Length"]
+        return Compressor(encoding, self.gzip_level, self.brotli_quality)
@@ -9,13 +9,41 @@ database.
 The module routes are prefixed with '/battery_data' for clarity.
 """
 
-from fastapi import APIRouter, HTTPException
+import asyncio
+import contextlib
+import math
+from typing import Annotated, AsyncIterator, Dict
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, \
+    WebSocket
+from fastapi.requests import HTTPConnection
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
 
 from pydantic import ValidationError
 
+from src.api.http_cache import cache_headers, is_not_modified
+from src.api.responses import JsonResponse, columns_response, \
+    ndjson_response, negotiate_format
+from src.config.db import DbConfig
+from src.config.ingest import IngestConfig
+from src.config.live import LiveConfig
 from src.config.logging import LoggingConfig
+from src.config.write_buffer import WriteBufferConfig
+from src.services.admission import AdmissionControl, OverloadedError, \
+    query_cost
+from src.services.bulk_ingest import BulkIngest
+from src.services.delete_jobs import DeleteJobs, TooManyJobsError
 from src.services.influx_manager import InfluxManager
+from src.services.latest_values import LATEST_FIELDS
+from src.services.live_hub import HubFullError, Subscription
+from src.services.metrics import HTTP_REQUESTS_SHED
+from src.services.write_buffer import RejectedPointsError, \
+    WriteBufferFullError
 from src.models.battery import BatteryData
+from src.models.query import BatteryQuery, ResponseFormat, StatsQuery, \
+    selects_all
+from src.utils.json_stream import JsonDocumentSplitter
 
 # initialize the logger
 logger = LoggingConfig.get_logger(__name__)
@@ -23,8 +51,195 @@ logger = LoggingConfig.get_logger(__name__)
 # initialize the api router from fast api
 router = APIRouter()
 
-# initialize influx manager
-influx_manager = InfluxManager()
+
+# WebSocket close code asking the client to reconnect later (RFC 6455)
+TRY_AGAIN_LATER = 1013
+
+
+async def get_influx_manager(connection: HTTPConnection) -> InfluxManager:
+    """
+    Dependency returning the InfluxManager created by the application
+    lifespan.
+
+    Parameters:
+    - connection: (HTTPConnection) - The current request or WebSocket.
+
+    Returns:
+    - InfluxManager: The application's InfluxManager.
+    """
+    return connection.app.state.influx_manager
+
+
+InfluxManagerDep = Annotated[InfluxManager, Depends(get_influx_manager)]
+
+
+async def get_delete_jobs(request: Request) -> DeleteJobs:
+    """
+    Dependency returning the DeleteJobs created by the application lifespan.
+
+    Parameters:
+    - request: (Request) - The current request.
+
+    Returns:
+    - DeleteJobs: The background delete jobs of the application.
+    """
+    return request.app.state.delete_jobs
+
+
+DeleteJobsDep = Annotated[DeleteJobs, Depends(get_delete_jobs)]
+
+
+def get_battery_query(query: Annotated[BatteryQuery, Query()],
+                      influx_manager: InfluxManagerDep) -> BatteryQuery:
+    """
+    Dependency validating the query parameters of /query once, for both
+    the admission control and the endpoint, and routing the query to the
+    rollup tier serving it.
+
+    Parameters:
+    - query: (BatteryQuery) - The query parameters.
+    - influx_manager: (InfluxManager) - The application's InfluxManager.
+
+    Returns:
+    - BatteryQuery: The validated query, with the tier serving it.
+    """
+    return influx_manager.route(query)
+
+
+BatteryQueryDep = Annotated[BatteryQuery, Depends(get_battery_query)]
+
+
+def get_cache_headers(request: Request, query: BatteryQuery,
+                      influx_manager: InfluxManager) -> Dict[str, str]:
+    """
+    Computes the caching headers of the result of /query, and answers a
+    conditional request with 304 if the result stored by the client is
+    current. Called before the query is admitted, rather than as a
+    dependency, so that the query parameters are validated once.
+
+    Parameters:
+    - request: (Request) - The current request.
+    - query: (BatteryQuery) - The query.
+    - influx_manager: (InfluxManager) - The manager owning the versions of
+        the data.
+
+    Returns:
+    - dict[str, str]: The caching headers; empty if HTTP caching is
+        disabled.
+
+    Raises:
+    - HTTPException: 304 if the stored result is current, 406 if the
+        format is not available on this server.
+    """
+    if influx_manager.data_versions is None:
+        return {}
+    headers = cache_headers(
+        query, negotiate_format(query.format, request.headers.get("accept")),
+        influx_manager.data_versions)
+    if is_not_modified(headers, request.headers.get("if-none-match"),
+                       request.headers.get("if-modified-since")):
+        raise HTTPException(status_code=304,
+                            headers={**headers, "Vary": "Accept"})
+    return headers
+
+
+def shed(request: Request, err: OverloadedError) -> HTTPException:
+    """
+    Counts a request rejected by the admission control and builds its
+    response.
+
+    Parameters:
+    - request: (Request) - The rejected request.
+    - err: (OverloadedError) - Why it was rejected.
+
+    Returns:
+    - HTTPException: The 429 or 503 response, with a Retry-After header.
+    """
+    HTTP_REQUESTS_SHED.labels(request.scope["route"].path, err.reason).inc()
+    error = ("Too many requests" if err.status_code == 429
+             else "Service unavailable")
+    return HTTPException(status_code=err.status_code,
+                         detail=f"{error}: {err}",
+                         headers={"Retry-After": str(err.retry_after_s)})
+
+
+async def admit_ingest(request: Request) -> AsyncIterator[None]:
+    """
+    Dependency holding an ingest slot while an ingest request is served.
+
+    Parameters:
+    - request: (Request) - The current request.
+
+    Raises:
+    - HTTPException: 503 if no slot is free in time.
+    """
+    admission: AdmissionControl = request.app.state.admission
+    try:
+        await admission.ingest.acquire()
+    except OverloadedError as err:
+        raise shed(request, err) from err
+    try:
+        yield
+    finally:
+        admission.ingest.release()
+
+
+@contextlib.asynccontextmanager
+async def query_slot(request: Request, query: BatteryQuery,
+                     influx_manager: InfluxManager) -> AsyncIterator[None]:
+    """
+    Holds a query slot while a query is served, once its cost has been
+    charged to the query budget. The "*" battery wildcard is costed as the
+    number of batteries known to the latest values table.
+
+    Parameters:
+    - request: (Request) - The current request.
+    - query: (BatteryQuery) - The query.
+    - influx_manager: (InfluxManager) - The manager owning the latest
+        values table.
+
+    Raises:
+    - HTTPException: 429 if the query is over the cost budget, 503 if
+        ingest requests are waiting or no slot is free in time.
+    """
+    admission: AdmissionControl = request.app.state.admission
+    cost = query_cost(
+        query, influx_manager.latest_values.snapshot()["batteries"])
+    try:
+        await admission.admit_query(cost)
+    except OverloadedError as err:
+        raise shed(request, err) from err
+    try:
+        yield
+    finally:
+        admission.query.release()
+
+
+def hold_until_sent(response: StreamingResponse,
+                    resources: contextlib.AsyncExitStack) -> None:
+    """
+    Keeps resources, such as a query slot, until the body of a streamed
+    response has been sent, rather than until the endpoint returns: the
+    body is only produced once the response is sent. They are released
+    when the body ends or fails, or, if it never starts, by a background
+    task run once the response is done.
+
+    Parameters:
+    - response: (StreamingResponse) - The streamed response.
+    - resources: (AsyncExitStack) - The resources, released when closed.
+    """
+    body = response.body_iterator
+
+    async def held_body() -> AsyncIterator[bytes]:
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            await resources.aclose()
+
+    response.body_iterator = held_body()
+    # closing the stack again is a no-op
+    response.background = BackgroundTask(resources.aclose)
 
 
 # Root endpoint
@@ -36,51 +251,361 @@ async def health_check():
     return {"message": "Battery Data API is running"}
 
 
-@router.get("/query")
+@router.get("/query", response_model=None, response_class=JsonResponse)
 async def query_battery_data(
-        battery_id: str,
-        start_time: str,
-        stop_time: str,
-        field: str) -> list[dict]:
+        request: Request,
+        query: BatteryQueryDep,
+        influx_manager: InfluxManagerDep
+) -> Response:
     """
-    Get battery data for a specified battery_id, time range, and field.
+    Get battery data for specified battery_ids, time range, and fields.
 
     Parameters:
-    - battery_id: (str) - Identifier for the battery.
+    - battery_id: (str) - Identifier for the battery. Repeat the parameter
+        for several batteries, or use "*" for every battery.
     - start_time: (str) - Start of the time range, ex. "-2h"
     - stop_time: (str) - End of the time range, ex. "-1m"
-    - field: (str) - Field to retrieve.
+    - field: (str) - Field to retrieve. Repeat the parameter for several
+        fields, or use "*" for every field.
+    - every: (str) - Aggregate the data points into windows of this Flux
+        duration, ex. "1m". Optional.
+    - fn: (str) - Function aggregating each window: "mean" (default),
+        "min", "max", "last", "count" or "percentile".
+    - percentile: (float) - Percentile computed when fn is "percentile",
+        ex. 95 (default).
+    - max_points: (int) - Maximum number of data points to return. Without
+        `every`, the aggregation window is sized to fit. Optional.
+    - downsample: (str) - How max_points is enforced: "aggregate" (default)
+        aggregates windows in InfluxDB, "lttb" keeps the raw points that
+        best preserve the shape of the series.
+    - stream: (bool) - Stream the data points as NDJSON, one point per line,
+        while they are read from InfluxDB. Memory use then stays constant
+        regardless of the time range.
+    - format: (str) - Format of the result: "json", "csv", "msgpack" or
+        "arrow". When not set, the format is negotiated from the Accept
+        header, falling back to JSON.
+    - tier: (str) - "auto" (default) serves aggregated queries with the
+        mean, min, max or count functions from the coarsest rollup tier
+        whose windows fit; "raw" always aggregates the raw data points.
+        The tier serving the query is returned in the X-Query-Tier
+        header: "raw", or a tier window such as "1h".
+
+    A query whose bounds are absolute times and whose stop is at least
+    HTTP_CACHE_SETTLE_MS in the past has a closed time range: its result is
+    sent with an ETag and Last-Modified header, and may be reused by the
+    clients and proxies without revalidation for HTTP_CACHE_MAX_AGE_S, if
+    set. A request with If-None-Match (or If-Modified-Since) is answered
+    with 304, without running the query, until the data of its batteries
+    is changed by a late write or a delete. Other results are sent with
+    "Cache-Control: no-cache".
 
     Returns:
-    - list[dict]: list of data points matching the query.
+    - list[dict]: list of data points matching the query, for a single
+        battery and field.
+    - dict[str, dict[str, list]]: for several batteries or fields, the
+        columns of each battery keyed by battery ID, in the format
+        {"time": [...], "<field>": [...], ...}, all fetched with a single
+        Flux query.
+    - A streamed NDJSON response if `stream` is set.
+    - For the CSV, MessagePack and Arrow formats, a single table with the
+        columns "time" and "value", or "battery_id", "time" and the fields
+        for several batteries or fields.
 
     Raises:
     - HTTPException:
+        - 304 if the result stored by the client is current.
         - 400 if there is a ValueError, with details about the error.
+        - 406 if the format is not available on this server.
         - 500 for any other exceptions, with details about the server error.
     """
-    try:
-        data = influx_manager.query_data(
-            battery_id, start_time, stop_time, field
+    headers = get_cache_headers(request, query, influx_manager)
+    response_format = negotiate_format(query.format,
+                                       request.headers.get("accept"))
+    async with contextlib.AsyncExitStack() as resources:
+        # taken once the result is known not to be current, so that a 304
+        # does not wait for a slot
+        await resources.enter_async_context(
+            query_slot(request, query, influx_manager))
+        try:
+            response = await serve_query(query, response_format,
+                                         influx_manager)
+        except ValueError as err:
+            raise HTTPException(
+                status_code=400, detail=f"Value error: {err}") from err
+
+        except Exception as err:
+            raise HTTPException(
+                status_code=500, detail=f"Server error: {err}") from err
+        response.headers.update({**headers, "X-Query-Tier": query.tier})
+        if isinstance(response, StreamingResponse):
+            hold_until_sent(response, resources.pop_all())
+        return response
+
+
+async def serve_query(query: BatteryQuery, response_format: ResponseFormat,
+                      influx_manager: InfluxManager) -> Response:
+    """
+    Runs a battery data query and builds its response in the requested
+    format; see `query_battery_data`.
+
+    Parameters:
+    - query: (BatteryQuery) - The routed query.
+    - response_format: (ResponseFormat) - The negotiated format.
+    - influx_manager: (InfluxManager) - The application's InfluxManager.
+
+    Returns:
+    - Response: The response.
+    """
+    if query.stream:
+        points = await influx_manager.executor.run(
+            influx_manager.stream_data, query
         )
-        return [dict(point) for point in data]
+        return await ndjson_response(influx_manager.executor.iterate(
+            points, DbConfig.INFLUX_STREAM_BATCH_SIZE))
+    if response_format is not ResponseFormat.JSON:
+        columns = await influx_manager.executor.run(
+            influx_manager.query_columns, query
+        )
+        return columns_response(columns, response_format)
+    if query.is_multi_series:
+        return JsonResponse(await influx_manager.executor.run(
+            influx_manager.query_pivot, query
+        ), headers={"Vary": "Accept"})
+    return JsonResponse(await influx_manager.executor.run(
+        influx_manager.query_data, query
+    ), headers={"Vary": "Accept"})
+
+
+@router.get("/stats", response_model=None, response_class=JsonResponse)
+async def battery_stats(
+        request: Request,
+        query: Annotated[StatsQuery, Query()],
+        influx_manager: InfluxManagerDep
+) -> Response:
+    """
+    Get summary statistics of the data points of batteries over a time
+        range, computed in a single pass over the raw data points.
+
+    Queries are subject to the same admission control and cost budget as
+    /query.
+
+    Parameters:
+    - battery_id: (str) - Identifier for the battery. Repeat the parameter
+        for several batteries, or use "*" for every battery.
+    - start_time: (str) - Start of the time range, ex. "-1d"
+    - stop_time: (str) - End of the time range, ex. "now()"
+    - field: (str) - Field to summarise. Repeat the parameter for several
+        fields; every field by default.
+    - percentile: (float) - Percentile computed for every field. Repeat the
+        parameter for several percentiles; 5, 50 and 95 by default.
+
+    Returns:
+    - dict[str, dict]: The statistics of every battery with data points in
+        the range, keyed by battery ID, in the format {"fields":
+        {"<field>": {"count": ..., "min": ..., "max": ..., "mean": ...,
+        "std": ..., "percentiles": {"p50": ..., ...}, "rate_per_s":
+        {"mean": ..., "min": ..., "max": ...}, "time_above_max_s": ...,
+        "time_below_min_s": ...}, ...}, "energy": {"charge_kwh": ...,
+        "discharge_kwh": ..., "throughput_kwh": ...}}. The time out of
+        range is reported for the fields DataValidationConfig bounds, and
+        the energy when the voltage, current and state of charge are
+        selected.
+
+    Raises:
+    - HTTPException:
+        - 400 if there is a ValueError, with details about the error.
+        - 429 or 503 if the query is shed by the admission control.
+        - 500 for any other exceptions, with details about the server error.
+    """
+    async with query_slot(request, query.series_query(), influx_manager):
+        try:
+            return JsonResponse(await influx_manager.executor.run(
+                influx_manager.query_stats, query
+            ))
+        except ValueError as err:
+            raise HTTPException(
+                status_code=400, detail=f"Value error: {err}") from err
+
+        except Exception as err:
+            raise HTTPException(
+                status_code=500, detail=f"Server error: {err}") from err
+
+
+@router.get("/latest", response_model=None, response_class=JsonResponse)
+async def latest_battery_data(
+        influx_manager: InfluxManagerDep,
+        battery_id: Annotated[list[str] | None, Query()] = None
+) -> Response:
+    """
+    Get the latest reading of some or all batteries, served from memory
+        without querying InfluxDB.
+
+    The table is updated by every write to this service, seeded from
+    InfluxDB at startup, and merges the values written to InfluxDB by other
+    writers every LATEST_REFRESH_INTERVAL_MS.
+
+    Parameters:
+    - battery_id: (str) - Identifier for the battery. Repeat the parameter
+        for several batteries; omit it, or use "*", for every battery.
+
+    Returns:
+    - dict[str, dict]: The latest reading of each known battery, keyed by
+        battery ID, in the format {"time": ..., "voltage": ...,
+        "current": ..., "temperature": ..., "state_of_charge": ...,
+        "state_of_health": ...}. Unknown batteries are left out.
+    """
+    return JsonResponse(influx_manager.latest_values.get(battery_id))
+
+
+def subscribe_live(influx_manager: InfluxManager,
+                   battery_id: list[str] | None,
+                   field: list[str] | None) -> Subscription:
+    """
+    Subscribes to the live readings of batteries, "*" selecting every
+    battery or field.
+
+    Raises:
+    - ValueError: If a field is not a reading field.
+    - HubFullError: If there are too many subscribers.
+    """
+    if field is not None and selects_all(field):
+        field = None
+    unknown = set(field or ()) - set(LATEST_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields {sorted(unknown)}, expected "
+                         f"some of {list(LATEST_FIELDS)}")
+    return influx_manager.live_hub.subscribe(
+        None if battery_id is None or selects_all(battery_id)
+        else battery_id, field)
+
+
+@router.get("/live", response_class=StreamingResponse)
+async def live_battery_data(
+        influx_manager: InfluxManagerDep,
+        battery_id: Annotated[list[str] | None, Query()] = None,
+        field: Annotated[list[str] | None, Query()] = None
+) -> StreamingResponse:
+    """
+    Receive the readings written to the service as they arrive, as
+        Server-Sent Events.
+
+    Each event holds a reading as JSON, in the format {"battery_id": ...,
+    "time": ..., "<field>": ..., ...}. A subscriber falling more than
+    LIVE_QUEUE_SIZE readings behind is sent an "overflow" event and the
+    stream ends; it may reconnect and resynchronise with /latest.
+
+    Parameters:
+    - battery_id: (str) - Identifier for the battery. Repeat the parameter
+        for several batteries; omit it, or use "*", for every battery.
+    - field: (str) - Field to receive. Repeat the parameter for several
+        fields; omit it, or use "*", for every field.
+
+    Returns:
+    - StreamingResponse: The text/event-stream of readings.
+
+    Raises:
+    - HTTPException:
+        - 400 if a field is unknown.
+        - 503 if there are too many subscribers, with a Retry-After header.
+    """
+    try:
+        subscription = subscribe_live(influx_manager, battery_id, field)
     except ValueError as err:
         raise HTTPException(
             status_code=400, detail=f"Value error: {err}") from err
-
-    except Exception as err:
+    except HubFullError as err:
         raise HTTPException(
-            status_code=500, detail=f"Server error: {err}") from err
+            status_code=503, detail=f"Service unavailable: {err}",
+            headers={"Retry-After": "1"}) from err
+
+    async def events():
+        try:
+            while True:
+                batch = await subscription.next_batch(
+                    LiveConfig.HEARTBEAT_MS / 1000)
+                if batch is None:
+                    yield b"event: overflow\ndata: {}\n\n"
+                    return
+                # a comment keeps idle connections open
+                yield b"".join(b"data: " + message + b"\n\n"
+                               for message in batch) or b": keep-alive\n\n"
+        finally:
+            influx_manager.live_hub.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache",
+                                      "X-Accel-Buffering": "no"})
+
 
+@router.websocket("/live/ws")
+async def live_battery_data_ws(
+        websocket: WebSocket,
+        influx_manager: InfluxManagerDep,
+        battery_id: Annotated[list[str] | None, Query()] = None,
+        field: Annotated[list[str] | None, Query()] = None
+) -> None:
+    """
+    Receive the readings written to the service as they arrive, over a
+        WebSocket.
 
-@router.post("/add")
-async def add_battery_data(data: BatteryData) -> dict[str, str]:
+    Takes the same parameters as GET /live and sends each reading as a JSON
+    text message. A subscriber falling more than LIVE_QUEUE_SIZE readings
+    behind is disconnected with close code 1013 (try again later).
+    Messages sent by the client are ignored.
     """
-    Add a new battery data point. FastAPI will automatically validate the
-        request message against our BatteryData model in src.models.battery.py
+    await websocket.accept()
+    try:
+        subscription = subscribe_live(influx_manager, battery_id, field)
+    except ValueError as err:
+        await websocket.close(code=1008, reason=str(err)[:120])
+        return
+    except HubFullError as err:
+        await websocket.close(code=TRY_AGAIN_LATER, reason=str(err)[:120])
+        return
+
+    async def forward() -> None:
+        while (batch := await subscription.next_batch()) is not None:
+            for message in batch:
+                await websocket.send_text(message.decode())
+        await websocket.close(code=TRY_AGAIN_LATER,
+                              reason="Too slow to receive the readings")
+
+    async def wait_for_disconnect() -> None:
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = [asyncio.create_task(forward()),
+             asyncio.create_task(wait_for_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        # sending fails once the client has disconnected
+        await asyncio.gather(*tasks, return_exceptions=True)
+        influx_manager.live_hub.unsubscribe(subscription)
+
+
+@router.post("/add", dependencies=[Depends(admit_ingest)],
+             openapi_extra={"requestBody": {
+                 "required": True,
+                 "content": {"application/json": {
+                     "schema": BatteryData.model_json_schema()}}}})
+async def add_battery_data(request: Request,
+                           influx_manager: InfluxManagerDep) -> dict[str, str]:
+    """
+    Add a new battery data point. The raw request body is validated against
+        our BatteryData model in src.models.battery.py in a single pass,
+        without decoding it to a dictionary first, and the reading is
+        serialised straight to line protocol.
+
+    The point is written to InfluxDB in a batch by the write buffer. With
+    WRITE_BUFFER_ACK_MODE=flush the response is sent once the batch is
+    written, otherwise as soon as the point is buffered.
 
     Parameters:
-    - data: (BatteryData) - The battery data payload excluding timestamps.
+    - request: (Request) - The request whose body holds the battery data
+        payload, in the format of BatteryData.
 
     Returns:
     - dict[str, str]: A dictionary with a status message {"status": "deleted"}
@@ -88,27 +613,130 @@ async def add_battery_data(data: BatteryData) -> dict[str, str]:
 
     Raises:
     - HTTPException:
-        - 422 if there is a ValidationError, with details about the error.
+        - 422 if there is a ValidationError, or if InfluxDB rejected the
+          point as invalid, with details about the error.
+        - 503 if the write buffer is full, with a Retry-After header.
         - 500 for any other exceptions, with details about the server error.
     """
     try:
-        influx_manager.insert_data(data.model_dump())
+        reading = BatteryData.model_validate_json(await request.body())
+        flushed = influx_manager.insert_data(reading)
+        if WriteBufferConfig.ACK_MODE == "flush":
+            await asyncio.wrap_future(flushed)
         return {"status": "success"}
     except ValidationError as err:
         raise HTTPException(
             status_code=422, detail=f"Validation error: {err}") from err
+    except RejectedPointsError as err:
+        raise HTTPException(
+            status_code=422, detail=f"Rejected by InfluxDB: {err}") from err
+    except WriteBufferFullError as err:
+        raise HTTPException(
+            status_code=503, detail=f"Service unavailable: {err}",
+            headers={"Retry-After": str(math.ceil(
+                WriteBufferConfig.FLUSH_INTERVAL_MS / 1000))}) from err
     except Exception as err:
         raise HTTPException(
             status_code=500, detail=f"Server error: {err}") from err
 
 
-@router.delete("/remove")
+@router.post("/addBulk", dependencies=[Depends(admit_ingest)])
+async def add_battery_data_bulk(request: Request,
+                                influx_manager: InfluxManagerDep) -> dict:
+    """
+    Add many battery data points at once. The body is either a JSON array
+        of BatteryData objects or newline-delimited JSON (NDJSON), one
+        BatteryData object per line. It is read as a stream: every reading
+        is validated as it arrives and written in chunks of
+        BULK_CHUNK_SIZE readings.
+
+    Readings may carry a "timestamp" (milliseconds since the Unix epoch) so
+    that back-filled data is stored at the time it was recorded.
+
+    Parameters:
+    - request: (Request) - The request whose body holds the readings.
+
+    Returns:
+    - dict: The status ("success", or "partial" if any reading was
+      rejected), the numbers of accepted and rejected readings, and an
+      error for each rejected reading, as {"line": ..., "error": ...},
+      where "line" is the NDJSON line or the JSON array element position.
+
+    Raises:
+    - HTTPException:
+        - 400 if the body is a malformed JSON array, or one followed by
+          anything but whitespace, with details about the error. Readings
+          accepted before the error are still written.
+        - 500 for any other exceptions, with details about the server error.
+    """
+    ingest = BulkIngest(influx_manager,
+                        chunk_size=IngestConfig.BULK_CHUNK_SIZE,
+                        max_errors=IngestConfig.BULK_MAX_ERRORS)
+    splitter = JsonDocumentSplitter()
+    try:
+        async for chunk in request.stream():
+            for line, document in splitter.feed(chunk):
+                ingest.add(line, document)
+        for line, document in splitter.close():
+            ingest.add(line, document)
+        return await ingest.finish(
+            wait_for_flush=WriteBufferConfig.ACK_MODE == "flush")
+    except ValueError as err:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Value error: {err} ({ingest.accepted} readings "
+                   f"accepted before the error)") from err
+    except Exception as err:
+        raise HTTPException(
+            status_code=500, detail=f"Server error: {err}") from err
+
+
+@router.get("/writeBuffer/metrics")
+async def write_buffer_metrics(
+        influx_manager: InfluxManagerDep) -> dict[str, int | float]:
+    """
+    Get the metrics of the InfluxDB write buffer.
+
+    Returns:
+    - dict[str, int | float]: The queue depth, point and flush counters,
+      and the last, max and total flush latency in milliseconds.
+    """
+    return influx_manager.write_buffer.snapshot()
+
+
+@router.get("/queryCache/metrics")
+async def query_cache_metrics(
+        influx_manager: InfluxManagerDep) -> dict[str, int]:
+    """
+    Get the metrics of the query result cache.
+
+    Returns:
+    - dict[str, int]: The number of entries and their estimated size in
+      bytes, and the hit, miss, coalesced, eviction and invalidation
+      counters.
+
+    Raises:
+    - HTTPException: If the query cache is disabled.
+    """
+    if influx_manager.query_cache is None:
+        raise HTTPException(status_code=404,
+                            detail="The query cache is disabled")
+    return influx_manager.query_cache.snapshot()
+
+
+@router.delete("/remove", status_code=202)
 async def remove_battery_data(
         battery_id: str,
         start_time: str,
-        stop_time: str) -> dict[str, str]:
+        stop_time: str,
+        delete_jobs: DeleteJobsDep) -> dict:
     """
-    Delete battery data for a specified battery_id and time range.
+    Delete battery data for a specified battery_id and time range, in the
+        background.
+
+    The range is resolved to absolute times when the request is received,
+    split into chunks of DELETE_CHUNK_MS, and the chunks are deleted one
+    after the other. The job is polled at `/jobs/{job_id}`.
 
     Parameters:
     - battery_id: (str) - Identifier for the battery.
@@ -116,23 +744,49 @@ async def remove_battery_data(
     - stop_time: (str) - End of the time range, ex. "-1m"
 
     Returns:
-    - dict[str, str]: A dictionary with a status message {"status": "deleted"}
-      if deletion is successful.
+    - dict: The submitted job, as returned by `/jobs/{job_id}`, with the
+      status "pending".
 
     Raises:
     - HTTPException:
         - 400 if there is a ValueError, with details about the error.
-        - 500 for any other exceptions, with details about the server error.
+        - 503 if too many delete jobs are waiting or running.
     """
     try:
-        print(battery_id, start_time, stop_time)
-        influx_manager.delete_data(
-            battery_id, start_time, stop_time
-        )
-        return {"status": "deleted"}
+        return delete_jobs.submit(battery_id, start_time,
+                                  stop_time).to_dict()
     except ValueError as err:
         raise HTTPException(
             status_code=400, detail=f"Value error: {err}") from err
-    except Exception as err:
+    except TooManyJobsError as err:
         raise HTTPException(
-            status_code=500, detail=f"Server error: {err}") from err
+            status_code=503, detail=f"Service unavailable: {err}",
+            headers={"Retry-After": "1"}) from err
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, delete_jobs: DeleteJobsDep) -> dict:
+    """
+    Get the status and progress of a delete job.
+
+    Parameters:
+    - job_id: (str) - Identifier of the job, returned by `/remove`. With
+      several workers, the job is found whichever worker serves the poll.
+
+    Returns:
+    - dict: The job, in the format {"job_id": ..., "status": ...,
+      "battery_id": ..., "start_time": ..., "stop_time": ..., "chunks": ...,
+      "chunks_done": ..., "progress": ..., "error": ...,
+      "submitted_at": ..., "finished_at": ...}. The status is "pending",
+      "running", "succeeded" or "failed"; progress goes from 0 to 1.
+
+    Raises:
+    - HTTPException:
+        - 404 if the job is unknown, or finished long enough ago to have
+          been forgotten.
+    """
+    job = delete_jobs.describe(job_id)
+    if job is None:
+        raise HTTPException(status_code=404,
+                            detail=f"Unknown job: {job_id}")
+    return job
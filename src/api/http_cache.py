@@ -0,0 +1,114 @@
+"""
+This module provides the HTTP caching of the query results: the validators
+(ETag and Last-Modified) and the Cache-Control header of a query, and the
+evaluation of the conditional requests against them.
+
+A query over a closed time range, whose bounds are absolute times and whose
+stop is old enough for no new readings to arrive, returns the same result
+until its data is changed by a late write or a delete. Its ETag is derived
+from the query and the versions of the data of its batteries, so that the
+clients and proxies can revalidate a stored result without the query being
+run again. The other queries are not cached, as their results keep
+growing.
+"""
+
+import hashlib
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from src.config.http_cache import HttpCacheConfig
+from src.models.query import BatteryQuery, ResponseFormat
+from src.services.data_versions import DataVersions
+from src.services.query_cache import CacheKey
+from src.utils.datetime_utils import NANOSECONDS_PER_SECOND, \
+    parse_time_bound, to_datetime
+
+# Cache-Control header of the results still growing, and of the closed
+# ranges unless they may be reused without revalidation
+GROWING_CACHE_CONTROL = "no-cache"
+
+
+def cache_headers(query: BatteryQuery, response_format: ResponseFormat,
+                  data_versions: DataVersions) -> Dict[str, str]:
+    """
+    Returns the caching headers of the result of a query.
+
+    Parameters:
+    - query (BatteryQuery): The query.
+    - response_format (ResponseFormat): The negotiated format of the
+      result.
+    - data_versions (DataVersions): The versions of the data.
+
+    Returns:
+    - Dict[str, str]: For a closed time range, a weak ETag, Last-Modified
+      and a Cache-Control header allowing reuse for MAX_AGE_S, or requiring
+      revalidation if MAX_AGE_S is 0; otherwise a Cache-Control header
+      requiring revalidation, and no validators. Empty if a time bound
+      cannot be parsed.
+    """
+    try:
+        bounds = [parse_time_bound(query.start_time),
+                  parse_time_bound(query.stop_time)]
+    except ValueError:
+        return {}
+    if (any(bound.relative for bound in bounds)
+            or bounds[1].nanoseconds > data_versions.closed_before()):
+        return {"Cache-Control": GROWING_CACHE_CONTROL}
+    key = CacheKey.from_query(query, bucket_ms=1, variant=(
+        f"{response_format.value}:{query.stream}"))
+    version = data_versions.get(key.batteries)
+    digest = hashlib.sha256(repr(
+        (data_versions.epoch, version.version, key)).encode()).hexdigest()
+    return {
+        "ETag": f'W/"{digest[:32]}"',
+        "Last-Modified": format_datetime(to_datetime(
+            version.modified_ns // NANOSECONDS_PER_SECOND
+            * NANOSECONDS_PER_SECOND), usegmt=True),
+        "Cache-Control": (
+            f"public, max-age={HttpCacheConfig.MAX_AGE_S}"
+            if HttpCacheConfig.MAX_AGE_S > 0 else GROWING_CACHE_CONTROL),
+    }
+
+
+def is_not_modified(headers: Dict[str, str],
+                    if_none_match: Optional[str],
+                    if_modified_since: Optional[str]) -> bool:
+    """
+    Evaluates the conditions of a GET request against the validators of
+    its result (RFC 9110, section 13.2.2): If-Modified-Since is ignored
+    when If-None-Match is present.
+
+    Parameters:
+    - headers (Dict[str, str]): The caching headers of the result, as
+      returned by `cache_headers`.
+    - if_none_match (Optional[str]): The If-None-Match header.
+    - if_modified_since (Optional[str]): The If-Modified-Since header.
+
+    Returns:
+    - bool: True if the stored result of the client is current, so that a
+      304 response can be sent instead of the result.
+    """
+    etag = headers.get("ETag")
+    if etag is None:
+        return False
+    if if_none_match is not None:
+        # weak comparison: the W/ prefix is ignored
+        opaque = etag.removeprefix("W/")
+        return any(tag == "*" or tag.removeprefix("W/") == opaque
+                   for tag in map(str.strip, if_none_match.split(",")))
+    return (if_modified_since is not None
+            and not _modified_since(headers["Last-Modified"],
+                                    if_modified_since))
+
+
+def _modified_since(last_modified: str, if_modified_since: str) -> bool:
+    """
+    Checks whether a result was modified after the time in an
+    If-Modified-Since header; an invalid time counts as modified.
+    """
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return True
+    return (since.tzinfo is None
+            or parsedate_to_datetime(last_modified) > since)
@@ -0,0 +1,123 @@
+"""
+This module exposes the Prometheus metrics of the REST API: an ASGI
+middleware recording the count, latency and response size of the requests
+per route, the `/metrics` endpoint, and the task sampling the event loop
+lag.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.services.metrics import EVENT_LOOP_LAG, HTTP_REQUESTS, \
+    HTTP_REQUEST_DURATION, HTTP_RESPONSE_SIZE, exposition_registry
+
+# Route label of the requests matching no route, so that unknown paths do
+# not create new time series
+UNMATCHED_ROUTE = "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the count, latency and response body size of
+    the HTTP requests, labelled with the route template (e.g.
+    "/batteryData/query") rather than the raw path.
+
+    It is a plain ASGI middleware rather than a BaseHTTPMiddleware, so that
+    it adds no task or memory stream per request and does not buffer
+    streamed responses. The latency is measured until the last body chunk is
+    sent.
+    """
+
+    def __init__(self, app: ASGIApp):
+        """
+        Initializes the MetricsMiddleware instance.
+
+        Parameters:
+        - app (ASGIApp): The application wrapped by the middleware.
+        """
+        self.app = app
+        # labelled metrics per (method, route, status), as looking up the
+        # labels costs more than recording the values
+        self._children: Dict[Tuple[str, str, int], Tuple[Any, Any, Any]] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
+        """
+        Serves a request, recording its metrics once the response is sent.
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # the router adds the matched route to the scope
+            route = scope.get("route")
+            route = route.path if route is not None else UNMATCHED_ROUTE
+            requests, duration, response_size = self._labelled(
+                scope["method"], route, status)
+            requests.inc()
+            duration.observe(time.perf_counter() - start)
+            response_size.observe(size)
+
+    def _labelled(self, method: str, route: str,
+                  status: int) -> Tuple[Any, Any, Any]:
+        """
+        Returns the request count, latency and response size metrics
+        labelled for a route and status.
+        """
+        key = (method, route, status)
+        children = self._children.get(key)
+        if children is None:
+            children = self._children[key] = (
+                HTTP_REQUESTS.labels(method, route, status),
+                HTTP_REQUEST_DURATION.labels(method, route),
+                HTTP_RESPONSE_SIZE.labels(method, route))
+        return children
+
+
+async def metrics_endpoint(_request: Request) -> Response:
+    """
+    Get the metrics of the service in the Prometheus text format.
+
+    Returns:
+    - Response: The current value of every metric, aggregated over the
+      worker processes.
+    """
+    return Response(generate_latest(exposition_registry()),
+                    media_type=CONTENT_TYPE_LATEST)
+
+
+async def monitor_event_loop_lag(interval_s: float) -> None:
+    """
+    Samples the event loop lag until cancelled: how late a sleep of
+    `interval_s` wakes up, which is the time the loop spent running other
+    callbacks, such as blocking code, past its deadline.
+
+    Parameters:
+    - interval_s (float): The interval between two samples.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        scheduled = loop.time() + interval_s
+        await asyncio.sleep(interval_s)
+        EVENT_LOOP_LAG.observe(max(loop.time() - scheduled, 0))
@@ -0,0 +1,92 @@
+"""
+This module defines the RequestContextMiddleware class, which gives every
+HTTP request an ID, carried by the records logged while serving it and
+returned in the X-Request-ID header, and logs the requests served with
+their timings.
+"""
+
+import re
+import time
+import uuid
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.config.logging import LoggingConfig
+from src.utils.logging_utils import REQUEST_ID
+
+# initialize logger for this module
+logger = LoggingConfig.get_logger(__name__)
+
+# Header carrying the request ID
+REQUEST_ID_HEADER = b"x-request-id"
+# Request IDs accepted from the clients; others are replaced
+REQUEST_ID_PATTERN = re.compile(rb"^[\w.:-]{1,128}$")
+
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware setting the ID of the request being served, taken from
+    the X-Request-ID header if the client sent a valid one and generated
+    otherwise, and returning it in the response headers.
+
+    Every request served is logged with its method, route, status and
+    duration as fields; the records are rate-limited like the other
+    per-event records, separately for each route and status, so that busy
+    routes do not hide the others, nor successes the errors. The duration
+    is measured until the last body chunk is sent.
+    """
+
+    def __init__(self, app: ASGIApp):
+        """
+        Initializes the RequestContextMiddleware instance.
+
+        Parameters:
+        - app (ASGIApp): The application wrapped by the middleware.
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive,
+                       send: Send) -> None:
+        """
+        Serves a request within its request ID context.
+        """
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = dict(scope["headers"]).get(REQUEST_ID_HEADER)
+        if request_id is None or not REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex.encode()
+        token = REQUEST_ID.set(request_id.decode())
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] in ("http.response.start",
+                                   "websocket.accept"):
+                status = message.get("status", 101)
+                message["headers"] = [*message.get("headers", ()),
+                                      (REQUEST_ID_HEADER, request_id)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _log_served(scope, status, time.perf_counter() - start)
+            REQUEST_ID.reset(token)
+
+
+def _log_served(scope: Scope, status: int, duration_s: float) -> None:
+    """
+    Logs a request served, with its method, route, status and duration.
+    """
+    # the router adds the matched route to the scope
+    route = scope.get("route")
+    route_path = None if route is None else route.path
+    method = scope.get("method", "WEBSOCKET")
+    logger.info("Served %s %s", method, scope["path"], extra={
+        "sampled": (method, route_path, status),
+        "route": route_path,
+        "status": status,
+        "duration_ms": round(duration_s * 1000, 3)})
@@ -0,0 +1,224 @@
+"""
+This module provides helpers for building the responses of the battery data
+endpoints, such as streaming large query results as newline-delimited JSON
+(NDJSON) instead of materialising them in memory, and encoding query results
+in the format negotiated with the client: JSON, CSV, MessagePack or Apache
+Arrow IPC.
+"""
+
+import csv
+import io
+from datetime import datetime
+from importlib.util import find_spec
+from typing import Any, AsyncIterator, Dict, List
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+
+from src.config.logging import LoggingConfig
+from src.models.query import ResponseFormat
+
+# initialize the logger
+logger = LoggingConfig.get_logger(__name__)
+
+# orjson options shared by the JSON responses: UTC times end with "Z"
+ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+# Media type of each response format
+MEDIA_TYPES = {
+    ResponseFormat.JSON: "application/json",
+    ResponseFormat.CSV: "text/csv",
+    ResponseFormat.MSGPACK: "application/msgpack",
+    ResponseFormat.ARROW: "application/vnd.apache.arrow.stream",
+}
+
+# Whether the optional library encoding each format is installed; the
+# libraries are imported by the first response in their format, as pyarrow
+# alone takes longer to import than the rest of the service
+FORMATS_AVAILABLE = {
+    ResponseFormat.MSGPACK: find_spec("msgpack") is not None,
+    ResponseFormat.ARROW: find_spec("pyarrow") is not None,
+}
+
+# Response format of each media type accepted in the Accept header
+ACCEPTED_MEDIA_TYPES = {
+    **{media_type: response_format
+       for response_format, media_type in MEDIA_TYPES.items()},
+    "application/x-msgpack": ResponseFormat.MSGPACK,
+    "*/*": ResponseFormat.JSON,
+    "application/*": ResponseFormat.JSON,
+}
+
+
+class JsonResponse(ORJSONResponse):
+    """
+    JSON response serialised with orjson, with UTC times ending with "Z".
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+def to_ndjson(points: List[Dict[str, Any]]) -> bytes:
+    """
+    Serialises data points as NDJSON, one JSON object per line.
+
+    Parameters:
+    - points (List[Dict[str, Any]]): The data points to serialise.
+
+    Returns:
+    - bytes: The NDJSON-encoded data points.
+    """
+    return b"".join(orjson.dumps(point, option=ORJSON_OPTIONS) + b"\n"
+                    for point in points)
+
+
+def negotiate_format(requested: ResponseFormat | None,
+                     accept: str | None) -> ResponseFormat:
+    """
+    Picks the format of a query result: the requested format if set,
+    otherwise the preferred format of the Accept header, falling back to
+    JSON.
+
+    Parameters:
+    - requested (ResponseFormat | None): The `format` query parameter.
+    - accept (str | None): The Accept header.
+
+    Returns:
+    - ResponseFormat: The format of the response.
+
+    Raises:
+    - HTTPException: 406 if the library encoding the format is not
+      installed.
+    """
+    response_format = requested or _preferred_format(accept or "")
+    if not FORMATS_AVAILABLE.get(response_format, True):
+        raise HTTPException(
+            status_code=406,
+            detail=f'The "{response_format.value}" format is not available '
+                   f'on this server')
+    return response_format
+
+
+def _preferred_format(accept: str) -> ResponseFormat:
+    """
+    Returns the supported format with the highest quality in an Accept
+    header, or JSON if none is supported.
+    """
+    ranges = []
+    for media_range in accept.split(","):
+        media_type, *params = media_range.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        media_type = media_type.strip().lower()
+        if quality > 0 and media_type in ACCEPTED_MEDIA_TYPES:
+            ranges.append((quality, ACCEPTED_MEDIA_TYPES[media_type]))
+    # the sort is stable: equal qualities keep the order of the header
+    ranges.sort(key=lambda item: -item[0])
+    return ranges[0][1] if ranges else ResponseFormat.JSON
+
+
+def columns_response(columns: Dict[str, List[Any]],
+                     response_format: ResponseFormat) -> Response:
+    """
+    Builds the response holding a query result given as columns.
+
+    Parameters:
+    - columns (Dict[str, List[Any]]): The columns of the result, of equal
+      lengths.
+    - response_format (ResponseFormat): The format of the response; one of
+      CSV, MessagePack or Arrow.
+
+    Returns:
+    - Response: The encoded result.
+    """
+    encoders = {
+        ResponseFormat.CSV: _to_csv,
+        ResponseFormat.MSGPACK: _to_msgpack,
+        ResponseFormat.ARROW: _to_arrow,
+    }
+    return Response(encoders[response_format](columns),
+                    media_type=MEDIA_TYPES[response_format],
+                    headers={"Vary": "Accept"})
+
+
+def _format_time(value: datetime) -> str:
+    """
+    Formats a UTC time as RFC3339 ending with "Z".
+    """
+    return value.isoformat().replace("+00:00", "Z")
+
+
+def _to_csv(columns: Dict[str, List[Any]]) -> bytes:
+    """
+    Encodes columns as a CSV table with a header row.
+    """
+    values = [[_format_time(value) for value in column] if name == "time"
+              else column for name, column in columns.items()]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    writer.writerows(zip(*values))
+    return buffer.getvalue().encode()
+
+
+def _to_msgpack(columns: Dict[str, List[Any]]) -> bytes:
+    """
+    Encodes columns as a MessagePack map, with times as MessagePack
+    timestamps.
+    """
+    import msgpack  # pylint: disable=import-outside-toplevel
+    return msgpack.packb(columns, datetime=True)
+
+
+def _to_arrow(columns: Dict[str, List[Any]]) -> bytes:
+    """
+    Encodes columns as an Apache Arrow IPC stream holding one record batch.
+    """
+    import pyarrow  # pylint: disable=import-outside-toplevel
+    import pyarrow.ipc  # pylint: disable=import-outside-toplevel
+    table = pyarrow.table(columns)
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+async def ndjson_response(
+        batches: AsyncIterator[List[Dict[str, Any]]]) -> StreamingResponse:
+    """
+    Builds a response streaming batches of data points as NDJSON.
+
+    The first batch is fetched before the response is returned, so that an
+    error raised by the query (e.g. an invalid time range) is still reported
+    with an error status code rather than as a truncated body.
+
+    Parameters:
+    - batches (AsyncIterator[List[Dict[str, Any]]]): The batches of data
+      points to stream.
+
+    Returns:
+    - StreamingResponse: The response streaming the data points.
+    """
+    first_batch = await anext(batches, [])
+
+    async def body() -> AsyncIterator[bytes]:
+        try:
+            if first_batch:
+                yield to_ndjson(first_batch)
+            async for batch in batches:
+                yield to_ndjson(batch)
+        except Exception as err:
+            logger.error("Streaming query response failed: %s", err)
+            raise
+        finally:
+            await batches.aclose()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
@@ -0,0 +1,11 @@
+"""
+Configuration of the service, read from the environment variables.
+
+The `.env` file, if any, is loaded into the environment once, when the
+package is first imported, before any of its configuration classes read
+their settings. Variables already set in the environment take precedence.
+"""
+
+from dotenv import load_dotenv
+
+load_dotenv()
@@ -0,0 +1,34 @@
+"""
+Configures the admission control of the REST API (per-route concurrency
+limits and the query cost budget) using environment variables.
+
+Reads from a `.env` file to set the admission control parameters, next to
+the REST API parameters of RestApiConfig.
+"""
+
+import os
+
+
+class AdmissionConfig:
+    """
+    Configuration class for the admission control of the REST API.
+
+    This class loads the admission control configuration from environment
+    variables. A limit of 0 disables it.
+    """
+    # Maximum number of ingest requests (/add, /addBulk) served at a time
+    INGEST_CONCURRENCY = int(os.getenv('ADMISSION_INGEST_CONCURRENCY', '64'))
+    # Maximum number of /query requests served at a time
+    QUERY_CONCURRENCY = int(os.getenv('ADMISSION_QUERY_CONCURRENCY', '8'))
+    # Maximum number of requests of a route waiting for a slot; further
+    # requests are rejected at once
+    MAX_QUEUED = int(os.getenv('ADMISSION_MAX_QUEUED', '256'))
+    # Time a request may wait for a slot before it is rejected
+    QUEUE_TIMEOUT_MS = int(os.getenv('ADMISSION_QUEUE_TIMEOUT_MS', '2000'))
+    # Query cost budget, in series-hours (hours of the time range times the
+    # fields times the batteries selected): the budget refilled every
+    # second, and the most that can be spent at once
+    QUERY_COST_PER_S = float(os.getenv('ADMISSION_QUERY_COST_PER_S',
+                                       '100000'))
+    QUERY_COST_BURST = float(os.getenv('ADMISSION_QUERY_COST_BURST',
+                                       '1000000'))
@@ -5,10 +5,6 @@ Reads from a `.env` file to set REST API parameters.
 """
 
 import os
-from dotenv import load_dotenv
-
-# Load .env file
-load_dotenv()
 
 
 class RestApiConfig:
@@ -20,3 +16,13 @@ class RestApiConfig:
     # REST API configuration
     REST_HOST = os.getenv('REST_HOST')
     REST_PORT = int(os.getenv('REST_PORT'))
+    # Number of worker processes, or "auto" for one per CPU allowed by the
+    # container's CPU quota
+    REST_WORKERS = os.getenv('REST_WORKERS', '1')
+    # Event loop ("uvloop" or "asyncio") and HTTP parser ("httptools" or
+    # "h11") of the workers
+    REST_LOOP = os.getenv('REST_LOOP', 'uvloop')
+    REST_HTTP = os.getenv('REST_HTTP', 'httptools')
+    # Time given to the in-flight requests to complete on shutdown, before
+    # the write buffers are flushed
+    REST_SHUTDOWN_TIMEOUT_S = int(os.getenv('REST_SHUTDOWN_TIMEOUT_S', '20'))
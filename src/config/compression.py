@@ -0,0 +1,25 @@
+"""
+Configures the compression of the responses using environment variables.
+
+Reads from a `.env` file to set the compression parameters.
+"""
+
+import os
+
+
+class CompressionConfig:
+    """
+    Configuration class for the compression of the HTTP responses.
+
+    This class loads the compression configuration from environment
+    variables.
+    """
+    # Set to "false" to send every response uncompressed
+    ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    # Responses smaller than this are sent uncompressed
+    MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', '1024'))
+    # gzip compression level, from 1 (fastest) to 9 (smallest)
+    GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+    # Brotli quality, from 0 (fastest) to 11 (smallest), used when the
+    # optional brotli package is installed
+    BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '4'))
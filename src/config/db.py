@@ -5,10 +5,6 @@ Reads from a `.env` file to set InfluxDB parameters.
 """
 
 import os
-from dotenv import load_dotenv
-
-# Load .env file
-load_dotenv()
 
 
 class DbConfig:
@@ -22,3 +18,27 @@ class DbConfig:
     INFLUX_TOKEN = os.getenv('INFLUX_TOKEN')
     INFLUX_ORG = os.getenv('INFLUX_ORG')
     INFLUX_BUCKET = os.getenv('INFLUX_BUCKET')
+    # Maximum number of HTTP connections kept open to InfluxDB; should be at
+    # least the number of executor workers plus the write buffer thread
+    INFLUX_POOL_SIZE = int(os.getenv('INFLUX_POOL_SIZE', '16'))
+    # Time allowed to open a connection to InfluxDB
+    INFLUX_CONNECT_TIMEOUT_MS = int(os.getenv('INFLUX_CONNECT_TIMEOUT_MS',
+                                              '2000'))
+    # Time allowed for InfluxDB to send a response
+    INFLUX_READ_TIMEOUT_MS = int(os.getenv('INFLUX_READ_TIMEOUT_MS',
+                                           '30000'))
+    # Number of times a failed InfluxDB request is retried
+    INFLUX_RETRIES = int(os.getenv('INFLUX_RETRIES', '3'))
+    # Initial delay between retries, doubled on every retry
+    INFLUX_RETRY_BACKOFF_MS = int(os.getenv('INFLUX_RETRY_BACKOFF_MS',
+                                            '200'))
+    # Size of the thread pool running blocking InfluxDB calls off the
+    # event loop
+    INFLUX_EXECUTOR_WORKERS = int(os.getenv('INFLUX_EXECUTOR_WORKERS', '8'))
+    # Number of data points read from InfluxDB per chunk of a streamed
+    # query response
+    INFLUX_STREAM_BATCH_SIZE = int(os.getenv('INFLUX_STREAM_BATCH_SIZE',
+                                             '5000'))
+    # Queries taking longer than this are logged with their template and
+    # counted per template
+    INFLUX_SLOW_QUERY_MS = int(os.getenv('INFLUX_SLOW_QUERY_MS', '1000'))
@@ -0,0 +1,32 @@
+"""
+Configures the background delete jobs of /remove using environment
+variables.
+
+Reads from a `.env` file to set the delete job parameters.
+"""
+
+import os
+
+
+class DeleteJobsConfig:
+    """
+    Configuration class for the background delete jobs.
+
+    This class loads the delete job configuration from environment
+    variables.
+    """
+    # Length of the time chunks a deleted range is split into; each chunk is
+    # a separate InfluxDB delete request
+    CHUNK_MS = int(os.getenv('DELETE_CHUNK_MS', str(24 * 3_600_000)))
+    # Maximum number of chunks deleted at the same time across all jobs, so
+    # that deletes do not take every InfluxDB executor worker from queries
+    CONCURRENCY = int(os.getenv('DELETE_CONCURRENCY', '2'))
+    # Maximum number of jobs waiting or running; further deletes are
+    # rejected until some complete
+    MAX_ACTIVE = int(os.getenv('DELETE_MAX_ACTIVE', '100'))
+    # Number of completed jobs whose status is kept for polling
+    MAX_FINISHED = int(os.getenv('DELETE_MAX_FINISHED', '1000'))
+    # Directory shared by the worker processes in which the state of the
+    # jobs is written, so that a job can be polled through any worker; set
+    # to a temporary directory when several workers are run
+    STATE_DIR = os.getenv('DELETE_STATE_DIR')
@@ -0,0 +1,30 @@
+"""
+Configures the HTTP caching of the query results using environment
+variables.
+
+Reads from a `.env` file to set the HTTP caching parameters.
+"""
+
+import os
+
+
+class HttpCacheConfig:
+    """
+    Configuration class for the HTTP caching headers of /query.
+
+    This class loads the HTTP caching configuration from environment
+    variables.
+    """
+    # Set to "false" to send no validators and no Cache-Control header
+    ENABLED = os.getenv('HTTP_CACHE_ENABLED', 'true').lower() == 'true'
+    # Time after which a time range no longer receives new readings, so
+    # that a range with absolute bounds stopping earlier is closed
+    SETTLE_MS = int(os.getenv('HTTP_CACHE_SETTLE_MS', '300000'))
+    # Time the clients and proxies may reuse the result of a closed range
+    # before revalidating it; 0 to have them revalidate it every time, so
+    # that deleted data is never served from their caches
+    MAX_AGE_S = int(os.getenv('HTTP_CACHE_MAX_AGE_S', '0'))
+    # Directory in which the workers share the versions of the data, or
+    # unset to keep them in memory; set up by the service when it runs
+    # several workers
+    STATE_DIR = os.getenv('HTTP_CACHE_STATE_DIR')
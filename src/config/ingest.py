@@ -0,0 +1,20 @@
+"""
+Configures the bulk ingest parameters using environment variables.
+
+Reads from a `.env` file to set the bulk ingest parameters.
+"""
+
+import os
+
+
+class IngestConfig:
+    """
+    Configuration class for the bulk ingest endpoint.
+
+    This class loads the bulk ingest configuration from environment
+    variables.
+    """
+    # Number of validated records handed to the write buffer at once
+    BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', '1000'))
+    # Maximum number of per-line errors reported in a bulk response
+    BULK_MAX_ERRORS = int(os.getenv('BULK_MAX_ERRORS', '1000'))
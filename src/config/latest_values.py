@@ -0,0 +1,24 @@
+"""
+Configures the in-memory table of the latest battery values using
+environment variables.
+
+Reads from a `.env` file to set the latest values parameters.
+"""
+
+import os
+
+
+class LatestValuesConfig:
+    """
+    Configuration class for the latest battery values served by /latest.
+
+    This class loads the latest values configuration from environment
+    variables.
+    """
+    # Time range searched for the last value of every battery when the table
+    # is seeded at startup
+    SEED_RANGE = os.getenv('LATEST_SEED_RANGE', '-30d')
+    # Interval at which the values written to InfluxDB by other writers
+    # (other workers or services) are merged into the table; 0 only seeds it
+    REFRESH_INTERVAL_MS = int(os.getenv('LATEST_REFRESH_INTERVAL_MS',
+                                        '5000'))
@@ -0,0 +1,24 @@
+"""
+Configures the live subscriptions using environment variables.
+
+Reads from a `.env` file to set the live subscription parameters.
+"""
+
+import os
+
+
+class LiveConfig:
+    """
+    Configuration class for the live reading subscriptions of /live.
+
+    This class loads the live subscription configuration from environment
+    variables.
+    """
+    # Maximum number of readings waiting to be sent to a subscriber before
+    # it is dropped as too slow
+    QUEUE_SIZE = int(os.getenv('LIVE_QUEUE_SIZE', '1000'))
+    # Maximum number of live subscribers
+    MAX_SUBSCRIBERS = int(os.getenv('LIVE_MAX_SUBSCRIBERS', '10000'))
+    # Interval of the keep-alive comments sent on idle SSE streams, which
+    # also detect disconnected clients
+    HEARTBEAT_MS = int(os.getenv('LIVE_HEARTBEAT_MS', '15000'))
@@ -3,8 +3,16 @@ This module provides a LoggingConfig class for configuring logging settings
 with a specific log level and timestamp format that includes milliseconds.
 """
 
+import atexit
 import logging
+import os
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from src.utils.logging_utils import JsonFormatter, RateLimitFilter, \
+    RequestContextFilter
 
 
 class LoggingConfig:
@@ -13,14 +21,29 @@ class LoggingConfig:
     including log level and format.
     """
 
-    # Set the desired logging level
-    LOG_LEVEL = logging.INFO
+    # Set the desired logging level, e.g. "DEBUG", "INFO" or "WARNING"
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+
+    # Output format: "text", or "json" for one JSON object per record with
+    # the request ID and timings as fields
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+
+    # Whether records are written to stdout by a background thread, so that
+    # logging never blocks the caller on the write
+    LOG_ASYNC = os.getenv('LOG_ASYNC', 'true').lower() == 'true'
+
+    # Records logged per second for each high-frequency message, such as
+    # those logged per data point; 0 for no limit
+    LOG_SAMPLED_PER_S = int(os.getenv('LOG_SAMPLED_PER_S', '10'))
 
     # Define a logging formatter that includes milliseconds in the timestamp
     LOG_FORMATTER = logging.Formatter(
         '%(asctime)s.%(msecs)03d - %(levelname)s - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S')
 
+    # Handler shared by the loggers, created on first use
+    _handler: Optional[logging.Handler] = None
+
     @staticmethod
     def get_logger(name: str = __name__) -> logging.Logger:
         """
@@ -43,8 +66,37 @@ class LoggingConfig:
 
         # Avoid adding multiple handlers if logger already has one
         if not logger.hasHandlers():
-            stdout_handler = logging.StreamHandler(sys.stdout)
-            stdout_handler.setFormatter(LoggingConfig.LOG_FORMATTER)
-            logger.addHandler(stdout_handler)
+            logger.addHandler(LoggingConfig.get_handler())
 
         return logger
+
+    @staticmethod
+    def get_handler() -> logging.Handler:
+        """
+        Retrieves the handler shared by the loggers, creating it on first
+        use. The records are rate-limited and tagged with the request ID in
+        the caller's thread. With LOG_ASYNC, they are then put on a queue
+        and formatted and written to stdout by a listener thread, which is
+        stopped, after writing the records left, when the process exits.
+
+        Returns:
+            logging.Handler: The handler.
+        """
+        if LoggingConfig._handler is not None:
+            return LoggingConfig._handler
+
+        stdout_handler = logging.StreamHandler(sys.stdout)
+        stdout_handler.setFormatter(
+            JsonFormatter() if LoggingConfig.LOG_FORMAT == 'json'
+            else LoggingConfig.LOG_FORMATTER)
+        handler: logging.Handler = stdout_handler
+        if LoggingConfig.LOG_ASYNC:
+            records: queue.SimpleQueue = queue.SimpleQueue()
+            handler = QueueHandler(records)
+            listener = QueueListener(records, stdout_handler)
+            listener.start()
+            atexit.register(listener.stop)
+        handler.addFilter(RateLimitFilter(LoggingConfig.LOG_SAMPLED_PER_S))
+        handler.addFilter(RequestContextFilter())
+        LoggingConfig._handler = handler
+        return handler
@@ -0,0 +1,18 @@
+"""
+Configures the Prometheus metrics using environment variables.
+
+Reads from a `.env` file to set the metrics parameters.
+"""
+
+import os
+
+
+class MetricsConfig:
+    """
+    Configuration class for the Prometheus metrics.
+
+    This class loads the metrics configuration from environment variables.
+    """
+    # Interval at which the event loop lag is sampled
+    LOOP_LAG_INTERVAL_MS = int(os.getenv('METRICS_LOOP_LAG_INTERVAL_MS',
+                                         '500'))
@@ -0,0 +1,25 @@
+"""
+Configures the query result cache using environment variables.
+
+Reads from a `.env` file to set the query cache parameters.
+"""
+
+import os
+
+
+class QueryCacheConfig:
+    """
+    Configuration class for the in-process query result cache.
+
+    This class loads the query cache configuration from environment
+    variables.
+    """
+    # Set to "false" to disable the cache
+    ENABLED = os.getenv('QUERY_CACHE_ENABLED', 'true').lower() == 'true'
+    # Time a cached result is served for
+    TTL_MS = int(os.getenv('QUERY_CACHE_TTL_MS', '5000'))
+    # Approximate memory the cached results may use
+    MAX_BYTES = int(os.getenv('QUERY_CACHE_MAX_BYTES', str(64 * 1024 ** 2)))
+    # Relative time ranges are aligned to buckets of this length, so that
+    # near-identical requests share a cache entry
+    BUCKET_MS = int(os.getenv('QUERY_CACHE_BUCKET_MS', '5000'))
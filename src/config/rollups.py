@@ -0,0 +1,33 @@
+"""
+Configures the rollup tiers serving the long-range aggregated queries using
+environment variables.
+
+Reads from a `.env` file to set the rollup parameters.
+"""
+
+import os
+
+
+class RollupConfig:
+    """
+    Configuration class for the rollup tiers and the InfluxDB tasks
+    maintaining them.
+
+    This class loads the rollup configuration from environment variables.
+    """
+    # Whether the rollup tasks are managed and aggregated queries are routed
+    # to the rollup tiers; off unless enabled, as the tasks write the tiers
+    # to the bucket of the battery data
+    ENABLED = os.getenv('ROLLUP_ENABLED', 'false').lower() == 'true'
+    # Windows of the rollup tiers, as comma-separated Flux durations
+    TIERS = [tier.strip() for tier in
+             os.getenv('ROLLUP_TIERS', '1m,1h,1d').split(',') if tier.strip()]
+    # How long after the end of a window it is rolled up, leaving time for
+    # late data points; points arriving later are only in the raw data
+    TASK_OFFSET = os.getenv('ROLLUP_TASK_OFFSET', '30s')
+    # How far back the data is rolled up when a tier's task is created
+    BACKFILL = os.getenv('ROLLUP_BACKFILL', '30d')
+    # Interval at which the tasks are checked and the range covered by the
+    # tiers is refreshed
+    REFRESH_INTERVAL_MS = int(os.getenv('ROLLUP_REFRESH_INTERVAL_MS',
+                                        '60000'))
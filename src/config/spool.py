@@ -0,0 +1,34 @@
+"""
+Configures the on-disk spool of the writes InfluxDB could not take using
+environment variables.
+
+Reads from a `.env` file to set the spool parameters.
+"""
+
+import os
+import tempfile
+
+
+class SpoolConfig:
+    """
+    Configuration class for the write spool and its replayer.
+
+    This class loads the spool configuration from environment variables.
+    """
+    # Whether writes failing or overflowing the write buffer are spooled to
+    # disk rather than lost or rejected
+    ENABLED = os.getenv('SPOOL_ENABLED', 'true').lower() == 'true'
+    # Directory of the spool; every worker process uses a subdirectory. The
+    # default, in the temporary directory, does not depend on the working
+    # directory but may not survive a reboot
+    DIRECTORY = os.getenv('SPOOL_DIR', os.path.join(tempfile.gettempdir(),
+                                                    'battery-data-spool'))
+    # Size at which a segment file is sealed
+    SEGMENT_BYTES = int(os.getenv('SPOOL_SEGMENT_BYTES',
+                                  str(16 * 1024 * 1024)))
+    # Maximum size of the spool of a worker; writes are rejected beyond it
+    MAX_BYTES = int(os.getenv('SPOOL_MAX_BYTES', str(1024 * 1024 * 1024)))
+    # Interval at which the spooled records are synced to disk
+    FSYNC_INTERVAL_MS = int(os.getenv('SPOOL_FSYNC_INTERVAL_MS', '200'))
+    # Maximum number of spooled records written back to InfluxDB per second
+    REPLAY_RATE = int(os.getenv('SPOOL_REPLAY_RATE', '50000'))
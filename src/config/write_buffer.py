@@ -0,0 +1,28 @@
+"""
+Configures the InfluxDB write buffer using environment variables.
+
+Reads from a `.env` file to set the write buffer parameters.
+"""
+
+import os
+
+
+class WriteBufferConfig:
+    """
+    Configuration class for the in-process InfluxDB write buffer.
+
+    This class loads the write buffer configuration from environment
+    variables, falling back to defaults suited to a fleet of batteries
+    reporting at 1 Hz.
+    """
+    # Maximum number of points held in the buffer before new writes are
+    # rejected (backpressure)
+    MAX_SIZE = int(os.getenv('WRITE_BUFFER_MAX_SIZE', '50000'))
+    # Number of points flushed to InfluxDB in a single write request
+    BATCH_SIZE = int(os.getenv('WRITE_BUFFER_BATCH_SIZE', '5000'))
+    # Maximum age of a buffered point before the buffer is flushed
+    FLUSH_INTERVAL_MS = int(os.getenv('WRITE_BUFFER_FLUSH_INTERVAL_MS',
+                                      '1000'))
+    # "buffer": acknowledge a write once it is buffered,
+    # "flush": acknowledge a write once it is flushed to InfluxDB
+    ACK_MODE = os.getenv('WRITE_BUFFER_ACK_MODE', 'buffer')
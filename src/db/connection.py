@@ -1,16 +1,68 @@
 """
 This module handles connection to an Influx DB with logging.
+
+The InfluxConnection class holds the InfluxDB client used by the service:
+the client is created on first use rather than at startup, shares a bounded
+pool of HTTP connections, retries failed requests with exponential backoff,
+and is recreated after a connection failure.
+
+influxdb_client is imported along with the first client, as importing it
+takes a sizeable share of the startup time of the service.
 """
 
-from influxdb_client import InfluxDBClient, WriteApi, QueryApi, DeleteApi
-from influxdb_client.client.write_api import SYNCHRONOUS
-from influxdb_client.client.exceptions import InfluxDBError
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING, Any, Iterator
+
+from urllib3.exceptions import HTTPError
+from urllib3.util.retry import Retry
+
 from src.config.logging import LoggingConfig
 from src.config.db import DbConfig
 
+if TYPE_CHECKING:
+    from influxdb_client import InfluxDBClient, WriteApi, QueryApi, \
+        DeleteApi, TasksApi
+    from influxdb_client.client.flux_table import FluxRecord, TableList
+
 # Configure the logger
 logger = LoggingConfig.get_logger(__name__)
 
+# HTTP statuses after which an InfluxDB request is retried
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# Longest delay between two retries, in seconds
+RETRY_BACKOFF_MAX_S = 10
+
+
+def create_client() -> InfluxDBClient:
+    """
+    Creates an InfluxDB client configured from DbConfig. No request is sent
+    to InfluxDB until the client is used.
+
+    Returns:
+        InfluxDBClient: The client, with its connection pool size, timeouts
+            and retry strategy set.
+    """
+    from influxdb_client import InfluxDBClient  # pylint: disable=import-outside-toplevel
+    return InfluxDBClient(
+        url=DbConfig.INFLUX_URL,
+        token=DbConfig.INFLUX_TOKEN,
+        org=DbConfig.INFLUX_ORG,
+        timeout=(DbConfig.INFLUX_CONNECT_TIMEOUT_MS,
+                 DbConfig.INFLUX_READ_TIMEOUT_MS),
+        connection_pool_maxsize=DbConfig.INFLUX_POOL_SIZE,
+        retries=Retry(
+            total=DbConfig.INFLUX_RETRIES,
+            backoff_factor=DbConfig.INFLUX_RETRY_BACKOFF_MS / 1000,
+            backoff_max=RETRY_BACKOFF_MAX_S,
+            status_forcelist=RETRY_STATUSES,
+            # Flux queries are sent as POST requests
+            allowed_methods=None,
+            raise_on_status=False
+        )
+    )
+
 
 def connect_to_influxdb() -> tuple[
                                  InfluxDBClient,
@@ -26,12 +78,11 @@ def connect_to_influxdb() -> tuple[
             client, Write API, Query Api and Delete Api if connected,
             None otherwise.
     """
+    # pylint: disable=import-outside-toplevel
+    from influxdb_client.client.exceptions import InfluxDBError
+    from influxdb_client.client.write_api import SYNCHRONOUS
     try:
-        client = InfluxDBClient(
-            url=DbConfig.INFLUX_URL,
-            token=DbConfig.INFLUX_TOKEN,
-            org=DbConfig.INFLUX_ORG
-        )
+        client = create_client()
 
         if client.ping():
             logger.info("Successfully connected to InfluxDB.")
@@ -45,3 +96,121 @@ def connect_to_influxdb() -> tuple[
     except InfluxDBError as err:
         logger.error("Failed to connect to InfluxDB: %s", err)
         return None
+
+
+class InfluxConnection:
+    """
+    Lazily created InfluxDB client and its write, query and delete APIs.
+
+    The client is created by the first request rather than at startup, so
+    that the service starts even when InfluxDB is briefly unavailable.
+    Requests failing to reach InfluxDB (after the client's own retries)
+    drop the client, and the next request creates a new one. All methods
+    are thread-safe.
+    """
+
+    def __init__(self):
+        """
+        Initializes the InfluxConnection instance without connecting.
+        """
+        self._lock = threading.Lock()
+        self._client: InfluxDBClient | None = None
+        self._apis: tuple[WriteApi, QueryApi, DeleteApi] | None = None
+
+    def write(self, *args: Any, **kwargs: Any) -> None:
+        """
+        Writes data points through the Write API; see `WriteApi.write`.
+        """
+        _, (write_api, _, _) = self._connect()
+        self._call(write_api.write, *args, **kwargs)
+
+    def query(self, *args: Any, **kwargs: Any) -> TableList:
+        """
+        Runs a Flux query through the Query API; see `QueryApi.query`.
+        """
+        _, (_, query_api, _) = self._connect()
+        return self._call(query_api.query, *args, **kwargs)
+
+    def query_stream(self, *args: Any, **kwargs: Any) -> Iterator[FluxRecord]:
+        """
+        Runs a Flux query through the Query API, returning its records
+        lazily; see `QueryApi.query_stream`.
+        """
+        _, (_, query_api, _) = self._connect()
+        return self._call(query_api.query_stream, *args, **kwargs)
+
+    def delete(self, *args: Any, **kwargs: Any) -> None:
+        """
+        Deletes data points through the Delete API; see `DeleteApi.delete`.
+        """
+        _, (_, _, delete_api) = self._connect()
+        self._call(delete_api.delete, *args, **kwargs)
+
+    def tasks_api(self) -> TasksApi:
+        """
+        Returns the Tasks API of the client, used to manage the InfluxDB
+        tasks of the service. Unlike the other requests, a failing task
+        request does not drop the client.
+
+        Returns:
+            TasksApi: The Tasks API.
+        """
+        client, _ = self._connect()
+        return client.tasks_api()
+
+    def ping(self) -> bool:
+        """
+        Checks whether InfluxDB is reachable.
+
+        Returns:
+            bool: True if InfluxDB answered the ping.
+        """
+        client, _ = self._connect()
+        return client.ping()
+
+    def reset(self) -> None:
+        """
+        Closes the client; the next request creates a new one.
+        """
+        with self._lock:
+            client, self._client, self._apis = self._client, None, None
+        if client is not None:
+            client.close()
+
+    def close(self) -> None:
+        """
+        Closes the client and its connection pool.
+        """
+        self.reset()
+        logger.info("Closed InfluxDB client")
+
+    def _connect(self) -> tuple[InfluxDBClient,
+                                tuple[WriteApi, QueryApi, DeleteApi]]:
+        """
+        Returns the client and its write, query and delete APIs, creating
+        them if needed.
+        """
+        from influxdb_client.client.write_api import SYNCHRONOUS  # pylint: disable=import-outside-toplevel
+        with self._lock:
+            if self._client is None:
+                client = create_client()
+                self._apis = (client.write_api(write_options=SYNCHRONOUS),
+                              client.query_api(),
+                              client.delete_api())
+                self._client = client
+                logger.info("Created InfluxDB client for %s",
+                            DbConfig.INFLUX_URL)
+            return self._client, self._apis
+
+    def _call(self, method: Any, *args: Any, **kwargs: Any) -> Any:
+        """
+        Calls an API method, dropping the client if InfluxDB cannot be
+        reached.
+        """
+        try:
+            return method(*args, **kwargs)
+        except (HTTPError, OSError) as err:
+            logger.warning("InfluxDB request failed, reconnecting on the "
+                           "next request: %s", err)
+            self.reset()
+            raise
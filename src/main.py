@@ -5,16 +5,144 @@ It creates and runs the FastAPI app instance using Uvicorn as the ASGI server.
 The application configuration (such as host and port) is set
 via `RestApiConfig`.
 
+With REST_WORKERS above 1 (or "auto"), Uvicorn runs that many worker
+processes sharing the listening socket. Each worker runs the application
+lifespan, so it has its own InfluxDB client, write buffer and query cache,
+and shares the state of the delete jobs and the versions of the data with
+the other workers; see
+"Running several workers" in the README. On SIGTERM, every worker stops
+accepting connections, lets the in-flight requests complete for up to
+REST_SHUTDOWN_TIMEOUT_S, then flushes its write buffer before exiting.
 """
 
+import importlib.util
+import os
+import tempfile
+from pathlib import Path
+
 import uvicorn
 from src.config.api import RestApiConfig
+from src.config.logging import LoggingConfig
 from src.api.app import create_app
+from src.utils.cpu_quota import available_cpus
+
+# Configure the logger
+logger = LoggingConfig.get_logger(__name__)
+
+# Implementations that are always available, used when the configured one
+# is not installed
+FALLBACK_IMPLEMENTATIONS = {"uvloop": "asyncio", "httptools": "h11"}
 
 # initialize our fast api app
 app = create_app()
 
-if __name__ == "__main__":
+
+def resolve_workers(setting: str) -> int:
+    """
+    Resolves the number of worker processes to run.
+
+    Parameters:
+    - setting (str): A number of workers, or "auto" for one per CPU allowed
+      by the CPU quota of the container.
+
+    Returns:
+    - int: The number of worker processes, at least 1.
+
+    Raises:
+    - ValueError: If the setting is neither "auto" nor an integer.
+    """
+    if setting.strip().lower() == "auto":
+        return available_cpus()
+    return max(int(setting), 1)
+
+
+def resolve_implementation(name: str) -> str:
+    """
+    Returns the Uvicorn event loop or HTTP implementation to use: `name`,
+    or its pure-Python fallback if it is not installed (uvloop is not
+    available on Windows).
+
+    Parameters:
+    - name (str): The configured implementation, e.g. "uvloop".
+
+    Returns:
+    - str: The implementation to pass to Uvicorn.
+    """
+    fallback = FALLBACK_IMPLEMENTATIONS.get(name)
+    if fallback is not None and importlib.util.find_spec(name) is None:
+        logger.warning("%s is not installed, using %s", name, fallback)
+        return fallback
+    return name
+
+
+def prepare_shared_directory(variable: str, prefix: str,
+                             pattern: str) -> None:
+    """
+    Sets up a directory shared by the workers, named by the environment
+    variable `variable`, creating a temporary one if it is not set, and
+    removes the files matching `pattern` left by a previous run. It must
+    run before the workers start, as they inherit the environment.
+
+    Parameters:
+    - variable (str): The environment variable naming the directory.
+    - prefix (str): The prefix of the temporary directory.
+    - pattern (str): The glob pattern of the files left by a previous run.
+    """
+    directory = os.environ.get(variable)
+    if directory is None:
+        directory = os.environ[variable] = tempfile.mkdtemp(prefix=prefix)
+    for stale in Path(directory).glob(pattern):
+        stale.unlink()
+
+
+def prepare_multiprocess_metrics() -> None:
+    """
+    Sets up the directory in which the workers' Prometheus metrics are
+    aggregated.
+    """
+    prepare_shared_directory("PROMETHEUS_MULTIPROC_DIR", "prometheus-",
+                             "*.db")
+
+
+def prepare_delete_jobs_state() -> None:
+    """
+    Sets up the directory in which the workers write the state of their
+    delete jobs, so that a job can be polled through any worker.
+    """
+    prepare_shared_directory("DELETE_STATE_DIR", "delete-jobs-", "*.json")
+
+
+def prepare_data_versions() -> None:
+    """
+    Sets up the directory in which the workers share the versions of the
+    data, so that they validate the cached query results alike.
+    """
+    prepare_shared_directory("HTTP_CACHE_STATE_DIR", "data-versions-",
+                             "versions.*")
+
+
+def main() -> None:
+    """
+    Runs the application with the configured number of workers.
+    """
+    workers = resolve_workers(RestApiConfig.REST_WORKERS)
+    if workers > 1:
+        prepare_multiprocess_metrics()
+        prepare_delete_jobs_state()
+        prepare_data_versions()
+    logger.info("Starting %d worker(s)", workers)
     uvicorn.run("src.main:app",
                 host=RestApiConfig.REST_HOST,
-                port=RestApiConfig.REST_PORT)
+                port=RestApiConfig.REST_PORT,
+                workers=workers,
+                loop=resolve_implementation(RestApiConfig.REST_LOOP),
+                http=resolve_implementation(RestApiConfig.REST_HTTP),
+                timeout_graceful_shutdown=(
+                    RestApiConfig.REST_SHUTDOWN_TIMEOUT_S),
+                log_level=LoggingConfig.LOG_LEVEL.lower(),
+                # the requests are logged by RequestContextMiddleware
+                access_log=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,8 @@ The model uses DataValidationConfig to ensure descriptions and constraints
 align with permissible ranges for each attribute.
 """
 
+from typing import Optional
+
 from pydantic import BaseModel, Field
 from src.config.validation import DataValidationConfig
 
@@ -16,7 +18,7 @@ class BatteryData(BaseModel):
     Data model for battery information.
 
     Attributes:
-    - battery_id (str): Unique identifier for the battery.
+    - battery_id (str): Unique identifier for the battery, not empty.
     - voltage (int): Battery voltage in volts,
         constrained between {DataValidationConfig.VOLTAGE['min']}
         and {DataValidationConfig.VOLTAGE['max']}.
@@ -32,9 +34,13 @@ class BatteryData(BaseModel):
     - state_of_health (int): Battery's state of health as a percentage,
         constrained between {DataValidationConfig.STATE_OF_HEALTH['min']}
         and {DataValidationConfig.STATE_OF_HEALTH['max']}.
+    - timestamp (Optional[int]): Time of the reading in milliseconds since
+        the Unix epoch. Defaults to the time the reading is inserted, set it
+        when back-filling data recorded earlier.
     """
     battery_id: str = Field(
         ...,
+        min_length=1,
         description="Unique identifier for the battery"
     )
     voltage: int = Field(
@@ -77,3 +83,17 @@ class BatteryData(BaseModel):
                     f"({DataValidationConfig.STATE_OF_HEALTH['min']} to "
                     f"{DataValidationConfig.STATE_OF_HEALTH['max']})"
     )
+    timestamp: Optional[int] = Field(
+        None,
+        ge=0,
+        description="Time of the reading in milliseconds since the Unix "
+                    "epoch (defaults to the insertion time)"
+    )
+
+
+# Fields of the battery_data measurement, selected by the "*" wildcard: the
+# fields of a reading, then those set when it is inserted
+BATTERY_FIELDS = (
+    *(name for name in BatteryData.model_fields
+      if name not in {"battery_id", "timestamp"}),
+    "influx_timestamp", "latency_ms")
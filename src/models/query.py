@@ -0,0 +1,284 @@
+"""
+This module defines the data model describing a battery data query in
+FastAPI. The BatteryQuery model gathers the query parameters of the query
+endpoint, including the optional server-side aggregation and downsampling
+parameters and the response format, and validates them before they reach
+InfluxDB. The StatsQuery model gathers those of the statistics endpoint.
+"""
+
+from enum import Enum
+from typing import Annotated, List, Optional
+
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from src.models.battery import BATTERY_FIELDS
+from src.utils.datetime_utils import parse_time_bound
+
+# A Flux duration literal, e.g. "30s", "1h30m"
+FLUX_DURATION_PATTERN = r"^(\d+(ns|us|ms|s|m|h|d|w|mo|y))+$"
+# Selects every battery or every field
+WILDCARD = "*"
+
+
+def selects_all(values: List[str]) -> bool:
+    """
+    Checks whether selected values include the "*" wildcard.
+
+    Parameters:
+    - values (List[str]): The selected battery IDs or fields.
+
+    Returns:
+    - bool: True if every value is selected.
+    """
+    return WILDCARD in values
+
+
+class AggregateFunction(str, Enum):
+    """
+    Functions used to aggregate the data points of each window.
+    """
+    MEAN = "mean"
+    MIN = "min"
+    MAX = "max"
+    LAST = "last"
+    COUNT = "count"
+    PERCENTILE = "percentile"
+
+
+class DownsampleMethod(str, Enum):
+    """
+    Methods used to reduce a series to `max_points` data points.
+
+    - aggregate: aggregate windows sized to fit `max_points` in InfluxDB.
+    - lttb: Largest-Triangle-Three-Buckets visual downsampling of the raw
+      data points, which preserves the peaks and troughs of the series.
+    """
+    AGGREGATE = "aggregate"
+    LTTB = "lttb"
+
+
+class ResponseFormat(str, Enum):
+    """
+    Formats a query result can be returned in.
+
+    - json: a JSON list of data points, or the columns of each battery.
+    - csv: a CSV table with a header row.
+    - msgpack: a MessagePack map of columns.
+    - arrow: an Apache Arrow IPC stream.
+    """
+    JSON = "json"
+    CSV = "csv"
+    MSGPACK = "msgpack"
+    ARROW = "arrow"
+
+
+class SeriesSelection(BaseModel):
+    """
+    Data model for the series selected by a query: batteries, fields and
+    time range.
+
+    Attributes:
+    - battery_id (List[str]): Identifiers for the batteries, or "*" for
+        every battery.
+    - start_time (str): Start of the time range, e.g. "-2h".
+    - stop_time (str): End of the time range, e.g. "-1m".
+    - field (List[str]): Fields to retrieve, or "*" for every field.
+    """
+    battery_id: List[str] = Field(
+        ...,
+        min_length=1,
+        description='Identifier for the battery; repeat the parameter for '
+                    'several batteries, or use "*" for every battery'
+    )
+    start_time: str = Field(
+        ...,
+        description='Start of the time range: a relative duration, e.g. '
+                    '"-2h" or "-1h30m", "now()", an RFC3339 time or epoch '
+                    'milliseconds'
+    )
+    stop_time: str = Field(
+        ...,
+        description='End of the time range, in the formats of start_time, '
+                    'e.g. "-1m"'
+    )
+    field: List[str] = Field(
+        ...,
+        min_length=1,
+        description='Field to retrieve; repeat the parameter for several '
+                    'fields, or use "*" for every field'
+    )
+
+    @field_validator("start_time", "stop_time")
+    @classmethod
+    def check_time(cls, value: str) -> str:
+        """
+        Checks that a time bound can be parsed, so that it can be resolved
+        to an absolute time before reaching InfluxDB.
+
+        Returns:
+        - str: The time bound, unchanged.
+
+        Raises:
+        - ValueError: If the time bound cannot be parsed.
+        """
+        parse_time_bound(value)
+        return value
+
+    @field_validator("field")
+    @classmethod
+    def check_fields(cls, value: List[str]) -> List[str]:
+        """
+        Checks that the selected fields are fields of the battery data.
+
+        Returns:
+        - List[str]: The fields, unchanged.
+
+        Raises:
+        - ValueError: If a field is neither a battery data field nor "*".
+        """
+        unknown = set(value) - {*BATTERY_FIELDS, WILDCARD}
+        if unknown:
+            raise ValueError(f"Unknown fields {sorted(unknown)}, expected "
+                             f"some of {list(BATTERY_FIELDS)} or \"*\"")
+        return value
+
+
+class BatteryQuery(SeriesSelection):
+    """
+    Data model for a battery data query.
+
+    Attributes:
+    - battery_id, start_time, stop_time, field: See SeriesSelection.
+    - every (Optional[str]): Aggregate the data points into windows of this
+        Flux duration, e.g. "1m".
+    - fn (AggregateFunction): Function aggregating each window.
+    - percentile (float): Percentile computed when `fn` is "percentile".
+    - max_points (Optional[int]): Maximum number of data points to return;
+        picks the aggregation window when `every` is not set.
+    - downsample (DownsampleMethod): How `max_points` is enforced.
+    - stream (bool): Whether to stream the data points as NDJSON.
+    - format (Optional[ResponseFormat]): Format of the result; negotiated
+        from the Accept header when not set.
+    - tier (str): "auto" to serve an aggregated query from a rollup tier
+        when one can, or "raw" for the raw data points; once routed, the
+        tier serving the query, e.g. "1h".
+    """
+    every: Optional[str] = Field(
+        None,
+        pattern=FLUX_DURATION_PATTERN,
+        description='Aggregation window, as a Flux duration, e.g. "1m"'
+    )
+    fn: AggregateFunction = Field(
+        AggregateFunction.MEAN,
+        description="Function aggregating each window"
+    )
+    percentile: float = Field(
+        95,
+        gt=0,
+        lt=100,
+        description='Percentile computed when fn is "percentile"'
+    )
+    max_points: Optional[int] = Field(
+        None,
+        ge=3,
+        description="Maximum number of data points to return"
+    )
+    downsample: DownsampleMethod = Field(
+        DownsampleMethod.AGGREGATE,
+        description='How max_points is enforced: "aggregate" or "lttb"'
+    )
+    stream: bool = Field(
+        False,
+        description="Stream the data points as NDJSON while they are read "
+                    "from InfluxDB"
+    )
+    format: Optional[ResponseFormat] = Field(
+        None,
+        description='Format of the result: "json", "csv", "msgpack" or '
+                    '"arrow"; negotiated from the Accept header when not set'
+    )
+
+    tier: str = Field(
+        "auto",
+        pattern=r"^(auto|raw)$",
+        description='"auto" serves aggregated queries from a rollup tier '
+                    'when one can; "raw" always aggregates the raw data'
+    )
+
+    @model_validator(mode="after")
+    def check_downsampling(self) -> "BatteryQuery":
+        """
+        Checks that LTTB downsampling is given a number of points and a
+        single series, and that streamed results are JSON.
+
+        Returns:
+        - BatteryQuery: The validated query.
+
+        Raises:
+        - ValueError: If `downsample` is "lttb" without `max_points` or with
+          several batteries or fields, or if `stream` is set with a format
+          other than JSON.
+        """
+        if self.downsample is DownsampleMethod.LTTB:
+            if self.max_points is None:
+                raise ValueError('downsample "lttb" requires max_points')
+            if self.is_multi_series:
+                raise ValueError('downsample "lttb" supports a single '
+                                 'battery and field')
+        if self.stream and self.format not in (None, ResponseFormat.JSON):
+            raise ValueError("stream only supports the json format")
+        return self
+
+    @property
+    def is_multi_series(self) -> bool:
+        """
+        bool: Whether the query selects more than one battery or field.
+        """
+        return any(len(values) > 1 or selects_all(values)
+                   for values in (self.battery_id, self.field))
+
+    @property
+    def is_aggregated(self) -> bool:
+        """
+        bool: Whether InfluxDB aggregates the data points into windows.
+        """
+        return self.every is not None or (
+            self.max_points is not None
+            and self.downsample is DownsampleMethod.AGGREGATE)
+
+
+class StatsQuery(SeriesSelection):
+    """
+    Data model for a battery statistics query.
+
+    Attributes:
+    - battery_id, start_time, stop_time: See SeriesSelection.
+    - field (List[str]): Fields to summarise, or "*" for every field.
+    - percentile (List[float]): Percentiles computed for every field.
+    """
+    field: List[str] = Field(
+        [WILDCARD],
+        min_length=1,
+        description='Field to summarise; repeat the parameter for several '
+                    'fields; every field by default'
+    )
+    percentile: List[Annotated[float, Field(gt=0, lt=100)]] = Field(
+        [5, 50, 95],
+        min_length=1,
+        max_length=20,
+        description="Percentile computed for every field; repeat the "
+                    "parameter for several percentiles"
+    )
+
+    def series_query(self) -> BatteryQuery:
+        """
+        Returns the query fetching the raw data points summarised.
+
+        Returns:
+        - BatteryQuery: The query of the selected batteries, fields and
+          time range, without aggregation.
+        """
+        return BatteryQuery(battery_id=self.battery_id,
+                            start_time=self.start_time,
+                            stop_time=self.stop_time, field=self.field,
+                            tier="raw")
@@ -0,0 +1,291 @@
+"""
+This module defines the admission control of the REST API: per-route
+concurrency limits with a bounded, deadline-limited queue, and a budget on
+the cost of the queries, so that bursts of heavy queries neither exhaust
+memory nor starve the ingest of new readings.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Deque, Dict
+
+from src.models.battery import BATTERY_FIELDS
+from src.models.query import BatteryQuery, selects_all
+from src.utils.datetime_utils import NANOSECONDS_PER_SECOND, \
+    parse_time_range
+
+NANOSECONDS_PER_HOUR = 3_600 * NANOSECONDS_PER_SECOND
+
+
+class OverloadedError(Exception):
+    """
+    Raised when a request is shed.
+
+    Attributes:
+    - status_code (int): 429 if the request is over the cost budget, 503
+      if the server is too busy to serve it in time.
+    - reason (str): Why the request was shed: "cost", "queue_full",
+      "queue_timeout" or "priority".
+    - retry_after_s (int): When the request may be retried, in seconds.
+    """
+
+    def __init__(self, message: str, status_code: int, reason: str,
+                 retry_after_s: int):
+        """
+        Initializes the OverloadedError instance.
+
+        Parameters:
+        - message (str): The error message.
+        - status_code (int): The HTTP status of the response.
+        - reason (str): Why the request was shed.
+        - retry_after_s (int): When the request may be retried, in seconds.
+        """
+        super().__init__(message)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+
+class ConcurrencyLimit:
+    """
+    Limits the number of requests of a route served at a time.
+
+    Requests beyond the limit wait in first-in, first-out order, for at
+    most `queue_timeout_s`; at most `max_queued` requests wait. A released
+    slot is handed to the first waiting request directly, so that new
+    requests cannot overtake the queue. Must be used on the event loop.
+
+    Attributes:
+    - active (int): The number of requests being served.
+    """
+
+    def __init__(self, limit: int, max_queued: int,
+                 queue_timeout_s: float):
+        """
+        Initializes the ConcurrencyLimit instance.
+
+        Parameters:
+        - limit (int): The maximum number of requests served at a time, or
+          0 for no limit.
+        - max_queued (int): The maximum number of requests waiting.
+        - queue_timeout_s (float): How long a request may wait.
+        """
+        self.limit = limit
+        self.max_queued = max_queued
+        self.queue_timeout_s = queue_timeout_s
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        """
+        int: The number of requests waiting for a slot.
+        """
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        """
+        Takes a slot, waiting for one if none is free.
+
+        Raises:
+        - OverloadedError: If the queue is full or the slot is not free
+          within `queue_timeout_s`.
+        """
+        if not self.limit or (self.active < self.limit
+                              and not self._waiters):
+            self.active += 1
+            return
+        if len(self._waiters) >= self.max_queued:
+            raise OverloadedError(
+                f"{len(self._waiters)} requests are already waiting",
+                503, "queue_full", math.ceil(self.queue_timeout_s))
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout_s)
+        except (TimeoutError, asyncio.CancelledError) as err:
+            if waiter.done() and not waiter.cancelled():
+                # the slot was handed over as the request gave up
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if isinstance(err, TimeoutError):
+                raise OverloadedError(
+                    f"No slot was free within {self.queue_timeout_s:g} s",
+                    503, "queue_timeout",
+                    math.ceil(self.queue_timeout_s)) from err
+            raise
+
+    def release(self) -> None:
+        """
+        Frees a slot, handing it to the first waiting request if any.
+        """
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class CostBudget:
+    """
+    Token bucket limiting the cost of the queries served over time.
+
+    The budget is refilled at `rate_per_s` up to `burst`. A query spends
+    its cost, capped at `burst` so that any query can eventually run, and
+    is rejected if the budget left is smaller.
+    """
+
+    def __init__(self, rate_per_s: float, burst: float):
+        """
+        Initializes the CostBudget instance, full.
+
+        Parameters:
+        - rate_per_s (float): The cost refilled every second, or 0 for no
+          budget.
+        - burst (float): The most the budget can hold.
+        """
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self._available = burst
+        self._updated = time.monotonic()
+
+    @property
+    def available(self) -> float:
+        """
+        float: The budget left.
+        """
+        now = time.monotonic()
+        self._available = min(self.burst, self._available + (
+            now - self._updated) * self.rate_per_s)
+        self._updated = now
+        return self._available
+
+    def spend(self, cost: float) -> None:
+        """
+        Spends the cost of a query.
+
+        Parameters:
+        - cost (float): The cost of the query.
+
+        Raises:
+        - OverloadedError: If the budget left is smaller than the cost.
+        """
+        if not self.rate_per_s:
+            return
+        cost = min(cost, self.burst)
+        available = self.available
+        if cost > available:
+            raise OverloadedError(
+                f"The query costs {cost:.0f} series-hours, "
+                f"{available:.0f} are left",
+                429, "cost",
+                math.ceil((cost - available) / self.rate_per_s))
+        self._available -= cost
+
+    def refund(self, cost: float) -> None:
+        """
+        Gives back the cost of a query that was not served.
+
+        Parameters:
+        - cost (float): The cost spent for the query.
+        """
+        if not self.rate_per_s:
+            return
+        self._available = min(self.burst,
+                              self.available + min(cost, self.burst))
+
+
+def query_cost(query: BatteryQuery, battery_count: int) -> float:
+    """
+    Estimates the cost of a query, in series-hours: the length of its time
+    range in hours, times the fields, times the batteries selected.
+
+    Parameters:
+    - query (BatteryQuery): The query.
+    - battery_count (int): The number of batteries the "*" wildcard
+      selects.
+
+    Returns:
+    - float: The estimated cost.
+    """
+    time_range = parse_time_range(query.start_time, query.stop_time)
+    hours = max(time_range.stop_ns - time_range.start_ns,
+                0) / NANOSECONDS_PER_HOUR
+    fields = (len(BATTERY_FIELDS) if selects_all(query.field)
+              else len(query.field))
+    batteries = (max(battery_count, 1) if selects_all(query.battery_id)
+                 else len(query.battery_id))
+    return hours * fields * batteries
+
+
+class AdmissionControl:
+    """
+    Admits the ingest and query requests.
+
+    Ingest has priority over analytics: queries are shed while ingest
+    requests are waiting for a slot, and queries must also fit the cost
+    budget.
+
+    Attributes:
+    - ingest (ConcurrencyLimit): The limit of the ingest requests.
+    - query (ConcurrencyLimit): The limit of the query requests.
+    - query_budget (CostBudget): The budget of the query costs.
+    """
+
+    def __init__(self, ingest: ConcurrencyLimit, query: ConcurrencyLimit,
+                 query_budget: CostBudget):
+        """
+        Initializes the AdmissionControl instance.
+
+        Parameters:
+        - ingest (ConcurrencyLimit): The limit of the ingest requests.
+        - query (ConcurrencyLimit): The limit of the query requests.
+        - query_budget (CostBudget): The budget of the query costs.
+        """
+        self.ingest = ingest
+        self.query = query
+        self.query_budget = query_budget
+
+    async def admit_query(self, cost: float) -> None:
+        """
+        Admits a query, spending its cost and taking a query slot, to be
+        released with `query.release()` once the query is served. The cost
+        is spent before waiting for a slot, so that a query over the budget
+        is rejected at once, and refunded if no slot is taken.
+
+        Parameters:
+        - cost (float): The estimated cost of the query.
+
+        Raises:
+        - OverloadedError: If ingest requests are waiting, if the query is
+          over the cost budget, or if no query slot is free in time.
+        """
+        if self.ingest.queued:
+            raise OverloadedError("Ingest requests are waiting", 503,
+                                  "priority", 1)
+        self.query_budget.spend(cost)
+        try:
+            await self.query.acquire()
+        except BaseException:
+            # shed, timed out or cancelled while waiting
+            self.query_budget.refund(cost)
+            raise
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Returns the requests served and waiting per route, and the query
+        budget left.
+
+        Returns:
+        - Dict[str, float]: The active and queued requests of the ingest
+          and query routes, and the query cost available.
+        """
+        return {"ingest_active": self.ingest.active,
+                "ingest_queued": self.ingest.queued,
+                "query_active": self.query.active,
+                "query_queued": self.query.queued,
+                "query_cost_available": self.query_budget.available}
@@ -0,0 +1,149 @@
+"""
+This module defines the BulkIngest class, which validates the readings of a
+bulk upload one by one and hands them to the InfluxManager in chunks,
+keeping track of the readings accepted and rejected.
+"""
+
+import asyncio
+from concurrent.futures import Future
+from typing import Any, Dict, List, Tuple
+
+from pydantic import ValidationError
+
+from src.models.battery import BatteryData
+from src.services.influx_manager import InfluxManager
+from src.services.write_buffer import RejectedPointsError, \
+    WriteBufferFullError
+
+
+def format_validation_error(err: ValidationError) -> str:
+    """
+    Formats a pydantic ValidationError as a compact, single-line message.
+
+    Parameters:
+    - err (ValidationError): The validation error.
+
+    Returns:
+    - str: The error message, e.g. "voltage: Input should be less than or
+      equal to 600".
+    """
+    return "; ".join(
+        f"{'.'.join(map(str, error['loc'])) or 'body'}: {error['msg']}"
+        for error in err.errors()
+    )
+
+
+class BulkIngest:  # pylint: disable=too-many-instance-attributes
+    """
+    Validates the readings of a bulk upload and writes them in chunks.
+
+    Readings are validated against the BatteryData model as they are added,
+    so that the body never has to be held in memory as a whole. Valid
+    readings are inserted through `InfluxManager.insert_many` every
+    `chunk_size` readings; invalid ones are reported with their line.
+
+    Attributes:
+    - accepted (int): Number of readings handed to the write buffer.
+    - errors (List[Dict[str, Any]]): The first `max_errors` rejected
+      readings, as {"line": ..., "error": ...}.
+    - rejected (int): Number of rejected readings.
+    """
+
+    def __init__(self,
+                 influx_manager: InfluxManager,
+                 chunk_size: int,
+                 max_errors: int):
+        """
+        Initializes the BulkIngest instance.
+
+        Parameters:
+        - influx_manager (InfluxManager): Manager the readings are inserted
+          through.
+        - chunk_size (int): Number of readings inserted at once.
+        - max_errors (int): Maximum number of errors kept for the response.
+        """
+        self.accepted = 0
+        self.rejected = 0
+        self.errors: List[Dict[str, Any]] = []
+        self._influx_manager = influx_manager
+        self._chunk_size = chunk_size
+        self._max_errors = max_errors
+        self._chunk: List[Tuple[int, BatteryData]] = []
+        self._pending: List[Tuple[List[int], Future]] = []
+
+    def add(self, line: int, document: bytes) -> None:
+        """
+        Validates a reading and queues it for insertion.
+
+        Parameters:
+        - line (int): Position of the reading in the body.
+        - document (bytes): The raw JSON document of the reading.
+        """
+        try:
+            reading = BatteryData.model_validate_json(document)
+        except ValidationError as err:
+            self._reject([line], format_validation_error(err))
+            return
+        self._chunk.append((line, reading))
+        if len(self._chunk) >= self._chunk_size:
+            self._write_chunk()
+
+    async def finish(self, wait_for_flush: bool) -> Dict[str, Any]:
+        """
+        Inserts the remaining readings and summarises the upload.
+
+        Parameters:
+        - wait_for_flush (bool): Whether to wait until the readings have
+          been written to InfluxDB, reporting those whose write failed.
+
+        Returns:
+        - Dict[str, Any]: The status ("success" or "partial"), the numbers
+          of accepted and rejected readings, and the per-line errors.
+        """
+        self._write_chunk()
+        if wait_for_flush:
+            for lines, flushed in self._pending:
+                try:
+                    await asyncio.wrap_future(flushed)
+                except RejectedPointsError as err:
+                    # the other readings of the chunk were written
+                    for index, error in err.rejected.items():
+                        self.accepted -= 1
+                        self._reject([lines[index]],
+                                     f"Rejected by InfluxDB: {error}")
+                except Exception as err:  # pylint: disable=broad-exception-caught
+                    self.accepted -= len(lines)
+                    self._reject(lines, f"Write error: {err}")
+        return {
+            "status": "partial" if self.rejected else "success",
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "errors": self.errors,
+        }
+
+    def _write_chunk(self) -> None:
+        """
+        Inserts the queued readings, rejecting them if the write buffer is
+        full.
+        """
+        if not self._chunk:
+            return
+        lines = [line for line, _ in self._chunk]
+        try:
+            flushed = self._influx_manager.insert_many(
+                [reading for _, reading in self._chunk])
+        except WriteBufferFullError as err:
+            self._reject(lines, f"Service unavailable: {err}")
+        else:
+            self.accepted += len(lines)
+            self._pending.append((lines, flushed))
+        self._chunk = []
+
+    def _reject(self, lines: List[int], error: str) -> None:
+        """
+        Records rejected readings, keeping at most `max_errors` errors.
+        """
+        self.rejected += len(lines)
+        room = self._max_errors - len(self.errors)
+        self.errors.extend({"line": line, "error": error}
+                           for line in lines[:max(room, 0)])
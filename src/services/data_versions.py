@@ -0,0 +1,206 @@
+"""
+This module defines the DataVersions class, which versions the data of
+every battery, so that the result of a query over a closed time range can
+be identified by the versions of its batteries and revalidated by the
+clients without running the query again.
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from src.models.query import selects_all
+from src.utils.datetime_utils import NANOSECONDS_PER_MILLISECOND
+
+
+class DataVersion(NamedTuple):
+    """
+    The version of the data of some batteries.
+
+    Attributes:
+    - version (int): Increases whenever their data in a closed time range
+      changes.
+    - modified_ns (int): When it last increased, in nanoseconds since the
+      epoch; the start of the process at first.
+    """
+    version: int
+    modified_ns: int
+
+
+class DataVersions:  # pylint: disable=too-many-instance-attributes
+    """
+    Thread-safe versions of the data of every battery.
+
+    A time range is closed once its stop is `settle_ms` in the past. The
+    version of a battery increases when its data in a closed range changes:
+    when a reading older than `settle_ms` is written, or when a range is
+    deleted. The readings written as they are taken only extend the open
+    ranges, so they leave the versions unchanged.
+
+    Without a `state_dir`, the versions are held in memory, so they only
+    see the writes and deletes made through this process; `epoch`, set
+    when the process starts, tells them apart from the versions of another
+    process. With a `state_dir`, the versions are kept in a file there,
+    shared by the worker processes: every change is written to it under a
+    file lock, and the versions are read back whenever it was replaced, so
+    that every worker sees the changes made through the others and
+    identifies the results with the same versions and `epoch`.
+
+    Attributes:
+    - settle_ms (int): The time after which a range is closed.
+    - epoch (int): When the versions were created, in nanoseconds since
+      the epoch.
+    """
+
+    def __init__(self, settle_ms: int, state_dir: Optional[str] = None):
+        """
+        Initializes the DataVersions instance, with every version at 0, or
+        at the versions found in the `state_dir`.
+
+        Parameters:
+        - settle_ms (int): The time after which a range is closed.
+        - state_dir (Optional[str]): The directory shared by the workers in
+          which the versions are kept, or None to keep them in memory only.
+        """
+        self.settle_ms = settle_ms
+        self.epoch = time.time_ns()
+        self._lock = threading.Lock()
+        self._batteries: Dict[str, DataVersion] = {}
+        # increases with every change of any battery, for the "*" wildcard
+        self._any = DataVersion(0, self.epoch)
+        # increases when the data of every battery may have changed
+        self._all = DataVersion(0, self.epoch)
+        self._path = None
+        # identifies the version of the file last read
+        self._stat: Optional[Tuple[int, int, int]] = None
+        if state_dir is not None:
+            Path(state_dir).mkdir(parents=True, exist_ok=True)
+            self._path = Path(state_dir) / "versions.json"
+            # written by the first worker, read by the others
+            self._update(lambda: None)
+
+    def closed_before(self) -> int:
+        """
+        Returns the time before which the ranges are closed.
+
+        Returns:
+        - int: The time, in nanoseconds since the epoch.
+        """
+        return time.time_ns() - self.settle_ms * NANOSECONDS_PER_MILLISECOND
+
+    def changed(self, touched: Dict[str, Tuple[int, int]]) -> None:
+        """
+        Increases the version of the batteries whose data changed in a
+        closed range.
+
+        Parameters:
+        - touched (Dict[str, Tuple[int, int]]): The time range changed for
+          each battery, in milliseconds, keyed by battery ID.
+        """
+        closed_before_ms = self.closed_before() // NANOSECONDS_PER_MILLISECOND
+        closed = [battery_id for battery_id, (start_ms, _) in touched.items()
+                  if start_ms < closed_before_ms]
+        if closed:
+            self._update(lambda: self._increase(closed, time.time_ns()))
+
+    def changed_all(self) -> None:
+        """
+        Increases the version of every battery, e.g. when readings of
+        unknown batteries and times were written.
+        """
+        def increase() -> None:
+            self._all = DataVersion(self._all.version + 1, time.time_ns())
+        self._update(increase)
+
+    def get(self, battery_ids: Tuple[str, ...]) -> DataVersion:
+        """
+        Returns the version of the data of some batteries. It increases
+        whenever the version of one of them does.
+
+        Parameters:
+        - battery_ids (Tuple[str, ...]): The batteries; ("*",) for every
+          battery.
+
+        Returns:
+        - DataVersion: The sum of their versions, and when the last of them
+          increased.
+        """
+        with self._lock:
+            self._read()
+            versions = ([self._any] if selects_all(battery_ids) else
+                        [self._batteries[battery_id]
+                         for battery_id in battery_ids
+                         if battery_id in self._batteries])
+            versions.append(self._all)
+        return DataVersion(sum(version.version for version in versions),
+                           max(version.modified_ns for version in versions))
+
+    def _increase(self, battery_ids: List[str], now_ns: int) -> None:
+        """
+        Increases the version of some batteries; called with the lock held.
+        """
+        for battery_id in battery_ids:
+            version = self._batteries.get(battery_id)
+            self._batteries[battery_id] = DataVersion(
+                1 if version is None else version.version + 1, now_ns)
+            self._any = DataVersion(self._any.version + 1, now_ns)
+
+    def _update(self, change: Callable[[], None]) -> None:
+        """
+        Applies a change to the versions. With a `state_dir`, the versions
+        are read back from the file and the change written to it while
+        holding the file lock, so that no change made by another worker is
+        lost.
+        """
+        with self._lock:
+            if self._path is None:
+                change()
+                return
+            with open(self._path.with_suffix(".lock"), "a",
+                      encoding="utf-8") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._read()
+                change()
+                self._write()
+
+    def _read(self) -> None:
+        """
+        Reads the versions back from the file if another worker replaced
+        it since it was last read; called with the lock held.
+        """
+        if self._path is None:
+            return
+        try:
+            stat = os.stat(self._path)
+        except FileNotFoundError:
+            return
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if key == self._stat:
+            return
+        state = json.loads(self._path.read_text(encoding="utf-8"))
+        self.epoch = state["epoch"]
+        self._batteries = {battery_id: DataVersion(*version)
+                           for battery_id, version
+                           in state["batteries"].items()}
+        self._any = DataVersion(*state["any"])
+        self._all = DataVersion(*state["all"])
+        self._stat = key
+
+    def _write(self) -> None:
+        """
+        Writes the versions to the file; called with both locks held. The
+        file is replaced atomically, so that the other workers never read
+        it partly written.
+        """
+        state: Dict[str, Any] = {
+            "epoch": self.epoch, "any": self._any, "all": self._all,
+            "batteries": self._batteries}
+        temporary = self._path.with_suffix(f".{os.getpid()}.tmp")
+        temporary.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(temporary, self._path)
+        stat = os.stat(self._path)
+        self._stat = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
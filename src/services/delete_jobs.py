@@ -0,0 +1,317 @@
+"""
+This module defines the DeleteJobs class, which runs the range deletes of
+`/remove` as background jobs, so that deleting a long time range neither
+outlasts the client's timeout nor holds the request open.
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config.logging import LoggingConfig
+from src.services.influx_manager import InfluxManager
+from src.utils.datetime_utils import NANOSECONDS_PER_MILLISECOND, \
+    NANOSECONDS_PER_SECOND, parse_time_range, split_range, to_rfc3339
+
+# initialize logger for this module
+logger = LoggingConfig.get_logger(__name__)
+
+
+class TooManyJobsError(Exception):
+    """
+    Raised when a job is rejected because the maximum number of jobs are
+    waiting or running.
+    """
+
+
+class JobStatus(str, Enum):
+    """
+    States of a delete job.
+    """
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+@dataclass
+class DeleteJob:  # pylint: disable=too-many-instance-attributes
+    """
+    A range delete and its progress.
+
+    Attributes:
+    - job_id (str): The identifier of the job.
+    - battery_id (str): The battery whose data is deleted.
+    - chunks (List[Tuple[int, int]]): The time chunks deleted one by one,
+      oldest first, in nanoseconds since the epoch.
+    - chunks_done (int): The number of chunks deleted.
+    - status (JobStatus): The state of the job.
+    - error (Optional[str]): Why the job failed, if it did.
+    - submitted_at (float): When the job was submitted, in seconds since
+      the epoch.
+    - finished_at (Optional[float]): When the job completed, if it did.
+    """
+    job_id: str
+    battery_id: str
+    chunks: List[Tuple[int, int]]
+    chunks_done: int = 0
+    status: JobStatus = JobStatus.PENDING
+    error: Optional[str] = None
+    submitted_at: float = 0.0
+    finished_at: Optional[float] = None
+
+    @property
+    def is_finished(self) -> bool:
+        """
+        bool: Whether the job succeeded or failed.
+        """
+        return self.status in (JobStatus.SUCCEEDED, JobStatus.FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Describes the job for the API.
+
+        Returns:
+        - Dict[str, Any]: The job's identifier, status, battery, time range
+          (RFC3339), progress, error, and submission and completion times.
+        """
+        return {
+            "job_id": self.job_id,
+            "status": self.status.value,
+            "battery_id": self.battery_id,
+            "start_time": to_rfc3339(self.chunks[0][0]),
+            "stop_time": to_rfc3339(self.chunks[-1][1]),
+            "chunks": len(self.chunks),
+            "chunks_done": self.chunks_done,
+            "progress": round(self.chunks_done / len(self.chunks), 4),
+            "error": self.error,
+            "submitted_at": _timestamp(self.submitted_at),
+            "finished_at": None if self.finished_at is None
+            else _timestamp(self.finished_at),
+        }
+
+
+def _timestamp(seconds: float) -> str:
+    """
+    Formats a time in seconds since the epoch as an RFC3339 timestamp.
+    """
+    return to_rfc3339(int(seconds * NANOSECONDS_PER_SECOND), digits=3)
+
+
+class DeleteJobs:  # pylint: disable=too-many-instance-attributes
+    """
+    Runs range deletes in the background, split into time chunks.
+
+    A job deletes its chunks one after the other, oldest first, through the
+    InfluxManager's executor. At most `concurrency` chunks are deleted at a
+    time across all jobs, so that deletes leave executor workers to the
+    queries. Finished jobs are kept for polling until `max_finished` more
+    recent jobs have finished.
+
+    Jobs are submitted and run on the event loop of the worker process they
+    were submitted to. With a `state_dir`, the worker also writes the state
+    of its jobs there whenever it changes, so that a job can be polled
+    through any worker sharing the directory.
+    """
+
+    def __init__(self, influx_manager: InfluxManager, chunk_ms: int,
+                 concurrency: int, max_active: int, max_finished: int,
+                 state_dir: Optional[str] = None):
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        """
+        Initializes the DeleteJobs instance.
+
+        Parameters:
+        - influx_manager (InfluxManager): The manager deleting the chunks.
+        - chunk_ms (int): The maximum length of a chunk.
+        - concurrency (int): Maximum number of chunks deleted at a time.
+        - max_active (int): Maximum number of jobs waiting or running.
+        - max_finished (int): Number of finished jobs kept for polling.
+        - state_dir (Optional[str]): The directory shared by the workers in
+          which the state of the jobs is written, or None to keep it in
+          memory only.
+        """
+        self.influx_manager = influx_manager
+        self.chunk_ns = chunk_ms * NANOSECONDS_PER_MILLISECOND
+        self.max_active = max_active
+        self.max_finished = max_finished
+        self._slots = asyncio.Semaphore(concurrency)
+        # jobs by ID, in submission order
+        self._jobs: Dict[str, DeleteJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._chunks_deleted = 0
+        self._state_dir = None if state_dir is None else Path(state_dir)
+        if self._state_dir is not None:
+            self._state_dir.mkdir(parents=True, exist_ok=True)
+
+    def submit(self, battery_id: str, start_time: str,
+               stop_time: str) -> DeleteJob:
+        """
+        Submits the deletion of a battery's data over a time range. The
+        range is resolved to absolute times on submission. Must be called on
+        the event loop.
+
+        Parameters:
+        - battery_id (str): The battery.
+        - start_time (str): The start of the range, e.g. "-30d".
+        - stop_time (str): The stop of the range, e.g. "now()".
+
+        Returns:
+        - DeleteJob: The job, pending.
+
+        Raises:
+        - ValueError: If a bound cannot be parsed or the range is reversed.
+        - TooManyJobsError: If `max_active` jobs are waiting or running.
+        """
+        time_range = parse_time_range(start_time, stop_time)
+        if time_range.start_ns > time_range.stop_ns:
+            raise ValueError("start_time must be before stop_time")
+        if len(self._tasks) >= self.max_active:
+            raise TooManyJobsError(
+                f"{len(self._tasks)} delete jobs are already waiting or "
+                f"running")
+        job = DeleteJob(job_id=uuid.uuid4().hex, battery_id=battery_id,
+                        chunks=split_range(time_range, self.chunk_ns),
+                        submitted_at=time.time())
+        self._jobs[job.job_id] = job
+        self._publish(job)
+        self._tasks[job.job_id] = asyncio.create_task(self._run(job))
+        return job
+
+    def get(self, job_id: str) -> Optional[DeleteJob]:
+        """
+        Returns a job by its identifier.
+
+        Parameters:
+        - job_id (str): The identifier of the job.
+
+        Returns:
+        - Optional[DeleteJob]: The job, or None if it is unknown or was
+          forgotten.
+        """
+        return self._jobs.get(job_id)
+
+    def describe(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Describes a job by its identifier, whichever worker sharing the
+        `state_dir` runs it.
+
+        Parameters:
+        - job_id (str): The identifier of the job.
+
+        Returns:
+        - Optional[Dict[str, Any]]: The job, as returned by
+          DeleteJob.to_dict, or None if it is unknown or was forgotten.
+        """
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        path = self._state_path(job_id)
+        if path is None:
+            return None
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def snapshot(self) -> Dict[str, int]:
+        """
+        Returns the number of jobs in each state and the number of chunks
+        deleted.
+
+        Returns:
+        - Dict[str, int]: The job counts keyed by state, and the
+          chunks_deleted counter.
+        """
+        counts = {status.value: 0 for status in JobStatus}
+        for job in self._jobs.values():
+            counts[job.status.value] += 1
+        return {**counts, "chunks_deleted": self._chunks_deleted}
+
+    async def close(self) -> None:
+        """
+        Cancels the jobs waiting or running; the chunks being deleted are
+        completed, and the jobs are marked as failed.
+        """
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, job: DeleteJob) -> None:
+        """
+        Deletes the chunks of a job one after the other.
+        """
+        try:
+            for start_ns, stop_ns in job.chunks:
+                await self._delete_chunk(job, start_ns, stop_ns)
+            job.status = JobStatus.SUCCEEDED
+        except asyncio.CancelledError:
+            job.status, job.error = JobStatus.FAILED, "Interrupted"
+            raise
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            job.status, job.error = JobStatus.FAILED, str(err)
+            logger.warning("Delete job %s failed: %s", job.job_id, err)
+        finally:
+            job.finished_at = time.time()
+            self._publish(job)
+            del self._tasks[job.job_id]
+            self._forget_finished()
+
+    async def _delete_chunk(self, job: DeleteJob, start_ns: int,
+                            stop_ns: int) -> None:
+        """
+        Deletes a chunk of a job once a slot is free.
+        """
+        manager = self.influx_manager
+        async with self._slots:
+            job.status = JobStatus.RUNNING
+            self._publish(job)
+            await manager.executor.run(manager.delete_range, job.battery_id,
+                                       start_ns, stop_ns)
+        job.chunks_done += 1
+        self._chunks_deleted += 1
+
+    def _forget_finished(self) -> None:
+        """
+        Forgets the oldest finished jobs beyond `max_finished`.
+        """
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job.is_finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+            path = self._state_path(job_id)
+            if path is not None:
+                path.unlink(missing_ok=True)
+
+    def _state_path(self, job_id: str) -> Optional[Path]:
+        """
+        Returns the file holding the state of a job in `state_dir`, or None
+        without a `state_dir` or if the identifier is not one of a job.
+        """
+        if self._state_dir is None or not job_id.isalnum():
+            return None
+        return self._state_dir / f"{job_id}.json"
+
+    def _publish(self, job: DeleteJob) -> None:
+        """
+        Writes the state of a job to `state_dir`, if any. The file is
+        replaced atomically, so that other workers never read it partly
+        written.
+        """
+        path = self._state_path(job.job_id)
+        if path is None:
+            return
+        temporary = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            temporary.write_text(json.dumps(job.to_dict()), encoding="utf-8")
+            os.replace(temporary, path)
+        except OSError as err:
+            logger.warning("Failed to write the state of delete job %s: %s",
+                           job.job_id, err)
@@ -0,0 +1,87 @@
+"""
+This module defines the BlockingExecutor class, which runs blocking calls
+(such as the synchronous InfluxDB client APIs) on a bounded thread pool so
+that they do not stall the asyncio event loop serving the REST API.
+"""
+
+import asyncio
+import contextvars
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+
+class BlockingExecutor:
+    """
+    Runs blocking callables on a bounded thread pool and exposes them as
+    awaitables.
+
+    The pool size caps the number of InfluxDB round trips in flight at any
+    time; further calls wait in the pool's queue without blocking the event
+    loop, so health checks and other requests keep being served.
+
+    Attributes:
+    - max_workers (int): The maximum number of worker threads.
+    """
+
+    def __init__(self, max_workers: int, name: str = "blocking"):
+        """
+        Initializes the BlockingExecutor instance.
+
+        Parameters:
+        - max_workers (int): The maximum number of worker threads.
+        - name (str): Prefix used for the worker thread names.
+        """
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers,
+                                        thread_name_prefix=name)
+
+    async def run(self, func: Callable[..., T], *args: Any,
+                  **kwargs: Any) -> T:
+        """
+        Runs a blocking callable on the thread pool and awaits its result,
+        in a copy of the caller's context, so that the records it logs
+        carry the ID of the request being served.
+
+        Parameters:
+        - func (Callable[..., T]): The blocking callable to run.
+        - *args (Any): Positional arguments passed to the callable.
+        - **kwargs (Any): Keyword arguments passed to the callable.
+
+        Returns:
+        - T: The value returned by the callable.
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self._pool, functools.partial(context.run, func, *args, **kwargs)
+        )
+
+    async def iterate(self, iterator: Iterator[T],
+                      batch_size: int) -> AsyncIterator[List[T]]:
+        """
+        Consumes a blocking iterator on the thread pool, yielding its items
+        in batches so that the thread hand-off is paid once per batch.
+
+        Parameters:
+        - iterator (Iterator[T]): The blocking iterator to consume.
+        - batch_size (int): The maximum number of items per batch.
+
+        Yields:
+        - List[T]: The next batch of items.
+        """
+        while batch := await self.run(
+                list, itertools.islice(iterator, batch_size)):
+            yield batch
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Shuts down the thread pool.
+
+        Parameters:
+        - wait (bool): Whether to wait for running calls to complete.
+        """
+        self._pool.shutdown(wait=wait)
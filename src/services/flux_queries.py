@@ -0,0 +1,553 @@
+"""
+This module defines the Flux query templates of the InfluxManager.
+
+Every query the service sends to InfluxDB is one of a fixed set of Flux
+scripts, compiled once when the module is imported. Templates differ only
+by the shape of the query: whether one, several or every battery and field
+is selected, and how the data points are aggregated. The values of a query
+(bucket, time range, battery IDs, fields, window and percentile) are never
+written into the script; they are sent as Flux parameters, which the
+InfluxDB client passes as typed literals. Since the scripts are constant,
+they are also what the slow-query log and metrics are grouped by.
+
+Aggregated queries can also be served from the rollup tiers: measurements
+holding the sum, count, min and max of every field per battery and tier
+window (e.g. "battery_data_1h"), maintained by InfluxDB tasks whose scripts
+are built here too.
+"""
+
+import itertools
+import math
+from enum import Enum
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from src.config.db import DbConfig
+from src.models.battery import BATTERY_FIELDS
+from src.models.query import AggregateFunction, BatteryQuery, selects_all
+from src.utils.datetime_utils import NANOSECONDS_PER_MILLISECOND, \
+    TimeRange, parse_time_range, to_datetime
+
+
+class Selection(str, Enum):
+    """
+    How many values of a column a query selects.
+    """
+    ALL = "all"
+    ONE = "one"
+    MANY = "many"
+
+    @classmethod
+    def of(cls, values: List[str]) -> "Selection":
+        """
+        Returns the selection made by the selected values of a column.
+
+        Parameters:
+        - values (List[str]): The selected battery IDs or fields.
+
+        Returns:
+        - Selection: ALL for the wildcard, ONE for a single value and MANY
+          otherwise.
+        """
+        if selects_all(values):
+            return cls.ALL
+        return cls.ONE if len(values) == 1 else cls.MANY
+
+
+class QueryShape(NamedTuple):
+    """
+    The shape of a query, which picks its template.
+
+    Attributes:
+    - batteries (Selection): The batteries selected.
+    - fields (Selection): The fields selected.
+    - aggregate (Optional[AggregateFunction]): The function aggregating
+      each window, or None if the data points are not aggregated.
+    """
+    batteries: Selection
+    fields: Selection
+    aggregate: Optional[AggregateFunction]
+
+    @property
+    def is_pivoted(self) -> bool:
+        """
+        bool: Whether the result is pivoted into one row per battery and
+        time, as it is for anything but a single battery and field.
+        """
+        return (self.batteries, self.fields) != (Selection.ONE,
+                                                 Selection.ONE)
+
+
+class TierCoverage(NamedTuple):
+    """
+    The time range rolled up in a rollup tier.
+
+    Attributes:
+    - tier (str): The tier window, as a Flux duration, e.g. "1h".
+    - window_ns (int): The tier window, in nanoseconds.
+    - start_ns (int): The start of the range, in nanoseconds since the
+      epoch.
+    - stop_ns (int): The stop of the range, in nanoseconds since the epoch.
+    """
+    tier: str
+    window_ns: int
+    start_ns: int
+    stop_ns: int
+
+
+class FluxTemplate(NamedTuple):
+    """
+    A compiled Flux script and the name it is reported under.
+
+    Attributes:
+    - name (str): The name of the template, e.g.
+      "query battery=one field=many fn=mean".
+    - script (str): The Flux script, reading its values from parameters.
+    """
+    name: str
+    script: str
+
+
+def _membership(column: str, param: str,
+                selection: Selection) -> Optional[str]:
+    """
+    Builds the Flux condition matching a column against the value(s) of a
+    parameter, or None if every value is selected.
+    """
+    if selection is Selection.ALL:
+        return None
+    if selection is Selection.ONE:
+        return f'r["{column}"] == {param}'
+    return f'contains(value: r["{column}"], set: {param}s)'
+
+
+def _aggregation(aggregate: Optional[AggregateFunction]) -> str:
+    """
+    Builds the `aggregateWindow` stage of a template, or an empty string if
+    the data points are not aggregated.
+    """
+    if aggregate is None:
+        return ""
+    function = aggregate.value
+    if aggregate is AggregateFunction.PERCENTILE:
+        function = ("(column, tables=<-) => tables "
+                    "|> quantile(q: _q, column: column)")
+    return (f"|> aggregateWindow(every: duration(v: _every), "
+            f"fn: {function}, createEmpty: false)")
+
+
+def _selection(shape: QueryShape) -> List[str]:
+    """
+    Builds the Flux conditions matching the batteries and fields selected
+    by the queries of a shape.
+    """
+    return list(filter(None, [
+        _membership("battery_id", "_battery_id", shape.batteries),
+        _membership("_field", "_field", shape.fields)]))
+
+
+def _pivot(shape: QueryShape) -> str:
+    """
+    Builds the stages pivoting the result of the queries of a shape into
+    one row per battery and time, or an empty string if it is not pivoted.
+    """
+    if not shape.is_pivoted:
+        return ""
+    return ('|> pivot(rowKey: ["_time"], columnKey: ["_field"], '
+            'valueColumn: "_value")\n'
+            '    |> group(columns: ["battery_id"])')
+
+
+def _compile_query(shape: QueryShape) -> FluxTemplate:
+    """
+    Compiles the template of the queries of a shape: selecting batteries'
+    fields over a time range, aggregated into windows if requested, pivoted
+    if several series are selected, and sorted from the most recent data
+    point.
+    """
+    conditions = ['r["_measurement"] == "battery_data"', *_selection(shape)]
+    stages = [
+        "from(bucket: _bucket)",
+        "|> range(start: _start, stop: _stop)",
+        f"|> filter(fn: (r) => {' and '.join(conditions)})",
+        _aggregation(shape.aggregate),
+        _pivot(shape),
+        '|> sort(columns: ["_time"], desc: true)',
+    ]
+    aggregate = "raw" if shape.aggregate is None else shape.aggregate.value
+    return FluxTemplate(
+        name=(f"query battery={shape.batteries.value} "
+              f"field={shape.fields.value} fn={aggregate}"),
+        script="\n    ".join(filter(None, stages)))
+
+
+def _compile_rollup_query(shape: QueryShape) -> FluxTemplate:
+    """
+    Compiles the template of the aggregated queries of a shape served from
+    a rollup tier. The tier windows inside the rollup range are read from
+    the tier's measurement; the head and tail of the time range, which the
+    tier does not cover, are aggregated into tier windows from the raw data
+    points. The tier windows are then combined into the query windows,
+    which are multiples of the tier window.
+
+    A mean is the sum of the sums of the tier windows divided by the sum of
+    their counts, so that every data point weighs the same whatever the
+    number of points of its window, as in a mean of the raw data points.
+    """
+    rolled_up, combine = ROLLUP_COMBINE[shape.aggregate]
+    names = ", ".join(f'"{name}"' for name in rolled_up)
+    raw = " and ".join(['r["_measurement"] == "battery_data"',
+                        *_selection(shape)])
+    rollup = " and ".join(['r["_measurement"] == _rollup',
+                           f'contains(value: r["fn"], set: [{names}])',
+                           *_selection(shape)])
+    parts = ", ".join(
+        f'part(tables: {tables}, fn: {name}, name: "{name}")'
+        for tables in ("head", "tail") for name in rolled_up)
+    if shape.aggregate is AggregateFunction.MEAN:
+        finish = [
+            '|> group(columns: ["battery_id", "_field"])',
+            '|> pivot(rowKey: ["_time"], columnKey: ["fn"], '
+            'valueColumn: "_value")',
+            "|> map(fn: (r) => ({r with _value: "
+            "float(v: r.sum) / float(v: r.count)}))",
+            '|> drop(columns: ["sum", "count"])']
+    else:
+        finish = ['|> drop(columns: ["fn"])']
+    stages = [
+        f"union(tables: [rollup, {parts}])",
+        '|> group(columns: ["battery_id", "_field", "fn"])',
+        # resets the bounds of the windows to the whole time range
+        "|> range(start: _start, stop: _stop)",
+        f"|> aggregateWindow(every: duration(v: _every), fn: {combine}, "
+        "createEmpty: false)",
+        *finish,
+        _pivot(shape),
+        '|> sort(columns: ["_time"], desc: true)',
+    ]
+    script = "\n".join([
+        "raw = (start, stop) => from(bucket: _bucket)",
+        "    |> range(start: start, stop: stop)",
+        f"    |> filter(fn: (r) => {raw})",
+        "head = raw(start: _start, stop: _rollup_start)",
+        "tail = raw(start: _rollup_stop, stop: _stop)",
+        "part = (tables, fn, name) => tables",
+        "    |> aggregateWindow(every: duration(v: _tier), fn: fn, "
+        'createEmpty: false, timeSrc: "_start")',
+        '    |> set(key: "fn", value: name)',
+        "rollup = from(bucket: _bucket)",
+        "    |> range(start: _rollup_start, stop: _rollup_stop)",
+        f"    |> filter(fn: (r) => {rollup})",
+        "\n    ".join(filter(None, stages))])
+    return FluxTemplate(
+        name=(f"query battery={shape.batteries.value} "
+              f"field={shape.fields.value} fn={shape.aggregate.value} "
+              f"tier=rollup"),
+        script=script)
+
+
+def rollup_task_script(tier: str, bucket: str, offset: str,
+                       backfill: str) -> str:
+    """
+    Builds the script of the InfluxDB task maintaining a rollup tier: every
+    tier window, it writes the sum, count, min and max of every field of
+    every battery over the windows completed since its last successful run
+    to the tier's measurement, timestamped with the start of the window and
+    tagged with the function. The first run rolls up the `backfill` before.
+
+    Parameters:
+    - tier (str): The tier window, as a Flux duration, e.g. "1h".
+    - bucket (str): The bucket holding the data and the rollups.
+    - offset (str): How long after the end of a window the task runs, as a
+      Flux duration, leaving time for late data points.
+    - backfill (str): How far back the first run rolls up, as a Flux
+      duration, e.g. "30d".
+
+    Returns:
+    - str: The Flux script, with its task options.
+    """
+    return "\n".join([
+        'import "influxdata/influxdb/tasks"',
+        "",
+        f"option task = {{name: {_string(rollup_task_name(tier))}, "
+        f"every: {tier}, offset: {offset}}}",
+        "",
+        *_rollup_statements(
+            tier, bucket, f"start: tasks.lastSuccess(orTime: -{backfill})",
+            [])])
+
+
+def rollup_repair_script(tier: str, bucket: str) -> str:
+    """
+    Builds the script rolling up again the tier windows of a battery
+    between `_start` and `_stop`, after its data changed there, e.g. after
+    a delete or late data points. The rolled-up points overwrite those of
+    the same windows; the windows left empty must be deleted beforehand.
+
+    Parameters:
+    - tier (str): The tier window, as a Flux duration, e.g. "1h".
+    - bucket (str): The bucket holding the data and the rollups.
+
+    Returns:
+    - str: The Flux script, taking the `_battery_id`, `_start` and `_stop`
+      parameters, aligned to tier windows.
+    """
+    return "\n".join(_rollup_statements(
+        tier, bucket, "start: _start, stop: _stop",
+        ['r["battery_id"] == _battery_id']))
+
+
+def _rollup_statements(tier: str, bucket: str, time_range: str,
+                       conditions: List[str]) -> List[str]:
+    """
+    Builds the statements rolling up the data points of the battery_data
+    measurement over a time range into a tier's measurement, along with
+    extra filter conditions.
+    """
+    fields = ", ".join(f'"{field}"' for field in BATTERY_FIELDS)
+    condition = " and ".join([
+        'r["_measurement"] == "battery_data"', *conditions,
+        f'contains(value: r["_field"], set: [{fields}])'])
+    return [
+        f"data = from(bucket: {_string(bucket)})",
+        f"    |> range({time_range})",
+        f"    |> filter(fn: (r) => {condition})",
+        "rollup = (fn, name) => data",
+        f"    |> aggregateWindow(every: {tier}, fn: fn, createEmpty: false, "
+        'timeSrc: "_start")',
+        '    |> set(key: "fn", value: name)',
+        f'    |> set(key: "_measurement", value: '
+        f'{_string(rollup_measurement(tier))})',
+        f"    |> to(bucket: {_string(bucket)}, "
+        'tagColumns: ["battery_id", "fn"])',
+        "",
+        *(f'rollup(fn: {function}, name: "{function}")'
+          for function in ROLLUP_FUNCTIONS)]
+
+
+def rollup_task_name(tier: str) -> str:
+    """
+    Returns the name of the task maintaining a rollup tier.
+
+    Parameters:
+    - tier (str): The tier window, e.g. "1h".
+
+    Returns:
+    - str: The task name, e.g. "battery_data rollup 1h".
+    """
+    return f"battery_data rollup {tier}"
+
+
+def rollup_measurement(tier: str) -> str:
+    """
+    Returns the measurement holding a rollup tier.
+
+    Parameters:
+    - tier (str): The tier window, e.g. "1h".
+
+    Returns:
+    - str: The measurement, e.g. "battery_data_1h".
+    """
+    return f"battery_data_{tier}"
+
+
+def _string(value: str) -> str:
+    """
+    Quotes a value as a Flux string literal.
+    """
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"') \
+        .replace("${", "\\${")
+    return f'"{escaped}"'
+
+
+def _compile_latest(batteries: Selection) -> FluxTemplate:
+    """
+    Compiles the template of the queries fetching the last value of every
+    field of one or every battery.
+    """
+    conditions = ['r["_measurement"] == "battery_data"',
+                  _membership("_field", "_field", Selection.MANY),
+                  _membership("battery_id", "_battery_id", batteries)]
+    return FluxTemplate(
+        name=f"latest battery={batteries.value}",
+        script="\n    ".join([
+            "from(bucket: _bucket)",
+            "|> range(start: _start, stop: _stop)",
+            f"|> filter(fn: (r) => {' and '.join(filter(None, conditions))})",
+            "|> last()"]))
+
+
+# Functions served from the rollup tiers, with the rolled-up functions they
+# read and the function combining the rolled-up values of several tier
+# windows into a query window
+ROLLUP_COMBINE = {
+    AggregateFunction.MEAN: (("sum", "count"), "sum"),
+    AggregateFunction.MIN: (("min",), "min"),
+    AggregateFunction.MAX: (("max",), "max"),
+    AggregateFunction.COUNT: (("count",), "sum"),
+}
+# Functions rolled up by the rollup tasks
+ROLLUP_FUNCTIONS = list(dict.fromkeys(
+    name for rolled_up, _ in ROLLUP_COMBINE.values() for name in rolled_up))
+
+QUERY_TEMPLATES = {
+    shape: _compile_query(shape)
+    for shape in itertools.starmap(QueryShape, itertools.product(
+        Selection, Selection, [None, *AggregateFunction]))}
+ROLLUP_TEMPLATES = {
+    shape: _compile_rollup_query(shape)
+    for shape in itertools.starmap(QueryShape, itertools.product(
+        Selection, Selection, ROLLUP_COMBINE))}
+LATEST_TEMPLATES = {batteries: _compile_latest(batteries)
+                    for batteries in (Selection.ALL, Selection.ONE)}
+
+
+def _selection_params(param: str, values: List[str],
+                      selection: Selection) -> Dict[str, Any]:
+    """
+    Returns the parameters holding the selected values of a column.
+    """
+    if selection is Selection.ALL:
+        return {}
+    if selection is Selection.ONE:
+        return {param: values[0]}
+    return {f"{param}s": list(values)}
+
+
+def _window(query: BatteryQuery, time_range: TimeRange) -> str:
+    """
+    Returns the aggregation window of a query, as a Flux duration. Without
+    an explicit window, the window is sized so that the time range holds
+    at most `max_points` windows.
+    """
+    if query.every is not None:
+        return query.every
+    duration_ns = time_range.stop_ns - time_range.start_ns
+    if duration_ns <= 0:
+        raise ValueError("start_time must be before stop_time")
+    window_ms = duration_ns / NANOSECONDS_PER_MILLISECOND / query.max_points
+    return f"{math.ceil(window_ms)}ms"
+
+
+def rollup_split(coverage: TierCoverage,
+                 time_range: TimeRange) -> Optional[Tuple[int, int]]:
+    """
+    Returns the part of a time range served from a rollup tier: the tier
+    windows inside both the range and the tier's coverage. The head and
+    tail of the range, which are never empty, are served from the raw data
+    points.
+
+    Parameters:
+    - coverage (TierCoverage): The range rolled up in the tier.
+    - time_range (TimeRange): The time range of the query.
+
+    Returns:
+    - Optional[Tuple[int, int]]: The start and stop of the part, in
+      nanoseconds since the epoch, or None if no tier window fits.
+    """
+    window_ns = coverage.window_ns
+    start_ns = max(time_range.start_ns // window_ns * window_ns + window_ns,
+                   -(-coverage.start_ns // window_ns) * window_ns)
+    stop_ns = min(coverage.stop_ns // window_ns * window_ns,
+                  (time_range.stop_ns - 1) // window_ns * window_ns)
+    return (start_ns, stop_ns) if start_ns < stop_ns else None
+
+
+def build_query(query: BatteryQuery,
+                coverage: Optional[TierCoverage] = None
+                ) -> Tuple[FluxTemplate, Dict[str, Any]]:
+    """
+    Picks the template of a battery data query and builds its parameters.
+    The time range is resolved to absolute times.
+
+    Parameters:
+    - query (BatteryQuery): The batteries, time range, fields and
+      aggregation parameters of the query.
+    - coverage (Optional[TierCoverage]): The coverage of the rollup tier
+      serving the query, for an aggregated query whose function and window
+      the tier can serve; the query is served from the raw data points if
+      None or if the tier covers none of its windows.
+
+    Returns:
+    - Tuple[FluxTemplate, Dict[str, Any]]: The template and its parameters.
+
+    Raises:
+    - ValueError: If a time bound cannot be parsed, or if the window of an
+      aggregated query cannot be sized because the time range is empty.
+    """
+    time_range = parse_time_range(query.start_time, query.stop_time)
+    shape = QueryShape(Selection.of(query.battery_id),
+                       Selection.of(query.field),
+                       query.fn if query.is_aggregated else None)
+    params: Dict[str, Any] = {
+        "_bucket": DbConfig.INFLUX_BUCKET,
+        "_start": to_datetime(time_range.start_ns),
+        "_stop": to_datetime(time_range.stop_ns),
+        **_selection_params("_battery_id", query.battery_id,
+                            shape.batteries),
+        **_selection_params("_field", query.field, shape.fields)}
+    if shape.aggregate is not None:
+        params["_every"] = _window(query, time_range)
+    if shape.aggregate is AggregateFunction.PERCENTILE:
+        params["_q"] = query.percentile / 100
+    split = (rollup_split(coverage, time_range)
+             if coverage is not None and shape in ROLLUP_TEMPLATES else None)
+    if split is not None:
+        params.update({
+            "_tier": coverage.tier,
+            "_rollup": rollup_measurement(coverage.tier),
+            "_rollup_start": to_datetime(split[0]),
+            "_rollup_stop": to_datetime(split[1])})
+        return ROLLUP_TEMPLATES[shape], params
+    return QUERY_TEMPLATES[shape], params
+
+
+def build_latest(start: str, fields: List[str],
+                 battery_id: Optional[str] = None
+                 ) -> Tuple[FluxTemplate, Dict[str, Any]]:
+    """
+    Picks the template fetching the last value of fields and builds its
+    parameters.
+
+    Parameters:
+    - start (str): Start of the time range searched, in a format accepted
+      by `parse_time_bound` (e.g. "-30d").
+    - fields (List[str]): The fields.
+    - battery_id (Optional[str]): Only fetch this battery.
+
+    Returns:
+    - Tuple[FluxTemplate, Dict[str, Any]]: The template and its parameters.
+
+    Raises:
+    - ValueError: If `start` cannot be parsed.
+    """
+    time_range = parse_time_range(start, "now()")
+    batteries = Selection.ALL if battery_id is None else Selection.ONE
+    params: Dict[str, Any] = {
+        "_bucket": DbConfig.INFLUX_BUCKET,
+        "_start": to_datetime(time_range.start_ns),
+        "_stop": to_datetime(time_range.stop_ns),
+        "_fields": list(fields)}
+    if battery_id is not None:
+        params["_battery_id"] = battery_id
+    return LATEST_TEMPLATES[batteries], params
+
+
+def delete_predicate(battery_id: str,
+                     measurement: Optional[str] = None) -> str:
+    """
+    Builds the predicate of a delete request selecting a battery, in every
+    measurement or in one. The delete API takes no parameters, so the
+    battery ID is quoted and escaped.
+
+    Parameters:
+    - battery_id (str): The battery.
+    - measurement (Optional[str]): The measurement, e.g. the one of a
+      rollup tier, or None for every measurement.
+
+    Returns:
+    - str: The predicate, e.g. 'battery_id="1"'.
+    """
+    escaped = battery_id.replace("\\", "\\\\").replace('"', '\\"')
+    if measurement is None:
+        return f'battery_id="{escaped}"'
+    return f'battery_id="{escaped}" AND _measurement="{measurement}"'
@@ -5,20 +5,57 @@ for querying, inserting, updating, and deleting data points with
 appropriate error handling and type annotations.
 """
 
-from typing import List, Dict, Any
-from influxdb_client import Point
+import functools
+import time
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Callable, Iterator, List, Dict, Any, \
+    Optional, Tuple, TypeVar
 
 from src.config.logging import LoggingConfig
 from src.config.db import DbConfig
-from src.db.connection import connect_to_influxdb
-from src.utils.datetime_utils import utc_now_timestamp, \
-    calculate_start_stop_times
+from src.config.http_cache import HttpCacheConfig
+from src.config.latest_values import LatestValuesConfig
+from src.config.live import LiveConfig
+from src.config.query_cache import QueryCacheConfig
+from src.config.rollups import RollupConfig
+from src.config.spool import SpoolConfig
+from src.config.write_buffer import WriteBufferConfig
+from src.db.connection import InfluxConnection
+from src.models.battery import BATTERY_FIELDS, BatteryData
+from src.models.query import BatteryQuery, DownsampleMethod, StatsQuery, \
+    selects_all
+from src.services.data_versions import DataVersions
+from src.services.executor import BlockingExecutor
+from src.services.flux_queries import FluxTemplate, build_latest, \
+    build_query, delete_predicate
+from src.services.metrics import INFLUX_DELETE_DURATION, \
+    INFLUX_QUERY_DURATION, INFLUX_QUERY_ROWS, INFLUX_SLOW_QUERIES, \
+    INFLUX_WRITE_DURATION
+from src.services.latest_values import LATEST_FIELDS, LatestValues
+from src.services.live_hub import LiveHub
+from src.services.query_cache import QueryCache
+from src.services.rollups import RAW, Rollups
+from src.services.spool import Spool, SpoolReplayer
+from src.services.write_buffer import WriteBuffer
+from src.utils.datetime_utils import NANOSECONDS_PER_MILLISECOND, \
+    from_datetime, parse_time_range, to_datetime, to_rfc3339, \
+    utc_now_timestamp
+from src.utils.downsampling import lttb, lttb_indices, to_seconds
+from src.utils.line_protocol import battery_line, parse_battery_line
+from src.utils.logging_utils import SAMPLED
+
+if TYPE_CHECKING:
+    from influxdb_client.client.flux_table import FluxRecord
 
 # initialize logger for this module
 logger = LoggingConfig.get_logger(__name__)
 
+T = TypeVar("T")
+
 
 class InfluxManager:
+    # pylint: disable=too-many-instance-attributes,too-many-public-methods
     """
     Provides methods for managing battery data in InfluxDB.
 
@@ -28,86 +65,549 @@ class InfluxManager:
     based on a battery ID and time range.
 
     Attributes:
-    - client (InfluxDBClient): The main client connection to InfluxDB.
-    - write_api (WriteApi): Interface for writing data points to InfluxDB.
-    - query_api (QueryApi): Interface for querying data from InfluxDB.
-    - delete_api (DeleteApi): Interface for deleting data in InfluxDB.
+    - connection (InfluxConnection): The connection to InfluxDB, giving
+      access to its write, query and delete APIs.
+    - spool (Spool | None): On-disk spool of the data points InfluxDB
+      could not take, or None if disabled.
+    - write_buffer (WriteBuffer): Buffer batching the data points written
+      to InfluxDB through the Write API.
+    - executor (BlockingExecutor): Bounded thread pool used by the async
+      endpoints to run the blocking InfluxDB calls off the event loop.
+    - query_cache (QueryCache | None): Cache of the query results, or None
+      if disabled.
+    - latest_values (LatestValues): The latest reading of every battery,
+      updated by every insert and seeded from InfluxDB by `refresh_latest`.
+    - live_hub (LiveHub): Fan-out of the inserted readings to the live
+      subscribers.
+    - rollups (Rollups | None): The rollup tiers serving the long-range
+      aggregated queries, or None if disabled.
+    - data_versions (DataVersions | None): The versions of the data of
+      every battery, identifying the results of the queries over closed
+      time ranges, or None if the HTTP caching is disabled.
     """
 
-    def __init__(self):
+    def __init__(self, connection: InfluxConnection):
         """
         Initializes the InfluxManager instance.
 
-        Establishes connections to the InfluxDB client and sets up the APIs
-        required for write, query, and delete operations.
+        Starts the write buffer in front of the Write API and, if enabled,
+        the spool replayer, which writes back the data points spooled by a
+        previous run. No other request is sent to InfluxDB until data is
+        written or queried.
+
+        Parameters:
+        - connection (InfluxConnection): The connection to InfluxDB.
         """
-        self.client, self.write_api, self.query_api, self.delete_api = (
-            connect_to_influxdb()
+        self.connection = connection
+        self.spool = Spool(
+            SpoolConfig.DIRECTORY,
+            segment_bytes=SpoolConfig.SEGMENT_BYTES,
+            max_bytes=SpoolConfig.MAX_BYTES
+        ) if SpoolConfig.ENABLED else None
+        self.write_buffer = WriteBuffer(
+            self._write_lines,
+            max_size=WriteBufferConfig.MAX_SIZE,
+            batch_size=WriteBufferConfig.BATCH_SIZE,
+            flush_interval_s=WriteBufferConfig.FLUSH_INTERVAL_MS / 1000,
+            spool=self.spool
         )
+        self._replayer = SpoolReplayer(
+            self.spool, self._replay_lines,
+            rate_per_s=SpoolConfig.REPLAY_RATE,
+            batch_size=WriteBufferConfig.BATCH_SIZE,
+            sync_interval_s=SpoolConfig.FSYNC_INTERVAL_MS / 1000
+        ) if self.spool is not None else None
+        self.executor = BlockingExecutor(DbConfig.INFLUX_EXECUTOR_WORKERS,
+                                         name="influx")
+        self.query_cache = QueryCache(
+            ttl_s=QueryCacheConfig.TTL_MS / 1000,
+            max_bytes=QueryCacheConfig.MAX_BYTES,
+            bucket_ms=QueryCacheConfig.BUCKET_MS
+        ) if QueryCacheConfig.ENABLED else None
+        self.latest_values = LatestValues()
+        self.live_hub = LiveHub(queue_size=LiveConfig.QUEUE_SIZE,
+                                max_subscribers=LiveConfig.MAX_SUBSCRIBERS)
+        self.rollups = Rollups(
+            connection, RollupConfig.TIERS,
+            offset=RollupConfig.TASK_OFFSET,
+            backfill=RollupConfig.BACKFILL
+        ) if RollupConfig.ENABLED else None
+        self.data_versions = DataVersions(
+            settle_ms=HttpCacheConfig.SETTLE_MS,
+            state_dir=HttpCacheConfig.STATE_DIR
+        ) if HttpCacheConfig.ENABLED else None
+
+    def snapshots(self) -> Dict[str, Callable[[], Dict[str, Any]]]:
+        """
+        Returns the functions snapshotting the metrics of the write buffer,
+        the latest values table, the live hub and, if enabled, the query
+        cache, the spool and the rollup tiers.
+
+        Returns:
+        - Dict[str, Callable[[], Dict[str, Any]]]: The snapshot functions,
+          keyed by component name.
+        """
+        snapshots = {"write_buffer": self.write_buffer.snapshot,
+                     "latest_values": self.latest_values.snapshot,
+                     "live_hub": self.live_hub.snapshot}
+        if self.query_cache is not None:
+            snapshots["query_cache"] = self.query_cache.snapshot
+        if self.spool is not None:
+            snapshots["spool"] = self.spool.snapshot
+        if self.rollups is not None:
+            snapshots["rollups"] = self.rollups.snapshot
+        return snapshots
 
-    def query_data(self,
-                   battery_id: str,
-                   start_time: str,
-                   stop_time: str,
-                   field: str) -> List[Dict[str, Any]]:
+    def route(self, query: BatteryQuery) -> BatteryQuery:
+        """
+        Picks the rollup tier serving a query, if any; see `Rollups.route`.
+
+        Parameters:
+        - query (BatteryQuery): The query, with `tier` "auto" or "raw".
+
+        Returns:
+        - BatteryQuery: A copy of the query with `tier` set to the tier
+          serving it, or "raw".
+        """
+        if self.rollups is None:
+            return query.model_copy(update={"tier": RAW})
+        return self.rollups.route(query)
+
+    def query_data(self, query: BatteryQuery) -> List[Dict[str, Any]]:
         """
         Queries battery data from InfluxDB within a specified
-            time range and field.
+            time range and field, optionally aggregated or downsampled.
 
         Parameters:
-        - battery_id (str): The unique identifier for the battery.
-        - start_time (str): Start time range for the query, e.g., "-2h"
-        - stop_time (str): Stop time range for the query, e.g., "-1m"
-        - field (str): The specific data field to retrieve (e.g., "voltage").
+        - query (BatteryQuery): The battery, time range, field and
+          aggregation parameters of a query selecting a single battery and
+          field.
+
+        Results are served from the query cache when possible, and must not
+        be modified.
 
         Returns:
         - List[Dict[str, Any]]: A list of dictionaries containing timestamps
           and field values, with each dictionary in the format
             {"time": ..., "value": ...}.
         """
-        query = f'''
-        from(bucket: "{DbConfig.INFLUX_BUCKET}")
-            |> range(start: {start_time}, stop: {stop_time})
-            |> filter(fn: (r) => r["_measurement"] == "battery_data" 
-                              and r["battery_id"] == "{battery_id}"
-                              and r["_field"] == "{field}")
-            |> sort(columns: ["_time"], desc: true) 
-        '''
-        result = self.query_api.query(query)
-        return [{"time": record.get_time(), "value": record.get_value()} for
-                table in result for record in table.records]
+        return self._cached(query, functools.partial(self._fetch_points,
+                                                     query))
+
+    def _fetch_points(self, query: BatteryQuery) -> List[Dict[str, Any]]:
+        """
+        Runs the query of `query_data` against InfluxDB.
+        """
+        points = [{"time": record.get_time(), "value": record.get_value()}
+                  for record in self._query_records(query)]
+        if query.downsample is DownsampleMethod.LTTB:
+            points = lttb(points, query.max_points)
+        return points
+
+    def query_pivot(self,
+                    query: BatteryQuery) -> Dict[str, Dict[str, List[Any]]]:
+        """
+        Queries several batteries and fields from InfluxDB in a single Flux
+            query, pivoted so that each row holds every field at one time.
+
+        Parameters:
+        - query (BatteryQuery): The batteries, time range, fields and
+          aggregation parameters of the query.
+
+        Results are served from the query cache when possible, and must not
+        be modified.
+
+        Returns:
+        - Dict[str, Dict[str, List[Any]]]: The columns of each battery, keyed
+          by battery ID, with each battery's columns in the format
+            {"time": [...], "<field>": [...], ...}.
+        """
+        return self._cached(query, functools.partial(self._fetch_pivot,
+                                                     query))
+
+    def _fetch_pivot(self,
+                     query: BatteryQuery) -> Dict[str, Dict[str, List[Any]]]:
+        """
+        Runs the query of `query_pivot` against InfluxDB.
+        """
+        fields = self._resolve_fields(query)
+        batteries: Dict[str, Dict[str, List[Any]]] = {}
+        for record in self._query_records(query):
+            columns = batteries.get(record.values["battery_id"])
+            if columns is None:
+                columns = batteries[record.values["battery_id"]] = {
+                    "time": [], **{field: [] for field in fields}}
+            columns["time"].append(record.get_time())
+            for field in fields:
+                columns[field].append(record.values.get(field))
+        return batteries
+
+    def query_columns(self, query: BatteryQuery) -> Dict[str, List[Any]]:
+        """
+        Queries battery data from InfluxDB like `query_data` and
+            `query_pivot`, but returns the result as a single table of
+            columns, the layout of the columnar response formats.
+
+        Results are served from the query cache when possible, and must not
+        be modified.
 
-    def insert_data(self, data: Dict[str, Any]) -> None:
+        Parameters:
+        - query (BatteryQuery): The batteries, time range, fields and
+          aggregation parameters of the query.
+
+        Returns:
+        - Dict[str, List[Any]]: The columns in the format
+            {"time": [...], "value": [...]}, or for a query selecting
+            several batteries or fields, in the format
+            {"battery_id": [...], "time": [...], "<field>": [...], ...}.
         """
-        Inserts a new battery data point into InfluxDB.
+        if not query.is_multi_series:
+            return self._cached(query, functools.partial(self._fetch_columns,
+                                                         query),
+                                variant="columns")
+        fields = ["time", *self._resolve_fields(query)]
+        columns: Dict[str, List[Any]] = {"battery_id": [],
+                                         **{field: [] for field in fields}}
+        for battery_id, battery in self.query_pivot(query).items():
+            columns["battery_id"] += [battery_id] * len(battery["time"])
+            for field in fields:
+                columns[field] += battery[field]
+        return columns
+
+    def _fetch_columns(self, query: BatteryQuery) -> Dict[str, List[Any]]:
+        """
+        Runs the query of `query_columns` for a single battery and field
+        against InfluxDB.
+        """
+        records = self._query_records(query)
+        columns = {"time": [record.get_time() for record in records],
+                   "value": [record.get_value() for record in records]}
+        if query.downsample is DownsampleMethod.LTTB:
+            selected = lttb_indices(
+                [to_seconds(time) for time in columns["time"]],
+                columns["value"], query.max_points)
+            columns = {name: [column[i] for i in selected]
+                       for name, column in columns.items()}
+        return columns
+
+    def stream_data(self, query: BatteryQuery) -> Iterator[Dict[str, Any]]:
+        """
+        Queries battery data from InfluxDB like `query_data`, but returns
+            the data points lazily as they are read from the InfluxDB
+            response, so that memory use does not grow with the time range.
+
+        The query is sent when this method is called; the returned iterator
+        must be consumed or closed to release the connection.
 
         Parameters:
-        - data (Dict[str, Any]): Dictionary containing the battery data,
-          including fields like "battery_id", "voltage", "current",
-          "temperature", "state_of_charge", and "state_of_health".
+        - query (BatteryQuery): The batteries, time range, fields and
+          aggregation parameters of the query.
+
+        Returns:
+        - Iterator[Dict[str, Any]]: An iterator of dictionaries in the format
+            {"time": ..., "value": ...}, or for a query selecting several
+            batteries or fields, pivoted rows in the format
+            {"battery_id": ..., "time": ..., "<field>": ..., ...}.
+
+        Raises:
+        - ValueError: If the query uses LTTB downsampling, which needs the
+          whole series.
+        """
+        if query.downsample is DownsampleMethod.LTTB:
+            raise ValueError('downsample "lttb" cannot be streamed')
+        records = self._count_rows(self._run_template(
+            self.connection.query_stream, *self._build_query(query)))
+        if not query.is_multi_series:
+            return ({"time": record.get_time(),
+                     "value": record.get_value()} for record in records)
+        fields = self._resolve_fields(query)
+        return ({"battery_id": record.values["battery_id"],
+                 "time": record.get_time(),
+                 **{field: record.values.get(field) for field in fields}}
+                for record in records)
+
+    def query_stats(self, query: StatsQuery) -> Dict[str, Dict[str, Any]]:
+        """
+        Summarises the data points of batteries over a time range: the
+        distribution, rate of change and time out of range of every field,
+        and the energy charged and discharged (see `battery_stats`).
+
+        Every battery is read with a single Flux query, streamed into
+        columns as the response is parsed, then summarised with NumPy.
+
+        Parameters:
+        - query (StatsQuery): The batteries, time range, fields and
+          percentiles of the query.
+
+        Returns:
+        - Dict[str, Dict[str, Any]]: The statistics of every battery with
+          data points in the range, keyed by battery ID.
+
+        Raises:
+        - ValueError: If a time bound cannot be parsed.
+        """
+        # NumPy is only imported by the first query needing it
+        from src.utils.series_stats import SeriesColumns  # pylint: disable=import-outside-toplevel
+        series = query.series_query()
+        fields = self._resolve_fields(series)
+        batteries: Dict[str, SeriesColumns] = {}
+        for record in self._count_rows(self._run_template(
+                self.connection.query_stream, *build_query(series))):
+            values = record.values
+            columns = batteries.get(values["battery_id"])
+            if columns is None:
+                columns = batteries[values["battery_id"]] = SeriesColumns(
+                    fields)
+            columns.append(
+                from_datetime(values["_time"]),
+                [values.get(field) for field in fields]
+                if series.is_multi_series else [values["_value"]])
+        return {battery_id: columns.stats(query.percentile)
+                for battery_id, columns in batteries.items()}
+
+    def refresh_latest(self, start: str,
+                       battery_id: Optional[str] = None) -> None:
+        """
+        Merges the last value of every field of every battery written to
+        InfluxDB since `start` into the latest values table, with a single
+        Flux `last()` query. Values older than those already in the table
+        are ignored.
+
+        Parameters:
+        - start (str): Start of the time range searched, as a relative
+          duration (e.g. "-30d") or an RFC3339 time.
+        - battery_id (Optional[str]): Only refresh this battery.
+
+        Raises:
+        - ValueError: If `start` cannot be parsed.
+        """
+        result = self._run_template(
+            self.connection.query,
+            *build_latest(start, list(LATEST_FIELDS), battery_id))
+        self.latest_values.update(
+            (record.values["battery_id"], record.get_time(),
+             {record.get_field(): record.get_value()})
+            for table in result for record in table.records)
+
+    def _query_records(self, query: BatteryQuery) -> List["FluxRecord"]:
+        """
+        Runs a query against InfluxDB and returns the records of all the
+        tables of its result.
+        """
+        result = self._run_template(self.connection.query,
+                                    *self._build_query(query))
+        records = [record for table in result for record in table.records]
+        INFLUX_QUERY_ROWS.observe(len(records))
+        return records
 
+    def _build_query(self, query: BatteryQuery
+                     ) -> Tuple[FluxTemplate, Dict[str, Any]]:
         """
-        # set timestamp to now
+        Builds a query, reading the rollup tier it was routed to, if any.
+        """
+        return build_query(query, None if self.rollups is None
+                           else self.rollups.coverage(query))
+
+    @staticmethod
+    def _run_template(method: Callable[..., T], template: FluxTemplate,
+                      params: Dict[str, Any]) -> T:
+        """
+        Runs a query template with its parameters through a method of the
+        connection. Slow queries are logged and counted by template rather
+        than by their values, so that they group together.
+        """
+        started = time.perf_counter()
+        with INFLUX_QUERY_DURATION.time():
+            result = method(template.script, params=params)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms >= DbConfig.INFLUX_SLOW_QUERY_MS:
+            INFLUX_SLOW_QUERIES.labels(template=template.name).inc()
+            logger.warning("Slow InfluxDB query %r took %.0f ms",
+                           template.name, elapsed_ms)
+        return result
+
+    @staticmethod
+    def _count_rows(records: Iterator["FluxRecord"]
+                    ) -> Iterator["FluxRecord"]:
+        """
+        Passes through the records of a streamed query, recording their
+        number once the stream is consumed or closed.
+        """
+        rows = 0
+        try:
+            for record in records:
+                rows += 1
+                yield record
+        finally:
+            INFLUX_QUERY_ROWS.observe(rows)
+
+    def _cached(self, query: BatteryQuery, fetch: Callable[[], T],
+                variant: str = "") -> T:
+        """
+        Returns the result of a query from the query cache, fetching it on a
+        miss, or fetches it directly if the cache is disabled.
+
+        The results are cached along with the version of the data of their
+        batteries, which the workers share: a change made through another
+        worker, which only invalidates the cache of that worker, makes the
+        results cached here miss, so that they are never served under the
+        ETag of the changed data.
+        """
+        if self.query_cache is None:
+            return fetch()
+        if self.data_versions is not None:
+            version = self.data_versions.get(tuple(query.battery_id))
+            variant = f"{variant}:v{version.version}"
+        return self.query_cache.get_or_compute(query, fetch, variant)
+
+    def refresh_rollups(self) -> None:
+        """
+        Refreshes the rollup tiers, then rolls up again the tier windows
+        whose data changed since they were rolled up; see `Rollups.refresh`
+        and `Rollups.repair`. The results served from the repaired windows
+        change, so their cached results and versions are invalidated again.
+        Does nothing if the rollups are disabled.
+
+        Raises:
+        - ApiException: If a request to the Tasks API fails.
+        """
+        if self.rollups is None:
+            return
+        self.rollups.refresh()
+        self._changed(self.rollups.repair())
+
+    def _invalidate(self, touched: Dict[str, Tuple[int, int]],
+                    *_: Any) -> None:
+        """
+        Reports data that was written or deleted to the rollup tiers, drops
+        the cached results holding it, and updates the versions of the
+        data.
+
+        Parameters:
+        - touched (Dict[str, Tuple[int, int]]): The time range touched for
+          each battery, in milliseconds, keyed by battery ID.
+        """
+        if self.rollups is not None:
+            self.rollups.invalidate(touched)
+        self._changed(touched)
+
+    def _changed(self, touched: Dict[str, Tuple[int, int]]) -> None:
+        """
+        Drops the cached results holding data that changed, and updates the
+        versions of the data.
+
+        Parameters:
+        - touched (Dict[str, Tuple[int, int]]): The time range changed for
+          each battery, in milliseconds, keyed by battery ID.
+        """
+        if self.data_versions is not None:
+            self.data_versions.changed(touched)
+        if self.query_cache is None:
+            return
+        for battery_id, (start_ms, stop_ms) in touched.items():
+            self.query_cache.invalidate(battery_id, start_ms, stop_ms)
+
+    @staticmethod
+    def _resolve_fields(query: BatteryQuery) -> List[str]:
+        """
+        Returns the fields selected by a query, expanding the wildcard.
+        """
+        if selects_all(query.field):
+            return list(BATTERY_FIELDS)
+        return query.field
+
+    def _write_lines(self, lines: List[str]) -> None:
+        """
+        Writes line-protocol records to InfluxDB; called by the write
+        buffer with each batch.
+        """
+        with INFLUX_WRITE_DURATION.time():
+            self.connection.write(DbConfig.INFLUX_BUCKET, DbConfig.INFLUX_ORG,
+                                  lines, write_precision="ms")
+
+    def _replay_lines(self, lines: List[str]) -> None:
+        """
+        Writes spooled line-protocol records to InfluxDB; called by the
+        spool replayer with each batch. The battery and timestamp of the
+        records are parsed back to invalidate the data they touch; if a
+        record cannot be parsed, the data of every battery is considered
+        changed.
+        """
+        self._write_lines(lines)
+        touched: Dict[str, Tuple[int, int]] = {}
+        parsed = [parse_battery_line(line) for line in lines]
+        if None in parsed and self.data_versions is not None:
+            self.data_versions.changed_all()
+        for battery_id, timestamp in filter(None, parsed):
+            start_ms, stop_ms = touched.get(battery_id,
+                                            (timestamp, timestamp))
+            touched[battery_id] = (min(start_ms, timestamp),
+                                   max(stop_ms, timestamp))
+        self._invalidate(touched)
+
+    def insert_data(self, reading: BatteryData) -> Future:
+        """
+        Inserts a new battery data point into InfluxDB. The point is added
+        to the write buffer and written with the next batch.
+
+        Parameters:
+        - reading (BatteryData): The validated battery data, including the
+          optional "timestamp" in milliseconds.
+
+        Returns:
+        - Future: Resolved once the point has been written to InfluxDB.
+
+        Raises:
+        - WriteBufferFullError: If the write buffer is full.
+        """
+        flushed = self.insert_many([reading])
+        logger.info("Buffered data point for InfluxDB", extra=SAMPLED)
+        return flushed
+
+    def insert_many(self, readings: List[BatteryData]) -> Future:
+        """
+        Inserts several battery data points into InfluxDB at once. Either
+        all of them or none are added to the write buffer. Once buffered,
+        they update the latest values and are sent to the live
+        subscribers.
+
+        The readings are serialised straight to line protocol by
+        `battery_line`, without going through a dictionary or a `Point`.
+
+        Parameters:
+        - readings (List[BatteryData]): The validated battery data, in the
+          format accepted by `insert_data`.
+
+        Returns:
+        - Future: Resolved once the points have been written to InfluxDB.
+
+        Raises:
+        - WriteBufferFullError: If the write buffer cannot hold the points.
+        """
+        # set the insertion timestamp to now
         utc_now_ts = utc_now_timestamp()
-        # create influx db data point
-        point = (
-            Point("battery_data")
-            .tag("battery_id", str(data.get("battery_id")))
-            .field("voltage", data.get("voltage"))
-            .field("current", data.get("current"))
-            .field("temperature", data.get("temperature"))
-            .field("state_of_charge", data.get("state_of_charge"))
-            .field("state_of_health", data.get("state_of_health"))
-            .field("influx_timestamp", utc_now_ts)
-            .field("latency_ms", 0)
-            .time(utc_now_ts, write_precision="ms")
-        )
-        self.write_api.write(
-            bucket=DbConfig.INFLUX_BUCKET,
-            org=DbConfig.INFLUX_ORG,
-            record=point
-        )
-        logger.info("Inserted data point in InfluxDB")
+        flushed = self.write_buffer.put(
+            [battery_line(reading, utc_now_ts) for reading in readings])
+        timestamps = [reading.timestamp or utc_now_ts
+                      for reading in readings]
+        published = [
+            (reading.battery_id,
+             datetime.fromtimestamp(timestamp / 1000, timezone.utc),
+             {field: getattr(reading, field) for field in LATEST_FIELDS})
+            for reading, timestamp in zip(readings, timestamps)]
+        self.latest_values.update(published)
+        self.live_hub.publish(published)
+        if self.query_cache is not None or self.data_versions is not None:
+            # the points are visible to queries once they have been flushed
+            touched: Dict[str, Tuple[int, int]] = {}
+            for reading, timestamp in zip(readings, timestamps):
+                start_ms, stop_ms = touched.get(reading.battery_id,
+                                                (timestamp, timestamp))
+                touched[reading.battery_id] = (min(start_ms, timestamp),
+                                               max(stop_ms, timestamp))
+            flushed.add_done_callback(
+                functools.partial(self._invalidate, touched))
+        return flushed
 
     def delete_data(self,
                     battery_id: str,
@@ -120,20 +620,62 @@ class InfluxManager:
 
         Parameters:
         - battery_id (str): The unique identifier for the battery.
-        - start_range (str): The start time of the range for deletion.
-        - stop_range (str): The end time of the range for deletion.
+        - start_time (str): The start time of the range for deletion.
+        - stop_time (str): The end time of the range for deletion.
+
+        Raises:
+        - ValueError: If a time cannot be parsed.
+        """
+        # Resolve the time range once, for the delete and the caches
+        time_range = parse_time_range(start_time, stop_time)
+        self.delete_range(battery_id, time_range.start_ns,
+                          time_range.stop_ns)
+
+    def delete_range(self, battery_id: str, start_ns: int,
+                     stop_ns: int) -> None:
+        """
+        Deletes battery data for a specified battery_id within an absolute
+            time range, as `delete_data` does.
+
+        Parameters:
+        - battery_id (str): The unique identifier for the battery.
+        - start_ns (int): The start of the range, in nanoseconds since the
+          Unix epoch.
+        - stop_ns (int): The stop of the range, in nanoseconds since the
+          Unix epoch.
         """
-        # Calculate start and stop times using the provided ranges
-        start_time, stop_time = calculate_start_stop_times(
-            start_time, stop_time
-        )
-        print(start_time, stop_time)
         # Use the delete API to remove the data within the specified time range
-        self.delete_api.delete(
-            start=start_time,
-            stop=stop_time,
-            predicate=f'battery_id="{battery_id}"',
-            bucket=DbConfig.INFLUX_BUCKET,
-            org=DbConfig.INFLUX_ORG
-        )
+        with INFLUX_DELETE_DURATION.time():
+            self.connection.delete(
+                start=to_rfc3339(start_ns),
+                stop=to_rfc3339(stop_ns),
+                predicate=delete_predicate(battery_id),
+                bucket=DbConfig.INFLUX_BUCKET,
+                org=DbConfig.INFLUX_ORG
+            )
+        touched = {battery_id: (start_ns // NANOSECONDS_PER_MILLISECOND,
+                                stop_ns // NANOSECONDS_PER_MILLISECOND)}
+        if self.rollups is not None:
+            # the deleted windows are rolled up again right away, so that
+            # the tiers never serve the deleted data
+            self.rollups.invalidate(touched)
+            self.rollups.repair()
+        self._changed(touched)
+        if self.latest_values.discard(battery_id, to_datetime(start_ns),
+                                      to_datetime(stop_ns)):
+            # fall back to the last reading left, if any
+            self.refresh_latest(LatestValuesConfig.SEED_RANGE, battery_id)
         logger.info("Deleted data point in InfluxDB")
+
+    def close(self) -> None:
+        """
+        Releases the resources held by the InfluxManager: flushes the write
+        buffer, stops the spool replayer and syncs the spool, waits for the
+        in-flight InfluxDB calls to finish, then closes the connection.
+        """
+        self.write_buffer.close()
+        if self._replayer is not None:
+            self._replayer.close()
+            self.spool.close()
+        self.executor.shutdown(wait=True)
+        self.connection.close()
@@ -0,0 +1,104 @@
+"""
+This module defines the LatestValues class, an in-memory table of the last
+known reading of every battery, so that fleet snapshots are answered
+without scanning a time range in InfluxDB.
+"""
+
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from src.models.query import selects_all
+
+# Fields of a reading kept in the table
+LATEST_FIELDS = ("voltage", "current", "temperature", "state_of_charge",
+                 "state_of_health")
+
+
+class LatestValues:
+    """
+    Thread-safe table of the latest reading of every battery, keyed by
+    battery ID, each in the format {"time": ..., "<field>": ..., ...}.
+
+    A value only replaces the current one if it is at least as recent, so
+    back-filled readings and values merged from InfluxDB never overwrite a
+    newer reading. Rows are replaced rather than modified, so the rows
+    returned by `get` are never changed afterwards.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty LatestValues table.
+        """
+        self._lock = threading.Lock()
+        self._rows: Dict[str, Dict[str, Any]] = {}
+
+    def update(self,
+               values: Iterable[Tuple[str, datetime, Dict[str, Any]]]
+               ) -> None:
+        """
+        Merges values into the table.
+
+        Parameters:
+        - values (Iterable[Tuple[str, datetime, Dict[str, Any]]]): The
+          values, as (battery ID, time, fields); the fields may be a subset
+          of the reading's fields.
+        """
+        with self._lock:
+            for battery_id, time, fields in values:
+                row = self._rows.get(battery_id)
+                if row is None:
+                    self._rows[battery_id] = {"time": time, **fields}
+                elif time >= row["time"]:
+                    self._rows[battery_id] = {**row, **fields, "time": time}
+
+    def get(self, battery_ids: Optional[List[str]] = None
+            ) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the latest reading of some or all batteries.
+
+        Parameters:
+        - battery_ids (Optional[List[str]]): The batteries to look up; None
+          or ["*"] for every battery. Unknown batteries are left out.
+
+        Returns:
+        - Dict[str, Dict[str, Any]]: The latest reading of each battery,
+          keyed by battery ID. The rows must not be modified.
+        """
+        with self._lock:
+            if battery_ids is None or selects_all(battery_ids):
+                return dict(self._rows)
+            return {battery_id: self._rows[battery_id]
+                    for battery_id in battery_ids
+                    if battery_id in self._rows}
+
+    def discard(self, battery_id: str, start: datetime,
+                stop: datetime) -> bool:
+        """
+        Drops the latest reading of a battery if it lies within a deleted
+        time range.
+
+        Parameters:
+        - battery_id (str): The battery whose data was deleted.
+        - start (datetime): Start of the deleted range.
+        - stop (datetime): Stop of the deleted range.
+
+        Returns:
+        - bool: True if the reading was dropped.
+        """
+        with self._lock:
+            row = self._rows.get(battery_id)
+            if row is None or not start <= row["time"] <= stop:
+                return False
+            del self._rows[battery_id]
+            return True
+
+    def snapshot(self) -> Dict[str, int]:
+        """
+        Returns the size of the table.
+
+        Returns:
+        - Dict[str, int]: The number of batteries in the table.
+        """
+        with self._lock:
+            return {"batteries": len(self._rows)}
@@ -0,0 +1,279 @@
+"""
+This module defines the LiveHub class, which fans the battery readings
+written through the service out to live subscribers (the `/live` SSE and
+WebSocket endpoints), so that dashboards are pushed new data instead of
+polling InfluxDB.
+"""
+
+import asyncio
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import chain
+from typing import Any, Deque, Dict, FrozenSet, Iterable, List, Optional, \
+    Set, Tuple
+
+import orjson
+
+
+class HubFullError(Exception):
+    """
+    Raised when a subscription is rejected because the hub has reached its
+    maximum number of subscribers.
+    """
+
+
+@dataclass
+class LiveHubMetrics:
+    """
+    Counters describing the activity of a LiveHub.
+
+    Attributes:
+    - published (int): Readings published to the hub.
+    - delivered (int): Messages queued for subscribers.
+    - slow_consumers_dropped (int): Subscribers dropped because their queue
+      was full.
+    """
+    published: int = 0
+    delivered: int = 0
+    slow_consumers_dropped: int = 0
+
+
+@dataclass(eq=False)
+class Subscription:
+    """
+    A subscriber's selection and the messages waiting to be sent to it,
+    each a reading serialised as JSON.
+
+    The messages are held in a plain deque rather than an asyncio.Queue,
+    which costs several times more per message fanned out.
+
+    Attributes:
+    - battery_ids (Optional[FrozenSet[str]]): The batteries subscribed to,
+      or None for every battery.
+    - fields (Optional[Tuple[str, ...]]): The fields sent, or None for
+      every field.
+    - messages (Deque[bytes]): The messages waiting to be sent.
+    - dropped (bool): Whether the subscriber was dropped for falling
+      behind.
+    """
+    battery_ids: Optional[FrozenSet[str]]
+    fields: Optional[Tuple[str, ...]]
+    messages: Deque[bytes] = field(default_factory=deque, repr=False)
+    dropped: bool = False
+    _waiter: Optional[asyncio.Future] = field(default=None, repr=False)
+
+    def push(self, message: bytes) -> None:
+        """
+        Queues a message, waking the subscriber up. Must be called on the
+        event loop.
+        """
+        self.messages.append(message)
+        self._wake()
+
+    def drop(self) -> None:
+        """
+        Marks the subscriber as dropped, waking it up. Must be called on the
+        event loop.
+        """
+        self.dropped = True
+        self._wake()
+
+    async def next_batch(self,
+                         timeout: Optional[float] = None
+                         ) -> Optional[List[bytes]]:
+        """
+        Waits for the next messages and returns all those queued.
+
+        Parameters:
+        - timeout (Optional[float]): How long to wait for a message, in
+          seconds; None to wait indefinitely.
+
+        Returns:
+        - Optional[List[bytes]]: The queued messages, empty if none arrived
+          within the timeout, or None if the subscriber was dropped for
+          falling behind.
+        """
+        if not self.messages and not self.dropped:
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await asyncio.wait_for(self._waiter, timeout)
+            except TimeoutError:
+                pass
+            finally:
+                self._waiter = None
+        if self.dropped:
+            return None
+        batch = list(self.messages)
+        self.messages.clear()
+        return batch
+
+    def _wake(self) -> None:
+        """
+        Resolves the future `next_batch` is waiting on, if any.
+        """
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+
+class LiveHub:  # pylint: disable=too-many-instance-attributes
+    """
+    In-process fan-out of battery readings to live subscribers.
+
+    Every subscriber has a bounded queue. A subscriber whose queue is full
+    is dropped rather than slowing the writers down or buffering without
+    bound; it is told so and may reconnect. Each reading is serialised once
+    per distinct field selection rather than once per subscriber, so
+    subscribers sharing a selection cost a queue insertion each.
+
+    Subscriptions are made on the event loop. Readings may be published
+    from any thread; they are dispatched on the loop.
+    """
+
+    def __init__(self, queue_size: int, max_subscribers: int):
+        """
+        Initializes the LiveHub instance.
+
+        Parameters:
+        - queue_size (int): Maximum number of messages waiting for a
+          subscriber before it is dropped.
+        - max_subscribers (int): Maximum number of subscribers.
+        """
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.metrics = LiveHubMetrics()
+        # subscribers per battery, and those subscribed to every battery
+        self._by_battery: Dict[str, Set[Subscription]] = {}
+        self._everything: Set[Subscription] = set()
+        self._count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+
+    def subscribe(self, battery_ids: Optional[Iterable[str]],
+                  fields: Optional[Iterable[str]]) -> Subscription:
+        """
+        Subscribes to the readings of some or all batteries. Must be called
+        on the event loop.
+
+        Parameters:
+        - battery_ids (Optional[Iterable[str]]): The batteries, or None for
+          every battery.
+        - fields (Optional[Iterable[str]]): The fields to receive, or None
+          for every field.
+
+        Returns:
+        - Subscription: The subscription, to be passed to `unsubscribe`.
+
+        Raises:
+        - HubFullError: If the hub has reached its maximum number of
+          subscribers.
+        """
+        if self._count >= self.max_subscribers:
+            raise HubFullError(
+                f"The limit of {self.max_subscribers} live subscribers "
+                f"is reached")
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        subscription = Subscription(
+            battery_ids=None if battery_ids is None else frozenset(
+                battery_ids),
+            fields=None if fields is None else tuple(fields))
+        if subscription.battery_ids is None:
+            self._everything.add(subscription)
+        for battery_id in subscription.battery_ids or ():
+            self._by_battery.setdefault(battery_id, set()).add(subscription)
+        self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+        Removes a subscription; removing it twice has no effect. Must be
+        called on the event loop.
+
+        Parameters:
+        - subscription (Subscription): The subscription to remove.
+        """
+        if subscription.battery_ids is None:
+            removed = subscription in self._everything
+            self._everything.discard(subscription)
+        else:
+            removed = False
+            for battery_id in subscription.battery_ids:
+                subscribers = self._by_battery.get(battery_id, set())
+                removed = removed or subscription in subscribers
+                subscribers.discard(subscription)
+                if not subscribers:
+                    self._by_battery.pop(battery_id, None)
+        self._count -= removed
+
+    def publish(self,
+                readings: List[Tuple[str, datetime, Dict[str, Any]]]
+                ) -> None:
+        """
+        Sends readings to their subscribers. Does nothing if there are none.
+
+        Parameters:
+        - readings (List[Tuple[str, datetime, Dict[str, Any]]]): The
+          readings, as (battery ID, time, fields).
+        """
+        if not self._count or self._loop is None:
+            return
+        if threading.get_ident() == self._loop_thread:
+            self._dispatch(readings)
+        elif not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._dispatch, readings)
+
+    def snapshot(self) -> Dict[str, int]:
+        """
+        Returns the number of subscribers and the hub's counters.
+
+        Returns:
+        - Dict[str, int]: The subscriber count and the published, delivered
+          and dropped subscriber counters.
+        """
+        return {"subscribers": self._count,
+                "published": self.metrics.published,
+                "delivered": self.metrics.delivered,
+                "slow_consumers_dropped":
+                    self.metrics.slow_consumers_dropped}
+
+    def _dispatch(self,
+                  readings: List[Tuple[str, datetime, Dict[str, Any]]]
+                  ) -> None:
+        """
+        Queues readings for their subscribers, on the event loop, dropping
+        the subscribers whose queue is full.
+        """
+        lagging: Set[Subscription] = set()
+        for battery_id, time, fields in readings:
+            self.metrics.published += 1
+            messages: Dict[Optional[Tuple[str, ...]], bytes] = {}
+            for subscription in chain(self._by_battery.get(battery_id, ()),
+                                      self._everything):
+                message = messages.get(subscription.fields)
+                if message is None:
+                    message = messages[subscription.fields] = orjson.dumps(
+                        self._select(battery_id, time, fields,
+                                     subscription.fields),
+                        option=orjson.OPT_UTC_Z)
+                if len(subscription.messages) >= self.queue_size:
+                    lagging.add(subscription)
+                else:
+                    subscription.push(message)
+                    self.metrics.delivered += 1
+        for subscription in lagging:
+            self.unsubscribe(subscription)
+            subscription.drop()
+            self.metrics.slow_consumers_dropped += 1
+
+    @staticmethod
+    def _select(battery_id: str, time: datetime, fields: Dict[str, Any],
+                selected: Optional[Tuple[str, ...]]) -> Dict[str, Any]:
+        """
+        Builds the message of a reading holding the selected fields.
+        """
+        if selected is None:
+            return {"battery_id": battery_id, "time": time, **fields}
+        return {"battery_id": battery_id, "time": time,
+                **{name: fields.get(name) for name in selected}}
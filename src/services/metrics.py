@@ -0,0 +1,132 @@
+"""
+This module defines the Prometheus metrics of the service: the latency and
+size of the HTTP requests and the requests shed, the latency of the
+InfluxDB calls made by the InfluxManager, the rows they return and the slow
+queries per query template, the queries served per rollup tier, the event
+loop lag, and a collector exporting
+the write buffer and query cache counters.
+
+When the service runs several worker processes, the Prometheus client keeps
+the counters and histograms in files under PROMETHEUS_MULTIPROC_DIR, and
+`/metrics` aggregates those of every worker.
+"""
+
+import functools
+import os
+from typing import Any, Callable, Dict, Iterator
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, \
+    Histogram, multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+# Buckets of the latency histograms, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10, 30)
+# Buckets of the row and byte count histograms
+SIZE_BUCKETS = tuple(10 ** exponent for exponent in range(9))
+
+HTTP_REQUESTS = Counter(
+    "http_requests", "HTTP requests served, by route and status",
+    ["method", "route", "status"])
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time spent serving HTTP requests",
+    ["method", "route"], buckets=LATENCY_BUCKETS)
+HTTP_RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Size of the serialised HTTP response bodies",
+    ["method", "route"], buckets=SIZE_BUCKETS)
+HTTP_REQUESTS_SHED = Counter(
+    "http_requests_shed",
+    "HTTP requests rejected by the admission control, by route and reason",
+    ["route", "reason"])
+INFLUX_DURATION = Histogram(
+    "influx_request_duration_seconds", "Time spent in InfluxDB calls",
+    ["operation"], buckets=LATENCY_BUCKETS)
+INFLUX_SLOW_QUERIES = Counter(
+    "influx_slow_queries",
+    "InfluxDB queries slower than INFLUX_SLOW_QUERY_MS, by query template",
+    ["template"])
+INFLUX_QUERY_ROWS = Histogram(
+    "influx_query_rows", "Rows returned per InfluxDB query",
+    buckets=SIZE_BUCKETS)
+QUERIES_BY_TIER = Counter(
+    "queries_by_tier",
+    "Aggregated data queries, by the rollup tier serving them or \"raw\"",
+    ["tier"])
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "Delay of the event loop in running a scheduled callback",
+    buckets=LATENCY_BUCKETS)
+
+# Pre-bound children, so that the hot path skips the label lookup
+INFLUX_QUERY_DURATION = INFLUX_DURATION.labels(operation="query")
+INFLUX_WRITE_DURATION = INFLUX_DURATION.labels(operation="write")
+INFLUX_DELETE_DURATION = INFLUX_DURATION.labels(operation="delete")
+
+# Snapshot values exported as counters rather than gauges
+MONOTONIC_METRICS = frozenset({
+    "points_buffered", "points_rejected", "points_flushed",
+    "points_invalid", "flushes",
+    "failed_flushes", "total_flush_ms", "hits", "misses", "coalesced",
+    "evictions", "invalidations", "published", "delivered",
+    "slow_consumers_dropped", "chunks_deleted", "records_spooled",
+    "records_replayed", "records_dropped", "replay_failures"})
+
+
+class SnapshotCollector(Collector):
+    """
+    Exports the values of `snapshot()` methods, such as those of the write
+    buffer and the query cache, as metrics named "<prefix>_<key>".
+
+    Attributes:
+    - snapshots (Dict[str, Callable[[], Dict[str, Any]]]): The snapshot
+      functions, keyed by metric name prefix; set by the application
+      lifespan.
+    """
+
+    def __init__(self):
+        """
+        Initializes the SnapshotCollector instance without snapshots.
+        """
+        self.snapshots: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def collect(self) -> Iterator[Any]:
+        """
+        Takes the snapshots and yields their values as metrics.
+
+        Yields:
+        - Metric: A counter or gauge per snapshot value.
+        """
+        for prefix, snapshot in self.snapshots.items():
+            for key, value in snapshot().items():
+                family = (CounterMetricFamily if key in MONOTONIC_METRICS
+                          else GaugeMetricFamily)
+                yield family(f"{prefix}_{key}", f"{prefix} {key}",
+                             value=value)
+
+
+# Registered once, as the registry rejects collectors exporting the same
+# metrics twice
+SNAPSHOT_COLLECTOR = SnapshotCollector()
+REGISTRY.register(SNAPSHOT_COLLECTOR)
+
+
+@functools.cache
+def exposition_registry() -> CollectorRegistry:
+    """
+    Returns the registry served on `/metrics`.
+
+    In multi-process mode (PROMETHEUS_MULTIPROC_DIR set), this is a registry
+    aggregating the counters and histograms written by every worker, plus
+    the snapshot metrics of the worker serving the request, as the write
+    buffers and query caches are per worker.
+
+    Returns:
+    - CollectorRegistry: The registry to expose.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(SNAPSHOT_COLLECTOR)
+    return registry
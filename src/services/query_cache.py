@@ -0,0 +1,309 @@
+"""
+This module defines the QueryCache class, an in-process LRU cache with a
+time-to-live and a memory bound, placed in front of the InfluxDB queries so
+that dashboards polling the same range do not each hit InfluxDB.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple, \
+    TypeVar
+
+from src.models.query import BatteryQuery, selects_all
+from src.utils.datetime_utils import NANOSECONDS_PER_MILLISECOND, \
+    parse_time_range
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class CacheKey:
+    """
+    Identifies a query result in the cache.
+
+    Attributes:
+    - params (Hashable): The normalised query parameters, excluding the time
+      range.
+    - batteries (Tuple[str, ...]): The batteries the query selects, sorted;
+      ("*",) for every battery.
+    - start_ms (int): Start of the bucket-aligned time range, in ms.
+    - stop_ms (int): Stop of the bucket-aligned time range, in ms.
+    """
+    params: Hashable
+    batteries: Tuple[str, ...]
+    start_ms: int
+    stop_ms: int
+
+    @classmethod
+    def from_query(cls, query: BatteryQuery, bucket_ms: int,
+                   variant: str = "") -> Optional["CacheKey"]:
+        """
+        Builds the cache key of a query. The time range is resolved to
+        absolute times and floored to `bucket_ms`, so that e.g. "-2h" and
+        "-120m" requested a few seconds apart share an entry.
+
+        Parameters:
+        - query (BatteryQuery): The query.
+        - bucket_ms (int): The length of the buckets the range is aligned
+          to.
+        - variant (str): Distinguishes the shapes a query result is cached
+          in.
+
+        Returns:
+        - Optional[CacheKey]: The key, or None if the time range cannot be
+          resolved (the query is then not cached).
+        """
+        try:
+            time_range = parse_time_range(query.start_time, query.stop_time)
+        except ValueError:
+            return None
+        params = (variant, *(
+            (name, tuple(sorted(value)) if isinstance(value, list) else value)
+            for name, value in query.model_dump(exclude={
+                "battery_id", "start_time", "stop_time", "stream", "format"
+            }).items()))
+        batteries = (("*",) if selects_all(query.battery_id)
+                     else tuple(sorted(set(query.battery_id))))
+        bucket_ns = bucket_ms * NANOSECONDS_PER_MILLISECOND
+        return cls(params, batteries,
+                   time_range.start_ns // bucket_ns * bucket_ms,
+                   time_range.stop_ns // bucket_ns * bucket_ms)
+
+    def covers(self, battery_id: str, start_ms: int, stop_ms: int,
+               bucket_ms: int) -> bool:
+        """
+        Checks whether data of a battery within a time range may be part of
+        the cached result. The cached range is widened by one bucket, since
+        the result was computed from the unaligned range.
+
+        Parameters:
+        - battery_id (str): The battery.
+        - start_ms (int): Start of the time range, in ms.
+        - stop_ms (int): Stop of the time range, in ms.
+        - bucket_ms (int): The length of the buckets the key is aligned to.
+
+        Returns:
+        - bool: True if the data may be part of the result.
+        """
+        return ((battery_id in self.batteries or "*" in self.batteries)
+                and start_ms < self.stop_ms + bucket_ms
+                and stop_ms >= self.start_ms)
+
+
+@dataclass
+class QueryCacheMetrics:
+    """
+    Counters describing the activity of a QueryCache.
+
+    Attributes:
+    - hits (int): Lookups served from the cache.
+    - misses (int): Lookups that ran the query.
+    - coalesced (int): Lookups that waited for an identical running query.
+    - evictions (int): Entries evicted to respect the memory bound.
+    - invalidations (int): Entries dropped because their data changed.
+    """
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+
+@dataclass
+class _Entry:
+    """
+    A cached result along with its expiry time and estimated size.
+    """
+    value: Any
+    expires: float
+    size: int
+
+
+@dataclass
+class _Flight:
+    """
+    A query being computed, which identical lookups wait for. It is marked
+    stale if its data changes while it runs, so that its result is not
+    cached.
+    """
+    future: Future = field(default_factory=Future)
+    stale: bool = False
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Estimates the memory used by a query result.
+
+    Parameters:
+    - value (Any): The result: lists, dicts and scalars.
+
+    Returns:
+    - int: The approximate size in bytes.
+    """
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(item) for item in value.values())
+    if isinstance(value, list):
+        return sys.getsizeof(value) + sum(estimate_size(item)
+                                          for item in value)
+    return sys.getsizeof(value)
+
+
+class QueryCache:  # pylint: disable=too-many-instance-attributes
+    """
+    Caches query results for a limited time and within a memory bound.
+
+    Entries are evicted in least-recently-used order once the estimated
+    size of the cached results exceeds `max_bytes`, and expire `ttl_s` after
+    being computed. Concurrent lookups of the same missing key run the query
+    once (single-flight). Writes and deletes invalidate the entries of the
+    battery whose time range they touch.
+
+    Attributes:
+    - ttl_s (float): Time a result is served for.
+    - max_bytes (int): Approximate memory the results may use.
+    - bucket_ms (int): Length of the buckets time ranges are aligned to.
+    - metrics (QueryCacheMetrics): Counters for the cache activity.
+    """
+
+    def __init__(self, ttl_s: float, max_bytes: int, bucket_ms: int):
+        """
+        Initializes the QueryCache instance.
+
+        Parameters:
+        - ttl_s (float): Time a result is served for.
+        - max_bytes (int): Approximate memory the results may use.
+        - bucket_ms (int): Length of the buckets time ranges are aligned to.
+        """
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self.bucket_ms = bucket_ms
+        self.metrics = QueryCacheMetrics()
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[CacheKey, _Entry] = OrderedDict()
+        self._flights: Dict[CacheKey, _Flight] = {}
+        # keys of the entries holding each battery's data, "*" included
+        self._keys_by_battery: Dict[str, Set[CacheKey]] = {}
+        self._size = 0
+
+    def get_or_compute(self, query: BatteryQuery, compute: Callable[[], T],
+                       variant: str = "") -> T:
+        """
+        Returns the cached result of a query, computing it on a miss.
+
+        Parameters:
+        - query (BatteryQuery): The query.
+        - compute (Callable[[], T]): Runs the query.
+        - variant (str): Distinguishes the shapes a query result is cached
+          in, e.g. rows or columns.
+
+        Returns:
+        - T: The query result.
+        """
+        key = CacheKey.from_query(query, self.bucket_ms, variant)
+        if key is None:
+            return compute()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.metrics.hits += 1
+                return entry.value
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                self.metrics.misses += 1
+                flight = self._flights[key] = _Flight()
+            else:
+                self.metrics.coalesced += 1
+        if not leader:
+            return flight.future.result()
+        return self._compute(key, flight, compute)
+
+    def invalidate(self, battery_id: str, start_ms: int,
+                   stop_ms: int) -> None:
+        """
+        Drops the entries that may hold data of a battery within a time
+        range, after that data was written or deleted.
+
+        Parameters:
+        - battery_id (str): The battery.
+        - start_ms (int): Start of the time range, in ms.
+        - stop_ms (int): Stop of the time range, in ms.
+        """
+        with self._lock:
+            for key, flight in self._flights.items():
+                if key.covers(battery_id, start_ms, stop_ms, self.bucket_ms):
+                    flight.stale = True
+            stale_keys = [
+                key
+                for battery in (battery_id, "*")
+                for key in self._keys_by_battery.get(battery, ())
+                if key.covers(battery_id, start_ms, stop_ms, self.bucket_ms)
+            ]
+            for key in stale_keys:
+                self._drop(key)
+            self.metrics.invalidations += len(stale_keys)
+
+    def snapshot(self) -> Dict[str, int]:
+        """
+        Returns the cache metrics along with its current size.
+
+        Returns:
+        - Dict[str, int]: The metrics, keyed by name.
+        """
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size,
+                    **vars(self.metrics)}
+
+    def _compute(self, key: CacheKey, flight: _Flight,
+                 compute: Callable[[], T]) -> T:
+        """
+        Runs a query for the lookups waiting on it and caches its result
+        unless its data changed in the meantime.
+        """
+        try:
+            value = compute()
+        except Exception as err:
+            with self._lock:
+                del self._flights[key]
+            flight.future.set_exception(err)
+            raise
+        size = estimate_size(value)
+        with self._lock:
+            del self._flights[key]
+            if not flight.stale and size <= self.max_bytes:
+                self._store(key, _Entry(value, time.monotonic() + self.ttl_s,
+                                        size))
+        flight.future.set_result(value)
+        return value
+
+    def _store(self, key: CacheKey, entry: _Entry) -> None:
+        """
+        Adds an entry, evicting the least recently used entries beyond the
+        memory bound. Must be called with the lock held.
+        """
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = entry
+        self._size += entry.size
+        for battery in key.batteries:
+            self._keys_by_battery.setdefault(battery, set()).add(key)
+        while self._size > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.metrics.evictions += 1
+
+    def _drop(self, key: CacheKey) -> None:
+        """
+        Removes an entry. Must be called with the lock held.
+        """
+        self._size -= self._entries.pop(key).size
+        for battery in key.batteries:
+            keys = self._keys_by_battery[battery]
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_battery[battery]
@@ -0,0 +1,381 @@
+"""
+This module defines the Rollups class, which manages the InfluxDB tasks
+maintaining the rollup tiers of the battery data, and routes the aggregated
+queries to the coarsest tier able to serve them.
+
+A rollup tier holds the sum, count, min and max of every field of every
+battery per tier window (e.g. one hour), so that a query aggregating a year
+into daily windows reads a few hundred rolled-up points per series instead
+of every raw data point.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from src.config.db import DbConfig
+from src.config.logging import LoggingConfig
+from src.db.connection import InfluxConnection
+from src.models.query import BatteryQuery, selects_all
+from src.services.flux_queries import ROLLUP_COMBINE, TierCoverage, \
+    delete_predicate, rollup_measurement, rollup_repair_script, \
+    rollup_split, rollup_task_name, rollup_task_script
+from src.services.metrics import QUERIES_BY_TIER
+from src.utils.datetime_utils import NANOSECONDS_PER_MILLISECOND, \
+    NANOSECONDS_PER_SECOND, TimeRange, from_datetime, parse_duration_ns, \
+    parse_time_range, to_datetime, to_rfc3339
+
+if TYPE_CHECKING:
+    from influxdb_client import TasksApi
+    from influxdb_client.domain.task import Task
+
+# initialize logger for this module
+logger = LoggingConfig.get_logger(__name__)
+
+NANOSECONDS_PER_DAY = 86_400 * NANOSECONDS_PER_SECOND
+# Tier of the queries served from the raw data points
+RAW = "raw"
+
+
+class Rollups:  # pylint: disable=too-many-instance-attributes
+    """
+    Manages the rollup tiers and routes the aggregated queries to them.
+
+    Every tier is maintained by an InfluxDB task, created by `refresh` if
+    missing and replaced if its script changed. Every tier window, the task
+    rolls up the windows completed since its last successful run, after
+    `offset`; on creation, it rolls up the `backfill` before. The range a
+    tier covers, from the start of the backfill to the last completed run,
+    is read from the task by `refresh`. Several workers share the tasks, as
+    they are found by name.
+
+    A query is routed to a tier if it aggregates with a function the tiers
+    hold (mean, min, max or count), its windows are multiples of the tier
+    window, and the tier covers at least half of its time range. The head
+    and tail of the time range are aggregated from the raw data points.
+
+    Data written or deleted in tier windows already rolled up, e.g. late
+    or replayed data points, or a range delete, is reported by
+    `invalidate`. Until `repair` rolls up the affected windows again, the
+    queries over the batteries and time range it touched are served from
+    the raw data points.
+
+    Attributes:
+    - tiers (List[str]): The tier windows, as Flux durations, from the
+      finest.
+    - offset (str): How long after the end of a window it is rolled up.
+    - backfill (str): How far back a new task rolls up.
+    """
+
+    def __init__(self, connection: InfluxConnection, tiers: List[str],
+                 offset: str, backfill: str):
+        """
+        Initializes the Rollups instance; no query is routed to a tier until
+        `refresh` finds its task.
+
+        Parameters:
+        - connection (InfluxConnection): The connection to InfluxDB, whose
+          Tasks API manages the tasks.
+        - tiers (List[str]): The tier windows, as Flux durations.
+        - offset (str): How long after the end of a window it is rolled up,
+          as a Flux duration.
+        - backfill (str): How far back a new task rolls up, as a Flux
+          duration.
+
+        Raises:
+        - ValueError: If a duration cannot be parsed.
+        """
+        self.tiers = sorted(tiers, key=parse_duration_ns)
+        self.offset = offset
+        self.backfill = backfill
+        self._connection = connection
+        self._window_ns = {tier: parse_duration_ns(tier)
+                           for tier in self.tiers}
+        self._offset_ns = parse_duration_ns(offset)
+        self._backfill_ns = parse_duration_ns(backfill)
+        # replaced as a whole by refresh, so that route reads a consistent
+        # view without a lock
+        self._coverage: Dict[str, TierCoverage] = {}
+        # the range rolled up before the data changed, in nanoseconds, by
+        # battery ID
+        self._dirty: Dict[str, Tuple[int, int]] = {}
+        self._dirty_lock = threading.Lock()
+
+    def refresh(self) -> None:
+        """
+        Creates or replaces the tasks of the tiers as needed, and reads the
+        range each tier covers. A tier whose task has not completed a run
+        yet, or whose last run failed, serves no query.
+
+        Raises:
+        - ApiException: If a request to the Tasks API fails.
+        """
+        tasks_api = self._connection.tasks_api()
+        coverage = {}
+        for tier in self.tiers:
+            task = self._ensure_task(tasks_api, tier)
+            if task is None or task.latest_completed is None:
+                continue
+            if task.last_run_status == "failed":
+                logger.warning("The last run of the %s rollup task failed: "
+                               "%s", tier, task.last_run_error)
+                continue
+            window_ns = self._window_ns[tier]
+            # the first run is scheduled on the first window boundary after
+            # the task was created
+            first_run_ns = -(-from_datetime(task.created_at)
+                             // window_ns) * window_ns
+            coverage[tier] = TierCoverage(
+                tier, window_ns, first_run_ns - self._backfill_ns,
+                from_datetime(task.latest_completed))
+        self._coverage = coverage
+
+    def invalidate(self, touched: Dict[str, Tuple[int, int]]) -> None:
+        """
+        Reports data written or deleted. The ranges which may already have
+        been rolled up are kept for `repair`, and served from the raw data
+        points until then.
+
+        Parameters:
+        - touched (Dict[str, Tuple[int, int]]): The time range touched for
+          each battery, in milliseconds, keyed by battery ID.
+        """
+        now_ns = time.time_ns()
+        for battery_id, (start_ms, stop_ms) in touched.items():
+            start_ns = start_ms * NANOSECONDS_PER_MILLISECOND
+            stop_ns = (stop_ms + 1) * NANOSECONDS_PER_MILLISECOND
+            if any(self._is_rolled_up(coverage, start_ns, stop_ns, now_ns)
+                   for coverage in self._coverage.values()):
+                with self._dirty_lock:
+                    start_ns, stop_ns = _merge(self._dirty.get(battery_id),
+                                               start_ns, stop_ns)
+                    self._dirty[battery_id] = (start_ns, stop_ns)
+
+    def repair(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Rolls up again the tier windows of the ranges reported by
+        `invalidate`: the points of the windows are deleted from every tier
+        covering them, then rolled up from the data points left. A range
+        failing to be repaired is retried by the next call.
+
+        Returns:
+        - Dict[str, Tuple[int, int]]: The time range repaired for each
+          battery, in milliseconds, keyed by battery ID, whose results
+          served from the tiers changed.
+        """
+        with self._dirty_lock:
+            dirty = dict(self._dirty)
+        repaired = {}
+        for battery_id, (start_ns, stop_ns) in dirty.items():
+            try:
+                for coverage in self._coverage.values():
+                    self._reroll(coverage, battery_id, start_ns, stop_ns)
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                logger.warning("Failed to roll up the data of battery %s "
+                               "again: %s", battery_id, err)
+                continue
+            with self._dirty_lock:
+                # unless the data changed again meanwhile
+                if self._dirty.get(battery_id) == (start_ns, stop_ns):
+                    del self._dirty[battery_id]
+            repaired[battery_id] = (start_ns // NANOSECONDS_PER_MILLISECOND,
+                                    stop_ns // NANOSECONDS_PER_MILLISECOND)
+        return repaired
+
+    def route(self, query: BatteryQuery) -> BatteryQuery:
+        """
+        Picks the tier serving an aggregated query: the coarsest tier able
+        to serve it, or the raw data points.
+
+        Parameters:
+        - query (BatteryQuery): The query, with `tier` "auto" or "raw".
+
+        Returns:
+        - BatteryQuery: A copy of the query with `tier` set to the tier. A
+          window sized from `max_points` is rounded up to a multiple of the
+          tier window and set as `every`.
+        """
+        routed = (self._route(query) if query.tier != RAW
+                  and query.is_aggregated and query.fn in ROLLUP_COMBINE
+                  else None)
+        if routed is None:
+            routed = query.model_copy(update={"tier": RAW})
+        if query.is_aggregated:
+            QUERIES_BY_TIER.labels(routed.tier).inc()
+        return routed
+
+    def coverage(self, query: BatteryQuery) -> Optional[TierCoverage]:
+        """
+        Returns the coverage of the tier a query was routed to.
+
+        Parameters:
+        - query (BatteryQuery): The query, as returned by `route`.
+
+        Returns:
+        - Optional[TierCoverage]: The range the tier covers, or None if the
+          query is served from the raw data points.
+        """
+        return self._coverage.get(query.tier)
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Returns how far behind each tier is.
+
+        Returns:
+        - Dict[str, float]: The seconds since the end of the range each
+          tier covers, as "<tier>_lag_s", or -1 if the tier serves no
+          query.
+        """
+        coverage, now_ns = self._coverage, time.time_ns()
+        return {f"{tier}_lag_s": (
+            max(0, now_ns - coverage[tier].stop_ns) / NANOSECONDS_PER_SECOND
+            if tier in coverage else -1) for tier in self.tiers}
+
+    def _route(self, query: BatteryQuery) -> Optional[BatteryQuery]:
+        """
+        Returns a copy of an aggregated query routed to the coarsest tier
+        able to serve it, or None if no tier can.
+        """
+        time_range = parse_time_range(query.start_time, query.stop_time)
+        duration_ns = time_range.stop_ns - time_range.start_ns
+        if duration_ns <= 0 or self._is_dirty(query, time_range):
+            return None
+        for tier in reversed(self.tiers):
+            coverage = self._coverage.get(tier)
+            every = self._tier_window(query, time_range, tier)
+            if coverage is None or every is None:
+                continue
+            split = rollup_split(coverage, time_range)
+            if split is not None and 2 * (split[1] - split[0]) >= duration_ns:
+                return query.model_copy(update={"tier": tier,
+                                                "every": every})
+        return None
+
+    def _is_dirty(self, query: BatteryQuery, time_range: TimeRange) -> bool:
+        """
+        Returns whether the tiers are waiting for a repair of the data a
+        query selects.
+        """
+        with self._dirty_lock:
+            dirty = (self._dirty.values() if selects_all(query.battery_id)
+                     else [self._dirty[battery_id]
+                           for battery_id in query.battery_id
+                           if battery_id in self._dirty])
+            return any(start_ns < time_range.stop_ns
+                       and time_range.start_ns < stop_ns
+                       for start_ns, stop_ns in dirty)
+
+    def _is_rolled_up(self, coverage: TierCoverage, start_ns: int,
+                      stop_ns: int, now_ns: int) -> bool:
+        """
+        Returns whether a tier may already have rolled up some of a time
+        range: the range overlaps the range the tier covers, or the task has
+        run since the end of the first tier window of the range.
+        """
+        window_ns = coverage.window_ns
+        first_end_ns = (start_ns // window_ns + 1) * window_ns
+        return stop_ns > coverage.start_ns and (
+            start_ns < coverage.stop_ns
+            or first_end_ns + self._offset_ns <= now_ns)
+
+    def _reroll(self, coverage: TierCoverage, battery_id: str,
+                start_ns: int, stop_ns: int) -> None:
+        """
+        Rolls up again the windows of a tier overlapping a battery's time
+        range, within the range the tier covers.
+        """
+        window_ns = coverage.window_ns
+        start_ns = max(start_ns // window_ns * window_ns, coverage.start_ns)
+        stop_ns = min(-(-stop_ns // window_ns) * window_ns, coverage.stop_ns)
+        if start_ns >= stop_ns:
+            return
+        # the rolled-up points are timestamped with the start of their
+        # window, and the delete range includes its stop
+        self._connection.delete(
+            start=to_rfc3339(start_ns), stop=to_rfc3339(stop_ns - 1),
+            predicate=delete_predicate(
+                battery_id, rollup_measurement(coverage.tier)),
+            bucket=DbConfig.INFLUX_BUCKET, org=DbConfig.INFLUX_ORG)
+        self._connection.query(
+            rollup_repair_script(coverage.tier, DbConfig.INFLUX_BUCKET),
+            params={"_battery_id": battery_id,
+                    "_start": to_datetime(start_ns),
+                    "_stop": to_datetime(stop_ns)})
+
+    def _tier_window(self, query: BatteryQuery, time_range: TimeRange,
+                     tier: str) -> Optional[str]:
+        """
+        Returns the window of a query served from a tier, or None if the
+        tier windows do not fit in the query windows.
+        """
+        window_ns = self._window_ns[tier]
+        if query.every is None:
+            # sized to fit max_points, rounded up to tier windows
+            windows = math.ceil((time_range.stop_ns - time_range.start_ns)
+                                / query.max_points / window_ns)
+            return f"{windows * window_ns}ns"
+        # calendar months and years are made of whole days
+        every_ns = (NANOSECONDS_PER_DAY
+                    if "mo" in query.every or "y" in query.every
+                    else parse_duration_ns(query.every))
+        return query.every if every_ns % window_ns == 0 else None
+
+    def _ensure_task(self, tasks_api: "TasksApi",
+                     tier: str) -> Optional["Task"]:
+        """
+        Returns the task of a tier, deleting any duplicate created by
+        another worker. If the task is missing, or was created with another
+        script, a new one is created and None is returned.
+        """
+        # pylint: disable=import-outside-toplevel
+        from influxdb_client.domain.task_create_request import \
+            TaskCreateRequest
+        name = rollup_task_name(tier)
+        script = rollup_task_script(tier, DbConfig.INFLUX_BUCKET,
+                                    self.offset, self.backfill)
+        # tells whether a task runs the current script, whatever the
+        # formatting InfluxDB stores it with
+        description = (f"Rollup of battery_data, script "
+                       f"{hashlib.sha256(script.encode()).hexdigest()[:16]}")
+        tasks = sorted(
+            (task for task in tasks_api.find_tasks(
+                name=name, org=DbConfig.INFLUX_ORG) if task.name == name),
+            key=lambda task: (task.created_at, task.id))
+        current = next((task for task in tasks
+                        if task.description == description), None)
+        for task in tasks:
+            if task is not current:
+                _delete_task(tasks_api, task)
+        if current is None:
+            tasks_api.create_task(task_create_request=TaskCreateRequest(
+                org=DbConfig.INFLUX_ORG, flux=script, status="active",
+                description=description))
+            logger.info("Created the %s rollup task, rolling up the data "
+                        "since %s", tier, to_rfc3339(
+                            time.time_ns() - self._backfill_ns, digits=0))
+        return current
+
+
+def _merge(current: Optional[Tuple[int, int]], start_ns: int,
+           stop_ns: int) -> Tuple[int, int]:
+    """
+    Returns the smallest time range holding a range, if any, and another.
+    """
+    if current is None:
+        return start_ns, stop_ns
+    return min(current[0], start_ns), max(current[1], stop_ns)
+
+
+def _delete_task(tasks_api: "TasksApi", task: "Task") -> None:
+    """
+    Deletes a task, unless another worker already did.
+    """
+    from influxdb_client.rest import ApiException  # pylint: disable=import-outside-toplevel
+    try:
+        tasks_api.delete_task(task.id)
+    except ApiException as err:
+        if err.status != 404:
+            raise
+    logger.info("Deleted the rollup task %s (%s)", task.name, task.id)
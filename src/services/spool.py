@@ -0,0 +1,458 @@
+"""
+This module defines the Spool class, an append-only, on-disk log of the
+line-protocol records that could not be written to InfluxDB, and the
+SpoolReplayer class, which writes them back once InfluxDB recovers, so that
+readings accepted by `/add` survive InfluxDB outages.
+"""
+
+import fcntl
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Callable, Deque, Dict, List, Optional, Tuple
+
+from src.config.logging import LoggingConfig
+
+# initialize logger for this module
+logger = LoggingConfig.get_logger(__name__)
+
+# Suffix of the segment files
+SEGMENT_SUFFIX = ".lp"
+# Maximum number of writes spent isolating the records InfluxDB rejects in
+# a batch; the parts of the batch left undecided are rejected as a whole
+MAX_ISOLATING_WRITES = 64
+
+
+class SpoolFullError(Exception):
+    """
+    Raised when records are rejected because the spool is full.
+    """
+
+
+@dataclass
+class SpoolMetrics:
+    """
+    Counters describing the activity of a Spool and its replayer.
+
+    Attributes:
+    - records_spooled (int): Records appended to the spool.
+    - records_replayed (int): Records written back to InfluxDB.
+    - records_dropped (int): Records InfluxDB rejected as invalid on
+      replay; the other records of their batch are replayed.
+    - replay_failures (int): Replayed writes that failed, to be retried.
+    """
+    records_spooled: int = 0
+    records_replayed: int = 0
+    records_dropped: int = 0
+    replay_failures: int = 0
+
+
+class Spool:  # pylint: disable=too-many-instance-attributes
+    """
+    Append-only log of line-protocol records, stored in segment files.
+
+    Records are appended to the active segment with one unbuffered write
+    per call, so they survive a crash of the process once `append` returns,
+    and reach the disk at the next `sync`. A segment is sealed when it
+    reaches `segment_bytes` or when the replayer needs it, and deleted once
+    replayed. Each segment file is named after its sequence number and its
+    creation time in milliseconds.
+
+    Every worker process claims its own subdirectory of the spool
+    directory, holding a lock on it while running, and replays the segments
+    left there by a previous run. Replaying a record twice is harmless, as
+    InfluxDB overwrites a point with the same series and timestamp.
+
+    Attributes:
+    - directory (Path): The subdirectory claimed by the process.
+    - segment_bytes (int): The size at which a segment is sealed.
+    - max_bytes (int): The maximum size of the spool.
+    - outage (bool): Whether InfluxDB is considered unavailable, in which
+      case the write buffer spools its batches without trying InfluxDB.
+    - metrics (SpoolMetrics): Counters for the spool activity.
+    """
+
+    def __init__(self, root: str, segment_bytes: int, max_bytes: int):
+        """
+        Initializes the Spool instance, claiming a subdirectory of `root`
+        and picking up the segments left in it.
+
+        Parameters:
+        - root (str): The spool directory, created if missing.
+        - segment_bytes (int): The size at which a segment is sealed.
+        - max_bytes (int): The maximum size of the spool.
+        """
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.outage = False
+        self.metrics = SpoolMetrics()
+        self.directory, self._lock_file = _claim_directory(Path(root))
+        self._lock = threading.Lock()
+        self._sealed: Deque[Path] = deque(sorted(
+            self.directory.glob(f"*{SEGMENT_SUFFIX}")))
+        self._bytes = sum(path.stat().st_size for path in self._sealed)
+        self._sequence = int(self._sealed[-1].name.split("-")[0]) + 1 \
+            if self._sealed else 0
+        self._active: Optional[Path] = None
+        self._file: Optional[BinaryIO] = None
+        self._active_bytes = 0
+        # files sealed since the last sync, and whether the active file
+        # was written to since
+        self._rolled: List[BinaryIO] = []
+        self._dirty = False
+        if self._sealed:
+            logger.warning("Found %d spooled segments to replay in %s",
+                           len(self._sealed), self.directory)
+
+    def append(self, lines: List[str]) -> None:
+        """
+        Appends records to the spool.
+
+        Parameters:
+        - lines (List[str]): The line-protocol records.
+
+        Raises:
+        - SpoolFullError: If the records do not fit in the spool.
+        """
+        data = ("\n".join(lines) + "\n").encode()
+        with self._lock:
+            if self._bytes + len(data) > self.max_bytes:
+                raise SpoolFullError(
+                    f"Spool is full ({self.max_bytes} bytes)")
+            if self._file is None or (
+                    self._active_bytes
+                    and self._active_bytes + len(data) > self.segment_bytes):
+                self._roll()
+            self._file.write(data)
+            self._active_bytes += len(data)
+            self._bytes += len(data)
+            self._dirty = True
+            self.metrics.records_spooled += len(lines)
+
+    def sync(self) -> None:
+        """
+        Flushes the records appended since the last call to the disk. The
+        files are synced outside of the lock, so appends are not held up;
+        it must only be called by one thread at a time.
+        """
+        with self._lock:
+            rolled, self._rolled = self._rolled, []
+            active = self._file if self._dirty else None
+            self._dirty = False
+        for file in rolled:
+            os.fsync(file.fileno())
+            file.close()
+        if active is not None:
+            os.fsync(active.fileno())
+
+    def oldest(self) -> Optional[Path]:
+        """
+        Returns the oldest sealed segment, sealing the active segment if it
+        is the only one holding records.
+
+        Returns:
+        - Optional[Path]: The segment, or None if the spool is empty.
+        """
+        with self._lock:
+            if not self._sealed and self._active_bytes:
+                self._seal()
+            return self._sealed[0] if self._sealed else None
+
+    def remove(self, segment: Path) -> None:
+        """
+        Deletes a replayed segment.
+
+        Parameters:
+        - segment (Path): The segment, as returned by `oldest`.
+        """
+        with self._lock:
+            self._sealed.remove(segment)
+            self._bytes -= segment.stat().st_size
+            segment.unlink()
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Returns the spool metrics along with its size and replay lag.
+
+        Returns:
+        - Dict[str, float]: The bytes and segments spooled, the age of the
+          oldest segment in seconds (0 if empty), whether an outage is
+          ongoing, and the counters.
+        """
+        with self._lock:
+            segments = [*self._sealed, *filter(None, [self._active])]
+            oldest = segments[0] if segments else None
+            return {
+                "bytes": self._bytes,
+                "segments": len(segments),
+                "replay_lag_s": 0 if oldest is None else max(
+                    0.0, time.time() - _created_s(oldest)),
+                "outage": int(self.outage),
+                **vars(self.metrics),
+            }
+
+    def close(self) -> None:
+        """
+        Syncs the records left to the disk and releases the directory; the
+        segments are replayed by the next process claiming it.
+        """
+        with self._lock:
+            self._seal()
+        self.sync()
+        self._lock_file.close()
+
+    def _roll(self) -> None:
+        """
+        Seals the active segment, if any, and opens a new one.
+        """
+        self._seal()
+        created_ms = int(time.time() * 1000)
+        self._active = self.directory / (
+            f"{self._sequence:012d}-{created_ms}{SEGMENT_SUFFIX}")
+        # unbuffered, so that every append is one write to the file
+        self._file = open(self._active, "ab", buffering=0)  # pylint: disable=consider-using-with
+        self._sequence += 1
+        self._active_bytes = 0
+
+    def _seal(self) -> None:
+        """
+        Seals the active segment, if any; its file is synced and closed by
+        the next `sync`.
+        """
+        if self._file is None:
+            return
+        self._sealed.append(self._active)
+        self._rolled.append(self._file)
+        self._dirty = False
+        self._active, self._file, self._active_bytes = None, None, 0
+
+
+def _created_s(segment: Path) -> float:
+    """
+    Returns the creation time of a segment, in seconds since the epoch.
+    """
+    return int(segment.stem.split("-")[1]) / 1000
+
+
+def _claim_directory(root: Path) -> Tuple[Path, BinaryIO]:
+    """
+    Claims the first subdirectory of the spool directory not locked by
+    another process, creating it if needed.
+
+    Returns:
+    - Tuple[Path, BinaryIO]: The subdirectory, and its lock file, which
+      holds the lock until it is closed.
+    """
+    for index in itertools.count():
+        directory = root / f"worker-{index}"
+        directory.mkdir(parents=True, exist_ok=True)
+        lock_file = open(directory / "lock", "ab")  # pylint: disable=consider-using-with
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            continue
+        return directory, lock_file
+    raise AssertionError("unreachable")
+
+
+def _api_exception() -> type:
+    """
+    Returns the exception raised by the InfluxDB client for the error
+    responses; influxdb_client is imported along with the first client.
+    """
+    from influxdb_client.rest import ApiException  # pylint: disable=import-outside-toplevel
+    return ApiException
+
+
+def is_rejection(error: Exception) -> bool:
+    """
+    Tells whether a write failed because InfluxDB rejected its records as
+    invalid (a 4xx response other than 429), in which case retrying it
+    would fail again, rather than because InfluxDB was unavailable.
+
+    Parameters:
+    - error (Exception): The write error.
+
+    Returns:
+    - bool: Whether the records were rejected.
+    """
+    status = getattr(error, "status", None)
+    return (isinstance(status, int) and 400 <= status < 500
+            and status != 429 and isinstance(error, _api_exception()))
+
+
+def write_isolating_rejections(
+        write: Callable[[List[str]], None], lines: List[str],
+        max_writes: int = MAX_ISOLATING_WRITES) -> Dict[int, Exception]:
+    """
+    Writes records to InfluxDB, isolating those it rejects as invalid: a
+    rejected batch is split in halves written separately, down to the
+    rejected records, so that the valid records of the batch are written.
+    The halves are written level by level, and once `max_writes` writes
+    are spent, the rejected parts not split yet are rejected as a whole, so
+    that a batch of invalid records does not cost a write per record.
+    Writing a record twice is harmless.
+
+    Parameters:
+    - write (Callable[[List[str]], None]): Writes a list of line-protocol
+      records to InfluxDB.
+    - lines (List[str]): The line-protocol records.
+    - max_writes (int): The maximum number of writes.
+
+    Returns:
+    - Dict[int, Exception]: The errors of the rejected records, keyed by
+      their position in `lines`.
+
+    Raises:
+    - Exception: The write error, if InfluxDB failed for another reason
+      than rejecting records.
+    """
+    rejected: Dict[int, Exception] = {}
+    pending = deque([(0, lines)])
+    writes = 0
+    while pending:
+        offset, part = pending.popleft()
+        writes += 1
+        err = _write_part(write, part)
+        if err is None:
+            continue
+        if len(part) == 1 or writes + len(pending) + 2 > max_writes:
+            rejected.update((offset + index, err)
+                            for index in range(len(part)))
+        else:
+            half = len(part) // 2
+            pending.extend([(offset, part[:half]),
+                            (offset + half, part[half:])])
+    return dict(sorted(rejected.items()))
+
+
+def _write_part(write: Callable[[List[str]], None],
+                lines: List[str]) -> Optional[Exception]:
+    """
+    Writes records to InfluxDB, returning the error if it rejected them
+    as invalid, and raising it if InfluxDB failed for another reason.
+    """
+    try:
+        write(lines)
+        return None
+    except Exception as err:  # pylint: disable=broad-exception-caught
+        if not is_rejection(err):
+            raise
+        return err
+
+
+class SpoolReplayer:  # pylint: disable=too-many-instance-attributes
+    """
+    Background thread syncing the spool to the disk every
+    `sync_interval_s`, and writing the spooled records back to InfluxDB,
+    oldest first, at most `rate_per_s` records per second, so that the
+    backlog does not overload InfluxDB as it recovers.
+
+    A failed write is retried after `retry_s`, doubled after every failure
+    up to 30 times `retry_s`. Records InfluxDB rejects as invalid (4xx
+    responses other than 429) are isolated and dropped, while the other
+    records of their batch are written. The first successful write ends the
+    outage.
+    """
+
+    def __init__(self, spool: Spool, write: Callable[[List[str]], None],
+                 rate_per_s: int, batch_size: int, sync_interval_s: float,
+                 retry_s: float = 1.0):
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        """
+        Initializes the SpoolReplayer instance and starts its thread.
+
+        Parameters:
+        - spool (Spool): The spool to replay.
+        - write (Callable[[List[str]], None]): Writes a list of
+          line-protocol records to InfluxDB.
+        - rate_per_s (int): The maximum number of records replayed per
+          second.
+        - batch_size (int): The maximum number of records per write.
+        - sync_interval_s (float): The interval between two syncs of the
+          spool, and between two checks for records to replay.
+        - retry_s (float): The delay before retrying a failed write.
+        """
+        self.spool = spool
+        self.rate_per_s = rate_per_s
+        self.batch_size = batch_size
+        self.sync_interval_s = sync_interval_s
+        self.retry_s = retry_s
+        self._write = write
+        # records already written of the segment being replayed, if a
+        # previous attempt failed
+        self._progress: Dict[Path, int] = {}
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run,
+                                        name="influx-spool-replayer",
+                                        daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """
+        Stops the replayer; the records left are replayed on the next
+        start.
+        """
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        """
+        Body of the replayer thread.
+        """
+        failures = 0
+        while not self._stopped.is_set():
+            self.spool.sync()
+            segment = self.spool.oldest()
+            if segment is None:
+                self._stopped.wait(self.sync_interval_s)
+                continue
+            try:
+                if self._replay(segment):
+                    self.spool.remove(segment)
+                failures = 0
+            except Exception as err:  # pylint: disable=broad-exception-caught
+                self.spool.metrics.replay_failures += 1
+                delay = self.retry_s * min(2 ** failures, 30)
+                failures += 1
+                logger.warning("Failed to replay spooled records, retrying "
+                               "in %.1f s: %s", delay, err)
+                self._stopped.wait(delay)
+
+    def _replay(self, segment: Path) -> bool:
+        """
+        Writes the records of a segment to InfluxDB, in batches of
+        `batch_size`, resuming after the last batch written if a previous
+        attempt failed.
+
+        Returns:
+        - bool: Whether the whole segment was replayed, rather than
+          interrupted by `close`.
+        """
+        # a record cut short by a crash has no trailing newline
+        lines = segment.read_bytes().decode().split("\n")[:-1]
+        done = self._progress.get(segment, 0)
+        next_at = time.monotonic()
+        while done < len(lines):
+            if self._stopped.wait(max(0.0, next_at - time.monotonic())):
+                return False
+            batch = lines[done:done + self.batch_size]
+            rejected = write_isolating_rejections(self._write, batch)
+            if rejected:
+                logger.error("Dropped %d spooled records rejected by "
+                             "InfluxDB: %s", len(rejected),
+                             next(iter(rejected.values())))
+            self.spool.metrics.records_dropped += len(rejected)
+            self.spool.metrics.records_replayed += len(batch) - len(rejected)
+            self.spool.outage = False
+            done += len(batch)
+            self._progress = {segment: done}
+            next_at = max(next_at, time.monotonic()) + \
+                len(batch) / self.rate_per_s
+        self._progress = {}
+        return True
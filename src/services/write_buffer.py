@@ -0,0 +1,368 @@
+"""
+This module defines the WriteBuffer class, which coalesces InfluxDB
+line-protocol records into batches and writes them from a background
+thread, so that ingest throughput is no longer capped by one InfluxDB round
+trip per data point.
+"""
+
+import bisect
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.config.logging import LoggingConfig
+from src.services.spool import Spool, SpoolFullError, \
+    write_isolating_rejections
+
+# initialize logger for this module
+logger = LoggingConfig.get_logger(__name__)
+
+
+class WriteBufferFullError(Exception):
+    """
+    Raised when a write is rejected because the buffer is full.
+    """
+
+
+class RejectedPointsError(Exception):
+    """
+    Raised through the future of a write when InfluxDB rejected some of its
+    records as invalid; its other records were written.
+
+    Attributes:
+    - rejected (Dict[int, Exception]): The errors of the rejected records,
+      keyed by their position among the records of the write.
+    """
+
+    def __init__(self, rejected: Dict[int, Exception]):
+        """
+        Initializes the RejectedPointsError instance.
+
+        Parameters:
+        - rejected (Dict[int, Exception]): The errors of the rejected
+          records, keyed by their position in the write.
+        """
+        super().__init__(f"InfluxDB rejected {len(rejected)} point(s): "
+                         f"{next(iter(rejected.values()))}")
+        self.rejected = rejected
+
+
+@dataclass
+class WriteBufferMetrics:  # pylint: disable=too-many-instance-attributes
+    """
+    Counters describing the activity of a WriteBuffer.
+
+    Attributes:
+    - points_buffered (int): Points accepted into the buffer.
+    - points_rejected (int): Points rejected because the buffer was full.
+    - points_flushed (int): Points successfully written to InfluxDB.
+    - points_invalid (int): Points InfluxDB rejected as invalid.
+    - flushes (int): Successful flushes.
+    - failed_flushes (int): Flushes that raised an error.
+    - last_flush_ms (float): Duration of the most recent flush.
+    - max_flush_ms (float): Duration of the slowest flush.
+    - total_flush_ms (float): Cumulative duration of all flushes.
+    """
+    points_buffered: int = 0
+    points_rejected: int = 0
+    points_flushed: int = 0
+    points_invalid: int = 0
+    flushes: int = 0
+    failed_flushes: int = 0
+    last_flush_ms: float = 0.0
+    max_flush_ms: float = 0.0
+    total_flush_ms: float = 0.0
+
+
+@dataclass
+class _Batch:
+    """
+    Records waiting to be flushed, along with the futures of the writes
+    they come from, each with the position after its last record, and the
+    time the first record was buffered.
+    """
+    lines: List[str] = field(default_factory=list)
+    writes: List[Tuple[int, Future]] = field(default_factory=list)
+    created: float = field(default_factory=time.monotonic)
+
+    def resolve(self, rejected: Dict[int, Exception]) -> None:
+        """
+        Resolves the futures of the writes, failing those with records
+        InfluxDB rejected.
+
+        Parameters:
+        - rejected (Dict[int, Exception]): The errors of the rejected
+          records, keyed by their position in the batch.
+        """
+        # the rejected positions are walked along with the writes
+        positions = sorted(rejected)
+        first = start = 0
+        for end, future in self.writes:
+            last = bisect.bisect_left(positions, end, first)
+            errors = {index - start: rejected[index]
+                      for index in positions[first:last]}
+            first = last
+            if errors:
+                future.set_exception(RejectedPointsError(errors))
+            else:
+                future.set_result(None)
+            start = end
+
+    def fail(self, error: Exception) -> None:
+        """
+        Fails the futures of the writes with an error.
+
+        Parameters:
+        - error (Exception): The error.
+        """
+        for _, future in self.writes:
+            future.set_exception(error)
+
+
+class WriteBuffer:  # pylint: disable=too-many-instance-attributes
+    """
+    Buffers line-protocol records and flushes them to InfluxDB in batches.
+
+    The buffer is flushed when it holds `batch_size` records, when its
+    oldest record is `flush_interval_s` old, and when it is closed. Every
+    call to `put` returns a future resolved when its records have been
+    flushed, letting callers choose between acknowledging a write once it
+    is buffered and once it is persisted.
+
+    Records InfluxDB rejects as invalid (4xx responses other than 429) are
+    isolated, so that the other records of their batch are written, and
+    the futures of the writes they come from fail with a
+    RejectedPointsError.
+
+    With a spool, a batch InfluxDB fails to take because it is unavailable
+    is appended to the spool instead, and an outage begins: the next
+    batches are spooled without trying InfluxDB until the spool replayer
+    writes to it again. Records that do not fit in the buffer are spooled
+    too, rather than rejected. Either way, their future is resolved once
+    they are spooled.
+
+    Attributes:
+    - max_size (int): Maximum number of buffered records.
+    - batch_size (int): Maximum number of records per InfluxDB write.
+    - flush_interval_s (float): Maximum age of a buffered record.
+    - metrics (WriteBufferMetrics): Counters for the buffer activity.
+    """
+
+    def __init__(self,
+                 write: Callable[[List[str]], None],
+                 max_size: int,
+                 batch_size: int,
+                 flush_interval_s: float,
+                 spool: Optional[Spool] = None):
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        """
+        Initializes the WriteBuffer instance and starts its flush thread.
+
+        Parameters:
+        - write (Callable[[List[str]], None]): Writes a list of
+          line-protocol records to InfluxDB.
+        - max_size (int): Maximum number of buffered records.
+        - batch_size (int): Maximum number of records per InfluxDB write.
+        - flush_interval_s (float): Maximum age of a buffered record.
+        - spool (Optional[Spool]): Spool taking the records InfluxDB or the
+          buffer cannot take, if any.
+        """
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.metrics = WriteBufferMetrics()
+        self._write = write
+        self._spool = spool
+        self._condition = threading.Condition()
+        self._batch = _Batch()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run,
+                                        name="influx-write-buffer",
+                                        daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self) -> int:
+        """
+        int: The number of records currently waiting to be flushed.
+        """
+        return len(self._batch.lines)
+
+    def put(self, lines: List[str]) -> Future:
+        """
+        Adds line-protocol records to the buffer.
+
+        Parameters:
+        - lines (List[str]): The line-protocol records to buffer.
+
+        Returns:
+        - Future: Resolved with None once the records have been written to
+          InfluxDB, with a RejectedPointsError if InfluxDB rejected some of
+          them, or with the write error if the flush failed.
+
+        Raises:
+        - WriteBufferFullError: If the records fit neither in the buffer
+          nor in the spool.
+        - RuntimeError: If the buffer has been closed.
+        """
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Write buffer is closed")
+            batch = self._batch
+            if len(batch.lines) + len(lines) > self.max_size:
+                return self._overflow(lines)
+            # wake the flush thread when its deadline or batch changes
+            if not batch.lines:
+                batch.created = time.monotonic()
+                self._condition.notify()
+            batch.lines.extend(lines)
+            future: Future = Future()
+            batch.writes.append((len(batch.lines), future))
+            self.metrics.points_buffered += len(lines)
+            if len(batch.lines) >= self.batch_size:
+                self._condition.notify()
+            return future
+
+    def _overflow(self, lines: List[str]) -> Future:
+        """
+        Spools records that do not fit in the buffer, or rejects them if
+        there is no spool or it is full.
+        """
+        if self._spool is not None:
+            try:
+                self._spool.append(lines)
+            except SpoolFullError:
+                pass
+            else:
+                spooled: Future = Future()
+                spooled.set_result(None)
+                return spooled
+        self.metrics.points_rejected += len(lines)
+        raise WriteBufferFullError(
+            f"Write buffer is full ({self.max_size} points)")
+
+    def snapshot(self) -> Dict[str, int | float]:
+        """
+        Returns the buffer metrics along with the current queue depth.
+
+        Returns:
+        - Dict[str, int | float]: The metrics, keyed by name.
+        """
+        with self._condition:
+            return {"queue_depth": self.depth, **vars(self.metrics)}
+
+    def close(self) -> None:
+        """
+        Flushes the remaining records and stops the flush thread.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _take_batch(self) -> _Batch | None:
+        """
+        Waits until the buffer must be flushed, then swaps in an empty batch
+        and returns the full one. Returns None once the buffer is closed and
+        drained.
+        """
+        with self._condition:
+            while True:
+                batch = self._batch
+                age = time.monotonic() - batch.created
+                if batch.lines and (len(batch.lines) >= self.batch_size
+                                    or age >= self.flush_interval_s
+                                    or self._closed):
+                    self._batch = _Batch()
+                    return batch
+                if self._closed:
+                    return None
+                timeout = (self.flush_interval_s - age if batch.lines
+                           else None)
+                self._condition.wait(timeout)
+
+    def _run(self) -> None:
+        """
+        Body of the flush thread.
+        """
+        while (batch := self._take_batch()) is not None:
+            self._flush(batch)
+
+    def _flush(self, batch: _Batch) -> None:
+        """
+        Writes a batch to InfluxDB in chunks of `batch_size` records and
+        resolves the futures of its writes. During an outage, or if
+        InfluxDB is unavailable, the records left are spooled instead.
+        """
+        if self._spool is not None and self._spool.outage:
+            self._spill(batch, 0, {})
+            return
+        start = time.perf_counter()
+        rejected: Dict[int, Exception] = {}
+        written = 0
+        try:
+            for i in range(0, len(batch.lines), self.batch_size):
+                rejected.update(
+                    (i + index, err) for index, err in
+                    write_isolating_rejections(
+                        self._write, batch.lines[i:i + self.batch_size]
+                    ).items())
+                written = i + self.batch_size
+        except Exception as err:  # pylint: disable=broad-exception-caught
+            self.metrics.failed_flushes += 1
+            logger.error("Failed to flush %d points to InfluxDB: %s",
+                         len(batch.lines), err)
+            self._spill(batch, written, rejected, err)
+            return
+        self._count_flush(len(batch.lines) - len(rejected),
+                          (time.perf_counter() - start) * 1000)
+        self._reject(rejected)
+        batch.resolve(rejected)
+
+    def _count_flush(self, points: int, elapsed_ms: float) -> None:
+        """
+        Counts a successful flush of `points` records.
+        """
+        self.metrics.flushes += 1
+        self.metrics.points_flushed += points
+        self.metrics.last_flush_ms = elapsed_ms
+        self.metrics.max_flush_ms = max(self.metrics.max_flush_ms,
+                                        elapsed_ms)
+        self.metrics.total_flush_ms += elapsed_ms
+
+    def _reject(self, rejected: Dict[int, Exception]) -> None:
+        """
+        Counts and logs the records InfluxDB rejected as invalid.
+        """
+        if rejected:
+            self.metrics.points_invalid += len(rejected)
+            logger.error("InfluxDB rejected %d points as invalid: %s",
+                         len(rejected), next(iter(rejected.values())))
+
+    def _spill(self, batch: _Batch, written: int,
+               rejected: Dict[int, Exception],
+               error: Optional[Exception] = None) -> None:
+        """
+        Spools the records of a batch from position `written`, which
+        InfluxDB did not take, starting an outage, and resolves the futures
+        of the batch's writes, failing those with records rejected before
+        the failure. Without a spool, or if it is full, the futures fail
+        with the write error instead.
+        """
+        if self._spool is None:
+            batch.fail(error)
+            return
+        lines = batch.lines[written:]
+        try:
+            self._spool.append(lines)
+        except SpoolFullError as err:
+            logger.error("Failed to spool %d points: %s", len(lines), err)
+            batch.fail(error or err)
+            return
+        if not self._spool.outage:
+            self._spool.outage = True
+            logger.warning("Spooling points until InfluxDB recovers")
+        self._reject(rejected)
+        batch.resolve(rejected)
@@ -0,0 +1,69 @@
+"""
+This module provides utilities for finding how many CPUs the process may
+use, taking the CPU quota of its container into account: in a container
+limited to 2 CPUs on a 32-core host, `os.cpu_count()` still returns 32.
+"""
+
+import math
+import os
+from pathlib import Path
+
+# Mount point of the cgroup file systems
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+
+def cgroup_cpu_limit(cgroup_root: Path = CGROUP_ROOT) -> float | None:
+    """
+    Reads the CPU quota of the process's cgroup, as a number of CPUs.
+
+    Both cgroup v2 (`cpu.max`) and cgroup v1 (`cpu.cfs_quota_us` and
+    `cpu.cfs_period_us`) are supported.
+
+    Parameters:
+    - cgroup_root (Path): The mount point of the cgroup file systems.
+
+    Returns:
+    - float | None: The number of CPUs the quota allows, e.g. 1.5, or None
+      if there is no quota or it cannot be read.
+    """
+    try:
+        quota, period = (cgroup_root / "cpu.max").read_text(
+            encoding="utf-8").split()
+    except (OSError, ValueError):
+        try:
+            quota, period = (
+                (cgroup_root / "cpu" / name).read_text(encoding="utf-8")
+                for name in ("cpu.cfs_quota_us", "cpu.cfs_period_us"))
+        except OSError:
+            return None
+    try:
+        quota_us, period_us = int(quota), int(period)
+    except ValueError:
+        # "max" in cgroup v2
+        return None
+    # -1 in cgroup v1
+    if quota_us <= 0 or period_us <= 0:
+        return None
+    return quota_us / period_us
+
+
+def available_cpus(cgroup_root: Path = CGROUP_ROOT) -> int:
+    """
+    Returns the number of CPUs the process may use: the CPUs it may be
+    scheduled on, capped by the CPU quota of its cgroup rounded up.
+
+    Parameters:
+    - cgroup_root (Path): The mount point of the cgroup file systems.
+
+    Returns:
+    - int: The number of usable CPUs, at least 1.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # not available on macOS and Windows
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit(cgroup_root)
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(cpus, 1)
@@ -1,8 +1,101 @@
 """
 This module provides utility functions for working with date and time.
+
+Time bounds of queries and deletes are parsed by `parse_time_bound`, which
+accepts:
+
+- relative durations, possibly compound: "-2h", "-1h30m", "+500ms";
+- "now()";
+- RFC3339 timestamps: "2024-11-17T00:00:00Z", "2024-11-17T01:00:00.5+01:00";
+- Unix epoch timestamps in milliseconds: "1731801600000".
+
+Parsed bounds are cached and resolved to integer nanoseconds since the Unix
+epoch, and are formatted for Flux by `to_rfc3339` without going through
+`strftime`.
 """
 
-from datetime import datetime, timezone, timedelta
+import calendar
+import functools
+import re
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, NamedTuple, Tuple
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+NANOSECONDS_PER_SECOND = 1_000_000_000
+NANOSECONDS_PER_MILLISECOND = 1_000_000
+
+# Length of each duration unit in nanoseconds. "mo" and "y" are approximate
+# (30 and 365 days, respectively).
+UNIT_NANOSECONDS = {
+    "ns": 1,
+    "us": 1_000,
+    "µs": 1_000,
+    "ms": NANOSECONDS_PER_MILLISECOND,
+    "s": NANOSECONDS_PER_SECOND,
+    "m": 60 * NANOSECONDS_PER_SECOND,
+    "h": 3_600 * NANOSECONDS_PER_SECOND,
+    "d": 86_400 * NANOSECONDS_PER_SECOND,
+    "w": 7 * 86_400 * NANOSECONDS_PER_SECOND,
+    "mo": 30 * 86_400 * NANOSECONDS_PER_SECOND,
+    "y": 365 * 86_400 * NANOSECONDS_PER_SECOND,
+}
+# A signed, possibly compound, duration such as "-1h30m"; the two-letter
+# units come first so that "ms" and "mo" are not read as "m"
+RELATIVE_TIME = re.compile(r"([+-])((?:\d+(?:ns|us|µs|ms|mo|s|m|h|d|w|y))+)")
+DURATION_PART = re.compile(r"(\d+)(ns|us|µs|ms|mo|s|m|h|d|w|y)")
+RFC3339_TIME = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})[Tt ](\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,9}))?"
+    r"(?:([Zz])|([+-])(\d{2}):(\d{2}))")
+EPOCH_MILLISECONDS = re.compile(r"\d{1,16}")
+
+
+class TimeBound(NamedTuple):
+    """
+    A parsed time bound.
+
+    Attributes:
+    - relative (bool): Whether the bound is an offset from the current
+      time rather than an absolute time.
+    - nanoseconds (int): The offset, or the time since the Unix epoch, in
+      nanoseconds.
+    - key (str): The normalised form of the bound, interned: "now",
+      "<signed offset>ns" (e.g. "-5400000000000ns" for both "-1h30m" and
+      "-90m") or "@<time since the epoch>ns".
+    """
+    relative: bool
+    nanoseconds: int
+    key: str
+
+    def resolve(self, now_ns: int) -> int:
+        """
+        Resolves the bound to an absolute time.
+
+        Parameters:
+        - now_ns (int): The current time, in nanoseconds since the epoch.
+
+        Returns:
+        - int: The time, in nanoseconds since the Unix epoch.
+        """
+        if self.relative:
+            return now_ns + self.nanoseconds
+        return self.nanoseconds
+
+
+class TimeRange(NamedTuple):
+    """
+    A time range resolved to absolute times.
+
+    Attributes:
+    - start_ns (int): Start of the range, in nanoseconds since the epoch.
+    - stop_ns (int): Stop of the range, in nanoseconds since the epoch.
+    - key (str): The normalised form of the range, interned; the same for
+      equivalent spellings of relative ranges, whatever the current time.
+    """
+    start_ns: int
+    stop_ns: int
+    key: str
 
 
 def utc_now_timestamp() -> int:
@@ -12,7 +105,194 @@ def utc_now_timestamp() -> int:
     Returns:
         int: The current UTC timestamp in milliseconds since the Unix epoch.
     """
-    return int(datetime.now(timezone.utc).timestamp() * 1000)
+    return time.time_ns() // NANOSECONDS_PER_MILLISECOND
+
+
+def parse_duration_ns(duration: str) -> int:
+    """
+    Parses an unsigned, possibly compound, duration such as "1h30m".
+
+    Parameters:
+    - duration (str): The duration.
+
+    Returns:
+    - int: The duration in nanoseconds.
+
+    Raises:
+    - ValueError: If the duration cannot be parsed.
+    """
+    position = 0
+    total = 0
+    for part in DURATION_PART.finditer(duration):
+        if part.start() != position:
+            break
+        total += int(part.group(1)) * UNIT_NANOSECONDS[part.group(2)]
+        position = part.end()
+    if not duration or position != len(duration):
+        raise ValueError(f"Unsupported time unit in duration {duration!r}")
+    return total
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_time_bound(time_str: str) -> TimeBound:
+    """
+    Parses a time bound: a relative duration, "now()", an RFC3339 timestamp
+    or a Unix epoch timestamp in milliseconds. Results are cached, as the
+    same few bounds are requested over and over.
+
+    Parameters:
+    - time_str (str): The time bound.
+
+    Returns:
+    - TimeBound: The parsed bound.
+
+    Raises:
+    - ValueError: If the bound cannot be parsed.
+    """
+    if time_str == "now()":
+        return TimeBound(True, 0, sys.intern("now"))
+    relative = RELATIVE_TIME.fullmatch(time_str)
+    if relative is not None:
+        offset = parse_duration_ns(relative.group(2))
+        if relative.group(1) == "-":
+            offset = -offset
+        return TimeBound(True, offset, sys.intern(f"{offset:+d}ns"))
+    if time_str[:1] in {"-", "+"}:
+        raise ValueError(f"Unsupported time unit in {time_str!r}")
+    if EPOCH_MILLISECONDS.fullmatch(time_str):
+        nanoseconds = int(time_str) * NANOSECONDS_PER_MILLISECOND
+    else:
+        nanoseconds = _parse_rfc3339(time_str)
+    return TimeBound(False, nanoseconds, sys.intern(f"@{nanoseconds}ns"))
+
+
+def _parse_rfc3339(time_str: str) -> int:
+    """
+    Parses an RFC3339 timestamp, keeping nanoseconds, into nanoseconds since
+    the Unix epoch.
+    """
+    match = RFC3339_TIME.fullmatch(time_str)
+    if match is None:
+        raise ValueError(f"Invalid time {time_str!r}, expected a relative "
+                         f"duration, now(), an RFC3339 time or epoch "
+                         f"milliseconds")
+    year, month, day, hour, minute, second = map(int, match.group(1, 2, 3,
+                                                                 4, 5, 6))
+    # validates the date, e.g. rejects February 30
+    datetime(year, month, day, hour, minute, second)
+    seconds = calendar.timegm((year, month, day, hour, minute, second))
+    if match.group(9) is not None:
+        offset = int(match.group(10)) * 3600 + int(match.group(11)) * 60
+        seconds -= offset if match.group(9) == "+" else -offset
+    fraction = match.group(7) or ""
+    return seconds * NANOSECONDS_PER_SECOND + int(fraction.ljust(9, "0"))
+
+
+def parse_time_range(start_time: str, stop_time: str,
+                     now_ns: int | None = None) -> TimeRange:
+    """
+    Parses the bounds of a time range and resolves them to absolute times.
+
+    Parameters:
+    - start_time (str): The start of the range (e.g. "-1h30m").
+    - stop_time (str): The stop of the range (e.g. "now()").
+    - now_ns (int | None): The time relative bounds are measured from, in
+      nanoseconds since the epoch; the current time if None.
+
+    Returns:
+    - TimeRange: The resolved range and its normalised key.
+
+    Raises:
+    - ValueError: If a bound cannot be parsed.
+    """
+    start = parse_time_bound(start_time)
+    stop = parse_time_bound(stop_time)
+    if now_ns is None:
+        now_ns = time.time_ns()
+    return TimeRange(start.resolve(now_ns), stop.resolve(now_ns),
+                     _range_key(start.key, stop.key))
+
+
+@functools.lru_cache(maxsize=1024)
+def _range_key(start_key: str, stop_key: str) -> str:
+    """
+    Builds the interned key of a range from the keys of its bounds.
+    """
+    return sys.intern(f"{start_key}|{stop_key}")
+
+
+def split_range(time_range: TimeRange,
+                chunk_ns: int) -> List[Tuple[int, int]]:
+    """
+    Splits a time range into consecutive chunks, oldest first, each
+    sharing its stop with the start of the next.
+
+    Parameters:
+    - time_range (TimeRange): The range.
+    - chunk_ns (int): The maximum length of a chunk, in nanoseconds.
+
+    Returns:
+    - List[Tuple[int, int]]: The start and stop of each chunk, in
+      nanoseconds since the epoch; a single chunk for an empty range.
+    """
+    bounds = list(range(time_range.start_ns, time_range.stop_ns, chunk_ns))
+    return list(zip(bounds, bounds[1:] + [time_range.stop_ns])) or [
+        (time_range.start_ns, time_range.stop_ns)]
+
+
+def to_rfc3339(nanoseconds: int, digits: int = 9) -> str:
+    """
+    Formats a time as an RFC3339 UTC timestamp, as accepted by Flux.
+
+    Parameters:
+    - nanoseconds (int): The time, in nanoseconds since the Unix epoch.
+    - digits (int): The number of fractional second digits, from 0 to 9.
+
+    Returns:
+    - str: The timestamp, e.g. "2024-11-17T00:00:00.000000000Z".
+    """
+    seconds, fraction = divmod(nanoseconds, NANOSECONDS_PER_SECOND)
+    text = _format_second(seconds)
+    if digits:
+        return f"{text}.{fraction:09d}"[:len(text) + digits + 1] + "Z"
+    return text + "Z"
+
+
+@functools.lru_cache(maxsize=256)
+def _format_second(seconds: int) -> str:
+    """
+    Formats a whole second as "YYYY-MM-DDTHH:MM:SS". Cached, as the bounds
+    of concurrent requests mostly fall within the same few seconds.
+    """
+    moment = time.gmtime(seconds)
+    return (f"{moment.tm_year:04d}-{moment.tm_mon:02d}-{moment.tm_mday:02d}"
+            f"T{moment.tm_hour:02d}:{moment.tm_min:02d}:{moment.tm_sec:02d}")
+
+
+def to_datetime(nanoseconds: int) -> datetime:
+    """
+    Converts a time to a UTC datetime, truncated to the microsecond.
+
+    Parameters:
+    - nanoseconds (int): The time, in nanoseconds since the Unix epoch.
+
+    Returns:
+    - datetime: The time as a timezone-aware datetime.
+    """
+    return EPOCH + timedelta(microseconds=nanoseconds // 1000)
+
+
+def from_datetime(value: datetime) -> int:
+    """
+    Converts a timezone-aware datetime to a time in nanoseconds.
+
+    Parameters:
+    - value (datetime): The time.
+
+    Returns:
+    - int: The time, in nanoseconds since the Unix epoch.
+    """
+    return (value - EPOCH) // timedelta(microseconds=1) * 1000
 
 
 def parse_relative_time(time_str: str) -> timedelta:
@@ -20,53 +300,33 @@ def parse_relative_time(time_str: str) -> timedelta:
     Parses a relative time string into a `timedelta` object.
 
     This function converts a time duration string (e.g.,
-    "-5m", "-2h", "-3d", "-1mo") into a `timedelta` object for easy
-    manipulation of time intervals. Supported units include milliseconds
-    ("ms"), seconds ("s"), minutes ("m"), hours ("h"), days ("d"), weeks ("w"),
-    months ("mo"), and years ("y"). Note that "mo" and "y" are approximate
-    (30 and 365 days, respectively).
+    "-5m", "-2h", "-3d", "-1mo", "-1h30m") into a `timedelta` object for
+    easy manipulation of time intervals. Supported units include
+    nanoseconds ("ns"), microseconds ("us"), milliseconds ("ms"), seconds
+    ("s"), minutes ("m"), hours ("h"), days ("d"), weeks ("w"), months
+    ("mo"), and years ("y"). Note that "mo" and "y" are approximate (30 and
+    365 days, respectively).
 
     Parameters:
-    - time_str (str): A string representing the relative time,
-                      where the last character(s) indicate the unit.
+    - time_str (str): A string representing the relative time, starting
+                      with its sign.
 
     Returns:
-    - timedelta: The corresponding `timedelta` object for the parsed time.
+    - timedelta: The length of the duration, regardless of its sign.
 
     Raises:
     - ValueError: If the provided time unit is unsupported.
     """
-    # Mapping of units to timedelta arguments
-    unit_mapping = {
-        "ms": "milliseconds",
-        "s": "seconds",
-        "m": "minutes",
-        "h": "hours",
-        "d": "days",
-        "w": "weeks",
-        "mo": 30 * 86400,  # 30 days in seconds for approximation
-        "y": 365 * 86400  # 365 days in seconds for approximation
-    }
-
-    # Extract the unit and amount
-    unit = time_str[-2:] if time_str[-2:] in {"mo", "ms"} else time_str[-1]
-    amount = int(time_str[1:-len(unit)])
-
-    # Handle approximate units for months and years separately
-    if unit in {"mo", "y"}:
-        delta = timedelta(seconds=amount * unit_mapping[unit])
-    elif unit in unit_mapping:
-        delta = timedelta(**{unit_mapping[unit]: amount})
-    else:
-        raise ValueError("Unsupported time unit")
-
-    return delta
+    bound = parse_time_bound(time_str)
+    if not bound.relative:
+        raise ValueError(f"Unsupported time unit in {time_str!r}")
+    return timedelta(microseconds=abs(bound.nanoseconds) // 1000)
 
 
 def calculate_start_stop_times(start_time: str,
                                stop_time: str) -> tuple[str, str]:
     """
-    Calculates the start and stop times based on relative time strings.
+    Calculates the start and stop times of a time range.
 
     Args:
         start_time (str): The start time range (e.g., "-2h").
@@ -74,17 +334,32 @@ def calculate_start_stop_times(start_time: str,
 
     Returns:
         tuple[str, str]: The calculated start and stop times in
-            RFC3339Nano format without timezone effect.
+            RFC3339 format with milliseconds, in UTC.
+
+    Raises:
+        ValueError: If a bound cannot be parsed.
     """
-    # Get the current UTC time as a datetime object
-    now = datetime.now(timezone.utc)
+    time_range = parse_time_range(start_time, stop_time)
+    return (to_rfc3339(time_range.start_ns, digits=3),
+            to_rfc3339(time_range.stop_ns, digits=3))
 
-    # Calculate start and stop times based on relative ranges
-    start_time = now - parse_relative_time(start_time)
-    stop_time = now - parse_relative_time(stop_time)
 
-    # Format the times as RFC3339Nano (no offset)
-    start_time_str = start_time.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
-    stop_time_str = stop_time.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+def range_duration(start_time: str, stop_time: str) -> timedelta:
+    """
+    Calculates the length of a time range given as Flux time bounds.
 
-    return start_time_str, stop_time_str
+    Args:
+        start_time (str): The start of the range (e.g., "-2h").
+        stop_time (str): The stop of the range (e.g., "now()").
+
+    Returns:
+        timedelta: The length of the range.
+
+    Raises:
+        ValueError: If a bound cannot be parsed or the range is empty.
+    """
+    time_range = parse_time_range(start_time, stop_time)
+    duration_ns = time_range.stop_ns - time_range.start_ns
+    if duration_ns <= 0:
+        raise ValueError("start_time must be before stop_time")
+    return timedelta(microseconds=duration_ns // 1000)
@@ -0,0 +1,84 @@
+"""
+This module provides downsampling functions for time series, used to reduce
+query results to the number of points a chart can actually display.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List
+
+
+def lttb(points: List[Dict[str, Any]], threshold: int) -> List[Dict[str, Any]]:
+    """
+    Downsamples a time series with the Largest-Triangle-Three-Buckets
+    algorithm.
+
+    The first and last points are kept; the points in between are split
+    into `threshold - 2` buckets, and from each bucket the point forming the
+    largest triangle with the previously selected point and the average of
+    the next bucket is kept. Unlike averaging, this preserves the visual
+    shape of the series, including its peaks and troughs.
+
+    Parameters:
+    - points (List[Dict[str, Any]]): Data points in the format
+        {"time": datetime, "value": number}, sorted by time in either order.
+    - threshold (int): The number of points to keep (at least 3).
+
+    Returns:
+    - List[Dict[str, Any]]: The selected points, in their original order.
+    """
+    if threshold >= len(points) or threshold < 3:
+        return points
+    selected = lttb_indices([to_seconds(point["time"]) for point in points],
+                            [point["value"] for point in points], threshold)
+    return [points[i] for i in selected]
+
+
+def lttb_indices(times: List[float], values: List[float],
+                 threshold: int) -> List[int]:
+    """
+    Selects the points of a time series given as columns with the
+    Largest-Triangle-Three-Buckets algorithm (see `lttb`).
+
+    Parameters:
+    - times (List[float]): The time of each point, as a number.
+    - values (List[float]): The value of each point.
+    - threshold (int): The number of points to keep (at least 3).
+
+    Returns:
+    - List[int]: The indices of the selected points, in ascending order.
+    """
+    if threshold >= len(times) or threshold < 3:
+        return list(range(len(times)))
+
+    bucket_size = (len(times) - 2) / (threshold - 2)
+
+    selected = [0]
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        # average of the next bucket (the last point for the final bucket)
+        next_end = min(int((bucket + 2) * bucket_size) + 1, len(times))
+        next_end = max(next_end, end + 1)
+        avg_x = sum(times[end:next_end]) / (next_end - end)
+        avg_y = sum(values[end:next_end]) / (next_end - end)
+
+        prev_x, prev_y = times[selected[-1]], values[selected[-1]]
+        areas = [abs((prev_x - avg_x) * (values[i] - prev_y)
+                     - (prev_x - times[i]) * (avg_y - prev_y))
+                 for i in range(start, end)]
+        selected.append(start + areas.index(max(areas)))
+    selected.append(len(times) - 1)
+    return selected
+
+
+def to_seconds(value: Any) -> float:
+    """
+    Converts a time value to seconds so that it can be used as a coordinate.
+
+    Parameters:
+    - value (Any): A datetime or a number.
+
+    Returns:
+    - float: The time in seconds.
+    """
+    return value.timestamp() if isinstance(value, datetime) else float(value)
@@ -0,0 +1,168 @@
+"""
+This module provides utilities for splitting a streamed request body into
+individual JSON documents without materialising the whole body, so that
+large bulk uploads can be validated record by record as they arrive.
+"""
+
+import re
+from typing import List, Tuple
+
+# Tokens that matter outside and inside a JSON string, respectively
+STRUCTURAL_TOKEN = re.compile(rb'["\[\]{},]')
+STRING_TOKEN = re.compile(rb'\\.|"', re.DOTALL)
+
+
+class JsonDocumentSplitter:  # pylint: disable=too-many-instance-attributes
+    """
+    Incrementally splits a body holding either a JSON array of objects or
+    newline-delimited JSON (NDJSON) into the raw bytes of its documents.
+
+    The format is detected from the first non-whitespace byte: "[" starts a
+    JSON array, anything else is read as NDJSON. Only the bytes of the
+    document being scanned are kept in memory.
+
+    Every document is returned with its position: the line number for
+    NDJSON and the 1-based element index for a JSON array.
+    """
+
+    def __init__(self):
+        """
+        Initializes the JsonDocumentSplitter instance.
+        """
+        self._buffer = bytearray()
+        self._is_array = None
+        self._position = 0
+        # array scanner state
+        self._scan_pos = 0
+        self._element_start = 0
+        self._depth = 0
+        self._in_string = False
+        self._done = False
+        self._trailing_data = False
+
+    def feed(self, chunk: bytes) -> List[Tuple[int, bytes]]:
+        """
+        Adds a chunk of the body and returns the documents it completes.
+
+        Parameters:
+        - chunk (bytes): The next chunk of the request body.
+
+        Returns:
+        - List[Tuple[int, bytes]]: The position and raw bytes of each
+          completed document.
+
+        Raises:
+        - ValueError: If the body is not a well-formed JSON array.
+        """
+        self._buffer.extend(chunk)
+        if self._is_array is None:
+            stripped = self._buffer.lstrip()
+            if not stripped:
+                return []
+            self._is_array = stripped[:1] == b"["
+        if self._is_array:
+            return self._split_array()
+        return self._split_lines(final=False)
+
+    def close(self) -> List[Tuple[int, bytes]]:
+        """
+        Signals the end of the body and returns the last documents.
+
+        Returns:
+        - List[Tuple[int, bytes]]: The position and raw bytes of each
+          remaining document.
+
+        Raises:
+        - ValueError: If a JSON array body is not terminated, or is
+          followed by anything but whitespace.
+        """
+        if self._is_array:
+            if not self._done:
+                raise ValueError("Unterminated JSON array")
+            if self._trailing_data:
+                raise ValueError("Unexpected data after the JSON array")
+            return []
+        return self._split_lines(final=True)
+
+    def _split_lines(self, final: bool) -> List[Tuple[int, bytes]]:
+        """
+        Returns the complete NDJSON lines in the buffer, and the trailing
+        partial line as well when `final` is set.
+        """
+        lines = self._buffer.split(b"\n")
+        self._buffer = bytearray() if final else lines.pop()
+        documents = []
+        for line in lines:
+            self._position += 1
+            if line.strip():
+                documents.append((self._position, bytes(line)))
+        return documents
+
+    def _split_array(self) -> List[Tuple[int, bytes]]:
+        """
+        Scans the buffer for the elements of the top-level JSON array and
+        returns those that are complete.
+        """
+        documents = []
+        buffer = self._buffer
+        while not self._done:
+            token = (STRING_TOKEN if self._in_string
+                     else STRUCTURAL_TOKEN).search(buffer, self._scan_pos)
+            if token is None:
+                # a lone trailing backslash escapes the next chunk's byte
+                lone_backslash = (self._in_string and buffer.endswith(b"\\")
+                                  and self._scan_pos < len(buffer))
+                self._scan_pos = len(buffer) - lone_backslash
+                break
+            self._scan_pos = token.end()
+            document = self._consume(token.group())
+            if document:
+                self._position += 1
+                documents.append((self._position, document))
+        if self._done:
+            # only whitespace may follow the array
+            self._trailing_data |= bool(buffer[self._scan_pos:].strip())
+            buffer.clear()
+            self._scan_pos = self._element_start = 0
+            return documents
+        # drop the bytes of the documents already returned
+        del buffer[:self._element_start]
+        self._scan_pos -= self._element_start
+        self._element_start = 0
+        return documents
+
+    def _take_element(self) -> bytes:
+        """
+        Returns the element ending before the token just scanned, and moves
+        the element start past that token.
+        """
+        element = bytes(
+            self._buffer[self._element_start:self._scan_pos - 1]).strip()
+        self._element_start = self._scan_pos
+        return element
+
+    def _consume(self, token: bytes) -> bytes | None:
+        """
+        Updates the scanner state for a token and returns the element it
+        completes, if any.
+        """
+        if token == b'"' or self._in_string:
+            # a quote, or an escape sequence inside a string
+            self._in_string ^= token == b'"'
+        elif token in b"[{":
+            self._depth += 1
+            if self._depth == 1:
+                self._element_start = self._scan_pos
+        elif token in b"]}":
+            self._depth -= 1
+            if self._depth == 0:
+                if token != b"]":
+                    raise ValueError("Malformed JSON array")
+                self._done = True
+                return self._take_element() or None
+        elif self._depth == 1:  # a comma between two elements
+            element = self._take_element()
+            if not element:
+                raise ValueError("Malformed JSON array")
+            return element
+        return None
@@ -0,0 +1,99 @@
+"""
+This module provides functions serialising battery readings to InfluxDB
+line protocol directly, without building a `Point` for every reading.
+
+The output is the same as `Point.to_line_protocol`: the battery ID tag is
+escaped the same way, and left out if empty, and the fields are written in
+alphabetical order, as integers, since every field of `BatteryData` is an
+integer.
+"""
+
+import re
+from typing import Optional, Tuple
+
+from src.models.battery import BatteryData
+
+# Characters escaped in tag values, as done by the InfluxDB client
+TAG_ESCAPES = str.maketrans({
+    ",": r"\,",
+    "=": r"\=",
+    " ": r"\ ",
+    "\n": r"\n",
+    "\t": r"\t",
+    "\r": r"\r",
+})
+# A record written by battery_line: its escaped battery ID and timestamp
+BATTERY_LINE = re.compile(
+    r"battery_data,battery_id=((?:[^\\ ]|\\.)+) \S+ (\d+)")
+# Escape sequences of tag values and the characters they stand for
+TAG_UNESCAPES = re.compile(r"\\([,= ntr])")
+UNESCAPED = {",": ",", "=": "=", " ": " ", "n": "\n", "t": "\t", "r": "\r"}
+
+
+def escape_tag_value(value: str) -> str:
+    """
+    Escapes a line protocol tag value.
+
+    Parameters:
+    - value (str): The tag value.
+
+    Returns:
+    - str: The escaped value; a trailing backslash is followed by a space
+      so that it does not escape the separator after it.
+    """
+    escaped = value.translate(TAG_ESCAPES)
+    if escaped.endswith("\\"):
+        escaped += " "
+    return escaped
+
+
+def battery_line(reading: BatteryData, inserted_at: int) -> str:
+    """
+    Serialises a battery reading to a line protocol record of the
+    battery_data measurement, timestamped with the reading's own timestamp
+    if it has one and the insertion time otherwise.
+
+    Parameters:
+    - reading (BatteryData): The validated reading.
+    - inserted_at (int): The insertion time in milliseconds, also written
+      as the influx_timestamp field.
+
+    Returns:
+    - str: The line protocol record, with a millisecond timestamp.
+    """
+    timestamp = reading.timestamp
+    # an empty tag value is invalid line protocol, and left out by Point
+    tag = (f",battery_id={escape_tag_value(reading.battery_id)}"
+           if reading.battery_id else "")
+    return (f"battery_data{tag}"
+            f" current={reading.current}i"
+            f",influx_timestamp={inserted_at}i"
+            f",latency_ms=0i"
+            f",state_of_charge={reading.state_of_charge}i"
+            f",state_of_health={reading.state_of_health}i"
+            f",temperature={reading.temperature}i"
+            f",voltage={reading.voltage}i"
+            f" {inserted_at if timestamp is None else timestamp}")
+
+
+def parse_battery_line(line: str) -> Optional[Tuple[str, int]]:
+    """
+    Parses back the battery ID and timestamp of a record written by
+    `battery_line`.
+
+    Parameters:
+    - line (str): The line protocol record.
+
+    Returns:
+    - Optional[Tuple[str, int]]: The battery ID and the timestamp in
+      milliseconds, or None if the record is not one of `battery_line`.
+    """
+    match = BATTERY_LINE.fullmatch(line)
+    if match is None:
+        return None
+    escaped = match.group(1)
+    # a trailing backslash is followed by a space, see escape_tag_value
+    if escaped.endswith("\\ "):
+        escaped = escaped[:-1]
+    battery_id = TAG_UNESCAPES.sub(lambda m: UNESCAPED[m.group(1)], escaped)
+    return battery_id, int(match.group(2))
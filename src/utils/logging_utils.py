@@ -0,0 +1,136 @@
+"""
+This module provides the building blocks of the service's logging: the
+request ID context carried by every record logged while serving a request,
+a filter rate-limiting high-frequency records, and a JSON formatter.
+"""
+
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+
+from src.utils.datetime_utils import NANOSECONDS_PER_SECOND, to_rfc3339
+
+# ID of the request being served, set by the request context middleware
+REQUEST_ID: ContextVar[Optional[str]] = ContextVar("request_id",
+                                                   default=None)
+
+# Extra marking a high-frequency record, e.g. one logged per data point, as
+# subject to the rate limit: logger.info("...", extra=SAMPLED). A hashable
+# value other than True rate-limits the records of each value separately
+SAMPLED = {"sampled": True}
+
+# Attributes of every LogRecord, which are not extra fields
+RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {
+    "message", "asctime", "taskName", "sampled"}
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Adds the ID of the request being served, if any, to the records as
+    `request_id`. It must run in the thread logging the record, as the ID
+    is read from the caller's context.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """
+        Adds the request ID to a record.
+
+        Parameters:
+        - record (logging.LogRecord): The record.
+
+        Returns:
+        - bool: Always True.
+        """
+        record.request_id = REQUEST_ID.get()
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Limits the records logged with the SAMPLED extra to `per_second` per
+    second for each message and value of the extra, so that records logged
+    per data point do not flood the output at high ingest rates. The first
+    record let through after some were dropped reports their number as
+    `suppressed`. Other records are always let through.
+    """
+
+    def __init__(self, per_second: int):
+        """
+        Initializes the RateLimitFilter instance.
+
+        Parameters:
+        - per_second (int): Records let through per second and key, or 0
+          for no limit.
+        """
+        super().__init__()
+        self.per_second = per_second
+        # (second, records let through, records dropped) per logger,
+        # message and value of the SAMPLED extra
+        self._windows: Dict[Tuple[str, Any, Any],
+                            Tuple[int, int, int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        """
+        Decides whether a record is logged.
+
+        Parameters:
+        - record (logging.LogRecord): The record.
+
+        Returns:
+        - bool: False if the record is dropped.
+        """
+        sampled = getattr(record, "sampled", False)
+        if not self.per_second or not sampled:
+            return True
+        key = (record.name, record.msg, sampled)
+        second = int(time.monotonic())
+        with self._lock:
+            window, passed, dropped = self._windows.get(key, (second, 0, 0))
+            if window != second:
+                window, passed = second, 0
+            if passed >= self.per_second:
+                self._windows[key] = (window, passed, dropped + 1)
+                return False
+            self._windows[key] = (window, passed + 1, 0)
+        if dropped:
+            record.suppressed = dropped
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as single-line JSON objects with the time (RFC3339, in
+    UTC), level, logger and message, followed by the request ID and the
+    extra fields of the record, e.g. timings, and the traceback if any.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        Formats a record.
+
+        Parameters:
+        - record (logging.LogRecord): The record.
+
+        Returns:
+        - str: The JSON object.
+        """
+        document = {
+            "time": to_rfc3339(int(record.created * NANOSECONDS_PER_SECOND),
+                               digits=3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and value is not None:
+                document[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            document["exc_info"] = record.exc_text
+        return orjson.dumps(document, default=str).decode()
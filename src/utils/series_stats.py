@@ -0,0 +1,229 @@
+"""
+This module computes summary statistics of battery time series with NumPy,
+over the columns of a query result: the distribution of every field, its
+rate of change, the time it spent outside the ranges of
+DataValidationConfig, and the energy charged and discharged.
+
+The series are sampled at irregular intervals, so time-weighted statistics
+hold every value until the next data point, and the energy is integrated
+with the trapezoidal rule.
+
+The data points of a battery are collected into typed arrays by
+SeriesColumns as they are read from InfluxDB, so that a range of millions
+of points takes 8 bytes per value rather than a Python object each.
+"""
+
+import math
+from array import array
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config.validation import DataValidationConfig
+from src.utils.datetime_utils import NANOSECONDS_PER_SECOND
+
+# Nanoseconds per hour, for the energy integration
+NANOSECONDS_PER_HOUR = 3_600 * NANOSECONDS_PER_SECOND
+# Fields the energy is integrated from
+ENERGY_FIELDS = ("voltage", "current", "state_of_charge")
+
+
+def validation_bounds(field: str) -> Optional[Tuple[float, float]]:
+    """
+    Returns the range DataValidationConfig allows for a field.
+
+    Parameters:
+    - field (str): The field, e.g. "voltage".
+
+    Returns:
+    - Optional[Tuple[float, float]]: The minimum and maximum, or None if
+      the field has no range.
+    """
+    rules = getattr(DataValidationConfig, field.upper(), {})
+    if "min" not in rules or "max" not in rules:
+        return None
+    return rules["min"], rules["max"]
+
+
+def field_stats(times_ns: np.ndarray, values: np.ndarray,
+                percentiles: List[float],
+                bounds: Optional[Tuple[float, float]] = None
+                ) -> Dict[str, Any]:
+    """
+    Summarises a field of a battery.
+
+    Parameters:
+    - times_ns (np.ndarray): The times of the data points, in nanoseconds
+      since the epoch, sorted in ascending order.
+    - values (np.ndarray): The values of the field, NaN where missing.
+    - percentiles (List[float]): The percentiles to compute.
+    - bounds (Optional[Tuple[float, float]]): The range the values should
+      stay in, if any.
+
+    Returns:
+    - Dict[str, Any]: The "count" of values, and if any, their "min",
+      "max", "mean", "std" (population standard deviation), "percentiles"
+      keyed by "p<percentile>", the "rate_per_s" of change ("mean" over the
+      range, "min" and "max" between two data points, None with fewer than
+      two data points) and, with `bounds`, the seconds spent above the
+      maximum and below the minimum.
+    """
+    present = ~np.isnan(values)
+    times_ns, values = times_ns[present], values[present]
+    if values.size == 0:
+        return {"count": 0}
+    stats: Dict[str, Any] = {
+        "count": len(values),
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+        "percentiles": dict(zip(
+            (f"p{percentile:g}" for percentile in percentiles),
+            np.percentile(values, percentiles).tolist())),
+        "rate_per_s": _rate_of_change(times_ns, values),
+    }
+    if bounds is not None:
+        # every value holds until the next data point
+        held_s = np.diff(times_ns) / NANOSECONDS_PER_SECOND
+        low, high = bounds
+        stats["time_above_max_s"] = float(held_s[values[:-1] > high].sum())
+        stats["time_below_min_s"] = float(held_s[values[:-1] < low].sum())
+    return stats
+
+
+def _rate_of_change(times_ns: np.ndarray,
+                    values: np.ndarray) -> Optional[Dict[str, float]]:
+    """
+    Returns the mean rate of change of a series over its time range, and
+    the extreme rates between two consecutive data points, per second.
+    """
+    elapsed_ns = np.diff(times_ns)
+    distinct = elapsed_ns > 0
+    if not distinct.any():
+        return None
+    rates = (np.diff(values)[distinct]
+             / (elapsed_ns[distinct] / NANOSECONDS_PER_SECOND))
+    span_s = (times_ns[-1] - times_ns[0]) / NANOSECONDS_PER_SECOND
+    return {"mean": float((values[-1] - values[0]) / span_s),
+            "min": float(rates.min()),
+            "max": float(rates.max())}
+
+
+def energy_stats(times_ns: np.ndarray, voltage: np.ndarray,
+                 current: np.ndarray,
+                 state_of_charge: np.ndarray) -> Dict[str, float]:
+    """
+    Integrates the power of a battery, voltage times current, over time.
+
+    The current is reported as a magnitude, so an interval between two
+    data points counts as charging when the state of charge rises over it,
+    and as discharging when it falls. Intervals without a change of the
+    state of charge only count towards the throughput.
+
+    Parameters:
+    - times_ns (np.ndarray): The times of the data points, in nanoseconds
+      since the epoch, sorted in ascending order.
+    - voltage (np.ndarray): The voltage, in volts, NaN where missing.
+    - current (np.ndarray): The current, in amperes, NaN where missing.
+    - state_of_charge (np.ndarray): The state of charge, in percent, NaN
+      where missing.
+
+    Returns:
+    - Dict[str, float]: The energy charged, discharged and moved in total,
+      in kWh, as "charge_kwh", "discharge_kwh" and "throughput_kwh".
+    """
+    present = ~(np.isnan(voltage) | np.isnan(current)
+                | np.isnan(state_of_charge))
+    times_ns, state_of_charge = times_ns[present], state_of_charge[present]
+    power_kw = voltage[present] * current[present] / 1000
+    energy_kwh = ((power_kw[:-1] + power_kw[1:]) / 2
+                  * np.diff(times_ns) / NANOSECONDS_PER_HOUR)
+    direction = np.sign(np.diff(state_of_charge))
+    return {"charge_kwh": float(energy_kwh[direction > 0].sum()),
+            "discharge_kwh": float(energy_kwh[direction < 0].sum()),
+            "throughput_kwh": float(energy_kwh.sum())}
+
+
+def battery_stats(times_ns: np.ndarray, columns: Dict[str, np.ndarray],
+                  percentiles: List[float]) -> Dict[str, Any]:
+    """
+    Summarises every field of a battery, with the time spent outside the
+    range DataValidationConfig allows, and integrates its energy if its
+    voltage, current and state of charge are among the fields.
+
+    Parameters:
+    - times_ns (np.ndarray): The times of the data points, in nanoseconds
+      since the epoch, sorted in ascending order.
+    - columns (Dict[str, np.ndarray]): The values of every field, NaN where
+      missing, keyed by field.
+    - percentiles (List[float]): The percentiles to compute.
+
+    Returns:
+    - Dict[str, Any]: The statistics, in the format {"fields": {"<field>":
+      {...}, ...}, "energy": {...}}, see `field_stats` and
+      `energy_stats`; "energy" is only set when it can be integrated.
+    """
+    stats: Dict[str, Any] = {"fields": {
+        field: field_stats(times_ns, values, percentiles,
+                           validation_bounds(field))
+        for field, values in columns.items()}}
+    if all(field in columns for field in ENERGY_FIELDS):
+        stats["energy"] = energy_stats(
+            times_ns, *(columns[field] for field in ENERGY_FIELDS))
+    return stats
+
+
+class SeriesColumns:
+    """
+    The data points of a battery, collected column by column.
+
+    Attributes:
+    - fields (List[str]): The fields collected.
+    """
+
+    def __init__(self, fields: List[str]):
+        """
+        Initializes the SeriesColumns instance, empty.
+
+        Parameters:
+        - fields (List[str]): The fields collected.
+        """
+        self.fields = fields
+        self._times = array("q")
+        self._columns = {field: array("d") for field in fields}
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    def append(self, time_ns: int, values: Sequence[Optional[float]]) -> None:
+        """
+        Adds a data point.
+
+        Parameters:
+        - time_ns (int): The time of the data point, in nanoseconds since
+          the epoch.
+        - values (Sequence[Optional[float]]): The values of the fields, in
+          the order of `fields`, None where missing.
+        """
+        self._times.append(time_ns)
+        for field, value in zip(self.fields, values):
+            self._columns[field].append(math.nan if value is None else value)
+
+    def stats(self, percentiles: List[float]) -> Dict[str, Any]:
+        """
+        Summarises the data points collected; see `battery_stats`.
+
+        Parameters:
+        - percentiles (List[float]): The percentiles to compute.
+
+        Returns:
+        - Dict[str, Any]: The statistics of the battery.
+        """
+        times_ns = np.frombuffer(self._times, dtype=np.int64)
+        order = np.argsort(times_ns, kind="stable")
+        return battery_stats(
+            times_ns[order],
+            {field: np.frombuffer(column, dtype=np.float64)[order]
+             for field, column in self._columns.items()},
+            percentiles)
@@ -0,0 +1,521 @@
+"""
+Unit tests for the application lifecycle.
+"""
+
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from influxdb_client.rest import ApiException
+from benchmarks.bench_startup import IMPORT_BUDGET_S, READY_BUDGET_S, \
+    measure_import, measure_ready
+from src.api.app import create_app
+from src.config.admission import AdmissionConfig
+from src.config.db import DbConfig
+from src.config.rollups import RollupConfig
+from src.config.write_buffer import WriteBufferConfig
+
+
+@pytest.mark.app
+def test_starts_without_influxdb(monkeypatch):
+    """
+    Test that the application starts and serves requests without waiting
+    for InfluxDB, and creates its InfluxManager in the lifespan.
+    """
+    # nothing listens on the discard port
+    monkeypatch.setattr(DbConfig, "INFLUX_URL", "http://127.0.0.1:9")
+    monkeypatch.setattr(DbConfig, "INFLUX_RETRIES", 0)
+    app = create_app()
+    with TestClient(app) as client:
+        response = client.get("/batteryData/healthCheck")
+        assert response.status_code == 200
+        assert app.state.influx_manager.connection is not None
+
+
+@pytest.mark.app
+def test_latest_values_are_seeded_and_updated(fake):
+    """
+    Test that /latest serves the readings found in InfluxDB at startup and
+    those written since.
+    """
+    now = int(time.time() * 1000)
+    fake.write(f"battery_data,battery_id=1 voltage=450,current=50 {now}")
+    reading = {"battery_id": "2", "voltage": 460, "current": 60,
+               "temperature": 25, "state_of_charge": 80,
+               "state_of_health": 90}
+
+    with TestClient(create_app()) as client:
+        client.post("/batteryData/add", json=reading)
+        for _ in range(50):
+            latest = client.get("/batteryData/latest").json()
+            if "1" in latest:
+                break
+            time.sleep(0.01)
+        single = client.get("/batteryData/latest",
+                            params={"battery_id": "2"}).json()
+
+    assert latest["1"]["voltage"] == 450
+    assert latest["2"]["voltage"] == 460
+    assert single.keys() == {"2"}
+    assert single["2"]["state_of_charge"] == 80
+
+
+@pytest.mark.app
+def test_live_websocket_receives_new_readings(fake):  # pylint: disable=unused-argument
+    """
+    Test that a WebSocket subscriber receives the readings written to its
+    battery.
+    """
+    reading = {"battery_id": "3", "voltage": 460, "current": 60,
+               "temperature": 25, "state_of_charge": 80,
+               "state_of_health": 90}
+
+    with TestClient(create_app()) as client, client.websocket_connect(
+            "/batteryData/live/ws?battery_id=3&field=voltage") as websocket:
+        client.post("/batteryData/add", json={**reading, "battery_id": "4"})
+        client.post("/batteryData/add", json=reading)
+        message = websocket.receive_json()
+
+    assert message["battery_id"] == "3"
+    assert message["voltage"] == 460
+    assert "current" not in message
+
+
+@pytest.mark.app
+def test_live_rejects_unknown_fields(fake):  # pylint: disable=unused-argument
+    """
+    Test that subscribing to an unknown field is rejected.
+    """
+    with TestClient(create_app()) as client:
+        response = client.get("/batteryData/live",
+                              params={"field": "power"})
+
+    assert response.status_code == 400
+
+
+@pytest.mark.app
+def test_remove_runs_as_a_background_job(fake):
+    """
+    Test that /remove returns a job at once, which can be polled until the
+    data is deleted.
+    """
+    now = int(time.time() * 1000)
+    fake.write(f"battery_data,battery_id=5 voltage=450 {now - 1000}")
+
+    with TestClient(create_app()) as client:
+        response = client.delete("/batteryData/remove", params={
+            "battery_id": "5", "start_time": "-1h", "stop_time": "now()"})
+        job_id = response.json()["job_id"]
+        for _ in range(100):
+            job = client.get(f"/batteryData/jobs/{job_id}").json()
+            if job["status"] not in ("pending", "running"):
+                break
+            time.sleep(0.01)
+        unknown = client.get("/batteryData/jobs/unknown")
+
+    assert response.status_code == 202
+    assert job["status"] == "succeeded"
+    assert job["progress"] == 1
+    assert not fake.points("5")
+    assert unknown.status_code == 404
+
+
+@pytest.mark.app
+def test_add_validates_the_raw_body(fake):
+    """
+    Test that /add writes a valid reading and rejects out-of-range values
+    and malformed JSON.
+    """
+    reading = {"battery_id": "6", "voltage": 460, "current": 60,
+               "temperature": 25, "state_of_charge": 80,
+               "state_of_health": 90}
+
+    with TestClient(create_app()) as client:
+        added = client.post("/batteryData/add", json=reading)
+        too_high = client.post("/batteryData/add",
+                               json={**reading, "voltage": 10 ** 6})
+        malformed = client.post("/batteryData/add", content=b"{")
+
+    assert added.status_code == 200
+    assert [values["voltage"] for _, values in fake.points("6")] == [460]
+    assert too_high.status_code == 422
+    assert "voltage" in too_high.json()["detail"]
+    assert malformed.status_code == 422
+
+
+@pytest.mark.app
+def test_expensive_queries_are_shed(fake, monkeypatch):  # pylint: disable=unused-argument
+    """
+    Test that a query over the cost budget is rejected with a 429 and a
+    Retry-After header, while cheaper queries are served.
+    """
+    monkeypatch.setattr(AdmissionConfig, "QUERY_COST_PER_S", 1)
+    monkeypatch.setattr(AdmissionConfig, "QUERY_COST_BURST", 10)
+
+    with TestClient(create_app()) as client:
+        cheap = client.get("/batteryData/query", params={
+            "battery_id": "1", "field": "voltage", "start_time": "-1h",
+            "stop_time": "now()"})
+        expensive = client.get("/batteryData/query", params={
+            "battery_id": "1", "field": "voltage", "start_time": "-30d",
+            "stop_time": "now()"})
+
+    assert cheap.status_code == 200
+    assert expensive.status_code == 429
+    assert int(expensive.headers["Retry-After"]) > 0
+
+
+@pytest.mark.app
+def test_requests_carry_a_request_id(fake):  # pylint: disable=unused-argument
+    """
+    Test that a valid request ID sent by the client is returned, and that
+    one is generated otherwise.
+    """
+    with TestClient(create_app()) as client:
+        sent = client.get("/batteryData/healthCheck",
+                          headers={"X-Request-ID": "client-42"})
+        generated = client.get("/batteryData/healthCheck",
+                               headers={"X-Request-ID": "not valid"})
+
+    assert sent.headers["X-Request-ID"] == "client-42"
+    assert len(generated.headers["X-Request-ID"]) == 32
+
+
+@pytest.mark.app
+def test_readings_survive_an_influxdb_outage(fake, monkeypatch):
+    """
+    Test that /add keeps accepting readings while InfluxDB is down, and
+    that they are written once it is back.
+    """
+    monkeypatch.setattr(DbConfig, "INFLUX_RETRIES", 0)
+    monkeypatch.setattr(WriteBufferConfig, "FLUSH_INTERVAL_MS", 10)
+    fake.available = False
+    reading = {"battery_id": "7", "voltage": 450, "current": 50,
+               "temperature": 25, "state_of_charge": 80,
+               "state_of_health": 90}
+
+    with TestClient(create_app()) as client:
+        responses = []
+        for offset in range(3):
+            responses.append(client.post("/batteryData/add", json={
+                **reading, "timestamp": 1731801600000 + offset}))
+            time.sleep(0.05)
+        outage = client.get("/metrics").text
+        fake.available = True
+        for _ in range(200):
+            if len(fake.points("7")) == 3:
+                break
+            time.sleep(0.01)
+
+    assert all(response.status_code == 200 for response in responses)
+    assert "spool_outage 1.0" in outage
+    assert [timestamp for timestamp, _ in fake.points("7")] == [
+        1731801600000, 1731801600001, 1731801600002]
+
+
+@pytest.mark.app
+def test_queries_state_the_tier_serving_them(fake, monkeypatch):  # pylint: disable=unused-argument
+    """
+    Test that long aggregated queries are served from a rollup tier once
+    its task has run, and that every query states its tier.
+    """
+    monkeypatch.setattr(RollupConfig, "ENABLED", True)
+    monkeypatch.setattr(RollupConfig, "REFRESH_INTERVAL_MS", 10)
+    params = {"battery_id": "1", "start_time": "-30d", "stop_time": "now()",
+              "field": "voltage", "every": "1d"}
+
+    with TestClient(create_app()) as client:
+        for _ in range(200):
+            routed = client.get("/batteryData/query", params=params)
+            if routed.headers["X-Query-Tier"] != "raw":
+                break
+            time.sleep(0.01)
+        forced = client.get("/batteryData/query",
+                            params={**params, "tier": "raw"})
+        metrics = client.get("/metrics").text
+
+    assert routed.status_code == 200
+    assert routed.headers["X-Query-Tier"] == "1d"
+    assert forced.headers["X-Query-Tier"] == "raw"
+    assert 'queries_by_tier_total{tier="1d"}' in metrics
+
+
+@pytest.mark.app
+def test_invalid_query_parameters_are_reported_once(fake):  # pylint: disable=unused-argument
+    with TestClient(create_app()) as client:
+        invalid = client.get("/batteryData/query",
+                             params={"battery_id": "1", "field": "bogus",
+                                     "start_time": "-1h",
+                                     "stop_time": "now()"})
+
+    assert invalid.status_code == 422
+    assert len(invalid.json()["detail"]) == 1
+
+
+@pytest.mark.app
+def test_write_buffer_counters_are_integers(fake):  # pylint: disable=unused-argument
+    with TestClient(create_app()) as client:
+        metrics = client.get("/batteryData/writeBuffer/metrics").json()
+
+    assert isinstance(metrics["points_flushed"], int)
+    assert isinstance(metrics["max_flush_ms"], float)
+
+
+@pytest.mark.app
+def test_query_pivots_several_batteries_and_fields(fake):
+    """
+    Test that a query over several batteries and fields returns the columns
+    of each battery, or a single table in the columnar formats, and that
+    "*" selects every battery and field.
+    """
+    now = int(time.time() * 1000)
+    for battery_id in ("1", "2", "3"):
+        fake.write("\n".join(
+            f"battery_data,battery_id={battery_id} voltage={400 + index},"
+            f"current={battery_id},temperature=25 "
+            f"{now - (2 - index) * 1000}"
+            for index in range(2)))
+    params = {"battery_id": ["1", "2"], "field": ["voltage", "current"],
+              "start_time": "-1h", "stop_time": "now()"}
+
+    with TestClient(create_app()) as client:
+        pivoted = client.get("/batteryData/query", params=params)
+        table = client.get("/batteryData/query",
+                           params={**params, "format": "csv"})
+        everything = client.get("/batteryData/query", params={
+            **params, "battery_id": "*", "field": "*"})
+
+    columns = pivoted.json()
+    assert sorted(columns) == ["1", "2"]
+    assert columns["1"]["voltage"] == [401, 400]
+    assert columns["2"]["current"] == [2, 2]
+    assert len(columns["2"]["time"]) == 2
+    assert "temperature" not in columns["1"]
+    rows = table.text.splitlines()
+    assert rows[0].split(",") == ["battery_id", "time", "voltage", "current"]
+    assert len(rows) == 5
+    assert sorted(everything.json()) == ["1", "2", "3"]
+    assert everything.json()["3"]["temperature"] == [25, 25]
+
+
+@pytest.mark.app
+def test_stats_summarise_every_battery(fake):
+    """
+    Test that /stats summarises the fields of several batteries, with the
+    energy they charged.
+    """
+    now = int(time.time() * 1000)
+    for battery_id in ("1", "2"):
+        fake.write("\n".join(
+            f"battery_data,battery_id={battery_id} voltage=400,current=100,"
+            f"state_of_charge={20 + index} {now - (3 - index) * 60_000}"
+            for index in range(3)))
+
+    with TestClient(create_app()) as client:
+        response = client.get("/batteryData/stats", params={
+            "battery_id": ["1", "2"], "start_time": "-1h",
+            "stop_time": "now()",
+            "field": ["voltage", "current", "state_of_charge"],
+            "percentile": [50]})
+
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats.keys() == {"1", "2"}
+    assert stats["1"]["fields"]["voltage"]["count"] == 3
+    assert stats["1"]["fields"]["state_of_charge"]["percentiles"] == {
+        "p50": 21}
+    assert stats["2"]["energy"]["charge_kwh"] == pytest.approx(4 / 3)
+
+
+@pytest.mark.app
+def test_imports_within_the_startup_budget():
+    """
+    Test that importing the application takes less than the budget, and
+    leaves the heavy dependencies to the first requests needing them.
+    """
+    startup = measure_import()
+
+    assert startup["lazy_imported"] == []
+    assert startup["import_s"] < IMPORT_BUDGET_S
+
+
+@pytest.mark.app
+def test_serves_within_the_startup_budget():
+    """
+    Test that the service answers its first request within the budget
+    after its process starts, without InfluxDB.
+    """
+    assert measure_ready() < READY_BUDGET_S
+
+
+@pytest.mark.app
+def test_closed_ranges_are_revalidated(fake):
+    """
+    Test that the result of a closed range is answered with 304 while its
+    data is unchanged, a delete changing it, and that large results are
+    compressed.
+    """
+    stop = int(time.time() * 1000) - 3_600_000
+    fake.write("\n".join(
+        f"battery_data,battery_id=1 voltage={400 + index % 100} "
+        f"{stop - index * 1000}" for index in range(1, 500)))
+    params = {"battery_id": "1", "start_time": str(stop - 86_400_000),
+              "stop_time": str(stop), "field": "voltage"}
+
+    with TestClient(create_app()) as client:
+        first = client.get("/batteryData/query", params=params,
+                           headers={"Accept-Encoding": "gzip"})
+        etag = first.headers["ETag"]
+        revalidated = client.get("/batteryData/query", params=params,
+                                 headers={"If-None-Match": etag})
+        client.app.state.influx_manager.delete_data(
+            "1", str(stop - 10_000), str(stop))
+        changed = client.get("/batteryData/query", params=params,
+                             headers={"If-None-Match": etag})
+        growing = client.get("/batteryData/query", params={
+            **params, "stop_time": "now()"})
+
+    assert first.status_code == 200
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert first.headers["Cache-Control"] == "no-cache"
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["ETag"] == etag
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(changed.json()) < len(first.json())
+    assert growing.headers["Cache-Control"] == "no-cache"
+    assert "ETag" not in growing.headers
+
+
+@pytest.mark.app
+def test_streamed_query_holds_its_slot_until_sent(fake, monkeypatch):  # pylint: disable=unused-argument
+    """
+    Test that a streamed query holds its query slot while its body is
+    sent, and releases it afterwards.
+    """
+    monkeypatch.setattr(DbConfig, "INFLUX_STREAM_BATCH_SIZE", 1)
+    active = []
+    app = create_app()
+
+    def stream_data(query):  # pylint: disable=unused-argument
+        for second in range(3):
+            active.append(app.state.admission.query.active)
+            yield {"time": f"2024-11-17T00:00:0{second}Z", "value": second}
+
+    with TestClient(app) as client:
+        monkeypatch.setattr(app.state.influx_manager, "stream_data",
+                            stream_data)
+        response = client.get("/batteryData/query", params={
+            "battery_id": "1", "field": "voltage", "start_time": "-1h",
+            "stop_time": "now()", "stream": "true"})
+        released = app.state.admission.query.active
+
+    assert response.status_code == 200
+    assert len(response.text.splitlines()) == 3
+    assert active == [1, 1, 1]
+    assert released == 0
+
+
+@pytest.mark.app
+def test_streamed_query_sends_ndjson(fake, monkeypatch):
+    """
+    Test that a streamed query sends the data points as NDJSON over several
+    chunks, pivoted for several batteries or fields, and that LTTB
+    downsampling, which needs the whole series, is refused.
+    """
+    monkeypatch.setattr(DbConfig, "INFLUX_STREAM_BATCH_SIZE", 2)
+    now = int(time.time() * 1000)
+    for battery_id in ("1", "2"):
+        fake.write("\n".join(
+            f"battery_data,battery_id={battery_id} voltage={400 + index},"
+            f"current={battery_id} {now - (3 - index) * 1000}"
+            for index in range(3)))
+    params = {"battery_id": "1", "field": "voltage", "start_time": "-1h",
+              "stop_time": "now()", "stream": "true"}
+
+    with TestClient(create_app()) as client:
+        single = client.get("/batteryData/query", params=params)
+        several = client.get("/batteryData/query", params={
+            **params, "battery_id": ["1", "2"],
+            "field": ["voltage", "current"]})
+        lttb = client.get("/batteryData/query", params={
+            **params, "downsample": "lttb", "max_points": 3})
+
+    assert single.headers["Content-Type"] == "application/x-ndjson"
+    points = [json.loads(line) for line in single.text.splitlines()]
+    assert [point["value"] for point in points] == [402, 401, 400]
+    assert all(point["time"].endswith("Z") for point in points)
+    rows = [json.loads(line) for line in several.text.splitlines()]
+    assert sorted((row["battery_id"], row["voltage"], row["current"])
+                  for row in rows) == [
+        ("1", 400, 1), ("1", 401, 1), ("1", 402, 1),
+        ("2", 400, 2), ("2", 401, 2), ("2", 402, 2)]
+    assert lttb.status_code == 400
+
+
+@pytest.mark.app
+def test_add_bulk_reports_every_reading(fake, monkeypatch):
+    """
+    Test that /addBulk writes the valid readings of an NDJSON or JSON array
+    body at their own timestamps, reports the invalid ones by line, and
+    rejects a malformed array with a 400.
+    """
+    monkeypatch.setattr(WriteBufferConfig, "ACK_MODE", "flush")
+    reading = {"battery_id": "8", "voltage": 450, "current": 50,
+               "temperature": 25, "state_of_charge": 80,
+               "state_of_health": 90}
+    ndjson = "\n".join(json.dumps(document) for document in [
+        {**reading, "timestamp": 1731801600000},
+        {**reading, "voltage": 10 ** 6},
+        {**reading, "timestamp": 1731801600001}]).encode()
+
+    with TestClient(create_app()) as client:
+        added = client.post("/batteryData/addBulk", content=ndjson)
+        array = client.post("/batteryData/addBulk", json=[
+            {**reading, "battery_id": "9", "timestamp": 1731801600002}])
+        unterminated = client.post("/batteryData/addBulk",
+                                   content=b'[{"battery_id": "9"}')
+        trailing = client.post("/batteryData/addBulk",
+                               content=b'[] {"battery_id": "9"}')
+
+    assert added.status_code == 200
+    assert added.json()["status"] == "partial"
+    assert (added.json()["accepted"], added.json()["rejected"]) == (2, 1)
+    assert added.json()["errors"][0]["line"] == 2
+    assert [timestamp for timestamp, _ in fake.points("8")] == [
+        1731801600000, 1731801600001]
+    assert array.json() == {"status": "success", "accepted": 1,
+                            "rejected": 0, "errors": []}
+    assert unterminated.status_code == 400
+    assert "Unterminated JSON array" in unterminated.json()["detail"]
+    assert trailing.status_code == 400
+
+
+@pytest.mark.app
+def test_add_maps_rejected_points_to_422(fake, monkeypatch):  # pylint: disable=unused-argument
+    """
+    Test that /add answers a reading InfluxDB rejects with a 422, and that
+    /addBulk reports it by line.
+    """
+    monkeypatch.setattr(WriteBufferConfig, "ACK_MODE", "flush")
+    monkeypatch.setattr(WriteBufferConfig, "FLUSH_INTERVAL_MS", 10)
+    reading = {"battery_id": "10", "voltage": 450, "current": 50,
+               "temperature": 25, "state_of_charge": 80,
+               "state_of_health": 90}
+
+    def reject(_lines):
+        raise ApiException(status=400, reason="partial write: bad point")
+
+    with TestClient(create_app()) as client:
+        monkeypatch.setattr(client.app.state.influx_manager.write_buffer,
+                            "_write", reject)
+        added = client.post("/batteryData/add", json=reading)
+        bulk = client.post("/batteryData/addBulk", json=[reading])
+
+    assert added.status_code == 422
+    assert added.json()["detail"].startswith("Rejected by InfluxDB")
+    assert bulk.json()["rejected"] == 1
+    assert bulk.json()["errors"][0]["error"].startswith(
+        "Rejected by InfluxDB")
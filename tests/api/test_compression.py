@@ -0,0 +1,85 @@
+"""
+Unit tests for the compression of the responses.
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+from src.api import compression
+from src.api.compression import CompressionMiddleware, preferred_encoding
+
+BODY = "battery " * 1000
+
+
+def make_client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, min_bytes=1024, gzip_level=6,
+                       brotli_quality=4)
+
+    @app.get("/large")
+    def large():
+        return PlainTextResponse(BODY)
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("battery")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter(["battery\n"] * 3))
+
+    return TestClient(app)
+
+
+@pytest.mark.compression
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip", "gzip"),
+    ("gzip, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("*", "br"),
+    ("deflate", None),
+    ("gzip;q=0, identity", None),
+    ("", None),
+])
+def test_preferred_encoding(monkeypatch, accept_encoding, expected):
+    monkeypatch.setattr(compression, "ENCODINGS", ("br", "gzip"))
+    assert preferred_encoding(accept_encoding) == expected
+
+
+@pytest.mark.compression
+def test_large_and_streamed_responses_are_compressed():
+    """
+    Test that the responses of at least min_bytes, and the streamed
+    responses, are compressed with gzip, and the small ones are not.
+    """
+    client = make_client()
+    headers = {"Accept-Encoding": "gzip"}
+
+    large = client.get("/large", headers=headers)
+    streamed = client.get("/stream", headers=headers)
+    small = client.get("/small", headers=headers)
+
+    assert large.headers["Content-Encoding"] == "gzip"
+    assert large.headers["Vary"] == "Accept-Encoding"
+    assert large.text == BODY
+    assert streamed.headers["Content-Encoding"] == "gzip"
+    assert streamed.text == "battery\n" * 3
+    assert "Content-Encoding" not in small.headers
+    assert int(small.headers["Content-Length"]) == len("battery")
+
+
+@pytest.mark.compression
+def test_brotli_is_preferred_when_installed():
+    """
+    Test that Brotli is used when the client accepts it and the brotli
+    package is installed.
+    """
+    pytest.importorskip("brotli")
+    client = make_client()
+
+    response = client.get("/large", headers={"Accept-Encoding": "gzip, br"})
+
+    assert response.headers["Content-Encoding"] == "br"
+    # decoded by the test client
+    assert response.text == BODY
@@ -0,0 +1,96 @@
+"""
+Unit tests for the HTTP caching headers of the query results.
+"""
+
+from email.utils import format_datetime
+from datetime import datetime, timezone
+
+import pytest
+from src.api.http_cache import cache_headers, is_not_modified
+from src.config.http_cache import HttpCacheConfig
+from src.models.query import BatteryQuery, ResponseFormat
+from src.services.data_versions import DataVersions
+
+CLOSED = {"start_time": "2024-11-17T00:00:00Z",
+          "stop_time": "2024-11-18T00:00:00Z"}
+
+
+def battery_query(**params):
+    return BatteryQuery(**{"battery_id": ["1"], "field": ["voltage"],
+                           **CLOSED, **params})
+
+
+@pytest.mark.http_cache
+def test_closed_ranges_have_validators():
+    """
+    Test that a closed range gets an ETag, which changes with the format,
+    the query and the version of its batteries, but not with the order of
+    its parameters.
+    """
+    versions = DataVersions(settle_ms=60_000)
+    headers = cache_headers(battery_query(), ResponseFormat.JSON, versions)
+
+    assert headers["ETag"].startswith('W/"')
+    assert headers["Cache-Control"] == "no-cache"
+    assert "Last-Modified" in headers
+    etags = {cache_headers(query, response_format, versions)["ETag"]
+             for query, response_format in [
+                 (battery_query(), ResponseFormat.CSV),
+                 (battery_query(field=["current"]), ResponseFormat.JSON),
+                 (battery_query(stream=True), ResponseFormat.JSON)]}
+    assert headers["ETag"] not in etags and len(etags) == 3
+    assert cache_headers(
+        battery_query(battery_id=["2", "1"]), ResponseFormat.JSON,
+        versions) == cache_headers(battery_query(battery_id=["1", "2"]),
+                                   ResponseFormat.JSON, versions)
+
+    versions.changed({"1": (0, 1)})
+    assert cache_headers(battery_query(), ResponseFormat.JSON,
+                         versions)["ETag"] != headers["ETag"]
+
+
+@pytest.mark.http_cache
+def test_closed_ranges_may_be_reused_for_max_age(monkeypatch):
+    monkeypatch.setattr(HttpCacheConfig, "MAX_AGE_S", 300)
+    headers = cache_headers(battery_query(), ResponseFormat.JSON,
+                            DataVersions(settle_ms=60_000))
+
+    assert headers["Cache-Control"] == "public, max-age=300"
+
+
+@pytest.mark.http_cache
+@pytest.mark.parametrize("start_time, stop_time", [
+    ("-1d", "-1h"),
+    ("2024-11-17T00:00:00Z", "now()"),
+    ("2024-11-17T00:00:00Z", "2999-01-01T00:00:00Z"),
+])
+def test_growing_ranges_are_not_cached(start_time, stop_time):
+    query = battery_query(start_time=start_time, stop_time=stop_time)
+
+    assert cache_headers(query, ResponseFormat.JSON,
+                         DataVersions(settle_ms=60_000)) == {
+        "Cache-Control": "no-cache"}
+
+
+@pytest.mark.http_cache
+def test_conditional_requests():
+    """
+    Test the evaluation of If-None-Match, taking precedence over
+    If-Modified-Since.
+    """
+    headers = cache_headers(battery_query(), ResponseFormat.JSON,
+                            DataVersions(settle_ms=60_000))
+    etag = headers["ETag"]
+    later = format_datetime(datetime(2999, 1, 1, tzinfo=timezone.utc),
+                            usegmt=True)
+    earlier = format_datetime(datetime(2000, 1, 1, tzinfo=timezone.utc),
+                              usegmt=True)
+
+    assert is_not_modified(headers, etag, None)
+    assert is_not_modified(headers, f'"other", {etag[2:]}', None)
+    assert is_not_modified(headers, "*", None)
+    assert not is_not_modified(headers, '"other"', later)
+    assert is_not_modified(headers, None, later)
+    assert not is_not_modified(headers, None, earlier)
+    assert not is_not_modified(headers, None, "yesterday")
+    assert not is_not_modified({"Cache-Control": "no-cache"}, "*", later)
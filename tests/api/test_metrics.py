@@ -0,0 +1,68 @@
+"""
+Unit tests for the Prometheus metrics of the REST API.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from src.api.app import create_app
+from src.services.metrics import SnapshotCollector
+
+
+def request_count(route: str, status: str) -> float:
+    """
+    Returns the number of GET requests recorded for a route and status.
+    """
+    return REGISTRY.get_sample_value(
+        "http_requests_total",
+        {"method": "GET", "route": route, "status": status}) or 0
+
+
+@pytest.mark.metrics
+def test_requests_are_recorded_by_route_template(fake):  # pylint: disable=unused-argument
+    """
+    Test that requests are counted per route template, and unknown paths
+    under a single label.
+    """
+    health_before = request_count("/batteryData/healthCheck", "200")
+    unmatched_before = request_count("unmatched", "404")
+
+    with TestClient(create_app()) as client:
+        client.get("/batteryData/healthCheck")
+        client.get("/batteryData/healthCheck")
+        client.get("/unknown/1")
+
+    assert request_count("/batteryData/healthCheck", "200") == \
+        health_before + 2
+    assert request_count("unmatched", "404") == unmatched_before + 1
+
+
+@pytest.mark.metrics
+def test_metrics_endpoint(fake):  # pylint: disable=unused-argument
+    """
+    Test that /metrics exposes the metrics in the Prometheus text format,
+    including those of the write buffer.
+    """
+    with TestClient(create_app()) as client:
+        client.get("/batteryData/healthCheck")
+        response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "http_request_duration_seconds_bucket" in response.text
+    assert "write_buffer_queue_depth" in response.text
+
+
+@pytest.mark.metrics
+def test_snapshot_collector():
+    """
+    Test that snapshot values are exported as counters or gauges.
+    """
+    collector = SnapshotCollector()
+    collector.snapshots = {"query_cache": lambda: {"hits": 3, "bytes": 64}}
+
+    metrics = {metric.name: metric for metric in collector.collect()}
+
+    assert metrics["query_cache_hits"].type == "counter"
+    assert metrics["query_cache_bytes"].type == "gauge"
+    assert metrics["query_cache_bytes"].samples[0].value == 64
@@ -0,0 +1,102 @@
+"""
+Unit tests for the query response formats and their negotiation.
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+from src.api import responses
+from src.api.responses import columns_response, negotiate_format, to_ndjson
+from src.models.query import ResponseFormat
+
+COLUMNS = {
+    "time": [datetime(2024, 11, 17, tzinfo=timezone.utc),
+             datetime(2024, 11, 17, 0, 0, 1, tzinfo=timezone.utc)],
+    "value": [1.5, None],
+}
+
+
+@pytest.mark.responses
+@pytest.mark.parametrize("accept, expected", [
+    (None, ResponseFormat.JSON),
+    ("*/*", ResponseFormat.JSON),
+    ("text/html", ResponseFormat.JSON),
+    ("text/csv", ResponseFormat.CSV),
+    ("application/x-msgpack", ResponseFormat.MSGPACK),
+    ("application/json;q=0.5, application/vnd.apache.arrow.stream",
+     ResponseFormat.ARROW),
+    ("text/csv;q=0, application/json", ResponseFormat.JSON),
+    ("text/csv, application/msgpack", ResponseFormat.CSV),
+])
+def test_negotiate_format_from_accept(accept, expected):
+    """
+    Test that the format is picked from the Accept header by quality.
+    """
+    assert negotiate_format(None, accept) is expected
+
+
+@pytest.mark.responses
+def test_format_parameter_overrides_accept():
+    """
+    Test that the format query parameter takes precedence over Accept.
+    """
+    assert negotiate_format(ResponseFormat.CSV, "application/json") \
+        is ResponseFormat.CSV
+
+
+@pytest.mark.responses
+def test_unavailable_format_is_not_acceptable(monkeypatch):
+    """
+    Test that a format whose library is not installed is rejected with 406.
+    """
+    monkeypatch.setitem(responses.FORMATS_AVAILABLE, ResponseFormat.ARROW,
+                        False)
+    with pytest.raises(HTTPException) as exc_info:
+        negotiate_format(ResponseFormat.ARROW, None)
+    assert exc_info.value.status_code == 406
+
+
+@pytest.mark.responses
+def test_ndjson_times_end_with_z():
+    """
+    Test that NDJSON lines hold UTC times ending with "Z".
+    """
+    points = [{"time": COLUMNS["time"][0], "value": 1.5}]
+    assert to_ndjson(points) == \
+        b'{"time":"2024-11-17T00:00:00Z","value":1.5}\n'
+
+
+@pytest.mark.responses
+def test_csv():
+    """
+    Test that columns are encoded as a CSV table with a header row.
+    """
+    response = columns_response(COLUMNS, ResponseFormat.CSV)
+    assert response.media_type == "text/csv"
+    assert response.body == (b"time,value\n"
+                             b"2024-11-17T00:00:00Z,1.5\n"
+                             b"2024-11-17T00:00:01Z,\n")
+
+
+@pytest.mark.responses
+def test_msgpack():
+    """
+    Test that columns are encoded as a MessagePack map.
+    """
+    msgpack = pytest.importorskip("msgpack")
+    response = columns_response(COLUMNS, ResponseFormat.MSGPACK)
+    assert msgpack.unpackb(response.body, timestamp=3) == COLUMNS
+
+
+@pytest.mark.responses
+def test_arrow():
+    """
+    Test that columns are encoded as an Arrow IPC stream.
+    """
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.ipc  # pylint: disable=import-outside-toplevel
+    response = columns_response(COLUMNS, ResponseFormat.ARROW)
+    table = pyarrow.ipc.open_stream(response.body).read_all()
+    assert table.column_names == ["time", "value"]
+    assert table.to_pydict() == COLUMNS
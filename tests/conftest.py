@@ -0,0 +1,29 @@
+"""
+Fixtures shared by the tests.
+"""
+
+import pytest
+from benchmarks.fake_influxdb import FakeInfluxDB
+from src.config.db import DbConfig
+from src.config.spool import SpoolConfig
+
+
+@pytest.fixture(name="fake")
+def fixture_fake(monkeypatch):
+    """
+    Starts a fake InfluxDB and points the configuration at it.
+    """
+    with FakeInfluxDB() as fake:
+        monkeypatch.setattr(DbConfig, "INFLUX_URL", fake.url)
+        monkeypatch.setattr(DbConfig, "INFLUX_TOKEN", "token")
+        monkeypatch.setattr(DbConfig, "INFLUX_ORG", "org")
+        monkeypatch.setattr(DbConfig, "INFLUX_BUCKET", "bucket")
+        yield fake
+
+
+@pytest.fixture(autouse=True)
+def fixture_spool_directory(monkeypatch, tmp_path):
+    """
+    Keeps the spool of every test in its own temporary directory.
+    """
+    monkeypatch.setattr(SpoolConfig, "DIRECTORY", str(tmp_path / "spool"))
@@ -0,0 +1,94 @@
+"""
+Unit tests for the lazily created InfluxDB connection.
+"""
+
+import pytest
+from src.db import connection as connection_module
+from src.db.connection import InfluxConnection
+
+
+class FakeClient:
+    """
+    Stand-in for InfluxDBClient whose Query API fails while `down` is set.
+    """
+
+    def __init__(self, down: bool):
+        self.down = down
+        self.closed = False
+
+    def write_api(self, **_kwargs):
+        return self
+
+    def query_api(self):
+        return self
+
+    def delete_api(self):
+        return self
+
+    def query(self, flux):
+        if self.down:
+            raise ConnectionRefusedError("InfluxDB unavailable")
+        return [flux]
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    """
+    Records the clients created by InfluxConnection; the first one cannot
+    reach InfluxDB.
+    """
+    created = []
+
+    def create_client():
+        created.append(FakeClient(down=not created))
+        return created[-1]
+
+    monkeypatch.setattr(connection_module, "create_client", create_client)
+    return created
+
+
+@pytest.mark.influx_connection
+def test_client_is_created_on_first_use(clients):
+    """
+    Test that no client is created until the first request.
+    """
+    connection = InfluxConnection()
+    assert not clients
+
+    with pytest.raises(ConnectionRefusedError):
+        connection.query("flux")
+    assert len(clients) == 1
+
+
+@pytest.mark.influx_connection
+def test_reconnects_after_connection_failure(clients):
+    """
+    Test that a connection failure drops the client and the next request
+    creates a new one.
+    """
+    connection = InfluxConnection()
+    with pytest.raises(ConnectionRefusedError):
+        connection.query("flux")
+    assert clients[0].closed
+
+    assert connection.query("flux") == ["flux"]
+    assert len(clients) == 2
+
+
+@pytest.mark.influx_connection
+def test_close(clients):
+    """
+    Test that closing the connection closes its client.
+    """
+    connection = InfluxConnection()
+    connection.close()
+    assert not clients
+
+    with pytest.raises(ConnectionRefusedError):
+        connection.query("flux")
+    connection.query("flux")
+    connection.close()
+    assert clients[1].closed
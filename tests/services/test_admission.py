@@ -0,0 +1,152 @@
+"""
+Unit tests for the admission control.
+"""
+
+import asyncio
+
+import pytest
+from src.models.battery import BATTERY_FIELDS
+from src.models.query import BatteryQuery
+from src.services.admission import AdmissionControl, ConcurrencyLimit, \
+    CostBudget, OverloadedError, query_cost
+
+
+@pytest.mark.admission
+def test_released_slot_goes_to_the_first_waiter():
+    """
+    Test that requests beyond the limit wait, and are served in arrival
+    order as slots are released.
+    """
+    limit = ConcurrencyLimit(1, max_queued=10, queue_timeout_s=1)
+    served = []
+
+    async def request(name):
+        await limit.acquire()
+        served.append(name)
+
+    async def scenario():
+        await limit.acquire()
+        waiters = [asyncio.create_task(request(name)) for name in "abc"]
+        await asyncio.sleep(0)
+        assert limit.queued == 3
+        for _ in waiters:
+            limit.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*waiters)
+
+    asyncio.run(scenario())
+    assert served == ["a", "b", "c"]
+    assert limit.active == 1
+    assert limit.queued == 0
+
+
+@pytest.mark.admission
+def test_waiting_is_bounded():
+    """
+    Test that a request is shed with a 503 when the queue is full, or when
+    no slot is free within the queue timeout.
+    """
+    limit = ConcurrencyLimit(1, max_queued=1, queue_timeout_s=0.05)
+
+    async def scenario():
+        await limit.acquire()
+        waiter = asyncio.create_task(limit.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(OverloadedError) as full:
+            await limit.acquire()
+        with pytest.raises(OverloadedError) as timeout:
+            await waiter
+        return full.value, timeout.value
+
+    full, timeout = asyncio.run(scenario())
+    assert (full.status_code, full.reason) == (503, "queue_full")
+    assert (timeout.status_code, timeout.reason) == (503, "queue_timeout")
+    assert timeout.retry_after_s == 1
+    assert limit.active == 1
+    assert limit.queued == 0
+
+
+@pytest.mark.admission
+def test_budget_rejects_queries_over_the_cost_left():
+    """
+    Test that a query costing more than the budget left is rejected with a
+    429, and a Retry-After matching the refill rate.
+    """
+    budget = CostBudget(rate_per_s=10, burst=100)
+    budget.spend(80)
+
+    with pytest.raises(OverloadedError) as err:
+        budget.spend(50)
+
+    assert (err.value.status_code, err.value.reason) == (429, "cost")
+    assert err.value.retry_after_s == 3
+    assert 20 <= budget.available < 21
+
+
+@pytest.mark.admission
+def test_queries_are_shed_while_ingest_waits():
+    """
+    Test that queries are shed while ingest requests wait for a slot, and
+    admitted again once they are served.
+    """
+    admission = AdmissionControl(
+        ingest=ConcurrencyLimit(1, max_queued=10, queue_timeout_s=1),
+        query=ConcurrencyLimit(1, max_queued=10, queue_timeout_s=1),
+        query_budget=CostBudget(rate_per_s=0, burst=0))
+
+    async def scenario():
+        await admission.ingest.acquire()
+        waiter = asyncio.create_task(admission.ingest.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(OverloadedError) as err:
+            await admission.admit_query(1)
+        admission.ingest.release()
+        await waiter
+        await admission.admit_query(1)
+        return err.value
+
+    err = asyncio.run(scenario())
+    assert (err.status_code, err.reason) == (503, "priority")
+    assert admission.snapshot()["query_active"] == 1
+
+
+@pytest.mark.admission
+def test_query_cost_counts_series_hours():
+    """
+    Test that the cost of a query is its hours times fields times
+    batteries, the wildcards counting every field and known battery.
+    """
+    narrow = BatteryQuery(battery_id=["1", "2"], field=["voltage"],
+                          start_time="-2h", stop_time="now()")
+    wide = BatteryQuery(battery_id=["*"], field=["*"],
+                        start_time="-1d", stop_time="now()")
+
+    assert query_cost(narrow, battery_count=100) == pytest.approx(4)
+    assert query_cost(wide, battery_count=100) == pytest.approx(
+        24 * len(BATTERY_FIELDS) * 100)
+
+
+@pytest.mark.admission
+def test_cost_is_refunded_when_no_slot_is_taken():
+    """
+    Test that the cost of a query shed or cancelled while waiting for a
+    slot is given back to the budget.
+    """
+    admission = AdmissionControl(
+        ingest=ConcurrencyLimit(1, max_queued=10, queue_timeout_s=1),
+        query=ConcurrencyLimit(1, max_queued=1, queue_timeout_s=0.05),
+        query_budget=CostBudget(rate_per_s=1, burst=100))
+
+    async def scenario():
+        await admission.admit_query(10)
+        with pytest.raises(OverloadedError):
+            await admission.admit_query(30)
+        cancelled = asyncio.create_task(admission.admit_query(30))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+
+    asyncio.run(scenario())
+    # only the admitted query is spent, up to the budget refilled meanwhile
+    assert 90 <= admission.query_budget.available < 91
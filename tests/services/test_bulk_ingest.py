@@ -0,0 +1,108 @@
+"""
+Unit tests for the validation and chunked insertion of bulk uploads.
+"""
+
+import asyncio
+import json
+from concurrent.futures import Future
+
+import pytest
+from src.services.bulk_ingest import BulkIngest
+from src.services.write_buffer import RejectedPointsError, \
+    WriteBufferFullError
+
+READING = {"battery_id": "1", "voltage": 450, "current": 50,
+           "temperature": 25, "state_of_charge": 80, "state_of_health": 90}
+
+
+class RecordingManager:
+    """
+    Stands in for the InfluxManager, recording the inserted chunks and
+    resolving their futures with the given outcomes, in order.
+    """
+
+    def __init__(self, *outcomes):
+        self.chunks = []
+        self._outcomes = list(outcomes)
+
+    def insert_many(self, readings):
+        outcome = self._outcomes.pop(0) if self._outcomes else None
+        if isinstance(outcome, WriteBufferFullError):
+            raise outcome
+        self.chunks.append(readings)
+        flushed = Future()
+        if isinstance(outcome, Exception):
+            flushed.set_exception(outcome)
+        else:
+            flushed.set_result(None)
+        return flushed
+
+
+def ingest(manager, documents, wait_for_flush=True, max_errors=10):
+    """
+    Adds documents, one per line, to a BulkIngest inserting chunks of two
+    readings, and returns its summary.
+    """
+    bulk = BulkIngest(manager, chunk_size=2, max_errors=max_errors)
+    for line, document in enumerate(documents, start=1):
+        bulk.add(line, json.dumps(document).encode())
+    return asyncio.run(bulk.finish(wait_for_flush))
+
+
+@pytest.mark.bulk_ingest
+def test_valid_readings_are_inserted_in_chunks():
+    manager = RecordingManager()
+    summary = ingest(manager, [
+        {**READING, "timestamp": 1731801600000 + offset}
+        for offset in range(5)])
+
+    assert summary == {"status": "success", "accepted": 5, "rejected": 0,
+                       "errors": []}
+    assert [len(chunk) for chunk in manager.chunks] == [2, 2, 1]
+    # the timestamps sent by the client are kept
+    assert [reading.timestamp for chunk in manager.chunks
+            for reading in chunk] == [1731801600000 + offset
+                                      for offset in range(5)]
+
+
+@pytest.mark.bulk_ingest
+def test_invalid_readings_are_reported_by_line():
+    manager = RecordingManager()
+    summary = ingest(manager, [READING, {**READING, "voltage": 10 ** 6},
+                               READING, {"battery_id": "2"}],
+                     max_errors=1)
+
+    assert summary["status"] == "partial"
+    assert (summary["accepted"], summary["rejected"]) == (2, 2)
+    # only the first max_errors errors are reported
+    assert len(summary["errors"]) == 1
+    assert summary["errors"][0]["line"] == 2
+    assert summary["errors"][0]["error"].startswith("voltage: ")
+
+
+@pytest.mark.bulk_ingest
+def test_points_rejected_by_influxdb_are_reported():
+    manager = RecordingManager(
+        RejectedPointsError({1: ValueError("bad point")}),
+        OSError("connection refused"),
+        WriteBufferFullError("full"))
+    summary = ingest(manager, [READING] * 6)
+
+    assert (summary["accepted"], summary["rejected"]) == (1, 5)
+    # the readings the write buffer cannot take are rejected right away,
+    # those whose write failed once the writes complete
+    assert summary["errors"] == [
+        {"line": 5, "error": "Service unavailable: full"},
+        {"line": 6, "error": "Service unavailable: full"},
+        {"line": 2, "error": "Rejected by InfluxDB: bad point"},
+        {"line": 3, "error": "Write error: connection refused"},
+        {"line": 4, "error": "Write error: connection refused"},
+    ]
+
+
+@pytest.mark.bulk_ingest
+def test_buffered_readings_are_accepted_without_waiting():
+    manager = RecordingManager(OSError("connection refused"))
+    summary = ingest(manager, [READING] * 2, wait_for_flush=False)
+
+    assert (summary["accepted"], summary["rejected"]) == (2, 0)
@@ -0,0 +1,76 @@
+"""
+Unit tests for the versions of the battery data.
+"""
+
+import time
+
+import pytest
+from src.services.data_versions import DataVersions
+
+HOUR_MS = 3_600_000
+
+
+def now_ms():
+    return time.time_ns() // 1_000_000
+
+
+@pytest.mark.data_versions
+def test_only_changes_to_closed_ranges_count():
+    """
+    Test that readings written as they are taken leave the versions
+    unchanged, while late readings and deletes increase them.
+    """
+    versions = DataVersions(settle_ms=60_000)
+    initial = versions.get(("1",))
+
+    versions.changed({"1": (now_ms(), now_ms())})
+    assert versions.get(("1",)) == initial
+
+    versions.changed({"1": (now_ms() - HOUR_MS, now_ms())})
+    changed = versions.get(("1",))
+    assert changed.version == initial.version + 1
+    assert changed.modified_ns >= initial.modified_ns
+
+
+@pytest.mark.data_versions
+def test_versions_of_several_batteries():
+    """
+    Test that the version of several batteries, or of every battery,
+    increases with the version of any of them.
+    """
+    versions = DataVersions(settle_ms=0)
+    before = [versions.get(("1", "2")), versions.get(("*",)),
+              versions.get(("3",))]
+
+    versions.changed({"2": (0, 1)})
+    after = [versions.get(("1", "2")), versions.get(("*",)),
+             versions.get(("3",))]
+    assert [version.version for version in after] == [1, 1, 0]
+
+    versions.changed_all()
+    assert all(version.version > previous.version
+               for version, previous in zip(
+                   [versions.get(("1", "2")), versions.get(("*",)),
+                    versions.get(("3",))], after))
+    assert before[2].version == 0
+
+
+@pytest.mark.data_versions
+def test_versions_are_shared_through_the_state_dir(tmp_path):
+    """
+    Test that workers sharing a state directory agree on the epoch and see
+    the changes made through each other.
+    """
+    first = DataVersions(settle_ms=0, state_dir=str(tmp_path))
+    second = DataVersions(settle_ms=0, state_dir=str(tmp_path))
+    assert second.epoch == first.epoch
+
+    first.changed({"1": (0, 1)})
+    assert second.get(("1",)) == first.get(("1",))
+    assert second.get(("1",)).version == 1
+
+    second.changed({"1": (0, 1)})
+    second.changed_all()
+    assert first.get(("1",)).version == 3
+    assert first.get(("*",)) == second.get(("*",))
+    assert DataVersions(settle_ms=0).get(("1",)).version == 0
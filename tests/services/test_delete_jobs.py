@@ -0,0 +1,159 @@
+"""
+Unit tests for the background delete jobs.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from src.services.delete_jobs import DeleteJobs, JobStatus, \
+    TooManyJobsError
+from src.services.executor import BlockingExecutor
+
+HOUR_MS = 3_600_000
+
+
+class FakeManager:
+    """
+    Stand-in for the InfluxManager recording the deleted chunks and the
+    number of chunks deleted at the same time.
+    """
+
+    def __init__(self, delay_s=0.0, fail=False):
+        self.executor = BlockingExecutor(8, name="test")
+        self.delay_s = delay_s
+        self.fail = fail
+        self.chunks = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def delete_range(self, battery_id, start_ns, stop_ns):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay_s)
+        with self._lock:
+            self.running -= 1
+            self.chunks.append((battery_id, start_ns, stop_ns))
+        if self.fail:
+            raise RuntimeError("InfluxDB is unavailable")
+
+
+async def wait_finished(jobs, job):
+    """
+    Waits until a job has finished.
+    """
+    while not jobs.get(job.job_id).is_finished:
+        await asyncio.sleep(0.005)
+
+
+@pytest.mark.delete_jobs
+def test_range_is_deleted_in_chunks_oldest_first():
+    """
+    Test that a range is split into chunks deleted oldest first, covering
+    the whole range.
+    """
+    manager = FakeManager()
+
+    async def scenario():
+        jobs = DeleteJobs(manager, chunk_ms=HOUR_MS, concurrency=2,
+                          max_active=10, max_finished=10)
+        job = jobs.submit("1", "-5h", "-30m")
+        assert job.to_dict()["status"] == "pending"
+        await wait_finished(jobs, job)
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status is JobStatus.SUCCEEDED
+    assert job.to_dict()["progress"] == 1
+    assert len(manager.chunks) == 5
+    starts = [start for _, start, _ in manager.chunks]
+    assert starts == sorted(starts)
+    assert manager.chunks[-1][2] - manager.chunks[0][1] == \
+        int(4.5 * HOUR_MS) * 1_000_000
+
+
+@pytest.mark.delete_jobs
+def test_concurrency_is_limited_across_jobs():
+    """
+    Test that no more than `concurrency` chunks are deleted at a time,
+    whatever the number of jobs.
+    """
+    manager = FakeManager(delay_s=0.01)
+
+    async def scenario():
+        jobs = DeleteJobs(manager, chunk_ms=HOUR_MS, concurrency=2,
+                          max_active=10, max_finished=10)
+        submitted = [jobs.submit(str(battery), "-2h", "now()")
+                     for battery in range(4)]
+        for job in submitted:
+            await wait_finished(jobs, job)
+
+    asyncio.run(scenario())
+    assert len(manager.chunks) == 8
+    assert manager.max_running == 2
+
+
+@pytest.mark.delete_jobs
+def test_failed_and_rejected_jobs():
+    """
+    Test that failures are reported by the job, that reversed ranges and
+    jobs beyond max_active are rejected, and that old jobs are forgotten.
+    """
+    manager = FakeManager(delay_s=0.01, fail=True)
+
+    async def scenario():
+        jobs = DeleteJobs(manager, chunk_ms=HOUR_MS, concurrency=1,
+                          max_active=1, max_finished=1)
+        with pytest.raises(ValueError):
+            jobs.submit("1", "-1h", "-2h")
+        job = jobs.submit("1", "-3h", "now()")
+        with pytest.raises(TooManyJobsError):
+            jobs.submit("2", "-1h", "now()")
+        await wait_finished(jobs, job)
+        newer = jobs.submit("2", "-1h", "now()")
+        await wait_finished(jobs, newer)
+        return jobs, job
+
+    jobs, job = asyncio.run(scenario())
+    assert job.status is JobStatus.FAILED
+    assert job.chunks_done == 0
+    assert job.error == "InfluxDB is unavailable"
+    # only the most recent finished job is kept
+    assert jobs.get(job.job_id) is None
+    assert jobs.snapshot()["failed"] == 1
+
+
+@pytest.mark.delete_jobs
+def test_jobs_are_polled_through_any_worker(tmp_path):
+    """
+    Test that a job is described by the DeleteJobs of another worker
+    sharing the state directory, until it is forgotten.
+    """
+    manager = FakeManager(delay_s=0.01)
+
+    async def scenario():
+        worker = DeleteJobs(manager, chunk_ms=HOUR_MS, concurrency=1,
+                            max_active=10, max_finished=1,
+                            state_dir=str(tmp_path))
+        other = DeleteJobs(manager, chunk_ms=HOUR_MS, concurrency=1,
+                           max_active=10, max_finished=1,
+                           state_dir=str(tmp_path))
+        job = worker.submit("1", "-3h", "now()")
+        assert other.get(job.job_id) is None
+        assert other.describe(job.job_id)["status"] in ("pending", "running")
+        await wait_finished(worker, job)
+        finished = other.describe(job.job_id)
+        newer = worker.submit("2", "-1h", "now()")
+        await wait_finished(worker, newer)
+        return job, finished, other
+
+    job, finished, other = asyncio.run(scenario())
+    assert finished == job.to_dict()
+    assert finished["status"] == "succeeded"
+    # forgotten by the worker running it, so by every worker
+    assert other.describe(job.job_id) is None
+    assert other.describe("../unknown") is None
+    assert not list(tmp_path.glob("*.tmp"))
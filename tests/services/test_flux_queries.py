@@ -0,0 +1,112 @@
+"""
+Unit tests for the Flux query templates.
+"""
+
+import pytest
+from pydantic import ValidationError
+from src.models.query import AggregateFunction, BatteryQuery
+from src.services.flux_queries import QUERY_TEMPLATES, ROLLUP_TEMPLATES, \
+    QueryShape, Selection, TierCoverage, build_query, delete_predicate, \
+    rollup_task_script
+from src.utils.datetime_utils import parse_duration_ns, parse_time_bound
+
+
+def battery_query(**params):
+    """
+    Builds a query over the last hour, overriding some parameters.
+    """
+    return BatteryQuery(**{"battery_id": ["1"], "start_time": "-1h",
+                           "stop_time": "now()", "field": ["voltage"],
+                           **params})
+
+
+@pytest.mark.flux_queries
+def test_every_shape_has_a_template():
+    assert len(QUERY_TEMPLATES) == 3 * 3 * (1 + len(AggregateFunction))
+    single = QUERY_TEMPLATES[QueryShape(Selection.ONE, Selection.ONE, None)]
+    several = QUERY_TEMPLATES[QueryShape(Selection.MANY, Selection.ALL,
+                                         None)]
+    assert "pivot(" not in single.script
+    assert "pivot(" in several.script
+    assert 'r["_field"]' not in several.script
+
+
+@pytest.mark.flux_queries
+def test_values_are_passed_as_parameters():
+    injected = '1" or r["battery_id"] != "'
+    template, params = build_query(battery_query(battery_id=[injected]))
+    other, _ = build_query(battery_query(battery_id=["2"],
+                                         start_time="-1d"))
+
+    assert template is other
+    assert injected not in template.script
+    assert params["_battery_id"] == injected
+    assert params["_field"] == "voltage"
+    assert (params["_stop"] - params["_start"]).total_seconds() == 3600
+
+
+@pytest.mark.flux_queries
+def test_aggregation_parameters():
+    template, params = build_query(battery_query(
+        battery_id=["1", "2"], fn="percentile", percentile=99,
+        max_points=60))
+
+    assert template.name == "query battery=many field=one fn=percentile"
+    assert params["_battery_ids"] == ["1", "2"]
+    assert params["_every"] == "60000ms"
+    assert params["_q"] == pytest.approx(0.99)
+
+
+@pytest.mark.flux_queries
+def test_rollup_tier_serves_the_whole_windows_it_covers():
+    hour = parse_duration_ns("1h")
+    coverage = TierCoverage("1h", hour, 0, parse_time_bound(
+        "2024-01-01T20:00:00Z").nanoseconds)
+    query = battery_query(start_time="2024-01-01T00:30:00Z",
+                          stop_time="2024-01-02T00:00:00Z", every="1d")
+
+    template, params = build_query(query, coverage)
+    raw, _ = build_query(query.model_copy(update={"fn": "percentile"}),
+                         coverage)
+
+    assert template.name == "query battery=one field=one fn=mean tier=rollup"
+    assert params["_rollup"] == "battery_data_1h"
+    assert "_rollup_fn" not in params
+    assert params["_rollup_start"].isoformat() == "2024-01-01T01:00:00+00:00"
+    assert params["_rollup_stop"].isoformat() == "2024-01-01T20:00:00+00:00"
+    assert "tier=rollup" not in raw.name
+
+
+@pytest.mark.flux_queries
+def test_rollup_means_are_weighted_by_the_counts():
+    shapes = {shape.aggregate: template.script
+              for shape, template in ROLLUP_TEMPLATES.items()}
+
+    assert 'set: ["sum", "count"]' in shapes[AggregateFunction.MEAN]
+    assert "float(v: r.sum) / float(v: r.count)" in \
+        shapes[AggregateFunction.MEAN]
+    assert 'set: ["max"]' in shapes[AggregateFunction.MAX]
+    assert "r.count" not in shapes[AggregateFunction.MAX]
+
+
+@pytest.mark.flux_queries
+def test_rollup_task_script():
+    script = rollup_task_script("1h", 'bucket"', "30s", "30d")
+
+    assert 'option task = {name: "battery_data rollup 1h", every: 1h, ' \
+           'offset: 30s}' in script
+    assert 'from(bucket: "bucket\\"")' in script
+    assert 'tasks.lastSuccess(orTime: -30d)' in script
+    assert script.count("rollup(fn: ") == 4
+
+
+@pytest.mark.flux_queries
+def test_unknown_fields_are_rejected():
+    with pytest.raises(ValidationError, match="Unknown fields"):
+        battery_query(field=['voltage") |> drop(columns: ["_value'])
+
+
+@pytest.mark.flux_queries
+def test_delete_predicate_escapes_quotes():
+    assert delete_predicate('1" or battery_id="2') == \
+        'battery_id="1\\" or battery_id=\\"2"'
@@ -0,0 +1,217 @@
+"""
+Tests of the InfluxManager against the fake InfluxDB of the benchmarks.
+"""
+
+import time
+
+import pytest
+from prometheus_client import REGISTRY
+from src.config.db import DbConfig
+from src.config.http_cache import HttpCacheConfig
+from src.config.rollups import RollupConfig
+from src.config.write_buffer import WriteBufferConfig
+from src.db.connection import InfluxConnection
+from src.models.battery import BatteryData
+from src.models.query import BatteryQuery
+from src.services.influx_manager import InfluxManager
+
+
+@pytest.fixture(name="manager")
+def fixture_manager(fake, monkeypatch):  # pylint: disable=unused-argument
+    """
+    Builds an InfluxManager connected to the fake InfluxDB, flushing its
+    writes quickly.
+    """
+    monkeypatch.setattr(WriteBufferConfig, "FLUSH_INTERVAL_MS", 10)
+    manager = InfluxManager(InfluxConnection())
+    yield manager
+    manager.close()
+
+
+@pytest.fixture(name="rollup_manager")
+def fixture_rollup_manager(fake, monkeypatch):  # pylint: disable=unused-argument
+    """
+    Builds an InfluxManager as the `manager` fixture does, with the rollup
+    tiers enabled.
+    """
+    monkeypatch.setattr(RollupConfig, "ENABLED", True)
+    monkeypatch.setattr(WriteBufferConfig, "FLUSH_INTERVAL_MS", 10)
+    manager = InfluxManager(InfluxConnection())
+    yield manager
+    manager.close()
+
+
+def reading(battery_id, voltage, timestamp):
+    """
+    Builds a battery reading.
+    """
+    return BatteryData(battery_id=battery_id, voltage=voltage, current=50,
+                       temperature=25, state_of_charge=80,
+                       state_of_health=90, timestamp=timestamp)
+
+
+@pytest.mark.influx_manager
+def test_write_query_delete_round_trip(fake, manager):
+    """
+    Test that written readings are queried back, most recent first, and
+    deleted.
+    """
+    now = int(time.time() * 1000)
+    manager.insert_many([reading("1", 450, now - 2000),
+                         reading("1", 451, now - 1000)]).result()
+    assert len(fake.points("1")) == 2
+
+    query = BatteryQuery(battery_id=["1"], start_time="-1h",
+                         stop_time="now()", field=["voltage"])
+    assert [point["value"] for point in manager.query_data(query)] == \
+        [451, 450]
+
+    manager.delete_data("1", "-1h", "-1ms")
+    assert not fake.points("1")
+
+
+@pytest.mark.influx_manager
+def test_query_pivot_several_batteries(fake, manager):
+    """
+    Test that a query over several batteries returns the columns of each
+    battery, selected fields only, from a single Flux query.
+    """
+    now = int(time.time() * 1000)
+    manager.insert_many([reading("1", 450.0, now - 2000),
+                         reading("1", 451.0, now - 1000),
+                         reading("2", 460.0, now - 1000)]).result()
+
+    rows = manager.query_pivot(BatteryQuery(
+        battery_id=["1", "2"], start_time="-1h", stop_time="now()",
+        field=["voltage", "current"]))
+    assert fake.requests["/api/v2/query"] == 1
+    assert {battery_id: columns["voltage"]
+            for battery_id, columns in rows.items()} == \
+        {"1": [451.0, 450.0], "2": [460.0]}
+    assert {battery_id: sorted(columns)
+            for battery_id, columns in rows.items()} == \
+        {"1": ["current", "time", "voltage"],
+         "2": ["current", "time", "voltage"]}
+
+
+@pytest.mark.influx_manager
+def test_refresh_latest_seeds_the_latest_values(fake, manager):
+    """
+    Test that the latest values are seeded from InfluxDB and not replaced
+    by older values.
+    """
+    now = int(time.time() * 1000)
+    fake.write(f"battery_data,battery_id=1 voltage=450,current=50 {now - 2}\n"
+               f"battery_data,battery_id=1 voltage=451,current=51 {now - 1}\n"
+               f"battery_data,battery_id=2 voltage=460,current=60 {now - 1}")
+    manager.insert_many([reading("2", 470.0, now)]).result()
+
+    manager.refresh_latest("-1h")
+
+    latest = manager.latest_values.get()
+    assert latest["1"]["voltage"] == 451
+    assert latest["1"]["current"] == 51
+    assert latest["2"]["voltage"] == 470.0
+    assert manager.latest_values.get(["2", "3"]).keys() == {"2"}
+
+
+@pytest.mark.influx_manager
+def test_delete_falls_back_to_the_previous_latest_value(manager):
+    """
+    Test that deleting the latest reading of a battery brings back the
+    last reading left in InfluxDB.
+    """
+    now = int(time.time() * 1000)
+    manager.insert_many([reading("1", 450.0, now - 3_600_000),
+                         reading("1", 451.0, now - 1000)]).result()
+
+    manager.delete_data("1", "-1m", "-1ms")
+
+    assert manager.latest_values.get(["1"])["1"]["voltage"] == 450.0
+
+
+@pytest.mark.influx_manager
+def test_slow_queries_are_counted_by_template(manager, monkeypatch):
+    """
+    Test that slow queries are counted under their template, whatever the
+    values they were run with.
+    """
+    monkeypatch.setattr(DbConfig, "INFLUX_SLOW_QUERY_MS", 0)
+    template = "query battery=one field=one fn=raw"
+    before = REGISTRY.get_sample_value("influx_slow_queries_total",
+                                       {"template": template}) or 0
+
+    for battery_id in ("1", "2"):
+        manager.query_data(BatteryQuery(
+            battery_id=[battery_id], start_time="-1h", stop_time="now()",
+            field=["voltage"]))
+
+    assert REGISTRY.get_sample_value("influx_slow_queries_total",
+                                     {"template": template}) == before + 2
+
+
+@pytest.mark.influx_manager
+def test_deleted_data_is_rolled_up_again(fake, rollup_manager):
+    """
+    Test that a delete rolls up again the tier windows it touched before
+    the tiers serve queries again, and that late data points are served
+    from the raw data until the next refresh rolls up their windows again.
+    """
+    manager = rollup_manager
+    manager.refresh_rollups()
+    manager.refresh_rollups()
+    query = BatteryQuery(battery_id=["1"], start_time="-7d",
+                         stop_time="now()", field=["voltage"], every="1d")
+    assert manager.route(query).tier == "1d"
+
+    manager.delete_data("1", "-3d", "-2d")
+    # the raw data, then the windows of every tier
+    tiers = len(manager.rollups.tiers)
+    assert fake.requests["/api/v2/delete"] == 1 + tiers
+    assert fake.requests["/api/v2/query"] == tiers
+    assert manager.route(query).tier == "1d"
+
+    day_ago = int(time.time() * 1000) - 86_400_000
+    manager.insert_many([reading("1", 450, day_ago)]).result()
+    assert manager.route(query).tier == "raw"
+    manager.refresh_rollups()
+    assert manager.route(query).tier == "1d"
+
+
+@pytest.mark.influx_manager
+def test_refresh_rollups_without_rollups(fake, manager):
+    """
+    Test that refreshing the rollups does nothing when they are disabled,
+    as they are by default.
+    """
+    manager.refresh_rollups()
+    assert manager.rollups is None
+    assert not fake.requests
+
+
+@pytest.mark.influx_manager
+def test_cached_results_follow_changes_made_through_other_workers(
+        fake, monkeypatch, tmp_path):  # pylint: disable=unused-argument
+    """
+    Test that a worker does not serve a cached result of a closed range
+    once its data was changed through another worker sharing the versions.
+    """
+    monkeypatch.setattr(HttpCacheConfig, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(WriteBufferConfig, "FLUSH_INTERVAL_MS", 10)
+    first, second = (InfluxManager(InfluxConnection()) for _ in range(2))
+    hour_ago = int(time.time() * 1000) - 3_600_000
+    query = BatteryQuery(battery_id=["1"], start_time=str(hour_ago - 1000),
+                         stop_time=str(hour_ago + 1000), field=["voltage"])
+    try:
+        for points in (1, 2):
+            version = second.data_versions.get(("1",)).version
+            second.insert_many([reading("1", 450, hour_ago + points)]).result()
+            # the versions change once the flush callbacks have run
+            while second.data_versions.get(("1",)).version == version:
+                time.sleep(0.001)
+            # served from the query cache of the first worker the second time
+            assert len(first.query_data(query)) == points
+            assert len(first.query_data(query)) == points
+    finally:
+        first.close()
+        second.close()
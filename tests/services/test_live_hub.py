@@ -0,0 +1,101 @@
+"""
+Unit tests for the live reading fan-out hub.
+"""
+
+import asyncio
+import json
+import threading
+from datetime import datetime, timezone
+
+import pytest
+from src.services.live_hub import HubFullError, LiveHub
+
+TIME = datetime(2024, 11, 17, tzinfo=timezone.utc)
+
+
+def reading(battery_id, voltage=450.0):
+    """
+    Builds a published reading.
+    """
+    return (battery_id, TIME, {"voltage": voltage, "current": 50.0})
+
+
+@pytest.mark.live_hub
+def test_readings_reach_matching_subscribers():
+    """
+    Test that subscribers receive the selected fields of their batteries
+    only.
+    """
+    async def scenario():
+        hub = LiveHub(queue_size=10, max_subscribers=10)
+        one = hub.subscribe(["1"], ["voltage"])
+        everything = hub.subscribe(None, None)
+
+        hub.publish([reading("1"), reading("2")])
+
+        return (await one.next_batch(0.1), await everything.next_batch(0.1),
+                await one.next_batch(0.01))
+
+    one, everything, idle = asyncio.run(scenario())
+
+    assert [json.loads(message) for message in one] == [
+        {"battery_id": "1", "time": "2024-11-17T00:00:00Z",
+         "voltage": 450.0}]
+    assert [json.loads(message)["battery_id"] for message in everything] == \
+        ["1", "2"]
+    assert idle == []
+
+
+@pytest.mark.live_hub
+def test_slow_subscriber_is_dropped():
+    """
+    Test that a subscriber whose queue is full is dropped without affecting
+    the others.
+    """
+    async def scenario():
+        hub = LiveHub(queue_size=2, max_subscribers=10)
+        slow = hub.subscribe(["1"], None)
+        fast = hub.subscribe(["1"], None)
+        for voltage in range(3):
+            hub.publish([reading("1", voltage)])
+            await fast.next_batch(0.1)
+        return hub, await slow.next_batch(0.1), fast
+
+    hub, slow_batch, fast = asyncio.run(scenario())
+
+    assert slow_batch is None
+    assert hub.snapshot()["subscribers"] == 1
+    assert hub.snapshot()["slow_consumers_dropped"] == 1
+    hub.unsubscribe(fast)
+    assert hub.snapshot()["subscribers"] == 0
+
+
+@pytest.mark.live_hub
+def test_publish_from_another_thread():
+    """
+    Test that readings published from another thread are dispatched on the
+    event loop.
+    """
+    async def scenario():
+        hub = LiveHub(queue_size=10, max_subscribers=10)
+        subscription = hub.subscribe(None, None)
+        thread = threading.Thread(target=hub.publish, args=([reading("1")],))
+        thread.start()
+        thread.join()
+        return await subscription.next_batch(1)
+
+    assert len(asyncio.run(scenario())) == 1
+
+
+@pytest.mark.live_hub
+def test_subscriber_limit():
+    """
+    Test that subscriptions beyond the limit are rejected.
+    """
+    async def scenario():
+        hub = LiveHub(queue_size=10, max_subscribers=1)
+        hub.subscribe(None, None)
+        with pytest.raises(HubFullError):
+            hub.subscribe(["1"], None)
+
+    asyncio.run(scenario())
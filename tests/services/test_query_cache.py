@@ -0,0 +1,179 @@
+"""
+Unit tests for the query result cache.
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+from src.models.query import BatteryQuery
+from src.services.query_cache import QueryCache, estimate_size
+
+
+def make_query(battery_id="100", start_time="-2h", stop_time="now()"):
+    """
+    Builds a single-battery voltage query.
+    """
+    return BatteryQuery(battery_id=[battery_id], start_time=start_time,
+                        stop_time=stop_time, field=["voltage"])
+
+
+def now_ms():
+    """
+    Returns the current time in milliseconds.
+    """
+    return int(datetime.now(timezone.utc).timestamp() * 1000)
+
+
+@pytest.mark.query_cache
+def test_hit_and_miss():
+    """
+    Test that a repeated query is served from the cache.
+    """
+    cache = QueryCache(ttl_s=60, max_bytes=1 << 20, bucket_ms=60_000)
+    calls = []
+    for _ in range(3):
+        result = cache.get_or_compute(make_query(),
+                                      lambda: calls.append(1) or [1, 2])
+        assert result == [1, 2]
+    assert len(calls) == 1
+    snapshot = cache.snapshot()
+    assert (snapshot["hits"], snapshot["misses"]) == (2, 1)
+
+
+@pytest.mark.query_cache
+def test_relative_ranges_are_normalised():
+    """
+    Test that equivalent relative ranges share a cache entry.
+    """
+    cache = QueryCache(ttl_s=60, max_bytes=1 << 20, bucket_ms=3_600_000)
+    cache.get_or_compute(make_query(start_time="-2h"), lambda: [1])
+    assert cache.get_or_compute(make_query(start_time="-120m"),
+                                lambda: [2]) == [1]
+
+
+@pytest.mark.query_cache
+def test_expiry():
+    """
+    Test that an entry is recomputed once its TTL has elapsed.
+    """
+    cache = QueryCache(ttl_s=0.05, max_bytes=1 << 20, bucket_ms=3_600_000)
+    cache.get_or_compute(make_query(), lambda: [1])
+    time.sleep(0.1)
+    assert cache.get_or_compute(make_query(), lambda: [2]) == [2]
+
+
+@pytest.mark.query_cache
+def test_memory_bound_evicts_least_recently_used():
+    """
+    Test that the least recently used entry is evicted beyond max_bytes.
+    """
+    max_bytes = 2 * estimate_size(list(range(50)))
+    cache = QueryCache(ttl_s=60, max_bytes=max_bytes, bucket_ms=60_000)
+    cache.get_or_compute(make_query("1"), lambda: list(range(50)))
+    cache.get_or_compute(make_query("2"), lambda: list(range(50)))
+    cache.get_or_compute(make_query("1"), lambda: [])
+    cache.get_or_compute(make_query("3"), lambda: list(range(50)))
+
+    assert cache.snapshot()["evictions"] == 1
+    assert cache.snapshot()["bytes"] <= max_bytes
+    assert cache.get_or_compute(make_query("1"), lambda: []) == \
+        list(range(50))
+    assert cache.get_or_compute(make_query("2"), lambda: []) == []
+
+
+@pytest.mark.query_cache
+def test_invalidation_is_range_aware():
+    """
+    Test that writes only invalidate the entries of the battery whose time
+    range they touch.
+    """
+    cache = QueryCache(ttl_s=60, max_bytes=1 << 20, bucket_ms=1000)
+    cache.get_or_compute(make_query("1", stop_time="-1h"), lambda: [1])
+    cache.get_or_compute(make_query("2", stop_time="-1h"), lambda: [2])
+
+    cache.invalidate("1", now_ms(), now_ms())
+    assert cache.snapshot()["invalidations"] == 0
+
+    written = now_ms() - 90 * 60 * 1000
+    cache.invalidate("1", written, written)
+    assert cache.snapshot()["invalidations"] == 1
+    assert cache.get_or_compute(make_query("1", stop_time="-1h"),
+                                lambda: [3]) == [3]
+    assert cache.get_or_compute(make_query("2", stop_time="-1h"),
+                                lambda: [4]) == [2]
+
+
+@pytest.mark.query_cache
+def test_wildcard_entries_are_invalidated_by_any_battery():
+    """
+    Test that an entry selecting every battery is invalidated by a write to
+    any battery.
+    """
+    cache = QueryCache(ttl_s=60, max_bytes=1 << 20, bucket_ms=1000)
+    cache.get_or_compute(make_query("*"), lambda: {})
+    cache.invalidate("7", now_ms() - 1000, now_ms() - 1000)
+    assert cache.snapshot()["entries"] == 0
+
+
+@pytest.mark.query_cache
+def test_single_flight():
+    """
+    Test that concurrent identical misses run the query once.
+    """
+    cache = QueryCache(ttl_s=60, max_bytes=1 << 20, bucket_ms=60_000)
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return [1]
+
+    results = []
+    threads = [threading.Thread(
+        target=lambda: results.append(
+            cache.get_or_compute(make_query(), compute)))
+        for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while cache.snapshot()["coalesced"] < 4:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [[1]] * 5
+
+
+@pytest.mark.query_cache
+def test_result_changed_while_computing_is_not_cached():
+    """
+    Test that a result is not cached if its data changes while the query
+    runs.
+    """
+    cache = QueryCache(ttl_s=60, max_bytes=1 << 20, bucket_ms=1000)
+
+    def compute():
+        cache.invalidate("100", now_ms() - 1000, now_ms() - 1000)
+        return [1]
+
+    assert cache.get_or_compute(make_query(), compute) == [1]
+    assert cache.snapshot()["entries"] == 0
+
+
+@pytest.mark.query_cache
+def test_errors_are_not_cached():
+    """
+    Test that a failing query is retried by the next lookup.
+    """
+    cache = QueryCache(ttl_s=60, max_bytes=1 << 20, bucket_ms=60_000)
+
+    def fail():
+        raise ConnectionError("InfluxDB unavailable")
+
+    with pytest.raises(ConnectionError):
+        cache.get_or_compute(make_query(), fail)
+    assert cache.get_or_compute(make_query(), lambda: [1]) == [1]
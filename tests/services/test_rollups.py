@@ -0,0 +1,108 @@
+"""
+Unit tests for the rollup tiers and the routing of the queries to them.
+"""
+
+import time
+
+import pytest
+from src.db.connection import InfluxConnection
+from src.models.query import BatteryQuery
+from src.services.rollups import Rollups
+
+DAY_MS = 86_400_000
+
+
+@pytest.fixture(name="connection")
+def fixture_connection(fake):  # pylint: disable=unused-argument
+    """
+    Connects to the fake InfluxDB.
+    """
+    connection = InfluxConnection()
+    yield connection
+    connection.close()
+
+
+def battery_query(**params):
+    """
+    Builds an aggregated query over the last week, overriding some
+    parameters.
+    """
+    return BatteryQuery(**{"battery_id": ["1"], "start_time": "-7d",
+                           "stop_time": "now()", "field": ["voltage"],
+                           "every": "1d", **params})
+
+
+@pytest.mark.rollups
+def test_tasks_are_created_once_and_replaced_when_changed(fake, connection):
+    """
+    Test that a task is created per tier, that a tier serves queries once
+    its task has run, and that a task whose script changed is replaced.
+    """
+    rollups = Rollups(connection, ["1h", "1m"], "30s", "30d")
+    rollups.refresh()
+    assert rollups.route(battery_query()).tier == "raw"
+
+    rollups.refresh()
+    names = sorted(task["name"] for task in fake.tasks.values())
+    assert names == ["battery_data rollup 1h", "battery_data rollup 1m"]
+    assert rollups.snapshot()["1h_lag_s"] >= 0
+
+    Rollups(connection, ["1h"], "1m", "30d").refresh()
+    offsets = {task["name"]: "offset: 1m" in task["flux"]
+               for task in fake.tasks.values()}
+    assert len(fake.tasks) == 2
+    assert offsets == {"battery_data rollup 1h": True,
+                       "battery_data rollup 1m": False}
+
+
+@pytest.mark.rollups
+def test_queries_are_routed_to_the_coarsest_fitting_tier(connection):
+    """
+    Test that aggregated queries go to the coarsest tier whose windows fit
+    theirs, and the others to the raw data.
+    """
+    rollups = Rollups(connection, ["1m", "1h"], "30s", "30d")
+    rollups.refresh()
+    rollups.refresh()
+
+    assert rollups.route(battery_query()).tier == "1h"
+    assert rollups.route(battery_query(every="1mo")).tier == "1h"
+    assert rollups.route(battery_query(every="30m")).tier == "1m"
+    assert rollups.route(battery_query(every="90s")).tier == "raw"
+    assert rollups.route(battery_query(fn="percentile")).tier == "raw"
+    assert rollups.route(battery_query(tier="raw")).tier == "raw"
+    assert rollups.route(battery_query(start_time="-1y")).tier == "raw"
+
+    sized = rollups.route(battery_query(every=None, max_points=5))
+    assert sized.tier == "1h"
+    assert sized.every == f"{34 * 3600 * 10 ** 9}ns"
+
+
+@pytest.mark.rollups
+def test_changed_windows_are_served_raw_until_rolled_up_again(fake,
+                                                              connection):
+    """
+    Test that the queries over data changed in windows already rolled up
+    are served from the raw data until the windows are rolled up again,
+    and that changes in windows not rolled up yet are ignored.
+    """
+    rollups = Rollups(connection, ["1h"], "30s", "30d")
+    rollups.refresh()
+    rollups.refresh()
+    now_ms = int(time.time() * 1000)
+
+    rollups.invalidate({"1": (now_ms, now_ms)})
+    assert rollups.route(battery_query()).tier == "1h"
+
+    rollups.invalidate({"1": (now_ms - 2 * DAY_MS, now_ms - DAY_MS)})
+    assert rollups.route(battery_query()).tier == "raw"
+    assert rollups.route(battery_query(battery_id=["*"])).tier == "raw"
+    assert rollups.route(battery_query(battery_id=["2"])).tier == "1h"
+    assert rollups.route(battery_query(start_time="-12h")).tier == "1h"
+
+    assert rollups.repair() == {"1": (now_ms - 2 * DAY_MS,
+                                      now_ms - DAY_MS + 1)}
+    assert fake.requests["/api/v2/delete"] == 1
+    assert fake.requests["/api/v2/query"] == 1
+    assert rollups.route(battery_query()).tier == "1h"
+    assert rollups.repair() == {}
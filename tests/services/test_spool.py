@@ -0,0 +1,195 @@
+"""
+Unit tests for the write spool and its replayer.
+"""
+
+import threading
+import time
+
+import pytest
+from influxdb_client.rest import ApiException
+from src.services.spool import Spool, SpoolFullError, SpoolReplayer, \
+    write_isolating_rejections
+
+
+class FlakyWriter:
+    """
+    Stand-in for the Write API failing while `available` is False and
+    recording the batches it receives otherwise.
+    """
+
+    def __init__(self, available=True):
+        self.available = available
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def __call__(self, lines):
+        if not self.available:
+            raise ConnectionError("InfluxDB unavailable")
+        with self._lock:
+            self.batches.append(list(lines))
+
+    @property
+    def lines(self):
+        """
+        The records written, in order.
+        """
+        with self._lock:
+            return [line for batch in self.batches for line in batch]
+
+
+def wait_until(condition, timeout_s=2.0):
+    """
+    Waits until a condition holds, failing the test after the timeout.
+    """
+    deadline = time.monotonic() + timeout_s
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+@pytest.mark.spool
+def test_segments_roll_over_and_survive_a_restart(tmp_path):
+    """
+    Test that records are appended to segments sealed at their size limit,
+    and that a new spool on the same directory picks them up in order.
+    """
+    spool = Spool(str(tmp_path), segment_bytes=10, max_bytes=1000)
+    spool.append(["a,x=1 v=1i"])
+    spool.append(["b,x=1 v=1i", "c,x=1 v=1i"])
+    snapshot = spool.snapshot()
+    spool.close()
+
+    restarted = Spool(str(tmp_path), segment_bytes=10, max_bytes=1000)
+    first = restarted.oldest()
+    lines = first.read_text().splitlines()
+    restarted.remove(first)
+    second = restarted.oldest()
+
+    assert snapshot["segments"] == 2
+    assert snapshot["records_spooled"] == 3
+    assert restarted.directory == spool.directory
+    assert lines == ["a,x=1 v=1i"]
+    assert second.read_text().splitlines() == ["b,x=1 v=1i", "c,x=1 v=1i"]
+    assert restarted.snapshot()["bytes"] == second.stat().st_size
+    restarted.close()
+
+
+@pytest.mark.spool
+def test_workers_claim_their_own_directory(tmp_path):
+    """
+    Test that a spool does not use a directory claimed by another running
+    spool, and that the spool rejects records beyond its maximum size.
+    """
+    first = Spool(str(tmp_path), segment_bytes=100, max_bytes=20)
+    second = Spool(str(tmp_path), segment_bytes=100, max_bytes=20)
+
+    first.append(["a,x=1 v=1i"])
+    with pytest.raises(SpoolFullError):
+        first.append(["b,x=1 v=1i", "c,x=1 v=1i"])
+
+    assert first.directory != second.directory
+    first.close()
+    second.close()
+
+
+@pytest.mark.spool
+def test_replayer_drains_the_spool_once_influxdb_recovers(tmp_path):
+    """
+    Test that the replayer retries while InfluxDB is unavailable, then
+    writes the spooled records in order and ends the outage.
+    """
+    spool = Spool(str(tmp_path), segment_bytes=25, max_bytes=10_000)
+    spool.outage = True
+    records = [f"m,x=1 v={index}i" for index in range(10)]
+    spool.append(records)
+    writer = FlakyWriter(available=False)
+    replayer = SpoolReplayer(spool, writer, rate_per_s=100_000,
+                             batch_size=3, sync_interval_s=0.01,
+                             retry_s=0.01)
+
+    wait_until(lambda: spool.metrics.replay_failures >= 2)
+    writer.available = True
+    spool.append(["m,x=1 v=10i"])
+    wait_until(lambda: spool.snapshot()["segments"] == 0)
+    replayer.close()
+
+    assert writer.lines == [*records, "m,x=1 v=10i"]
+    assert not spool.outage
+    assert spool.snapshot()["records_replayed"] == 11
+    assert spool.snapshot()["bytes"] == 0
+    spool.close()
+
+
+@pytest.mark.spool
+def test_replay_is_rate_limited(tmp_path):
+    """
+    Test that the replayer writes at most `rate_per_s` records per second.
+    """
+    spool = Spool(str(tmp_path), segment_bytes=10_000, max_bytes=10_000)
+    spool.append([f"m,x=1 v={index}i" for index in range(40)])
+    writer = FlakyWriter()
+    start = time.monotonic()
+    replayer = SpoolReplayer(spool, writer, rate_per_s=200, batch_size=10,
+                             sync_interval_s=0.01)
+
+    wait_until(lambda: len(writer.lines) == 40)
+    elapsed = time.monotonic() - start
+    replayer.close()
+    spool.close()
+
+    # the last of 4 batches of 10 waits for the first 30 records
+    assert elapsed >= 0.15
+
+
+@pytest.mark.spool
+def test_replay_drops_only_the_rejected_records(tmp_path):
+    """
+    Test that the replayer drops the records InfluxDB rejects with a 400,
+    and writes the other records of their batch.
+    """
+    spool = Spool(str(tmp_path), segment_bytes=10_000, max_bytes=10_000)
+    records = [f"m,x=1 v={index}i" for index in range(6)]
+    spool.append([*records[:2], "bad", *records[2:]])
+    writer = FlakyWriter()
+
+    def validating_writer(lines):
+        if "bad" in lines:
+            raise ApiException(status=400, reason="Bad Request")
+        writer(lines)
+
+    replayer = SpoolReplayer(spool, validating_writer, rate_per_s=100_000,
+                             batch_size=7, sync_interval_s=0.01)
+    wait_until(lambda: spool.snapshot()["segments"] == 0)
+    replayer.close()
+
+    assert sorted(writer.lines) == records
+    assert spool.snapshot()["records_replayed"] == 6
+    assert spool.snapshot()["records_dropped"] == 1
+    spool.close()
+
+
+@pytest.mark.spool
+def test_isolating_rejections_is_bounded():
+    """
+    Test that isolating the rejected records stops after `max_writes`
+    writes, rejecting the undecided parts of the batch as a whole.
+    """
+    written = []
+
+    def rejecting_writer(lines):
+        written.append(list(lines))
+        if any(line.startswith("bad") for line in lines):
+            raise ApiException(status=400, reason="Bad Request")
+
+    lines = ["bad"] * 1000
+    assert sorted(write_isolating_rejections(rejecting_writer, lines,
+                                             max_writes=15)) == \
+        list(range(1000))
+    assert len(written) <= 15
+
+    written.clear()
+    lines = ["ok"] * 64
+    lines[5] = "bad"
+    rejected = write_isolating_rejections(rejecting_writer, lines)
+    assert list(rejected) == [5]
+    assert len(written) == 13
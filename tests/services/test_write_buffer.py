@@ -0,0 +1,178 @@
+"""
+Unit tests for the InfluxDB write buffer.
+"""
+
+import threading
+
+import pytest
+from influxdb_client.rest import ApiException
+from src.services.spool import Spool
+from src.services.write_buffer import RejectedPointsError, WriteBuffer, \
+    WriteBufferFullError
+
+
+class RecordingWriter:
+    """
+    Stand-in for the Write API that records the batches it receives.
+    """
+
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, lines):
+        self.release.wait()
+        if self.fail:
+            raise ConnectionError("InfluxDB unavailable")
+        self.batches.append(list(lines))
+
+
+class ValidatingWriter(RecordingWriter):
+    """
+    Stand-in for the Write API rejecting with a 400 the batches holding a
+    record starting with "bad".
+    """
+
+    def __call__(self, lines):
+        if any(line.startswith("bad") for line in lines):
+            raise ApiException(status=400, reason="Bad Request")
+        super().__call__(lines)
+
+
+@pytest.mark.write_buffer
+def test_flush_on_size():
+    writer = RecordingWriter()
+    buffer = WriteBuffer(writer, max_size=100, batch_size=3,
+                         flush_interval_s=60)
+
+    future = buffer.put(["a", "b", "c"])
+
+    # Assert that a full batch is flushed without waiting for its age
+    assert future.result(timeout=1) is None
+    assert writer.batches == [["a", "b", "c"]]
+    buffer.close()
+
+
+@pytest.mark.write_buffer
+def test_flush_on_age():
+    writer = RecordingWriter()
+    buffer = WriteBuffer(writer, max_size=100, batch_size=100,
+                         flush_interval_s=0.05)
+
+    future = buffer.put(["a"])
+
+    assert future.result(timeout=1) is None
+    assert writer.batches == [["a"]]
+    assert buffer.snapshot()["flushes"] == 1
+    buffer.close()
+
+
+@pytest.mark.write_buffer
+def test_flush_on_close():
+    writer = RecordingWriter()
+    buffer = WriteBuffer(writer, max_size=100, batch_size=100,
+                         flush_interval_s=60)
+
+    future = buffer.put(["a", "b"])
+    buffer.close()
+
+    # Assert that closing the buffer flushes the pending records
+    assert future.done()
+    assert writer.batches == [["a", "b"]]
+    with pytest.raises(RuntimeError):
+        buffer.put(["c"])
+
+
+@pytest.mark.write_buffer
+def test_backpressure_when_full():
+    writer = RecordingWriter()
+    writer.release.clear()
+    buffer = WriteBuffer(writer, max_size=2, batch_size=100,
+                         flush_interval_s=60)
+
+    buffer.put(["a", "b"])
+
+    # Assert that records beyond max_size are rejected
+    with pytest.raises(WriteBufferFullError):
+        buffer.put(["c"])
+    assert buffer.snapshot()["points_rejected"] == 1
+    assert buffer.snapshot()["queue_depth"] == 2
+
+    writer.release.set()
+    buffer.close()
+
+
+@pytest.mark.write_buffer
+def test_failed_flush_resolves_future_with_error():
+    buffer = WriteBuffer(RecordingWriter(fail=True), max_size=10,
+                         batch_size=1, flush_interval_s=60)
+
+    future = buffer.put(["a"])
+
+    with pytest.raises(ConnectionError):
+        future.result(timeout=1)
+    assert buffer.snapshot()["failed_flushes"] == 1
+    buffer.close()
+
+
+@pytest.mark.write_buffer
+def test_failed_and_overflowing_writes_are_spooled(tmp_path):
+    """
+    Test that a batch InfluxDB fails to take is spooled and acknowledged,
+    that the next batches are spooled without trying InfluxDB, and that
+    records not fitting in the buffer are spooled rather than rejected.
+    """
+    writer = RecordingWriter(fail=True)
+    spool = Spool(str(tmp_path), segment_bytes=1000, max_bytes=1000)
+    buffer = WriteBuffer(writer, max_size=2, batch_size=2,
+                         flush_interval_s=60, spool=spool)
+
+    failed = buffer.put(["a", "b"])
+    assert failed.result(timeout=1) is None
+    writer.release.clear()
+    during_outage = buffer.put(["c", "d"])
+    assert during_outage.result(timeout=1) is None
+    overflow = buffer.put(["e", "f", "g"])
+    buffer.close()
+
+    assert overflow.done()
+    assert spool.outage
+    assert buffer.snapshot()["failed_flushes"] == 1
+    assert spool.snapshot()["records_spooled"] == 7
+    spool.close()
+
+
+@pytest.mark.write_buffer
+def test_rejected_records_are_isolated(tmp_path):
+    """
+    Test that the valid records of a batch InfluxDB rejects with a 400 are
+    written, that only the writes holding rejected records fail, and that
+    nothing is spooled.
+    """
+    writer = ValidatingWriter()
+    spool = Spool(str(tmp_path), segment_bytes=1000, max_bytes=1000)
+    buffer = WriteBuffer(writer, max_size=100, batch_size=8,
+                         flush_interval_s=60, spool=spool)
+    writer.release.clear()
+
+    valid = buffer.put(["a", "b", "c"])
+    mixed = buffer.put(["d", "bad-e", "f", "bad-g"])
+    last = buffer.put(["h"])
+    writer.release.set()
+
+    assert valid.result(timeout=1) is None
+    assert last.result(timeout=1) is None
+    with pytest.raises(RejectedPointsError) as err:
+        mixed.result(timeout=1)
+    buffer.close()
+
+    assert sorted(err.value.rejected) == [1, 3]
+    assert sorted(line for batch in writer.batches for line in batch) == \
+        ["a", "b", "c", "d", "f", "h"]
+    assert not spool.outage
+    assert spool.snapshot()["records_spooled"] == 0
+    assert buffer.snapshot()["points_invalid"] == 2
+    assert buffer.snapshot()["points_flushed"] == 6
+    spool.close()
@@ -0,0 +1,50 @@
+"""
+Unit tests for the CPU quota detection.
+"""
+
+import os
+
+import pytest
+from src.utils.cpu_quota import available_cpus, cgroup_cpu_limit
+
+
+@pytest.mark.cpu_quota
+def test_cgroup_v2_limit(tmp_path):
+    (tmp_path / "cpu.max").write_text("150000 100000\n")
+
+    assert cgroup_cpu_limit(tmp_path) == 1.5
+
+
+@pytest.mark.cpu_quota
+def test_cgroup_v2_without_limit(tmp_path):
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+
+    assert cgroup_cpu_limit(tmp_path) is None
+
+
+@pytest.mark.cpu_quota
+def test_cgroup_v1_limit(tmp_path):
+    (tmp_path / "cpu").mkdir()
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("200000\n")
+    (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+
+    assert cgroup_cpu_limit(tmp_path) == 2
+
+
+@pytest.mark.cpu_quota
+def test_cgroup_v1_without_limit(tmp_path):
+    (tmp_path / "cpu").mkdir()
+    (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("-1\n")
+    (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+
+    assert cgroup_cpu_limit(tmp_path) is None
+
+
+@pytest.mark.cpu_quota
+def test_available_cpus_rounds_quota_up(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "sched_getaffinity", lambda _pid: set(range(8)),
+                        raising=False)
+    (tmp_path / "cpu.max").write_text("150000 100000\n")
+
+    assert available_cpus(tmp_path) == 2
+    assert available_cpus(tmp_path / "missing") == 8
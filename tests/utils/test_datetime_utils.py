@@ -1,7 +1,8 @@
 import pytest
 from datetime import datetime, timedelta, timezone
 from src.utils.datetime_utils import utc_now_timestamp, parse_relative_time, \
-    calculate_start_stop_times
+    calculate_start_stop_times, range_duration, parse_time_bound, \
+    parse_time_range, split_range, to_rfc3339, TimeRange
 
 
 @pytest.mark.datetime_utils
@@ -30,6 +31,7 @@ def test_utc_now_timestamp():
     ("-1mo", timedelta(days=30)),  # Approximate month
     ("-1y", timedelta(days=365)),  # Approximate year
     ("-500ms", timedelta(milliseconds=500)),
+    ("-1h30m", timedelta(hours=1, minutes=30)),
 ])
 def test_parse_relative_time(time_str, expected_timedelta):
     # Assert that the parsed timedelta matches the expected value
@@ -79,3 +81,91 @@ def test_calculate_start_stop_times():
         (
             f"Expected stop time close to {expected_stop_time},"
             f" got {stop_time_dt}")
+
+
+@pytest.mark.datetime_utils
+@pytest.mark.parametrize("start_time, stop_time, expected_duration", [
+    ("-2h", "-1m", timedelta(minutes=119)),
+    ("-1d", "now()", timedelta(days=1)),
+    ("2024-11-17T00:00:00Z", "2024-11-18T06:00:00Z",
+     timedelta(days=1, hours=6)),
+])
+def test_range_duration(start_time, stop_time, expected_duration):
+    assert range_duration(start_time, stop_time) == expected_duration
+
+
+@pytest.mark.datetime_utils
+def test_range_duration_empty_range():
+    with pytest.raises(ValueError, match="start_time must be before"):
+        range_duration("-1m", "-2h")
+
+
+@pytest.mark.datetime_utils
+@pytest.mark.parametrize("time_str, expected_ns", [
+    ("-1h30m", -5400 * 10 ** 9),
+    ("+500ms", 500 * 10 ** 6),
+    ("-1mo2d", -32 * 86400 * 10 ** 9),
+    ("-10us", -10_000),
+    ("now()", 0),
+])
+def test_parse_time_bound_relative(time_str, expected_ns):
+    bound = parse_time_bound(time_str)
+    assert bound.relative
+    assert bound.nanoseconds == expected_ns
+
+
+@pytest.mark.datetime_utils
+@pytest.mark.parametrize("time_str", [
+    "2024-11-17T00:00:00.123456789Z",
+    "2024-11-17T01:00:00.123456789+01:00",
+    "2024-11-16T23:30:00.123456789-00:30",
+])
+def test_parse_time_bound_rfc3339_keeps_nanoseconds(time_str):
+    bound = parse_time_bound(time_str)
+    assert not bound.relative
+    assert bound.nanoseconds == 1731801600123456789
+
+
+@pytest.mark.datetime_utils
+def test_parse_time_bound_epoch_milliseconds():
+    assert parse_time_bound("1731801600000") == parse_time_bound(
+        "2024-11-17T00:00:00Z")
+
+
+@pytest.mark.datetime_utils
+@pytest.mark.parametrize("time_str", [
+    "-10x", "-1h30", "1h", "2024-11-17", "2024-02-30T00:00:00Z", "now", ""])
+def test_parse_time_bound_invalid(time_str):
+    with pytest.raises(ValueError):
+        parse_time_bound(time_str)
+
+
+@pytest.mark.datetime_utils
+def test_parse_time_range_normalises_equivalent_ranges():
+    now_ns = 1731801600 * 10 ** 9
+    compound = parse_time_range("-1h30m", "now()", now_ns)
+    minutes = parse_time_range("-90m", "now()", now_ns + 1)
+
+    assert compound.start_ns == now_ns - 5400 * 10 ** 9
+    assert compound.stop_ns == now_ns
+    assert compound.key is minutes.key
+
+
+@pytest.mark.datetime_utils
+@pytest.mark.parametrize("digits, expected", [
+    (9, "2024-11-17T00:00:00.123456789Z"),
+    (3, "2024-11-17T00:00:00.123Z"),
+    (0, "2024-11-17T00:00:00Z"),
+])
+def test_to_rfc3339(digits, expected):
+    assert to_rfc3339(1731801600123456789, digits) == expected
+
+
+@pytest.mark.datetime_utils
+@pytest.mark.parametrize("start_ns, stop_ns, expected", [
+    (0, 10, [(0, 4), (4, 8), (8, 10)]),
+    (0, 8, [(0, 4), (4, 8)]),
+    (5, 5, [(5, 5)]),
+])
+def test_split_range(start_ns, stop_ns, expected):
+    assert split_range(TimeRange(start_ns, stop_ns, ""), 4) == expected
@@ -0,0 +1,56 @@
+"""
+Unit tests for the time series downsampling functions.
+"""
+
+import math
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from src.utils.downsampling import lttb, lttb_indices
+
+
+def make_series(length: int):
+    start = datetime(2024, 11, 17, tzinfo=timezone.utc)
+    return [{"time": start + timedelta(seconds=i), "value": math.sin(i / 10)}
+            for i in range(length)]
+
+
+@pytest.mark.downsampling
+def test_lttb_keeps_threshold_points_and_endpoints():
+    series = make_series(1000)
+
+    result = lttb(series, 50)
+
+    assert len(result) == 50
+    assert result[0] is series[0]
+    assert result[-1] is series[-1]
+    # Assert that the selected points keep their original order
+    times = [point["time"] for point in result]
+    assert times == sorted(times)
+
+
+@pytest.mark.downsampling
+def test_lttb_preserves_spikes():
+    series = make_series(1000)
+    series[500]["value"] = 100
+
+    # Assert that a single outlier survives heavy downsampling
+    assert series[500] in lttb(series, 20)
+
+
+@pytest.mark.downsampling
+def test_lttb_returns_short_series_unchanged():
+    series = make_series(10)
+
+    assert lttb(series, 10) is series
+    assert lttb(series, 50) is series
+
+
+@pytest.mark.downsampling
+def test_lttb_indices_match_lttb():
+    series = make_series(500)
+
+    indices = lttb_indices([point["time"].timestamp() for point in series],
+                           [point["value"] for point in series], 40)
+
+    assert [series[i] for i in indices] == lttb(series, 40)
@@ -0,0 +1,63 @@
+"""
+Unit tests for splitting streamed bodies into JSON documents.
+"""
+
+import pytest
+from src.utils.json_stream import JsonDocumentSplitter
+
+ARRAY_BODY = (b' [{"battery_id": "1", "note": "a,]}\\\\"},'
+              b' {"battery_id": "2", "tags": ["x", {"y": "\\""}]} ,'
+              b' {"battery_id": "3"}]')
+EXPECTED_ARRAY_DOCUMENTS = [
+    (1, b'{"battery_id": "1", "note": "a,]}\\\\"}'),
+    (2, b'{"battery_id": "2", "tags": ["x", {"y": "\\""}]}'),
+    (3, b'{"battery_id": "3"}'),
+]
+
+
+def split(body: bytes, chunk_size: int):
+    splitter = JsonDocumentSplitter()
+    documents = []
+    for i in range(0, len(body), chunk_size):
+        documents += splitter.feed(body[i:i + chunk_size])
+    return documents + splitter.close()
+
+
+@pytest.mark.json_stream
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 1024])
+def test_split_json_array(chunk_size):
+    # Assert that elements are split correctly wherever the chunks end,
+    # including inside strings and escape sequences
+    assert split(ARRAY_BODY, chunk_size) == EXPECTED_ARRAY_DOCUMENTS
+
+
+@pytest.mark.json_stream
+@pytest.mark.parametrize("chunk_size", [1, 5, 1024])
+def test_split_ndjson(chunk_size):
+    body = b'{"battery_id": "1"}\n\n{"battery_id": "2"}\r\n{"battery_id": '
+
+    # Assert that blank lines are skipped but still counted
+    assert split(body, chunk_size) == [
+        (1, b'{"battery_id": "1"}'),
+        (3, b'{"battery_id": "2"}\r'),
+        (4, b'{"battery_id": '),
+    ]
+
+
+@pytest.mark.json_stream
+def test_split_empty_array():
+    assert split(b"[ ]", 1) == []
+
+
+@pytest.mark.json_stream
+@pytest.mark.parametrize("body", [b'[{"a": 1}', b'[{"a": 1},,{"b": 2}]',
+                                  b'[{"a": 1}}', b'[{"a": 1}] {"b": 2}',
+                                  b'[{"a": 1}]]'])
+def test_split_malformed_array(body):
+    with pytest.raises(ValueError):
+        split(body, 3)
+
+
+@pytest.mark.json_stream
+def test_whitespace_may_follow_an_array():
+    assert split(b'[{"a": 1}] \r\n', 1) == [(1, b'{"a": 1}')]
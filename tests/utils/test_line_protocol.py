@@ -0,0 +1,69 @@
+"""
+Unit tests for the line protocol serialisation of battery readings.
+"""
+
+import pytest
+from influxdb_client import Point
+from pydantic import ValidationError
+from src.models.battery import BatteryData
+from src.utils.line_protocol import battery_line, parse_battery_line
+
+
+def point_line(reading, inserted_at):
+    """
+    Serialises a reading with the InfluxDB client's Point builder.
+    """
+    timestamp = reading.timestamp
+    point = Point("battery_data").tag("battery_id", reading.battery_id)
+    for field in ("voltage", "current", "temperature", "state_of_charge",
+                  "state_of_health"):
+        point.field(field, getattr(reading, field))
+    return (point.field("influx_timestamp", inserted_at)
+            .field("latency_ms", 0)
+            .time(inserted_at if timestamp is None else timestamp,
+                  write_precision="ms")
+            .to_line_protocol())
+
+
+@pytest.mark.line_protocol
+@pytest.mark.parametrize("battery_id, timestamp", [
+    ("1", None),
+    ("pack 7,cell=2", 1731801600000),
+    ("trailing\\", None),
+    ("tab\tnew\nline", 0),
+    ("", None),
+])
+def test_battery_line_matches_point(battery_id, timestamp):
+    # built without validation, as the model rejects an empty battery ID
+    reading = BatteryData.model_construct(
+        battery_id=battery_id, voltage=450, current=20, temperature=25,
+        state_of_charge=80, state_of_health=90, timestamp=timestamp)
+    assert battery_line(reading, 1731801601234) == \
+        point_line(reading, 1731801601234)
+
+
+@pytest.mark.line_protocol
+def test_empty_battery_id_is_rejected():
+    """
+    Test that a reading without a battery ID is rejected, rather than
+    written without the battery_id tag.
+    """
+    with pytest.raises(ValidationError):
+        BatteryData(battery_id="", voltage=450, current=20, temperature=25,
+                    state_of_charge=80, state_of_health=90)
+
+
+@pytest.mark.line_protocol
+@pytest.mark.parametrize("battery_id, timestamp", [
+    ("1", 1731801600000),
+    ("pack 7,cell=2", 0),
+    ("trailing\\", 1731801600000),
+    ("tab\tnew\nline", 1731801600000),
+])
+def test_battery_line_is_parsed_back(battery_id, timestamp):
+    reading = BatteryData(battery_id=battery_id, voltage=450, current=20,
+                          temperature=25, state_of_charge=80,
+                          state_of_health=90, timestamp=timestamp)
+    assert parse_battery_line(battery_line(reading, 1)) == \
+        (battery_id, timestamp)
+    assert parse_battery_line("cpu,host=a usage=1i 1") is None
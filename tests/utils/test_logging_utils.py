@@ -0,0 +1,87 @@
+"""
+Unit tests for the logging filters and JSON formatter.
+"""
+
+import json
+import logging
+
+import pytest
+from src.utils import logging_utils
+from src.utils.logging_utils import REQUEST_ID, SAMPLED, JsonFormatter, \
+    RateLimitFilter, RequestContextFilter
+
+
+def record(message="Buffered data point", extra=None):
+    """
+    Builds a log record, with the given extra attributes.
+    """
+    return logging.makeLogRecord({"name": "test", "levelname": "INFO",
+                                  "msg": message, **(extra or {})})
+
+
+@pytest.mark.logging
+def test_sampled_records_are_rate_limited(monkeypatch):
+    """
+    Test that records marked as sampled are limited per message, the next
+    record let through reporting how many were dropped, and that other
+    records are never dropped.
+    """
+    clock = [1000.0]
+    monkeypatch.setattr(logging_utils.time, "monotonic", lambda: clock[0])
+    limit = RateLimitFilter(per_second=2)
+
+    sampled = [limit.filter(record(extra=SAMPLED)) for _ in range(5)]
+    other = limit.filter(record("Other", extra=SAMPLED))
+    unsampled = [limit.filter(record()) for _ in range(5)]
+    clock[0] += 1
+    resumed = record(extra=SAMPLED)
+
+    assert sampled == [True, True, False, False, False]
+    assert other
+    assert all(unsampled)
+    assert limit.filter(resumed)
+    assert resumed.suppressed == 3
+
+
+@pytest.mark.logging
+def test_sampled_records_are_rate_limited_per_key(monkeypatch):
+    """
+    Test that the records of a message are limited separately for each
+    value of the sampled extra, e.g. the route and status of a request.
+    """
+    monkeypatch.setattr(logging_utils.time, "monotonic", lambda: 1000.0)
+    limit = RateLimitFilter(per_second=1)
+
+    def served(route, status):
+        return limit.filter(record("Served %s", extra={
+            "sampled": ("GET", route, status)}))
+
+    assert [served("/query", 200) for _ in range(3)] == [True, False, False]
+    assert served("/query", 500)
+    assert served("/healthCheck", 200)
+    assert not served("/query", 500)
+
+
+@pytest.mark.logging
+def test_json_records_carry_the_request_id_and_extra_fields():
+    """
+    Test that a JSON record holds the message, the request ID and the
+    extra fields, but neither the standard attributes nor unset fields.
+    """
+    entry = record("Served %s %s", extra={"args": ("GET", "/latest"),
+                                          "status": 200,
+                                          "duration_ms": 1.5,
+                                          "route": None, **SAMPLED})
+    token = REQUEST_ID.set("abc")
+    try:
+        RequestContextFilter().filter(entry)
+    finally:
+        REQUEST_ID.reset(token)
+
+    document = json.loads(JsonFormatter().format(entry))
+
+    assert document.pop("time").endswith("Z")
+    assert document == {"level": "INFO", "logger": "test",
+                        "message": "Served GET /latest",
+                        "request_id": "abc", "status": 200,
+                        "duration_ms": 1.5}
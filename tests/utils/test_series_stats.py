@@ -0,0 +1,117 @@
+"""
+Unit tests for the battery time series statistics.
+"""
+
+import math
+
+import numpy as np
+import pytest
+from src.config.validation import DataValidationConfig
+from src.utils.series_stats import SeriesColumns, battery_stats, \
+    energy_stats, field_stats, validation_bounds
+
+SECOND_NS = 10 ** 9
+HOUR_NS = 3_600 * SECOND_NS
+
+
+@pytest.mark.series_stats
+def test_field_stats_summarise_the_values():
+    """
+    Test the distribution and rate of change of a field, ignoring the
+    missing values.
+    """
+    times = np.arange(5, dtype=np.int64) * SECOND_NS
+    values = np.array([10.0, 20.0, math.nan, 40.0, 50.0])
+
+    stats = field_stats(times, values, [50, 90])
+
+    assert stats["count"] == 4
+    assert (stats["min"], stats["max"], stats["mean"]) == (10, 50, 30)
+    assert stats["std"] == pytest.approx(np.std([10, 20, 40, 50]))
+    assert stats["percentiles"] == {"p50": 30, "p90": pytest.approx(47)}
+    assert stats["rate_per_s"] == {"mean": 10, "min": 10, "max": 10}
+    assert "time_above_max_s" not in stats
+
+
+@pytest.mark.series_stats
+def test_field_stats_hold_values_until_the_next_data_point():
+    """
+    Test that the time out of range is counted from every value out of
+    range until the next data point.
+    """
+    times = np.array([0, 10, 40, 100], dtype=np.int64) * SECOND_NS
+    values = np.array([50.0, 120.0, -5.0, 120.0])
+
+    stats = field_stats(times, values, [50], bounds=(0, 100))
+
+    assert stats["time_above_max_s"] == 30
+    assert stats["time_below_min_s"] == 60
+
+
+@pytest.mark.series_stats
+def test_field_stats_of_few_values():
+    """
+    Test that a field without values only has a count, and a single value
+    has no rate of change.
+    """
+    times = np.array([0], dtype=np.int64)
+
+    assert field_stats(times, np.array([math.nan]), [50]) == {"count": 0}
+    assert field_stats(times, np.array([1.0]), [50])["rate_per_s"] is None
+
+
+@pytest.mark.series_stats
+def test_energy_is_split_by_the_state_of_charge_trend():
+    """
+    Test that the energy is integrated over time and counted as charged
+    while the state of charge rises, and discharged while it falls.
+    """
+    times = np.array([0, 1, 2, 3], dtype=np.int64) * HOUR_NS
+    voltage = np.full(4, 400.0)
+    current = np.array([100.0, 100.0, 50.0, 50.0])
+    state_of_charge = np.array([20.0, 60.0, 40.0, 40.0])
+
+    energy = energy_stats(times, voltage, current, state_of_charge)
+
+    assert energy == {"charge_kwh": 40, "discharge_kwh": 30,
+                      "throughput_kwh": 90}
+
+
+@pytest.mark.series_stats
+def test_battery_stats_use_the_validation_bounds():
+    """
+    Test that the time out of range is computed for the fields validated
+    by DataValidationConfig, and the energy only with the fields it needs.
+    """
+    low, high = DataValidationConfig.VOLTAGE["min"], \
+        DataValidationConfig.VOLTAGE["max"]
+    times = np.array([0, 1], dtype=np.int64) * SECOND_NS
+    columns = {"voltage": np.array([high + 1, low]),
+               "latency_ms": np.array([1.0, 2.0])}
+
+    stats = battery_stats(times, columns, [50])
+
+    assert validation_bounds("voltage") == (low, high)
+    assert validation_bounds("latency_ms") is None
+    assert stats["fields"]["voltage"]["time_above_max_s"] == 1
+    assert "time_above_max_s" not in stats["fields"]["latency_ms"]
+    assert "energy" not in stats
+
+
+@pytest.mark.series_stats
+def test_series_columns_sort_the_data_points():
+    """
+    Test that the data points are summarised in time order, whatever order
+    they were appended in.
+    """
+    columns = SeriesColumns(["voltage", "current", "state_of_charge"])
+    columns.append(2 * HOUR_NS, [400, 100, 60])
+    columns.append(0, [400, 100, 20])
+    columns.append(HOUR_NS, [400, None, 40])
+
+    stats = columns.stats([50])
+
+    assert len(columns) == 3
+    assert stats["fields"]["state_of_charge"]["rate_per_s"]["min"] > 0
+    assert stats["fields"]["current"]["count"] == 2
+    assert stats["energy"]["charge_kwh"] == 80